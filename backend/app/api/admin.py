@@ -26,6 +26,7 @@ class MetricsResponse(BaseModel):
     request_volume: List[Dict[str, Any]]
     database: Dict[str, Any]
     ai_service: Dict[str, Any]
+    outbox: Dict[str, Any]
     timestamp: str
 
 
@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
 from datetime import date
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.database import get_db
 from app.models import User
 from app.api.auth import get_current_user
 from app.services.ai.task_priority_service import TaskPriorityService
 from app.services.ai.recommendation_service import RecommendationService
 from app.services.ai.anomaly_detection_service import AnomalyDetectionService
-from app.services.ai.insights_service import InsightsService
+from app.services.ai.expense_stats_service import ExpenseStatsService
+from app.services import transaction_service
+from app.services.ai.insights_store import InsightsStore
 from app.services.nlp.task_parser import TaskParser
+from app.services.nlp.recategorization_service import RecategorizationService
+from app.services.ai.category_model_service import CategoryModelService
 
 router = APIRouter()
 
@@ -25,6 +29,25 @@ class NLPParseRequest(BaseModel):
     text: str
 
 
+class TransactionTextItem(BaseModel):
+    title: str = ""
+    description: Optional[str] = None
+
+
+class ClassifyTransactionsRequest(BaseModel):
+    items: List[TransactionTextItem] = Field(..., max_length=10000)
+
+
+class SuggestCategoryRequest(BaseModel):
+    title: str
+    description: Optional[str] = None
+
+
+class RecategorizeRequest(BaseModel):
+    dry_run: bool = True
+    overwrite: bool = False  # foydalanuvchi tanlagan kategoriyalarni ham almashtirish
+
+
 @router.post("/tasks/predict-priority")
 async def predict_task_priority(
     request: TaskPriorityRequest,
@@ -86,15 +109,23 @@ async def get_habit_recommendations(
         )
 
 
+def _set_insights_headers(response: Response, freshness: dict):
+    """Snapshot yoshi haqida sarlavhalar"""
+    response.headers["X-Insights-Computed-At"] = freshness["computed_at"]
+    response.headers["X-Insights-Age"] = str(freshness["age_seconds"])
+    response.headers["X-Insights-Base-Age"] = str(freshness["base_age_seconds"])
+
+
 @router.get("/insights/daily")
 async def get_daily_insights(
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Kunlik xulosa"""
     try:
-        service = InsightsService(db)
-        insights = service.generate_daily_insights(current_user.id)
+        insights, freshness = InsightsStore(db).get(current_user.id, "daily")
+        _set_insights_headers(response, freshness)
         return insights
     except Exception as e:
         raise HTTPException(
@@ -105,13 +136,14 @@ async def get_daily_insights(
 
 @router.get("/insights/weekly")
 async def get_weekly_insights(
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Haftalik xulosa"""
     try:
-        service = InsightsService(db)
-        insights = service.generate_weekly_insights(current_user.id)
+        insights, freshness = InsightsStore(db).get(current_user.id, "weekly")
+        _set_insights_headers(response, freshness)
         return insights
     except Exception as e:
         raise HTTPException(
@@ -122,13 +154,14 @@ async def get_weekly_insights(
 
 @router.get("/insights/monthly")
 async def get_monthly_insights(
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Oylik xulosa"""
     try:
-        service = InsightsService(db)
-        insights = service.generate_monthly_insights(current_user.id)
+        insights, freshness = InsightsStore(db).get(current_user.id, "monthly")
+        _set_insights_headers(response, freshness)
         return insights
     except Exception as e:
         raise HTTPException(
@@ -155,6 +188,34 @@ async def get_expense_anomalies(
         )
 
 
+@router.get("/anomalies/transactions/{transaction_id}")
+async def check_transaction_anomaly(
+    transaction_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Bitta xarajatni kategoriya statistikasi bilan solishtirish"""
+    transaction = transaction_service.get_transaction(db, transaction_id, current_user.id)
+    if not transaction:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Transaction not found"
+        )
+    if transaction.transaction_type != "expense":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only expenses can be checked"
+        )
+    
+    try:
+        return ExpenseStatsService(db).check_transaction(transaction)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to check transaction: {str(e)}"
+        )
+
+
 @router.get("/anomalies/habits")
 async def get_habit_anomalies(
     current_user: User = Depends(get_current_user),
@@ -189,3 +250,84 @@ async def parse_task_from_text(
             detail=f"Failed to parse task: {str(e)}"
         )
 
+
+@router.post("/nlp/classify-transactions")
+def classify_transactions(
+    request: ClassifyTransactionsRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Ko'p tranzaksiya matnini bitta so'rovda kategoriyalash (foydalanuvchi modeli + kalit so'zlar)"""
+    try:
+        results = CategoryModelService(db).categorize(
+            current_user.id, [(item.title, item.description) for item in request.items]
+        )
+        return {
+            "categories": [result["category"] for result in results],
+            "sources": [result["source"] for result in results],
+            "count": len(results),
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to classify transactions: {str(e)}"
+        )
+
+
+@router.post("/transactions/suggest-category")
+def suggest_transaction_category(
+    request: SuggestCategoryRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Yangi tranzaksiya uchun kategoriya taklifi (foydalanuvchi tarixidan o'rganilgan)"""
+    try:
+        return CategoryModelService(db).categorize(
+            current_user.id, [(request.title, request.description)]
+        )[0]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to suggest category: {str(e)}"
+        )
+
+
+@router.post("/transactions/category-model/train")
+def train_category_model(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Foydalanuvchi kategoriya modelini qayta o'qitish"""
+    try:
+        model = CategoryModelService(db).get_model(current_user.id, refresh=True)
+        if model is None:
+            return {"trained": False, "samples": 0, "categories": []}
+        return {
+            "trained": True,
+            "samples": model["n_samples"],
+            "categories": [str(category) for category in model["model"].classes_],
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to train category model: {str(e)}"
+        )
+
+
+@router.post("/transactions/recategorize")
+def recategorize_transactions(
+    request: RecategorizeRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Foydalanuvchining barcha tranzaksiyalarini qayta kategoriyalash (standart: dry run)"""
+    try:
+        service = RecategorizationService(db)
+        return service.recategorize(current_user.id, dry_run=request.dry_run, overwrite=request.overwrite)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to recategorize transactions: {str(e)}"
+        )
+
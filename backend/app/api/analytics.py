@@ -96,7 +96,7 @@ async def get_activity(
 async def get_productivity_trends(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
-    period: str = Query("daily", regex="^(daily|weekly|monthly)$"),
+    period: str = Query("daily", pattern="^(daily|weekly|monthly)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -121,7 +121,7 @@ async def get_productivity_trends(
 async def get_expense_trends(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
-    period: str = Query("daily", regex="^(daily|weekly|monthly)$"),
+    period: str = Query("daily", pattern="^(daily|weekly|monthly)$"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -1,9 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User
-from app.models.telegram_code import TelegramCode
 from app.schemas.auth import (
     UserRegister, Token, UserResponse, UserUpdate,
     TelegramSendCodeRequest, TelegramVerifyCodeRequest, TelegramLoginResponse
@@ -14,7 +13,9 @@ from app.utils.auth import (
     create_access_token,
     decode_access_token,
 )
+from app.utils.network import get_client_ip
 from app.services.telegram_service import create_code, verify_code, normalize_phone_number
+from app.services.background.outbox import wake_outbox_worker
 from datetime import timedelta
 import uuid
 import logging
@@ -170,12 +171,15 @@ async def debug_list_users(
 @router.post("/telegram/send-code", status_code=status.HTTP_200_OK)
 async def telegram_send_code(
     request: TelegramSendCodeRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """Send verification code via Telegram"""
     try:
-        code = create_code(db, request.phone_number)
+        client_ip = get_client_ip(http_request)
+        code = create_code(db, request.phone_number, client_ip)
         if code:
+            wake_outbox_worker()
             return {
                 "message": "Code sent successfully",
                 "expires_in_minutes": settings.telegram_code_expire_minutes
@@ -196,13 +200,15 @@ async def telegram_send_code(
 @router.post("/telegram/verify-code", response_model=TelegramLoginResponse, status_code=status.HTTP_200_OK)
 async def telegram_verify_code(
     request: TelegramVerifyCodeRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """Verify code and login/register user"""
     normalized_phone = normalize_phone_number(request.phone_number)
     
     # Verify code
-    if not verify_code(db, request.phone_number, request.code):
+    client_ip = get_client_ip(http_request)
+    if not verify_code(request.phone_number, request.code, client_ip):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired code"
@@ -1,90 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional
-import json
-import io
+from datetime import date
+from typing import Any, Dict
+from zipfile import BadZipFile
 from app.database import get_db
 from app.models import User
 from app.api.auth import get_current_user
-from app.services.export_import_service import ExportImportService
+from app.services.export_import_service import ExportImportService, PYARROW_AVAILABLE, export_file_type, gzip_stream
+from app.services.bulk_import_service import BulkImportService
+from app.services.json_stream import JSONStreamError
+from app.services.planner_import_service import PlannerImportService
 
 router = APIRouter()
 
+# Uploads treated as newline-delimited JSON (one record per line)
+NDJSON_SUFFIXES = (".ndjson", ".jsonl", ".ndjson.gz", ".jsonl.gz")
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/jsonl", "application/x-jsonlines"}
+
+
+def _export_response(db: Session, user_id: str, layout: str, format: str, gzip: bool) -> StreamingResponse:
+    """Stream an export in the requested format, optionally gzip-compressed on the fly"""
+    if format == "parquet" and not PYARROW_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Parquet export is not available on this server"
+        )
+    service = ExportImportService(db)
+    body = service.stream_export(user_id, layout, format)
+    media_type, extension = export_file_type(layout, format)
+    filename = f"tizim-{layout}-{date.today().isoformat()}.{extension}"
+    if gzip:
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
 
 @router.get("/tasks")
-async def export_tasks(
+def export_tasks(
+    format: str = Query("json", pattern="^(json|csv|xlsx|parquet)$", description="Output format"),
+    gzip: bool = Query(False, description="Compress the export with gzip"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Export tasks as JSON"""
-    service = ExportImportService(db)
-    tasks = service.export_tasks(current_user.id)
-    return JSONResponse(content={"tasks": tasks})
+    """Export tasks as JSON, CSV, XLSX or Parquet"""
+    return _export_response(db, current_user.id, "tasks", format, gzip)
 
 
 @router.get("/habits")
-async def export_habits(
+def export_habits(
+    format: str = Query("json", pattern="^(json|csv|xlsx|parquet)$", description="Output format"),
+    gzip: bool = Query(False, description="Compress the export with gzip"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Export habits as JSON"""
-    service = ExportImportService(db)
-    habits = service.export_habits(current_user.id)
-    return JSONResponse(content={"habits": habits})
+    """Export habits as JSON, CSV, XLSX or Parquet"""
+    return _export_response(db, current_user.id, "habits", format, gzip)
 
 
 @router.get("/finance")
-async def export_finance(
+def export_finance(
+    format: str = Query("json", pattern="^(json|csv|xlsx|parquet)$", description="Output format"),
+    gzip: bool = Query(False, description="Compress the export with gzip"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Export finance data as JSON"""
-    service = ExportImportService(db)
-    finance = service.export_finance(current_user.id)
-    return JSONResponse(content=finance)
+    """Export finance data (CSV/Parquet: a ZIP with one file per table)"""
+    return _export_response(db, current_user.id, "finance", format, gzip)
 
 
 @router.get("/all")
-async def export_all(
+def export_all(
+    format: str = Query("json", pattern="^(json|csv|xlsx|parquet)$", description="Output format"),
+    gzip: bool = Query(False, description="Compress the export with gzip"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Export all data as JSON"""
-    service = ExportImportService(db)
-    data = service.export_all(current_user.id)
-    return JSONResponse(content=data)
+    """Export all data as a streamed document (XLSX: one sheet per table)"""
+    return _export_response(db, current_user.id, "all", format, gzip)
 
 
-@router.post("/tasks")
-async def import_tasks(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
-    """Import tasks from JSON file"""
+def _is_ndjson(file: UploadFile) -> bool:
+    filename = (file.filename or "").lower()
+    return filename.endswith(NDJSON_SUFFIXES) or file.content_type in NDJSON_MEDIA_TYPES
+
+
+def _import_upload(db: Session, user_id: str, file: UploadFile, layout: str) -> Dict[str, Any]:
+    """Parse and upsert an upload incrementally (JSON or NDJSON, plain or gzip)"""
     try:
-        content = await file.read()
-        data = json.loads(content.decode('utf-8'))
-        
-        if "tasks" not in data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid file format: 'tasks' key not found"
-            )
-        
         service = ExportImportService(db)
-        result = service.import_tasks(current_user.id, data["tasks"])
-        
-        return {
-            "message": f"Imported {result['imported']} tasks",
-            "imported": result["imported"],
-            "errors": result["errors"],
-        }
-    except json.JSONDecodeError:
+        return service.import_stream(user_id, file.file, layout, ndjson=_is_ndjson(file))
+    except JSONStreamError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid JSON format"
+            detail=f"Invalid JSON format: {str(e)}"
         )
     except Exception as e:
         raise HTTPException(
@@ -93,71 +107,93 @@ async def import_tasks(
         )
 
 
+def _section_response(results: Dict[str, Any], section: str) -> Dict[str, Any]:
+    if section not in results:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid file format: '{section}' key not found"
+        )
+    result = results[section]
+    return {
+        "message": f"Imported {result['imported']} {section}",
+        "imported": result["imported"],
+        "created": result["created"],
+        "updated": result["updated"],
+        "errors": result["errors"],
+    }
+
+
+def _results_response(results: Dict[str, Any]) -> Dict[str, Any]:
+    total_imported = sum(section["imported"] for section in results.values())
+    return {
+        "message": f"Imported {total_imported} items",
+        "results": results,
+    }
+
+
+@router.post("/tasks")
+def import_tasks(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Import tasks from a JSON/NDJSON file"""
+    return _section_response(_import_upload(db, current_user.id, file, "tasks"), "tasks")
+
+
 @router.post("/habits")
-async def import_habits(
+def import_habits(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Import habits from JSON file"""
-    try:
-        content = await file.read()
-        data = json.loads(content.decode('utf-8'))
-        
-        if "habits" not in data:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid file format: 'habits' key not found"
-            )
-        
-        service = ExportImportService(db)
-        result = service.import_habits(current_user.id, data["habits"])
-        
-        return {
-            "message": f"Imported {result['imported']} habits",
-            "imported": result["imported"],
-            "errors": result["errors"],
-        }
-    except json.JSONDecodeError:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid JSON format"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Import failed: {str(e)}"
-        )
+    """Import habits from a JSON/NDJSON file"""
+    return _section_response(_import_upload(db, current_user.id, file, "habits"), "habits")
+
+
+@router.post("/finance")
+def import_finance(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Import transactions and budgets from a JSON/NDJSON file"""
+    return _results_response(_import_upload(db, current_user.id, file, "finance"))
 
 
 @router.post("/all")
-async def import_all(
+def import_all(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Import all data from JSON file"""
+    """Import all data from a JSON/NDJSON file"""
+    results = {
+        "tasks": BulkImportService.new_report(),
+        "habits": BulkImportService.new_report(),
+    }
+    results.update(_import_upload(db, current_user.id, file, "all"))
+    return _results_response(results)
+
+
+@router.post("/planner")
+def import_planner(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Import an Ongli Tizim planner workbook (or an XLSX export) in streaming read-only mode"""
     try:
-        content = await file.read()
-        data = json.loads(content.decode('utf-8'))
-        
-        service = ExportImportService(db)
-        result = service.import_all(current_user.id, data)
-        
-        total_imported = result.get("tasks", {}).get("imported", 0) + result.get("habits", {}).get("imported", 0)
-        
-        return {
-            "message": f"Imported {total_imported} items",
-            "results": result,
-        }
-    except json.JSONDecodeError:
+        service = PlannerImportService(db)
+        results = service.import_workbook(current_user.id, file.file)
+    except (BadZipFile, KeyError, OSError) as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid JSON format"
+            detail=f"Invalid XLSX file: {str(e)}"
         )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Import failed: {str(e)}"
         )
-
+    return _results_response(results)
@@ -6,6 +6,7 @@ from app.models import User
 from app.api.auth import get_current_user
 from app.schemas.task import TaskCreate, TaskUpdate, TaskResponse
 from app.services import task_service
+from app.services.background.reminder_scheduler import wake_reminder_scheduler
 
 router = APIRouter()
 
@@ -58,7 +59,10 @@ async def create_task(
     db: Session = Depends(get_db),
 ):
     """Create a new task"""
-    return task_service.create_task(db, task, current_user.id)
+    created = task_service.create_task(db, task, current_user.id)
+    if created.due_date is not None:
+        wake_reminder_scheduler()
+    return created
 
 
 @router.put("/{task_id}", response_model=TaskResponse)
@@ -75,6 +79,8 @@ async def update_task(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
+    if "due_date" in task_update.model_dump(exclude_unset=True):
+        wake_reminder_scheduler()
     return task
 
 
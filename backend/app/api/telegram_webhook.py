@@ -1,15 +1,16 @@
 """
 Telegram Bot Webhook Handler
-Handles incoming messages from Telegram Bot API
+Receives updates from Telegram Bot API; they are stored and processed in the background
 """
+import asyncio
+from typing import Optional
 from fastapi import APIRouter, Request, HTTPException, status, Header, Depends
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models.telegram_user import TelegramUser
-from app.services.telegram_service import normalize_phone_number, validate_phone_number
+from app.services.background.telegram_updates import store_update, wake_update_consumer
 import logging
 import hmac
-import hashlib
+import json
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -17,124 +18,57 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def verify_telegram_webhook(telegram_token: str, request_body: bytes, x_telegram_bot_api_secret_token: str = None) -> bool:
+def verify_telegram_webhook(x_telegram_bot_api_secret_token: Optional[str]) -> bool:
     """
     Verify Telegram webhook request
-    In production, you should verify the request comes from Telegram
+    Telegram echoes the secret_token given to setWebhook in the
+    X-Telegram-Bot-Api-Secret-Token header of every update
     """
-    # For now, just check if token matches
     if not settings.telegram_bot_token:
         return False
     
-    # In production, you should also verify IP addresses from Telegram
-    # Telegram IP ranges: https://core.telegram.org/bots/webhooks#validating-updates
-    return True
+    if not settings.telegram_webhook_secret:
+        # Without a secret anyone who knows the URL can post updates; allowed only for local development
+        return settings.debug
+    
+    return hmac.compare_digest(
+        (x_telegram_bot_api_secret_token or "").encode(),
+        settings.telegram_webhook_secret.encode(),
+    )
 
 
 @router.post("/webhook")
 async def telegram_webhook(
     request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
     Handle incoming Telegram Bot webhook updates
+    The update is only stored here, so Telegram gets its 200 right away;
+    duplicates (Telegram retries) are dropped by update_id
     """
+    if not verify_telegram_webhook(x_telegram_bot_api_secret_token):
+        logger.warning("Rejected Telegram webhook request: invalid secret token or bot not configured")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid webhook secret token")
+    
+    try:
+        update = json.loads(await request.body())
+        update_id = int(update["update_id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Telegram update")
+    
     try:
-        data = await request.json()
-        
-        # Verify webhook (optional but recommended)
-        # Note: For production, you should verify the request comes from Telegram IP ranges
-        if not settings.telegram_bot_token:
-            logger.warning("TELEGRAM_BOT_TOKEN not set")
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Bot token not configured")
-        
-        # Handle update
-        if "message" in data:
-            message = data["message"]
-            chat_id = str(message["chat"]["id"])
-            text = message.get("text", "").strip()
-            
-            # Handle /start command
-            if text == "/start":
-                welcome_message = (
-                    "👋 Salom! Tizim AI bot'iga xush kelibsiz!\n\n"
-                    "📱 Autentifikatsiya kodini olish uchun telefon raqamingizni yuboring.\n"
-                    "📝 Format: +998901234567 yoki 998901234567\n\n"
-                    "Masalan: +998901234567"
-                )
-                
-                # Send welcome message via Telegram Bot API
-                await send_telegram_reply(chat_id, welcome_message)
-                return {"ok": True}
-            
-            # Handle phone number
-            elif text.startswith("+") or text.replace(" ", "").isdigit():
-                phone_text = text.replace(" ", "").replace("-", "")
-                normalized_phone = normalize_phone_number(phone_text)
-                
-                if validate_phone_number(normalized_phone):
-                    # Save or update phone number -> chat_id mapping
-                    existing = db.query(TelegramUser).filter(
-                        TelegramUser.phone_number == normalized_phone
-                    ).first()
-                    
-                    if existing:
-                        # Update chat_id if changed
-                        if existing.chat_id != chat_id:
-                            existing.chat_id = chat_id
-                            db.commit()
-                    else:
-                        # Create new mapping
-                        telegram_user = TelegramUser(
-                            phone_number=normalized_phone,
-                            chat_id=chat_id
-                        )
-                        db.add(telegram_user)
-                        db.commit()
-                    
-                    success_message = (
-                        f"✅ Telefon raqamingiz qabul qilindi: {normalized_phone}\n\n"
-                        "🔐 Endi web ilovada telefon raqamingizni kiriting va tasdiqlash kodini oling."
-                    )
-                    await send_telegram_reply(chat_id, success_message)
-                    logger.info(f"Phone number registered: {normalized_phone} -> {chat_id}")
-                    return {"ok": True}
-                else:
-                    error_message = (
-                        "❌ Telefon raqam formati noto'g'ri!\n\n"
-                        "✅ To'g'ri format: +998901234567\n"
-                        "Masalan: +998901234567"
-                    )
-                    await send_telegram_reply(chat_id, error_message)
-                    return {"ok": True}
-        
+        # INSERT + commit in the threadpool so a slow database never stalls the event loop
+        if await asyncio.to_thread(store_update, db, update):
+            wake_update_consumer()
+        else:
+            logger.info(f"Duplicate Telegram update {update_id} ignored")
         return {"ok": True}
     
     except Exception as e:
-        logger.error(f"Error handling Telegram webhook: {e}", exc_info=True)
+        logger.error(f"Error storing Telegram update: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error processing webhook"
         )
-
-
-async def send_telegram_reply(chat_id: str, text: str) -> bool:
-    """Send message via Telegram Bot API"""
-    if not settings.telegram_bot_token:
-        logger.warning("TELEGRAM_BOT_TOKEN not set, cannot send message")
-        return False
-    
-    try:
-        import requests
-        url = f"https://api.telegram.org/bot{settings.telegram_bot_token}/sendMessage"
-        payload = {
-            "chat_id": chat_id,
-            "text": text,
-            "parse_mode": "HTML"
-        }
-        response = requests.post(url, json=payload, timeout=5)
-        return response.status_code == 200
-    except Exception as e:
-        logger.error(f"Error sending Telegram message: {e}", exc_info=True)
-        return False
-
@@ -1,18 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import List, Optional
 from datetime import date
+import asyncio
+import json
 from app.database import get_db
-from app.models import User
+from app.models import User, ReceiptScanJob
 from app.api.auth import get_current_user
 from app.schemas.transaction import (
     TransactionCreate,
     TransactionUpdate,
     TransactionResponse,
     TransactionStats,
+    ReceiptScanJobResponse,
+    ReceiptBatchResponse,
 )
 from app.services import transaction_service
-from app.services.ai.receipt_scanner_service import ReceiptScannerService
+from app.services.ai.receipt_batch_service import ReceiptBatchService, BatchLimitError
+from app.services.background.receipt_queue import ReceiptScanQueue, get_receipt_queue, PENDING_STATUSES
+from app.config.ai_config import ai_config
 
 router = APIRouter()
 
@@ -117,50 +123,96 @@ async def get_transaction_stats(
     )
 
 
-@router.post("/scan-receipt", response_model=TransactionResponse, status_code=status.HTTP_201_CREATED)
+def _scan_job_response(db: Session, job: ReceiptScanJob) -> ReceiptScanJobResponse:
+    transaction = None
+    if job.transaction_id:
+        transaction = transaction_service.get_transaction(db, job.transaction_id, job.user_id)
+    return ReceiptScanJobResponse(
+        job_id=job.id,
+        status=job.status,
+        error=job.error,
+        result=json.loads(job.result) if job.result else None,
+        transaction=TransactionResponse.model_validate(transaction) if transaction else None,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.post("/scan-receipt", response_model=ReceiptScanJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def scan_receipt(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    queue: ReceiptScanQueue = Depends(get_receipt_queue),
 ):
-    """Scan receipt image and create transaction"""
-    try:
-        # Read image data
-        image_data = await file.read()
-        
-        # Validate image format
-        if not file.content_type or not file.content_type.startswith('image/'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="File must be an image"
-            )
-        
-        # Scan receipt
-        scanner = ReceiptScannerService()
-        extracted_data = await scanner.scan_receipt(image_data)
-        
-        # Create transaction from extracted data
-        transaction_data = TransactionCreate(
-            title=extracted_data["title"],
-            description=extracted_data.get("description", ""),
-            category=extracted_data["category"],
-            amount=extracted_data["amount"],
-            transaction_type="expense",
-            transaction_date=date.fromisoformat(extracted_data["date"]),
-            icon="ShoppingBag",
-            color="bg-slate-100 text-slate-600",
+    """Queue a receipt image for scanning; poll GET /scan-receipt/{job_id} for the transaction"""
+    # Validate image format
+    if not file.content_type or not file.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be an image"
         )
-        
-        # Create transaction
-        transaction = transaction_service.create_transaction(
-            db, transaction_data, current_user.id
+    
+    # Queued jobs hold their image in memory; read at most one byte past the limit
+    max_bytes = ai_config.receipt_max_file_mb * 1024 * 1024
+    image_data = await file.read(max_bytes + 1)
+    if len(image_data) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds {ai_config.receipt_max_file_mb} MB"
         )
-        
-        return transaction
-        
-    except Exception as e:
+    try:
+        job_id = await queue.submit(current_user.id, image_data, file.filename, file.content_type)
+    except asyncio.QueueFull:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to scan receipt: {str(e)}"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Receipt scanner is busy, please retry shortly"
         )
+    
+    return ReceiptScanJobResponse(job_id=job_id, status="queued")
+
 
+@router.post("/scan-receipts", response_model=ReceiptBatchResponse)
+async def scan_receipts(
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    queue: ReceiptScanQueue = Depends(get_receipt_queue),
+):
+    """Scan many receipt images (or zip archives of them) and create all transactions at once"""
+    # Share the queue's scanner so LLM concurrency is bounded across both paths
+    service = ReceiptBatchService(db, scanner=queue.scanner)
+    try:
+        return await service.run(current_user.id, files)
+    except BatchLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+
+
+@router.get("/scan-receipt/{job_id}", response_model=ReceiptScanJobResponse)
+async def get_scan_receipt_job(
+    job_id: str,
+    wait: int = Query(0, ge=0, le=ai_config.receipt_scan_max_wait_seconds, description="Long-poll up to N seconds"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    queue: ReceiptScanQueue = Depends(get_receipt_queue),
+):
+    """Get receipt scan job status; with wait>0 blocks until the job finishes or the wait expires"""
+    job = db.query(ReceiptScanJob).filter(
+        ReceiptScanJob.id == job_id,
+        ReceiptScanJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Scan job not found"
+        )
+    
+    if wait and job.status in PENDING_STATUSES:
+        # Don't hold a DB transaction open while long-polling
+        db.rollback()
+        await queue.wait(job_id, wait)
+        db.refresh(job)
+    
+    return _scan_job_response(db, job)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 
 class AIConfig(BaseSettings):
@@ -21,10 +21,47 @@ class AIConfig(BaseSettings):
     # Anomaly Detection
     anomaly_contamination: float = 0.1  # 10% anomaliya kutilmoqda
     anomaly_threshold: float = 0.5
+    anomaly_training_days: int = 90  # detector shu oraliqdagi xarajatlarda o'qitiladi
+    anomaly_min_samples: int = 10
+    anomaly_model_refresh_hours: int = 24
+    anomaly_refit_min_new: int = 10  # shuncha yangi xarajatdan keyin detector qayta fit qilinadi
+    expense_ewma_alpha: float = 0.1  # online statistika: EWMA silliqlash koeffitsienti
+    expense_digest_compression: int = 100  # t-digest aniqligi
+    expense_unusual_z: float = 2.0  # shu z-score'dan yuqori xarajat g'ayrioddiy
+    model_cache_size: int = 256  # xotirada saqlanadigan modellar soni (LRU)
     
     # NLP
     nlp_model: str = "en_core_web_sm"  # spaCy model
+    nlp_disabled_components: List[str] = ["parser", "ner"]  # faqat token/POS kerak
+    nlp_warm_up: bool = True  # startup'dan keyin modelni fonda yuklash
     nlp_confidence_threshold: float = 0.7
+    nlp_memo_size: int = 50000  # takroriy tavsiflar uchun kategoriya keshi
+    category_model_features: int = 16384  # HashingVectorizer o'lchami (model hajmi ~ sinflar x shu)
+    category_model_min_samples: int = 20
+    category_model_min_confidence: float = 0.6  # shundan past bo'lsa kalit so'zlar ishlatiladi
+    category_model_refresh_hours: int = 24
+    category_model_correction_weight: float = 5.0  # foydalanuvchi tuzatishining partial_fit vazni
+    
+    # Receipt scanning
+    receipt_scan_workers: int = 4  # bir vaqtda ishlanadigan cheklar (asyncio worker'lar)
+    receipt_scan_queue_size: int = 100
+    ocr_workers: int = 2  # tesseract uchun process pool hajmi
+    vision_timeout_seconds: float = 30.0
+    vision_max_concurrency: int = 4  # bir vaqtda yuboriladigan vision LLM so'rovlari
+    receipt_scan_max_wait_seconds: int = 30  # long-polling uchun maksimal kutish
+    receipt_preprocess: bool = True
+    receipt_max_side: int = 1800  # ~300 DPI chek uchun yetarli, kattasi kichraytiriladi
+    receipt_max_skew_degrees: float = 5.0
+    receipt_upload_format: str = "JPEG"  # JPEG yoki WEBP
+    receipt_upload_quality: int = 80
+    receipt_cache_ttl_days: int = 30  # takroriy yuklangan cheklar natijasi keshi
+    receipt_phash_max_distance: int = 3  # dHash Hamming masofasi (256 bitdan); kesh natijasi qayta ishlatiladi, shuning uchun qattiq
+    receipt_cache_candidates: int = 500  # o'xshashlik tekshiriladigan oxirgi yozuvlar soni
+    receipt_batch_max_files: int = 200  # bitta bulk yuklashdagi (zip ichidagi ham) rasmlar soni
+    receipt_batch_concurrency: int = 4  # bir vaqtda ishlanadigan fayllar
+    receipt_max_file_mb: int = 15
+    receipt_batch_max_mb: int = 300  # ochilgan fayllar umumiy hajmi
+    receipt_zip_max_ratio: int = 100  # zip bomb: siqish nisbati chegarasi
     
     # Time Series
     forecast_days: int = 30
@@ -34,10 +71,23 @@ class AIConfig(BaseSettings):
     cache_ttl_seconds: int = 3600  # 1 soat
     enable_caching: bool = True
     
+    # Insights snapshot
+    insights_fresh_seconds: int = 300  # shu vaqtgacha snapshot qayta hisoblanmaydi
+    insights_retention_days: int = 35
+    
     # Performance
     max_features: int = 50
     batch_size: int = 32
     
+    # Background jobs
+    scheduler_enabled: bool = True
+    insights_job_cron: str = "0 2 * * *"  # har kuni 02:00
+    anomalies_job_cron: str = "30 2 * * *"  # har kuni 02:30
+    anomaly_models_job_cron: str = "0 3 * * *"  # har kuni 03:00
+    job_chunk_size: int = 500  # keyset pagination bo'lagi
+    job_max_workers: int = 8
+    job_user_timeout_seconds: float = 30.0
+    
     class Config:
         env_file = ".env"
         env_prefix = "AI_"
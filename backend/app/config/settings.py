@@ -36,11 +36,60 @@ class Settings(BaseSettings):
     smtp_from: Optional[str] = os.getenv("SMTP_FROM", None)
     email_enabled: bool = os.getenv("EMAIL_ENABLED", "false").lower() == "true"
     
+    # Push notifications (FCM HTTP v1)
+    fcm_project_id: Optional[str] = os.getenv("FCM_PROJECT_ID", None)
+    fcm_service_account_file: Optional[str] = os.getenv("FCM_SERVICE_ACCOUNT_FILE", None)
+    fcm_api_url: str = os.getenv("FCM_API_URL", "https://fcm.googleapis.com")
+    fcm_concurrency: int = int(os.getenv("FCM_CONCURRENCY", "100"))
+    fcm_timeout_seconds: float = float(os.getenv("FCM_TIMEOUT_SECONDS", "10"))
+    
+    # Reminders (push)
+    reminders_enabled: bool = os.getenv("REMINDERS_ENABLED", "true").lower() == "true"
+    reminder_lead_minutes: int = int(os.getenv("REMINDER_LEAD_MINUTES", "60"))  # remind this long before due_date
+    reminder_horizon_minutes: int = int(os.getenv("REMINDER_HORIZON_MINUTES", "15"))  # reminders kept in memory ahead
+    reminder_refresh_seconds: int = int(os.getenv("REMINDER_REFRESH_SECONDS", "60"))
+    reminder_batch_size: int = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+    habit_reminder_time_utc: str = os.getenv("HABIT_REMINDER_TIME_UTC", "15:00")  # 20:00 Tashkent
+    
     # Telegram Bot Settings
     telegram_bot_token: Optional[str] = os.getenv("TELEGRAM_BOT_TOKEN", None)
     telegram_code_expire_minutes: int = int(os.getenv("TELEGRAM_CODE_EXPIRE_MINUTES", "10"))
     telegram_code_attempts: int = int(os.getenv("TELEGRAM_CODE_ATTEMPTS", "3"))
     telegram_code_rate_limit_minutes: int = int(os.getenv("TELEGRAM_CODE_RATE_LIMIT_MINUTES", "1"))
+    telegram_code_phone_limit: int = int(os.getenv("TELEGRAM_CODE_PHONE_LIMIT", "1"))  # codes per phone per rate limit window
+    telegram_code_ip_limit: int = int(os.getenv("TELEGRAM_CODE_IP_LIMIT", "10"))  # codes per IP per IP window
+    telegram_verify_ip_limit: int = int(os.getenv("TELEGRAM_VERIFY_IP_LIMIT", "30"))  # verify attempts per IP per IP window
+    telegram_code_ip_window_minutes: int = int(os.getenv("TELEGRAM_CODE_IP_WINDOW_MINUTES", "10"))
+    # Reverse proxies whose X-Forwarded-For is trusted: comma-separated IPs/CIDRs, "*" for any peer.
+    # Unset means the client IP is unknown and the per-IP limits above are off
+    trusted_proxies: str = os.getenv("TRUSTED_PROXIES", "")
+    telegram_code_store: str = os.getenv("TELEGRAM_CODE_STORE", "memory")  # memory | database
+    telegram_api_url: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+    telegram_timeout_seconds: float = float(os.getenv("TELEGRAM_TIMEOUT_SECONDS", "10"))
+    telegram_pool_size: int = int(os.getenv("TELEGRAM_POOL_SIZE", "20"))
+    telegram_max_retries: int = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+    # Bot API limits: ~30 messages/s overall, 1/s per private chat, 20/min per group
+    telegram_global_rate: float = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+    telegram_chat_rate: float = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+    telegram_group_rate_per_minute: float = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MINUTE", "20"))
+    # Webhook: secret_token passed to setWebhook, echoed in X-Telegram-Bot-Api-Secret-Token
+    telegram_webhook_secret: Optional[str] = os.getenv("TELEGRAM_WEBHOOK_SECRET", None)
+    telegram_update_batch_size: int = int(os.getenv("TELEGRAM_UPDATE_BATCH_SIZE", "100"))
+    telegram_update_concurrency: int = int(os.getenv("TELEGRAM_UPDATE_CONCURRENCY", "10"))
+    telegram_update_poll_seconds: float = float(os.getenv("TELEGRAM_UPDATE_POLL_SECONDS", "5"))
+    telegram_update_max_attempts: int = int(os.getenv("TELEGRAM_UPDATE_MAX_ATTEMPTS", "3"))
+    telegram_update_retention_hours: int = int(os.getenv("TELEGRAM_UPDATE_RETENTION_HOURS", "48"))
+    
+    # Outbox (queued Telegram/email/push delivery)
+    outbox_enabled: bool = os.getenv("OUTBOX_ENABLED", "true").lower() == "true"
+    outbox_batch_size: int = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+    outbox_concurrency: int = int(os.getenv("OUTBOX_CONCURRENCY", "10"))
+    outbox_poll_seconds: float = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+    outbox_backoff_base_seconds: float = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "2"))
+    outbox_backoff_max_seconds: float = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "600"))
+    outbox_lease_seconds: int = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+    outbox_retention_hours: int = int(os.getenv("OUTBOX_RETENTION_HOURS", "48"))  # sent/failed rows are purged after this
     
     @property
     def cors_origins(self) -> list[str]:
@@ -1,12 +1,23 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.config import settings
+from app.config import settings, ai_config
 from app.database import init_db, SessionLocal
 from app.models import Category, User
 from app.utils.auth import get_password_hash
 from app.api import auth, tasks, habits, transactions, budgets, productivity, ai, analytics, optimization, admin, notifications, export_import, telegram_webhook
 from app.middleware.logging import LoggingMiddleware
+from app.services.background.scheduler import create_ai_scheduler
+from app.services.background.receipt_queue import fail_interrupted_scan_jobs, stop_receipt_queue
+from app.services.ai.receipt_scanner_service import shutdown_ocr_executor
+from app.services.nlp.model_registry import warm_up_nlp
+from app.services.telegram_client import close_telegram_client
+from app.services.fcm_client import close_fcm_client
+from app.services.notification_service import NotificationService
+from app.services.background.outbox import start_outbox_worker, stop_outbox_worker
+from app.services.background.telegram_updates import start_update_consumer, stop_update_consumer
+from app.services.background.reminder_scheduler import start_reminder_scheduler, stop_reminder_scheduler
 import uuid
+import asyncio
 import logging
 import os
 
@@ -108,6 +119,55 @@ async def startup_event():
     finally:
         db.close()
         logger.info("Database initialization complete")
+    
+    # Receipt scans queued before a restart lived only in memory
+    try:
+        interrupted = fail_interrupted_scan_jobs(SessionLocal)
+        if interrupted:
+            logger.warning(f"Marked {interrupted} interrupted receipt scan jobs as failed")
+    except Exception as e:
+        logger.error(f"Error cleaning up receipt scan jobs: {str(e)}", exc_info=True)
+    
+    # Load the spaCy model in the background so the first NLP request doesn't pay for it
+    if ai_config.enable_nlp and ai_config.nlp_warm_up:
+        app.state.nlp_warm_up = asyncio.create_task(warm_up_nlp())
+    
+    # Deliver queued Telegram/email/push messages
+    if settings.outbox_enabled:
+        start_outbox_worker(SessionLocal)
+    
+    # Process stored Telegram webhook updates
+    if settings.telegram_bot_token:
+        if not settings.telegram_webhook_secret:
+            logger.warning(
+                "TELEGRAM_BOT_TOKEN is set but TELEGRAM_WEBHOOK_SECRET is not: "
+                "the Telegram webhook rejects every update with 403 unless DEBUG is on. "
+                "Set the secret and pass it to setWebhook(secret_token=...)"
+            )
+        start_update_consumer(SessionLocal)
+    
+    # Task and habit push reminders
+    if settings.reminders_enabled and NotificationService.fcm_configured():
+        start_reminder_scheduler(SessionLocal)
+    
+    # Start background job scheduler
+    if ai_config.scheduler_enabled:
+        app.state.scheduler = create_ai_scheduler(SessionLocal)
+        app.state.scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    scheduler = getattr(app.state, "scheduler", None)
+    if scheduler:
+        await scheduler.stop()
+    await stop_receipt_queue()
+    await stop_update_consumer()
+    await stop_reminder_scheduler()
+    await stop_outbox_worker()
+    shutdown_ocr_executor()
+    await close_telegram_client()
+    await close_fcm_client()
 
 
 # Include routers
@@ -11,6 +11,14 @@ from .log import Log
 from .metric import Metric
 from .telegram_code import TelegramCode
 from .telegram_user import TelegramUser
+from .job_run import JobRun
+from .insight import Insight
+from .expense_stat import ExpenseStat
+from .receipt_scan_job import ReceiptScanJob
+from .receipt_scan_cache import ReceiptScanCache
+from .outbox_message import OutboxMessage
+from .telegram_update import TelegramUpdate
+from .device_token import DeviceToken
 
 __all__ = [
     "User",
@@ -26,5 +34,13 @@ __all__ = [
     "Metric",
     "TelegramCode",
     "TelegramUser",
+    "JobRun",
+    "Insight",
+    "ExpenseStat",
+    "ReceiptScanJob",
+    "ReceiptScanCache",
+    "OutboxMessage",
+    "TelegramUpdate",
+    "DeviceToken",
 ]
 
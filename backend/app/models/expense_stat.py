@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, Text, Float, Integer, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+
+
+class ExpenseStat(Base):
+    __tablename__ = "expense_stats"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    category = Column(String, nullable=False)  # '__all__' - barcha xarajatlar
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)  # Welford: kvadrat og'ishlar yig'indisi
+    ewma_mean = Column(Float, nullable=True)
+    ewma_var = Column(Float, nullable=False, default=0.0)
+    digest = Column(Text, nullable=False, default="[]")  # JSON: t-digest centroidlari
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Constraints
+    __table_args__ = (UniqueConstraint("user_id", "category", name="uq_expense_stat_user_category"),)
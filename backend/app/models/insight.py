@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, Text, Date, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+
+
+class Insight(Base):
+    __tablename__ = "insights"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    period = Column(String, nullable=False)  # 'daily', 'weekly', 'monthly'
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False, index=True)  # snapshot kuni (bugun)
+    base = Column(Text, nullable=False)  # JSON: yopilgan kunlar agregatlari + trendlar
+    payload = Column(Text, nullable=False)  # JSON: oxirgi to'liq xulosa
+    base_computed_at = Column(DateTime(timezone=True), nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Constraints
+    __table_args__ = (UniqueConstraint("user_id", "period", "period_end", name="uq_insight_user_period_end"),)
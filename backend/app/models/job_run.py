@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, DateTime, Integer, Float, Text
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    job_name = Column(String, nullable=False, index=True)  # daily_insights, anomaly_check, ...
+    status = Column(String, nullable=False, default="running")  # running, completed, degraded, failed
+    started_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    processed = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    timed_out = Column(Integer, default=0)
+    duration_seconds = Column(Float, nullable=True)
+    throughput = Column(Float, nullable=True)  # users per second
+    errors = Column(Text, nullable=True)  # JSON list of {"user_id", "error"}
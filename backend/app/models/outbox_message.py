@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Text, Integer, Float, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("idx_outbox_messages_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    channel = Column(String, nullable=False)  # telegram, email, push
+    recipient = Column(String, nullable=False)  # chat_id, email address yoki device token
+    payload = Column(Text, nullable=False)  # JSON: kanalga xos xabar maydonlari
+    status = Column(String, nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)  # shundan keyin yuborilmaydi (masalan, tasdiqlash kodi)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    delivery_ms = Column(Float, nullable=True)  # navbatga qo'yilgandan yetkazilgunicha
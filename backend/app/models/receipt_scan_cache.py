@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+
+
+class ReceiptScanCache(Base):
+    __tablename__ = "receipt_scan_cache"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    sha256 = Column(String(64), nullable=False)  # asl fayl baytlari
+    phash = Column(String(64), nullable=True)  # 256-bit dHash (hex) - o'xshash rasmlar uchun
+    result = Column(Text, nullable=False)  # JSON: ajratib olingan chek ma'lumotlari
+    transaction_id = Column(String, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Indexes
+    __table_args__ = (
+        Index("idx_receipt_scan_cache_user_sha", "user_id", "sha256"),
+        Index("idx_receipt_scan_cache_user_expires", "user_id", "expires_at"),
+    )
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+import uuid
+
+
+class ReceiptScanJob(Base):
+    __tablename__ = "receipt_scan_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, processing, completed, failed
+    filename = Column(String, nullable=True)
+    content_type = Column(String, nullable=True)
+    result = Column(Text, nullable=True)  # JSON: ajratib olingan chek ma'lumotlari
+    error = Column(Text, nullable=True)
+    transaction_id = Column(String, ForeignKey("transactions.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
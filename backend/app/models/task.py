@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -6,6 +6,8 @@ from app.database import Base
 
 class Task(Base):
     __tablename__ = "tasks"
+    # Reminder scheduler scans upcoming due dates across all users
+    __table_args__ = (Index("idx_tasks_due_date_status", "due_date", "status"),)
 
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, Text, Integer, BigInteger, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class TelegramUpdate(Base):
+    __tablename__ = "telegram_updates"
+    __table_args__ = (
+        Index("idx_telegram_updates_status_chat", "status", "chat_id"),
+    )
+
+    update_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=False)  # Telegram qayta yuborsa dublikat bo'lmaydi
+    chat_id = Column(String, nullable=True)  # bitta chat update'lari ketma-ket qayta ishlanadi
+    payload = Column(Text, nullable=False)  # JSON: Telegram'dan kelgan xom update
+    status = Column(String, nullable=False, default="pending")  # pending, processing, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+    processed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Float, Date, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, Float, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -18,9 +18,13 @@ class Transaction(Base):
     icon = Column(String, default="CreditCard")
     color = Column(String, default="bg-slate-100 text-slate-600")
     receipt_url = Column(Text, nullable=True)
+    anomaly_score = Column(Float, nullable=True)  # IsolationForest bahosi (kattaroq = g'ayrioddiyroq)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
     user = relationship("User", back_populates="transactions")
 
+    # Indexes
+    __table_args__ = (Index("idx_transactions_user_anomaly_score", "user_id", "anomaly_score"),)
+
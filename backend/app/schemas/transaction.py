@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import date, datetime
 
 
@@ -34,6 +34,7 @@ class TransactionUpdate(BaseModel):
 class TransactionResponse(TransactionBase):
     id: str
     user_id: str
+    anomaly_score: Optional[float] = None
     created_at: datetime
     updated_at: datetime
 
@@ -48,3 +49,32 @@ class TransactionStats(BaseModel):
     income_count: int
     expense_count: int
 
+
+
+class ReceiptScanJobResponse(BaseModel):
+    job_id: str
+    status: str  # 'queued', 'processing', 'completed', 'failed'
+    error: Optional[str] = None
+    result: Optional[dict] = None
+    transaction: Optional[TransactionResponse] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class ReceiptBatchFileResult(BaseModel):
+    filename: str
+    status: str  # 'created', 'duplicate', 'failed', 'rejected'
+    error: Optional[str] = None
+    transaction_id: Optional[str] = None
+    duplicate_of: Optional[str] = None  # transaction this receipt (possibly) duplicates
+    result: Optional[dict] = None
+
+
+class ReceiptBatchResponse(BaseModel):
+    total: int
+    created: int
+    duplicates: int
+    failed: int
+    rejected: int
+    files: List[ReceiptBatchFileResult]
+    transactions: List[TransactionResponse]
@@ -2,11 +2,15 @@ from .task_priority_service import TaskPriorityService
 from .recommendation_service import RecommendationService
 from .anomaly_detection_service import AnomalyDetectionService
 from .insights_service import InsightsService
+from .insights_store import InsightsStore
+from .expense_stats_service import ExpenseStatsService
 
 __all__ = [
     "TaskPriorityService",
     "RecommendationService",
     "AnomalyDetectionService",
     "InsightsService",
+    "InsightsStore",
+    "ExpenseStatsService",
 ]
 
@@ -1,9 +1,11 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Dict, Optional
-from datetime import date, timedelta
+from sqlalchemy import and_, func, update, bindparam
+from typing import Iterable, List, Dict, Optional, Sequence, Tuple
+from datetime import date, datetime, timedelta
+import logging
 import numpy as np
 from app.models import Transaction, Habit, HabitCompletion
+from app.services.ai.model_store import model_store
 from app.config.ai_config import ai_config
 
 try:
@@ -12,9 +14,20 @@ try:
 except ImportError:
     SKLEARN_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
+# model_store'dagi detectorlar turi
+ANOMALY_MODEL_KIND = "expense_anomaly"
+
 
 class AnomalyDetectionService:
-    """Anomaliya aniqlash servisi"""
+    """Anomaliya aniqlash servisi
+
+    Har bir foydalanuvchi uchun IsolationForest detector bir marta fit qilinib
+    ``model_store``da saqlanadi. Yangi xarajat qo'shilganda ``score_transaction``
+    uni shu detector bilan baholaydi va ``Transaction.anomaly_score``ga yozadi,
+    shuning uchun anomaliyalar ro'yxati indeksli so'rovga aylanadi.
+    """
     
     def __init__(self, db: Session):
         self.db = db
@@ -26,93 +39,267 @@ class AnomalyDetectionService:
     ) -> List[Dict]:
         """Xarajatlar anomaliyalarini aniqlash"""
         start_date = date.today() - timedelta(days=days)
+        window_filter = and_(
+            Transaction.user_id == user_id,
+            Transaction.transaction_type == "expense",
+            Transaction.transaction_date >= start_date
+        )
         
-        transactions = self.db.query(Transaction).filter(
-            and_(
-                Transaction.user_id == user_id,
-                Transaction.transaction_type == "expense",
-                Transaction.transaction_date >= start_date
-            )
-        ).all()
+        # Oddiy statistika: ``days`` oynasi bo'yicha bitta SQL agregat. Butun tarix
+        # bo'yicha baseline (ExpenseStatsService) xarajatlari o'zgargan foydalanuvchida
+        # chegarani siljitadi, shuning uchun bu yerda ishlatilmaydi
+        count, total, total_sq = self.db.query(
+            func.count(Transaction.id),
+            func.sum(func.abs(Transaction.amount)),
+            func.sum(Transaction.amount * Transaction.amount)
+        ).filter(window_filter).one()
         
-        if len(transactions) < 5:
+        if count < 5:
             return []
         
-        # Oddiy statistika
-        amounts = [abs(txn.amount) for txn in transactions]
-        mean_amount = np.mean(amounts)
-        std_amount = np.std(amounts)
+        mean_amount = float(total) / count
+        std_amount = float(np.sqrt(max(float(total_sq) / count - mean_amount ** 2, 0.0)))
         
         anomalies = []
         
-        if SKLEARN_AVAILABLE and len(transactions) >= 10:
-            # Isolation Forest
+        if SKLEARN_AVAILABLE and count >= ai_config.anomaly_min_samples:
+            # Isolation Forest (cache'dagi detector + saqlangan baholar)
             try:
-                # Features: amount, category encoded, day of week
-                features = []
-                category_map = {}
-                category_idx = 0
-                
-                for txn in transactions:
-                    cat = txn.category
-                    if cat not in category_map:
-                        category_map[cat] = category_idx
-                        category_idx += 1
-                    
-                    day_of_week = txn.transaction_date.weekday()
-                    features.append([
-                        abs(txn.amount),
-                        category_map[cat],
-                        day_of_week
-                    ])
-                
-                # Normalize
-                features = np.array(features)
-                features[:, 0] = (features[:, 0] - features[:, 0].mean()) / (features[:, 0].std() + 1e-8)
-                
-                # Isolation Forest
-                iso_forest = IsolationForest(
-                    contamination=ai_config.anomaly_contamination,
-                    random_state=42
-                )
-                predictions = iso_forest.fit_predict(features)
-                
-                # Anomalies
-                for i, txn in enumerate(transactions):
-                    if predictions[i] == -1:  # Anomaly
-                        anomalies.append({
-                            "transaction_id": txn.id,
-                            "title": txn.title,
-                            "amount": abs(txn.amount),
-                            "category": txn.category,
-                            "date": txn.transaction_date.isoformat(),
-                            "reason": f"Kutilmagan katta xarajat (o'rtacha: {mean_amount:.2f})",
-                            "severity": "high" if abs(txn.amount) > mean_amount + 2 * std_amount else "medium"
-                        })
-            except Exception:
-                pass
+                detector = self.get_detector(user_id)
+                if detector is not None:
+                    self._backfill_scores(user_id, detector, start_date)
+                    flagged = self.db.query(Transaction).filter(
+                        and_(
+                            window_filter,
+                            Transaction.anomaly_score > detector["threshold"]
+                        )
+                    ).all()
+                    anomalies = [
+                        self._format_anomaly(txn, mean_amount, mean_amount + 2 * std_amount)
+                        for txn in flagged
+                    ]
+            except Exception as e:
+                self.db.rollback()
+                logger.warning(f"Isolation Forest anomaly detection failed: {str(e)}")
         
         # Fallback: Z-score method
         if not anomalies:
             threshold = mean_amount + 2 * std_amount
-            for txn in transactions:
-                amount = abs(txn.amount)
-                if amount > threshold:
-                    anomalies.append({
-                        "transaction_id": txn.id,
-                        "title": txn.title,
-                        "amount": amount,
-                        "category": txn.category,
-                        "date": txn.transaction_date.isoformat(),
-                        "reason": f"Kutilmagan katta xarajat (o'rtacha: {mean_amount:.2f})",
-                        "severity": "high" if amount > mean_amount + 3 * std_amount else "medium"
-                    })
+            flagged = self.db.query(Transaction).filter(
+                and_(
+                    window_filter,
+                    func.abs(Transaction.amount) > threshold
+                )
+            ).all()
+            anomalies = [
+                self._format_anomaly(txn, mean_amount, mean_amount + 3 * std_amount)
+                for txn in flagged
+            ]
         
         # Amount bo'yicha saralash
         anomalies.sort(key=lambda x: x["amount"], reverse=True)
         
         return anomalies
     
+    def get_detector(
+        self,
+        user_id: str,
+        refresh: bool = False
+    ) -> Optional[Dict]:
+        """Cache'dagi detector; yo'q yoki eskirgan bo'lsa qayta fit qilinadi"""
+        if not SKLEARN_AVAILABLE:
+            return None
+        
+        detector = None if refresh else model_store.get(ANOMALY_MODEL_KIND, user_id)
+        if detector is None or self._is_stale(user_id, detector):
+            detector = self.fit_detector(user_id)
+        return detector
+    
+    def fit_detector(self, user_id: str) -> Optional[Dict]:
+        """Oxirgi ``anomaly_training_days`` kunlik xarajatlarda detectorni fit qilish
+        
+        Fit qilingandan keyin shu oraliqdagi barcha xarajatlar yangi model bilan
+        qayta baholanadi.
+        """
+        since = date.today() - timedelta(days=ai_config.anomaly_training_days)
+        rows = self.db.query(
+            Transaction.id,
+            Transaction.amount,
+            Transaction.category,
+            Transaction.transaction_date
+        ).filter(
+            and_(
+                Transaction.user_id == user_id,
+                Transaction.transaction_type == "expense",
+                Transaction.transaction_date >= since
+            )
+        ).all()
+        
+        if len(rows) < ai_config.anomaly_min_samples:
+            model_store.delete(ANOMALY_MODEL_KIND, user_id)
+            return None
+        
+        ids, amounts, categories, dates = zip(*rows)
+        amounts = np.abs(np.asarray(amounts, dtype=float))
+        category_names, category_codes = np.unique(np.asarray(categories, dtype=object), return_inverse=True)
+        amount_mean = float(amounts.mean())
+        amount_std = float(amounts.std())
+        
+        features = self._build_features(amounts, category_codes, self._weekdays(dates), amount_mean, amount_std)
+        forest = IsolationForest(
+            contamination=ai_config.anomaly_contamination,
+            random_state=42
+        ).fit(features)
+        
+        detector = {
+            "model": forest,
+            # score_samples < offset_ bo'lsa predict() -1 qaytaradi
+            "threshold": float(-forest.offset_),
+            "category_map": {name: idx for idx, name in enumerate(category_names)},
+            "amount_mean": amount_mean,
+            "amount_std": amount_std,
+            "n_samples": len(rows),
+            "fitted_at": datetime.utcnow(),
+        }
+        model_store.put(ANOMALY_MODEL_KIND, user_id, detector)
+        
+        self._store_scores(zip(ids, -forest.score_samples(features)))
+        return detector
+    
+    def score_transaction(self, transaction: Transaction) -> Optional[float]:
+        """Bitta tranzaksiyani cache'dagi detector bilan baholash (commit qilinmaydi)
+        
+        Detector hali bo'lmasa baho bo'sh qoladi va keyingi ``detect_expense_anomalies``
+        chaqiruvida to'ldiriladi.
+        """
+        transaction.anomaly_score = None
+        if not SKLEARN_AVAILABLE or transaction.transaction_type != "expense":
+            return None
+        
+        detector = model_store.get(ANOMALY_MODEL_KIND, transaction.user_id)
+        if detector is None:
+            return None
+        
+        score = float(self._score_rows(
+            detector,
+            [transaction.amount],
+            [transaction.category],
+            [transaction.transaction_date]
+        )[0])
+        transaction.anomaly_score = score
+        return score
+    
+    def _is_stale(self, user_id: str, detector: Dict) -> bool:
+        """Detector eskirganmi: vaqt bo'yicha yoki yetarlicha yangi ma'lumot kelganmi"""
+        fitted_at = detector["fitted_at"]
+        if datetime.utcnow() - fitted_at > timedelta(hours=ai_config.anomaly_model_refresh_hours):
+            return True
+        
+        changed = self.db.query(func.count(Transaction.id)).filter(
+            and_(
+                Transaction.user_id == user_id,
+                Transaction.transaction_type == "expense",
+                Transaction.updated_at > fitted_at
+            )
+        ).scalar() or 0
+        return changed >= max(ai_config.anomaly_refit_min_new, int(detector["n_samples"] * 0.2))
+    
+    def _backfill_scores(self, user_id: str, detector: Dict, start_date: date):
+        """Hali baholanmagan xarajatlarni bitta batch'da baholash"""
+        rows = self.db.query(
+            Transaction.id,
+            Transaction.amount,
+            Transaction.category,
+            Transaction.transaction_date
+        ).filter(
+            and_(
+                Transaction.user_id == user_id,
+                Transaction.transaction_type == "expense",
+                Transaction.transaction_date >= start_date,
+                Transaction.anomaly_score.is_(None)
+            )
+        ).all()
+        
+        if not rows:
+            return
+        
+        ids, amounts, categories, dates = zip(*rows)
+        self._store_scores(zip(ids, self._score_rows(detector, amounts, categories, dates)))
+    
+    def _store_scores(self, scored: Iterable[Tuple[str, float]]):
+        """Baholarni executemany bilan yozish (updated_at o'zgarmaydi)"""
+        params = [{"txn_id": txn_id, "score": float(score)} for txn_id, score in scored]
+        if not params:
+            return
+        
+        table = Transaction.__table__
+        stmt = update(table).where(table.c.id == bindparam("txn_id")).values(
+            anomaly_score=bindparam("score"),
+            # Qayta baholash "ma'lumot o'zgarishi" hisoblanmasligi kerak
+            updated_at=table.c.updated_at
+        )
+        self.db.connection().execute(stmt, params)
+        self.db.commit()
+    
+    def _score_rows(
+        self,
+        detector: Dict,
+        amounts: Sequence[float],
+        categories: Sequence[str],
+        dates: Sequence[date]
+    ) -> np.ndarray:
+        """Anomaliya bahosi: -score_samples (kattaroq = g'ayrioddiyroq)"""
+        category_map = detector["category_map"]
+        unknown = len(category_map)
+        category_codes = np.fromiter(
+            (category_map.get(cat, unknown) for cat in categories),
+            dtype=float,
+            count=len(categories)
+        )
+        features = self._build_features(
+            np.abs(np.asarray(amounts, dtype=float)),
+            category_codes,
+            self._weekdays(dates),
+            detector["amount_mean"],
+            detector["amount_std"]
+        )
+        return -detector["model"].score_samples(features)
+    
+    @staticmethod
+    def _build_features(
+        amounts: np.ndarray,
+        category_codes: np.ndarray,
+        weekdays: np.ndarray,
+        amount_mean: float,
+        amount_std: float
+    ) -> np.ndarray:
+        """Features: normallashgan amount, category kodi, hafta kuni"""
+        return np.column_stack((
+            (amounts - amount_mean) / (amount_std + 1e-8),
+            category_codes,
+            weekdays
+        )).astype(float)
+    
+    @staticmethod
+    def _weekdays(dates: Sequence[date]) -> np.ndarray:
+        """date.weekday() ning vektorlashgan varianti (1970-01-01 - payshanba)"""
+        days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+        return (days + 3) % 7
+    
+    @staticmethod
+    def _format_anomaly(txn: Transaction, mean_amount: float, high_threshold: float) -> Dict:
+        amount = abs(txn.amount)
+        return {
+            "transaction_id": txn.id,
+            "title": txn.title,
+            "amount": amount,
+            "category": txn.category,
+            "date": txn.transaction_date.isoformat(),
+            "reason": f"Kutilmagan katta xarajat (o'rtacha: {mean_amount:.2f})",
+            "severity": "high" if amount > high_threshold else "medium",
+            "anomaly_score": txn.anomaly_score
+        }
+    
     def detect_habit_anomalies(
         self,
         user_id: str
@@ -0,0 +1,226 @@
+"""
+Tranzaksiya kategoriyasi uchun o'rganiladigan klassifikator (foydalanuvchi bo'yicha)
+
+Belgi n-grammlarini xeshlash (``char_wb`` 2-4, o'zbekcha qo'shimchalarga chidamli,
+lug'at saqlanmaydi) + SGDClassifier (log loss). Model foydalanuvchining
+``title/description -> category`` juftliklaridan o'qitiladi va ``model_store``da
+saqlanadi. Foydalanuvchi kategoriyani tuzatganda ``learn`` modelni
+``partial_fit`` bilan darhol yangilaydi. Ishonch past bo'lsa kalit so'z
+klassifikatori (TextClassifier) ishlatiladi.
+
+Inference sklearn validatsiyasini chetlab o'tadi: xesh belgilar to'g'ridan-to'g'ri
+``coef_`` bilan ko'paytiriladi (bitta matn uchun ~0.1 ms).
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+from app.models import Transaction
+from app.services.ai.model_store import model_store
+from app.services.nlp.keyword_matcher import normalize_text
+from app.services.nlp.text_classifier import TextClassifier, DEFAULT_CATEGORY
+from app.config.ai_config import ai_config
+
+try:
+    from scipy.sparse import csr_matrix
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.utils import murmurhash3_32
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# model_store'dagi modellar turi
+CATEGORY_MODEL_KIND = "transaction_category"
+
+NGRAM_RANGE = (2, 4)
+
+
+def hash_features(text: str) -> Dict[int, float]:
+    """So'z chegarali belgi n-grammlari -> {xesh indeks: l2-normallangan soni}"""
+    n_features = ai_config.category_model_features
+    counts: Dict[int, float] = {}
+    for word in normalize_text(text).split():
+        word = f" {word} "
+        for n in range(NGRAM_RANGE[0], NGRAM_RANGE[1] + 1):
+            if len(word) < n:
+                break
+            for offset in range(len(word) - n + 1):
+                index = murmurhash3_32(word[offset:offset + n], positive=True) % n_features
+                counts[index] = counts.get(index, 0.0) + 1.0
+    norm = sum(value * value for value in counts.values()) ** 0.5
+    if norm:
+        for index in counts:
+            counts[index] /= norm
+    return counts
+
+
+def featurize(texts: Iterable[str]) -> "csr_matrix":
+    indptr, indices, values = [0], [], []
+    for text in texts:
+        features = hash_features(text)
+        indices.extend(features)
+        values.extend(features.values())
+        indptr.append(len(indices))
+    return csr_matrix(
+        (np.asarray(values, dtype=np.float64), np.asarray(indices, dtype=np.int32), indptr),
+        shape=(len(indptr) - 1, ai_config.category_model_features)
+    )
+
+
+def predict_proba(classifier, texts: List[str]) -> np.ndarray:
+    """SGDClassifier(log_loss).predict_proba bilan bir xil (one-vs-rest), validatsiyasiz:
+    har bir matnning xesh ustunlari ``coef_`` dan olinib skalyar ko'paytiriladi"""
+    coef = classifier.coef_
+    scores = np.empty((len(texts), coef.shape[0]))
+    for row, text in enumerate(texts):
+        features = hash_features(text)
+        columns = np.fromiter(features.keys(), dtype=np.intp, count=len(features))
+        weights = np.fromiter(features.values(), dtype=np.float64, count=len(features))
+        scores[row] = coef[:, columns] @ weights
+    proba = 1.0 / (1.0 + np.exp(-(scores + classifier.intercept_)))
+    if proba.shape[1] == 1:
+        return np.hstack([1.0 - proba, proba])
+    totals = proba.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+    return proba / totals
+
+
+def transaction_text(title: Optional[str], description: Optional[str]) -> str:
+    return f"{title or ''} {description or ''}".strip()
+
+
+class CategoryModelService:
+    """Foydalanuvchi tarixidan o'rganilgan kategoriya modeli"""
+
+    def __init__(self, db: Session, classifier: Optional[TextClassifier] = None):
+        self.db = db
+        self.classifier = classifier or TextClassifier()
+
+    def get_model(self, user_id: str, refresh: bool = False) -> Optional[Dict]:
+        """Cache'dagi model; yo'q yoki eskirgan bo'lsa qayta o'qitiladi
+
+        Ma'lumot yetarli bo'lmagani ham (``"model": None`` yozuvi) keshlanadi, shuning
+        uchun yangi foydalanuvchida har bir murojaat butun tarixni qayta o'qimaydi.
+        """
+        if not SKLEARN_AVAILABLE:
+            return None
+
+        model = None if refresh else model_store.get(CATEGORY_MODEL_KIND, user_id)
+        if model is None or self._is_stale(model):
+            model = self.fit_model(user_id)
+        return model if model is not None and model["model"] is not None else None
+
+    def fit_model(self, user_id: str) -> Optional[Dict]:
+        """Foydalanuvchi kategoriyalagan barcha tranzaksiyalarda to'liq o'qitish"""
+        rows = self.db.query(
+            Transaction.title,
+            Transaction.description,
+            Transaction.category
+        ).filter(
+            and_(
+                Transaction.user_id == user_id,
+                Transaction.category.isnot(None),
+                Transaction.category != "",
+                Transaction.category != DEFAULT_CATEGORY
+            )
+        ).all()
+
+        labels = [row.category for row in rows]
+        if len(rows) < ai_config.category_model_min_samples or len(set(labels)) < 2:
+            # Salbiy natija ham refresh muddatigacha (yoki keyingi ``learn`` gacha) faqat xotirada saqlanadi
+            model_store.remember(CATEGORY_MODEL_KIND, user_id, {
+                "model": None,
+                "n_samples": len(rows),
+                "fitted_at": datetime.utcnow(),
+                "corrections": 0,
+            })
+            return None
+
+        X = featurize(transaction_text(row.title, row.description) for row in rows)
+        classifier = SGDClassifier(loss="log_loss", alpha=1e-5, max_iter=20, tol=None, random_state=42)
+        classifier.fit(X, labels)
+
+        model = {
+            "model": classifier,
+            "n_samples": len(rows),
+            "fitted_at": datetime.utcnow(),
+            "corrections": 0,
+        }
+        model_store.put(CATEGORY_MODEL_KIND, user_id, model)
+        logger.info(f"Category model fitted for user {user_id}: {len(rows)} samples, {len(classifier.classes_)} classes")
+        return model
+
+    def predict_many(
+        self,
+        user_id: str,
+        items: Iterable[Tuple[Optional[str], Optional[str]]]
+    ) -> List[Optional[Tuple[str, float]]]:
+        """(kategoriya, ishonch) juftliklari; model yo'q bo'lsa None'lar"""
+        texts = [transaction_text(title, description) for title, description in items]
+        model = self.get_model(user_id)
+        if model is None or not texts:
+            return [None] * len(texts)
+
+        classifier = model["model"]
+        proba = predict_proba(classifier, texts)
+        best = proba.argmax(axis=1)
+        return [
+            (str(classifier.classes_[index]), float(proba[row, index]))
+            for row, index in enumerate(best)
+        ]
+
+    def categorize(
+        self,
+        user_id: str,
+        items: Iterable[Tuple[Optional[str], Optional[str]]]
+    ) -> List[Dict]:
+        """Model ishonchli bo'lsa uning javobi, aks holda kalit so'z klassifikatori"""
+        items = list(items)
+        predictions = self.predict_many(user_id, items)
+
+        results: List[Optional[Dict]] = [None] * len(items)
+        fallback = []
+        for index, prediction in enumerate(predictions):
+            if prediction and prediction[1] >= ai_config.category_model_min_confidence:
+                results[index] = {"category": prediction[0], "confidence": round(prediction[1], 3), "source": "model"}
+            else:
+                fallback.append(index)
+
+        if fallback:
+            categories = self.classifier.classify_transactions(items[index] for index in fallback)
+            for index, category in zip(fallback, categories):
+                results[index] = {"category": category, "confidence": None, "source": "keywords"}
+        return results
+
+    def learn(self, user_id: str, title: Optional[str], description: Optional[str], category: str) -> bool:
+        """Foydalanuvchi tuzatishini modelga qo'shish (partial_fit); yangi kategoriya - qayta o'qitish"""
+        if not SKLEARN_AVAILABLE or not category or category == DEFAULT_CATEGORY:
+            return False
+
+        model = model_store.get(CATEGORY_MODEL_KIND, user_id)
+        if model is None:
+            return False
+
+        classifier = model["model"]
+        if classifier is None:
+            # Yangi yorliq yetarli ma'lumot berishi mumkin - keyingi murojaatda qayta tekshiriladi
+            # (yozuv faqat xotirada, cache'dagi obyektning o'zi o'zgaradi)
+            model["fitted_at"] = datetime.min
+            return True
+        if category not in classifier.classes_:
+            # partial_fit yangi sinfni qo'sha olmaydi - keyingi murojaatda to'liq o'qitiladi
+            model["fitted_at"] = datetime.min
+        else:
+            X = featurize([transaction_text(title, description)])
+            classifier.partial_fit(X, [category], sample_weight=[ai_config.category_model_correction_weight])
+            model["corrections"] += 1
+        model_store.put(CATEGORY_MODEL_KIND, user_id, model)
+        return True
+
+    def _is_stale(self, model: Dict) -> bool:
+        """Faqat vaqt bo'yicha - inference yo'lida bazaga so'rov yo'q"""
+        return datetime.utcnow() - model["fitted_at"] > timedelta(hours=ai_config.category_model_refresh_hours)
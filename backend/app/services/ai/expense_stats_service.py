@@ -0,0 +1,251 @@
+import json
+import logging
+from sqlalchemy.orm import Session
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional, Tuple
+from app.models import ExpenseStat, Transaction
+from app.services.analytics.online_stats import RunningStats, Ewma, TDigest
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+# Foydalanuvchining barcha xarajatlari uchun umumiy qator
+OVERALL_CATEGORY = "__all__"
+# Kategoriya statistikasi shundan kam bo'lsa umumiy statistika ishlatiladi
+MIN_CATEGORY_SAMPLES = 5
+
+# (transaction_type, category, amount)
+TransactionValues = Tuple[str, str, float]
+
+
+class ExpenseStatsService:
+    """Xarajatlar uchun inkremental statistika (foydalanuvchi va kategoriya bo'yicha)
+
+    Har bir qatorda Welford o'rtacha/dispersiya, EWMA va t-digest saqlanadi.
+    Tranzaksiya yaratilganda, o'zgartirilganda yoki o'chirilganda ``apply``
+    faqat tegishli qatorlarni yangilaydi. Foydalanuvchi statistikasi hali
+    qurilmagan bo'lsa, birinchi o'qishda ``rebuild`` bilan to'liq quriladi.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def values_of(transaction: Transaction) -> TransactionValues:
+        return (transaction.transaction_type, transaction.category, transaction.amount)
+
+    def apply(
+        self,
+        user_id: str,
+        removed: Optional[TransactionValues] = None,
+        added: Optional[TransactionValues] = None
+    ):
+        """Bitta tranzaksiya o'zgarishini statistikaga qo'llash (commit qilinmaydi)"""
+        rows: Dict[str, ExpenseStat] = {}
+        overall = self._find(user_id, OVERALL_CATEGORY, lock=True)
+        if overall is None:
+            # Hali qurilmagan - birinchi o'qishda barcha tarix bilan quriladi
+            return
+        rows[OVERALL_CATEGORY] = overall
+
+        if removed and removed[0] == "expense":
+            for key in (OVERALL_CATEGORY, removed[1]):
+                row = self._row(user_id, key, rows, create=False)
+                if row is not None:
+                    self._remove_value(row, abs(removed[2]))
+
+        if added and added[0] == "expense":
+            for key in (OVERALL_CATEGORY, added[1]):
+                self._add_value(self._row(user_id, key, rows, create=True), abs(added[2]))
+
+    def apply_many(self, user_id: str, added: List[TransactionValues]):
+        """Ko'p yangi tranzaksiyani bitta o'tishda qo'llash (bulk import, commit qilinmaydi)"""
+        rows: Dict[str, ExpenseStat] = {}
+        overall = self._find(user_id, OVERALL_CATEGORY, lock=True)
+        if overall is None:
+            return
+        rows[OVERALL_CATEGORY] = overall
+
+        for values in added:
+            if values[0] == "expense":
+                for key in (OVERALL_CATEGORY, values[1]):
+                    self._add_value(self._row(user_id, key, rows, create=True), abs(values[2]))
+
+    def get_stats(
+        self,
+        user_id: str,
+        category: str = OVERALL_CATEGORY
+    ) -> Optional[ExpenseStat]:
+        """Statistika qatori; foydalanuvchi uchun hali qurilmagan bo'lsa quriladi"""
+        if category != OVERALL_CATEGORY and self._find(user_id, OVERALL_CATEGORY) is None:
+            self.rebuild(user_id)
+        row = self._find(user_id, category)
+        if row is None and category == OVERALL_CATEGORY:
+            self.rebuild(user_id)
+            row = self._find(user_id, category)
+        return row
+
+    def rebuild(self, user_id: str) -> int:
+        """Barcha xarajatlar bo'yicha statistikani noldan qurish (oqimli o'qish)
+
+        Eski qatorlar o'chirilib yangilari savepoint ichida yoziladi: parallel
+        birinchi o'qish xuddi shu qatorlarni yozib ulgurgan bo'lsa
+        (``UNIQUE(user_id, category)``), faqat savepoint bekor qilinadi va
+        o'sha rebuild natijasi ishlatiladi.
+        """
+        accumulators: Dict[str, Tuple[RunningStats, Ewma, TDigest]] = {
+            OVERALL_CATEGORY: self._new_accumulator()
+        }
+        rows = self.db.query(Transaction.category, Transaction.amount).filter(
+            and_(
+                Transaction.user_id == user_id,
+                Transaction.transaction_type == "expense"
+            )
+        ).order_by(Transaction.transaction_date, Transaction.created_at).yield_per(1000)
+
+        for category, amount in rows:
+            value = abs(amount)
+            for key in (OVERALL_CATEGORY, category):
+                if key not in accumulators:
+                    accumulators[key] = self._new_accumulator()
+                for accumulator in accumulators[key]:
+                    accumulator.add(value)
+
+        try:
+            with self.db.begin_nested():
+                self._delete_rows(user_id)
+                for key, (stats, ewma, digest) in accumulators.items():
+                    digest.compress()
+                    self.db.add(ExpenseStat(
+                        user_id=user_id,
+                        category=key,
+                        count=stats.count,
+                        mean=stats.mean,
+                        m2=stats.m2,
+                        ewma_mean=ewma.mean,
+                        ewma_var=ewma.var,
+                        digest=json.dumps(digest.to_list()),
+                    ))
+            count = accumulators[OVERALL_CATEGORY][0].count
+        except IntegrityError:
+            logger.info(f"Expense stats for user {user_id} were rebuilt concurrently")
+            row = self._find(user_id, OVERALL_CATEGORY)
+            count = row.count if row is not None else 0
+
+        self.db.commit()
+        return count
+
+    def _delete_rows(self, user_id: str):
+        self.db.query(ExpenseStat).filter(
+            ExpenseStat.user_id == user_id
+        ).delete(synchronize_session=False)
+
+    def summary(self, row: ExpenseStat) -> Dict:
+        """Statistika qatorining o'qiladigan ko'rinishi"""
+        stats = RunningStats(row.count, row.mean, row.m2)
+        digest = self._digest(row)
+        return {
+            "category": None if row.category == OVERALL_CATEGORY else row.category,
+            "count": row.count,
+            "mean": round(stats.mean, 2),
+            "std": round(stats.std, 2),
+            "ewma": round(row.ewma_mean, 2) if row.ewma_mean is not None else None,
+            "p50": digest.quantile(0.5),
+            "p90": digest.quantile(0.9),
+            "p99": digest.quantile(0.99),
+        }
+
+    def check_transaction(self, transaction: Transaction) -> Optional[Dict]:
+        """Xarajatni kategoriya (yoki umumiy) baseline bilan O(1) solishtirish"""
+        if transaction.transaction_type != "expense":
+            return None
+
+        row = self.get_stats(transaction.user_id, transaction.category)
+        if row is None or row.count < MIN_CATEGORY_SAMPLES:
+            row = self.get_stats(transaction.user_id)
+
+        amount = abs(transaction.amount)
+        stats = RunningStats(row.count, row.mean, row.m2)
+        z_score = stats.z_score(amount)
+        return {
+            "transaction_id": transaction.id,
+            "amount": amount,
+            "baseline": self.summary(row),
+            "z_score": round(z_score, 2),
+            "percentile": round(self._digest(row).cdf(amount) * 100, 2),
+            "is_unusual": row.count >= MIN_CATEGORY_SAMPLES and z_score > ai_config.expense_unusual_z,
+        }
+
+    def _find(self, user_id: str, category: str, lock: bool = False) -> Optional[ExpenseStat]:
+        query = self.db.query(ExpenseStat).filter(
+            and_(
+                ExpenseStat.user_id == user_id,
+                ExpenseStat.category == category
+            )
+        )
+        if lock:
+            # Parallel yozishlarda yo'qolgan yangilanishlarning oldini olish (PostgreSQL)
+            query = query.with_for_update()
+        return query.first()
+
+    def _row(
+        self,
+        user_id: str,
+        category: str,
+        rows: Dict[str, ExpenseStat],
+        create: bool
+    ) -> Optional[ExpenseStat]:
+        # Session autoflush=False: shu chaqiruvda yaratilgan qatorlar dict'dan olinadi
+        if category not in rows:
+            row = self._find(user_id, category, lock=True)
+            if row is None and create:
+                row = ExpenseStat(
+                    user_id=user_id,
+                    category=category,
+                    count=0,
+                    mean=0.0,
+                    m2=0.0,
+                    ewma_var=0.0,
+                    digest="[]",
+                )
+                self.db.add(row)
+            if row is None:
+                return None
+            rows[category] = row
+        return rows[category]
+
+    def _add_value(self, row: ExpenseStat, value: float):
+        stats = RunningStats(row.count, row.mean, row.m2)
+        ewma = Ewma(ai_config.expense_ewma_alpha, row.ewma_mean, row.ewma_var)
+        digest = self._digest(row)
+
+        stats.add(value)
+        ewma.add(value)
+        digest.add(value)
+
+        row.count, row.mean, row.m2 = stats.count, stats.mean, stats.m2
+        row.ewma_mean, row.ewma_var = ewma.mean, ewma.var
+        row.digest = json.dumps(digest.to_list())
+
+    def _remove_value(self, row: ExpenseStat, value: float):
+        stats = RunningStats(row.count, row.mean, row.m2)
+        digest = self._digest(row)
+
+        stats.remove(value)
+        digest.remove(value)
+
+        row.count, row.mean, row.m2 = stats.count, stats.mean, stats.m2
+        row.digest = json.dumps(digest.to_list())
+
+    @staticmethod
+    def _digest(row: ExpenseStat) -> TDigest:
+        return TDigest(ai_config.expense_digest_compression, json.loads(row.digest))
+
+    @staticmethod
+    def _new_accumulator() -> Tuple[RunningStats, Ewma, TDigest]:
+        return (
+            RunningStats(),
+            Ewma(ai_config.expense_ewma_alpha),
+            TDigest(ai_config.expense_digest_compression),
+        )
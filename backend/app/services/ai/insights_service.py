@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, case
 from typing import Dict, Optional
 from datetime import date, timedelta
 from app.models import Task, Habit, HabitCompletion, ProductivityLog, Transaction
@@ -7,251 +7,350 @@ from app.services.analytics.trend_analyzer import TrendAnalyzer
 from app.services.analytics.time_series_service import TimeSeriesService
 
 
+# Davr boshlanishi: bugundan necha kun oldin
+PERIOD_DAYS = {"daily": 0, "weekly": 7, "monthly": 30}
+
+
 class InsightsService:
-    """Aqlli xulosa generatsiya qilish servisi"""
-    
+    """Aqlli xulosa generatsiya qilish servisi
+
+    Xulosa ikki qismdan yig'iladi:
+    - base: davrning yopilgan kunlari (bugungacha) va trendlar - kun davomida o'zgarmaydi,
+      shuning uchun ``InsightsStore`` uni saqlab qo'yadi
+    - partial: faqat bugungi (tugallanmagan) kun - har safar qayta hisoblanadi
+    """
+
     def __init__(self, db: Session):
         self.db = db
         self.trend_analyzer = TrendAnalyzer(db)
         self.time_series = TimeSeriesService(db)
-    
+
     def generate_daily_insights(
         self,
         user_id: str
     ) -> Dict:
         """Kunlik xulosa generatsiya qilish"""
+        return self.generate_insights(user_id, "daily")
+
+    def generate_weekly_insights(
+        self,
+        user_id: str
+    ) -> Dict:
+        """Haftalik xulosa"""
+        return self.generate_insights(user_id, "weekly")
+
+    def generate_monthly_insights(
+        self,
+        user_id: str
+    ) -> Dict:
+        """Oylik xulosa"""
+        return self.generate_insights(user_id, "monthly")
+
+    def generate_insights(
+        self,
+        user_id: str,
+        period: str
+    ) -> Dict:
+        """Xulosani to'liq (base + partial) hisoblash"""
         today = date.today()
-        
-        # Bugungi vazifalar
-        today_tasks = self.db.query(Task).filter(
-            and_(
-                Task.user_id == user_id,
-                func.date(Task.created_at) == today
-            )
-        ).all()
-        
-        completed_tasks = [t for t in today_tasks if t.status == "done"]
-        completion_rate = (
-            (len(completed_tasks) / len(today_tasks) * 100)
-            if today_tasks
-            else 0
-        )
-        
-        # Bugungi odatlar
-        active_habits = self.db.query(Habit).filter(
+        base = self.compute_base(user_id, period, today)
+        partial = self.compute_partial(user_id, period, today)
+        return self.build_insights(period, today, base, partial)
+
+    @staticmethod
+    def period_start(period: str, today: date) -> date:
+        if period not in PERIOD_DAYS:
+            raise ValueError(f"Unknown insights period: {period}")
+        return today - timedelta(days=PERIOD_DAYS[period])
+
+    def compute_base(
+        self,
+        user_id: str,
+        period: str,
+        today: date
+    ) -> Dict:
+        """Yopilgan kunlar agregatlari va trendlar"""
+        start = self.period_start(period, today)
+        closed_end = today - timedelta(days=1)
+
+        if start <= closed_end:
+            aggregate = self._aggregate(user_id, start, closed_end, by_category=period == "monthly")
+        else:
+            aggregate = self._empty_aggregate()
+
+        base = {"aggregate": aggregate}
+
+        if period in ("daily", "weekly"):
+            task_trend = self.trend_analyzer.analyze_task_completion_trends(user_id, days=7)
+            base["task_trend"] = task_trend["trend"]
+
+        if period == "weekly":
+            expense_trend = self.trend_analyzer.analyze_expense_category_trends(user_id, days=7)
+            base["expense_trends"] = expense_trend.get("trends", {})
+
+        return base
+
+    def compute_partial(
+        self,
+        user_id: str,
+        period: str,
+        today: date
+    ) -> Dict:
+        """Faqat bugungi kun agregatlari"""
+        active_habits = self.db.query(func.count(Habit.id)).filter(
             and_(
                 Habit.user_id == user_id,
                 Habit.is_active == 1
             )
-        ).all()
-        
-        completed_habits = self.db.query(HabitCompletion).filter(
+        ).scalar() or 0
+
+        return {
+            "aggregate": self._aggregate(user_id, today, today, by_category=period == "monthly"),
+            "habits_active": active_habits,
+        }
+
+    def build_insights(
+        self,
+        period: str,
+        today: date,
+        base: Dict,
+        partial: Dict
+    ) -> Dict:
+        """Base va partial qismlardan yakuniy xulosani yig'ish"""
+        aggregate = self._merge_aggregates(base["aggregate"], partial["aggregate"])
+        habits_active = partial["habits_active"]
+
+        if period == "daily":
+            return self._build_daily(today, aggregate, habits_active, base["task_trend"])
+        if period == "weekly":
+            return self._build_weekly(
+                self.period_start(period, today), today, aggregate, habits_active,
+                base["task_trend"], base["expense_trends"]
+            )
+        return self._build_monthly(self.period_start(period, today), today, aggregate)
+
+    def _aggregate(
+        self,
+        user_id: str,
+        start: date,
+        end: date,
+        by_category: bool = False
+    ) -> Dict:
+        """[start, end] oralig'i uchun SQL agregatlari"""
+        tasks_total, tasks_completed = self.db.query(
+            func.count(Task.id),
+            func.sum(case((Task.status == "done", 1), else_=0))
+        ).filter(
+            and_(
+                Task.user_id == user_id,
+                func.date(Task.created_at) >= start,
+                func.date(Task.created_at) <= end
+            )
+        ).one()
+
+        # Faqat faol odatlar bajarilishi hisobga olinadi
+        habits_completed = self.db.query(func.count(HabitCompletion.id)).join(
+            Habit, Habit.id == HabitCompletion.habit_id
+        ).filter(
             and_(
-                HabitCompletion.habit_id.in_([h.id for h in active_habits]),
-                HabitCompletion.completion_date == today
+                Habit.user_id == user_id,
+                Habit.is_active == 1,
+                HabitCompletion.completion_date >= start,
+                HabitCompletion.completion_date <= end
             )
-        ).count()
-        
+        ).scalar() or 0
+
+        expense_filter = and_(
+            Transaction.user_id == user_id,
+            Transaction.transaction_type == "expense",
+            Transaction.transaction_date >= start,
+            Transaction.transaction_date <= end
+        )
+
+        category_expenses = {}
+        if by_category:
+            rows = self.db.query(
+                Transaction.category,
+                func.sum(func.abs(Transaction.amount))
+            ).filter(expense_filter).group_by(Transaction.category).all()
+            category_expenses = {cat: float(total or 0) for cat, total in rows}
+            total_expense = sum(category_expenses.values())
+        else:
+            total_expense = self.db.query(
+                func.sum(func.abs(Transaction.amount))
+            ).filter(expense_filter).scalar() or 0
+
+        return {
+            "tasks_total": int(tasks_total or 0),
+            "tasks_completed": int(tasks_completed or 0),
+            "habits_completed": int(habits_completed),
+            "total_expense": float(total_expense),
+            "category_expenses": category_expenses,
+        }
+
+    @staticmethod
+    def _empty_aggregate() -> Dict:
+        return {
+            "tasks_total": 0,
+            "tasks_completed": 0,
+            "habits_completed": 0,
+            "total_expense": 0.0,
+            "category_expenses": {},
+        }
+
+    @staticmethod
+    def _merge_aggregates(first: Dict, second: Dict) -> Dict:
+        merged = {
+            key: first[key] + second[key]
+            for key in ("tasks_total", "tasks_completed", "habits_completed", "total_expense")
+        }
+        categories = dict(first["category_expenses"])
+        for cat, amount in second["category_expenses"].items():
+            categories[cat] = categories.get(cat, 0) + amount
+        merged["category_expenses"] = categories
+        return merged
+
+    def _build_daily(
+        self,
+        today: date,
+        aggregate: Dict,
+        habits_active: int,
+        task_trend: str
+    ) -> Dict:
+        tasks_total = aggregate["tasks_total"]
+        completion_rate = (
+            (aggregate["tasks_completed"] / tasks_total * 100)
+            if tasks_total
+            else 0
+        )
         habit_completion_rate = (
-            (completed_habits / len(active_habits) * 100)
-            if active_habits
+            (aggregate["habits_completed"] / habits_active * 100)
+            if habits_active
             else 0
         )
-        
-        # Bugungi xarajatlar
-        today_expenses = self.db.query(Transaction).filter(
-            and_(
-                Transaction.user_id == user_id,
-                Transaction.transaction_type == "expense",
-                Transaction.transaction_date == today
-            )
-        ).all()
-        
-        total_expense = sum(abs(txn.amount) for txn in today_expenses)
-        
+
         # Xulosa
         insights = {
             "date": today.isoformat(),
             "summary": {
-                "tasks_completed": len(completed_tasks),
-                "tasks_total": len(today_tasks),
+                "tasks_completed": aggregate["tasks_completed"],
+                "tasks_total": tasks_total,
                 "tasks_completion_rate": round(completion_rate, 2),
-                "habits_completed": completed_habits,
-                "habits_total": len(active_habits),
+                "habits_completed": aggregate["habits_completed"],
+                "habits_total": habits_active,
                 "habits_completion_rate": round(habit_completion_rate, 2),
-                "total_expense": round(total_expense, 2)
+                "total_expense": round(aggregate["total_expense"], 2)
             },
             "insights": [],
             "recommendations": []
         }
-        
+
         # Insightlar
         if completion_rate >= 80:
             insights["insights"].append("Ajoyib! Bugun ko'p vazifalar bajarildi.")
         elif completion_rate < 50:
             insights["insights"].append("Bugun vazifalar bajarilishi past. Ertaga yaxshiroq bo'ladi!")
-        
+
         if habit_completion_rate >= 80:
             insights["insights"].append("Odatlar ajoyib bajarilmoqda!")
         elif habit_completion_rate < 50:
             insights["insights"].append("Odatlarni bajarishni yaxshilash kerak.")
-        
+
         # Tavsiyalar
         if completion_rate < 50:
             insights["recommendations"].append("Ertaga vazifalarni kichik qismlarga bo'ling.")
-        
+
         if habit_completion_rate < 50:
             insights["recommendations"].append("Odatlarni kunlik rejangizga qo'shing.")
-        
+
         # Trend tahlili
-        task_trend = self.trend_analyzer.analyze_task_completion_trends(user_id, days=7)
-        if task_trend["trend"] == "increasing":
+        if task_trend == "increasing":
             insights["insights"].append("Oxirgi haftada vazifalar bajarilishi yaxshilanmoqda.")
-        elif task_trend["trend"] == "decreasing":
+        elif task_trend == "decreasing":
             insights["recommendations"].append("Vazifalar bajarilishi pasaymoqda. Prioritetlarni ko'rib chiqing.")
-        
+
         return insights
-    
-    def generate_weekly_insights(
+
+    def _build_weekly(
         self,
-        user_id: str
+        week_start: date,
+        today: date,
+        aggregate: Dict,
+        habits_active: int,
+        task_trend: str,
+        expense_trends: Dict
     ) -> Dict:
-        """Haftalik xulosa"""
-        week_start = date.today() - timedelta(days=7)
-        
-        # Haftalik statistika
-        tasks = self.db.query(Task).filter(
-            and_(
-                Task.user_id == user_id,
-                func.date(Task.created_at) >= week_start
-            )
-        ).all()
-        
-        completed_tasks = [t for t in tasks if t.status == "done"]
-        
-        # Haftalik odatlar
-        habits = self.db.query(Habit).filter(
-            and_(
-                Habit.user_id == user_id,
-                Habit.is_active == 1
-            )
-        ).all()
-        
-        habit_completions = self.db.query(HabitCompletion).filter(
-            and_(
-                HabitCompletion.habit_id.in_([h.id for h in habits]),
-                HabitCompletion.completion_date >= week_start
-            )
-        ).count()
-        
-        # Haftalik xarajatlar
-        expenses = self.db.query(Transaction).filter(
-            and_(
-                Transaction.user_id == user_id,
-                Transaction.transaction_type == "expense",
-                Transaction.transaction_date >= week_start
-            )
-        ).all()
-        
-        total_expense = sum(abs(txn.amount) for txn in expenses)
-        
-        # Trend tahlili
-        task_trend = self.trend_analyzer.analyze_task_completion_trends(user_id, days=7)
-        expense_trend = self.trend_analyzer.analyze_expense_category_trends(user_id, days=7)
-        
+        tasks_total = aggregate["tasks_total"]
+        habit_completions = aggregate["habits_completed"]
+
         insights = {
             "period": "weekly",
             "start_date": week_start.isoformat(),
-            "end_date": date.today().isoformat(),
+            "end_date": today.isoformat(),
             "summary": {
-                "tasks_completed": len(completed_tasks),
-                "tasks_total": len(tasks),
-                "tasks_completion_rate": round((len(completed_tasks) / len(tasks) * 100) if tasks else 0, 2),
+                "tasks_completed": aggregate["tasks_completed"],
+                "tasks_total": tasks_total,
+                "tasks_completion_rate": round((aggregate["tasks_completed"] / tasks_total * 100) if tasks_total else 0, 2),
                 "habits_completed": habit_completions,
-                "habits_total": len(habits) * 7,  # Har bir odat uchun 7 kun
-                "habits_completion_rate": round((habit_completions / (len(habits) * 7) * 100) if habits else 0, 2),
-                "total_expense": round(total_expense, 2)
+                "habits_total": habits_active * 7,  # Har bir odat uchun 7 kun
+                "habits_completion_rate": round((habit_completions / (habits_active * 7) * 100) if habits_active else 0, 2),
+                "total_expense": round(aggregate["total_expense"], 2)
             },
             "trends": {
-                "tasks": task_trend["trend"],
-                "expenses": expense_trend.get("trends", {})
+                "tasks": task_trend,
+                "expenses": expense_trends
             },
             "insights": [],
             "recommendations": []
         }
-        
+
         # Insightlar
-        if task_trend["trend"] == "increasing":
+        if task_trend == "increasing":
             insights["insights"].append("Hafta davomida vazifalar bajarilishi yaxshilanmoqda.")
-        elif task_trend["trend"] == "decreasing":
+        elif task_trend == "decreasing":
             insights["insights"].append("Vazifalar bajarilishi pasaymoqda.")
-        
+
         if insights["summary"]["tasks_completion_rate"] >= 70:
             insights["insights"].append("Hafta muvaffaqiyatli o'tdi!")
-        
+
         # Tavsiyalar
         if insights["summary"]["tasks_completion_rate"] < 50:
             insights["recommendations"].append("Vazifalarni kichik qismlarga bo'ling va prioritetlarni aniqlang.")
-        
+
         return insights
-    
-    def generate_monthly_insights(
+
+    def _build_monthly(
         self,
-        user_id: str
+        month_start: date,
+        today: date,
+        aggregate: Dict
     ) -> Dict:
-        """Oylik xulosa"""
-        month_start = date.today() - timedelta(days=30)
-        
-        # Oylik statistika
-        tasks = self.db.query(Task).filter(
-            and_(
-                Task.user_id == user_id,
-                func.date(Task.created_at) >= month_start
-            )
-        ).all()
-        
-        completed_tasks = [t for t in tasks if t.status == "done"]
-        
-        # Oylik xarajatlar
-        expenses = self.db.query(Transaction).filter(
-            and_(
-                Transaction.user_id == user_id,
-                Transaction.transaction_type == "expense",
-                Transaction.transaction_date >= month_start
-            )
-        ).all()
-        
-        total_expense = sum(abs(txn.amount) for txn in expenses)
-        
+        tasks_total = aggregate["tasks_total"]
+
         # Kategoriyalar bo'yicha
-        category_expenses = {}
-        for txn in expenses:
-            cat = txn.category
-            category_expenses[cat] = category_expenses.get(cat, 0) + abs(txn.amount)
-        
+        category_expenses = aggregate["category_expenses"]
         top_category = max(category_expenses.items(), key=lambda x: x[1])[0] if category_expenses else None
-        
+
         insights = {
             "period": "monthly",
             "start_date": month_start.isoformat(),
-            "end_date": date.today().isoformat(),
+            "end_date": today.isoformat(),
             "summary": {
-                "tasks_completed": len(completed_tasks),
-                "tasks_total": len(tasks),
-                "tasks_completion_rate": round((len(completed_tasks) / len(tasks) * 100) if tasks else 0, 2),
-                "total_expense": round(total_expense, 2),
+                "tasks_completed": aggregate["tasks_completed"],
+                "tasks_total": tasks_total,
+                "tasks_completion_rate": round((aggregate["tasks_completed"] / tasks_total * 100) if tasks_total else 0, 2),
+                "total_expense": round(aggregate["total_expense"], 2),
                 "top_category": top_category
             },
             "insights": [],
             "recommendations": []
         }
-        
+
         # Insightlar
         if insights["summary"]["tasks_completion_rate"] >= 70:
             insights["insights"].append("Oy davomida ajoyib ishladingiz!")
-        
+
         if top_category:
             insights["insights"].append(f"Eng ko'p xarajat qilingan kategoriya: {top_category}")
-        
-        return insights
 
+        return insights
@@ -0,0 +1,150 @@
+import json
+from sqlalchemy.orm import Session
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import date, datetime, timedelta
+from app.models import Insight
+from app.services.ai.insights_service import InsightsService
+from app.config.ai_config import ai_config
+
+
+def invalidate_insights(db: Session, user_id: str, *days: date) -> None:
+    """Yopilgan kunga yozilgan ma'lumotdan keyin bugungi snapshotlarni o'chirish
+
+    ``get`` base'ni faqat snapshot bo'lmaganda hisoblaydi, shuning uchun orqa sana
+    bilan kiritilgan tranzaksiya, o'tgan kunlik odat bajarilishi yoki import
+    keyingi murojaatda to'liq qayta hisoblashga olib keladi. ``days`` berilsa,
+    ular orasida bugundan oldingi kun bo'lgandagina o'chiriladi. Commit chaqiruvchida.
+    """
+    today = date.today()
+    if days and all(day is None or day >= today for day in days):
+        return
+    db.query(Insight).filter(
+        and_(
+            Insight.user_id == user_id,
+            Insight.period_end == today
+        )
+    ).delete(synchronize_session=False)
+
+
+class InsightsStore:
+    """Oldindan hisoblangan xulosalar uchun read-through qatlam
+
+    - snapshot yangi bo'lsa (``insights_fresh_seconds``) saqlangani qaytariladi
+    - eskirgan bo'lsa, yopilgan kunlar (base) qayta ishlatiladi va faqat bugungi
+      tugallanmagan kun qayta hisoblanadi
+    - yopilgan kunlarga yozuv (``invalidate_insights``) snapshotni o'chiradi
+    - bugun uchun snapshot bo'lmasa (yoki kun almashgan bo'lsa) to'liq hisoblanadi
+    """
+
+    PERIODS = ("daily", "weekly", "monthly")
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.service = InsightsService(db)
+
+    def get(
+        self,
+        user_id: str,
+        period: str
+    ) -> Tuple[Dict, Dict]:
+        """Xulosa va uning yoshi haqidagi ma'lumot (computed_at, age)"""
+        today = date.today()
+        now = datetime.utcnow()
+        snapshot = self._find(user_id, period, today)
+
+        if snapshot and self._age_seconds(snapshot.computed_at, now) <= ai_config.insights_fresh_seconds:
+            return json.loads(snapshot.payload), self._freshness(snapshot, now)
+
+        if snapshot:
+            # Yopilgan kunlarga yozuvlar snapshotni o'chiradi - base hali to'g'ri
+            base = json.loads(snapshot.base)
+        else:
+            base = self.service.compute_base(user_id, period, today)
+            snapshot = Insight(
+                user_id=user_id,
+                period=period,
+                period_start=InsightsService.period_start(period, today),
+                period_end=today,
+                base=json.dumps(base),
+                base_computed_at=now,
+            )
+            self.db.add(snapshot)
+
+        partial = self.service.compute_partial(user_id, period, today)
+        payload = self.service.build_insights(period, today, base, partial)
+
+        snapshot.payload = json.dumps(payload)
+        snapshot.computed_at = now
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # Parallel so'rov snapshotni birinchi bo'lib yaratdi - natija baribir to'g'ri
+            self.db.rollback()
+            return payload, {"computed_at": now.isoformat() + "Z", "age_seconds": 0, "base_age_seconds": 0}
+
+        return payload, self._freshness(snapshot, now)
+
+    def refresh(
+        self,
+        user_id: str,
+        periods: Iterable[str] = PERIODS
+    ) -> Dict[str, Dict]:
+        """Snapshotlarni to'liq qayta hisoblash (nightly job uchun)"""
+        today = date.today()
+        now = datetime.utcnow()
+        results = {}
+
+        for period in periods:
+            base = self.service.compute_base(user_id, period, today)
+            partial = self.service.compute_partial(user_id, period, today)
+            payload = self.service.build_insights(period, today, base, partial)
+
+            snapshot = self._find(user_id, period, today)
+            if not snapshot:
+                snapshot = Insight(
+                    user_id=user_id,
+                    period=period,
+                    period_start=InsightsService.period_start(period, today),
+                    period_end=today,
+                )
+                self.db.add(snapshot)
+
+            snapshot.base = json.dumps(base)
+            snapshot.payload = json.dumps(payload)
+            snapshot.base_computed_at = now
+            snapshot.computed_at = now
+            results[period] = payload
+
+        # Eski snapshotlarni tozalash
+        cutoff = today - timedelta(days=ai_config.insights_retention_days)
+        self.db.query(Insight).filter(
+            and_(
+                Insight.user_id == user_id,
+                Insight.period_end < cutoff
+            )
+        ).delete(synchronize_session=False)
+
+        self.db.commit()
+        return results
+
+    def _find(self, user_id: str, period: str, today: date) -> Optional[Insight]:
+        return self.db.query(Insight).filter(
+            and_(
+                Insight.user_id == user_id,
+                Insight.period == period,
+                Insight.period_end == today
+            )
+        ).first()
+
+    @staticmethod
+    def _age_seconds(computed_at: datetime, now: datetime) -> float:
+        return max(0.0, (now - computed_at.replace(tzinfo=None)).total_seconds())
+
+    def _freshness(self, snapshot: Insight, now: datetime) -> Dict:
+        return {
+            "computed_at": snapshot.computed_at.replace(tzinfo=None).isoformat() + "Z",
+            "age_seconds": int(self._age_seconds(snapshot.computed_at, now)),
+            "base_age_seconds": int(self._age_seconds(snapshot.base_computed_at, now)),
+        }
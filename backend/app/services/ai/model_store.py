@@ -0,0 +1,87 @@
+import re
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+import joblib
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+
+class ModelStore:
+    """Foydalanuvchi modellari uchun ombor: diskda joblib + jarayon ichidagi LRU cache
+
+    Fayllar ``{model_dir}/{kind}/{key}.joblib`` ko'rinishida saqlanadi.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or ai_config.model_cache_size
+        self._cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, key: str) -> Path:
+        safe_key = re.sub(r"[^A-Za-z0-9_.-]", "_", key)
+        return Path(ai_config.model_dir) / kind / f"{safe_key}.joblib"
+
+    def get(self, kind: str, key: str) -> Optional[Any]:
+        """Modelni cache'dan, bo'lmasa diskdan o'qish"""
+        cache_key = (kind, key)
+        with self._lock:
+            if cache_key in self._cache:
+                self._cache.move_to_end(cache_key)
+                return self._cache[cache_key]
+
+        path = self._path(kind, key)
+        if not path.exists():
+            return None
+
+        try:
+            value = joblib.load(path)
+        except Exception as e:
+            logger.warning(f"Failed to load model {kind}/{key}: {str(e)}")
+            return None
+
+        self._remember(cache_key, value)
+        return value
+
+    def put(self, kind: str, key: str, value: Any):
+        """Modelni diskka yozish va cache'ga qo'yish"""
+        path = self._path(kind, key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            joblib.dump(value, tmp_path)
+            tmp_path.replace(path)
+        except Exception as e:
+            # Disk yozilmasa ham model shu jarayonda ishlataveradi
+            logger.warning(f"Failed to persist model {kind}/{key}: {str(e)}")
+
+        self._remember((kind, key), value)
+
+    def remember(self, kind: str, key: str, value: Any):
+        """Faqat xotiradagi cache'ga qo'yish (diskka yozilmaydi)"""
+        self._remember((kind, key), value)
+
+    def delete(self, kind: str, key: str):
+        with self._lock:
+            self._cache.pop((kind, key), None)
+        path = self._path(kind, key)
+        if path.exists():
+            path.unlink()
+
+    def clear(self):
+        """Faqat xotiradagi cache'ni tozalash"""
+        with self._lock:
+            self._cache.clear()
+
+    def _remember(self, cache_key: tuple, value: Any):
+        with self._lock:
+            self._cache[cache_key] = value
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+
+model_store = ModelStore()
@@ -0,0 +1,310 @@
+"""
+Cheklarni ommaviy skanerlash - bir nechta rasm yoki zip arxiv
+
+- Yuklangan fayllar xotiraga to'liq o'qilmaydi: bo'laklab vaqtinchalik papkaga yoziladi
+- Zip ichidagi rasmlar cheklovlar bilan ochiladi (fayllar soni, hajm, siqish nisbati)
+- OCR umumiy process pool'da (``ai_config.ocr_workers``), vision LLM scanner
+  semaforida (``ai_config.vision_max_concurrency``); bir vaqtda
+  ``ai_config.receipt_batch_concurrency`` ta fayl ishlanadi
+- Takroriy cheklar (partiya ichida yoki keshda) qayta skanlanmaydi
+- Barcha tranzaksiyalar bitta commit bilan yoziladi (bazaga murojaatlar thread'da),
+  har bir fayl bo'yicha hisobot qaytadi
+"""
+import uuid
+import shutil
+import asyncio
+import logging
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+from app.services import transaction_service
+from app.services.ai.receipt_scanner_service import ReceiptScannerService
+from app.services.ai.receipt_cache import (
+    CachedScan, ReceiptFingerprint, ReceiptScanCacheStore, fingerprint_receipt
+)
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+CHUNK_SIZE = 1024 * 1024
+MB = 1024 * 1024
+
+
+class BatchLimitError(Exception):
+    """Partiya umumiy cheklovdan oshdi - butun so'rov rad etiladi"""
+
+
+@dataclass
+class BatchItem:
+    filename: str
+    path: Optional[Path] = None
+    status: str = "pending"  # pending, created, duplicate, failed, rejected
+    error: Optional[str] = None
+    fingerprint: Optional[ReceiptFingerprint] = None
+    cached: Optional[CachedScan] = None
+    extracted: Optional[Dict] = None
+    transaction_id: Optional[str] = None
+    duplicate_of: Optional[str] = None
+    same_as: Optional["BatchItem"] = None  # partiyadagi birinchi nusxa
+
+    def reject(self, error: str):
+        self.status = "rejected"
+        self.error = error
+
+
+class ReceiptBatchService:
+    """Bir so'rovdagi ko'p chekni skanerlash va tranzaksiyalarni bitta commit bilan yaratish"""
+
+    def __init__(self, db: Session, scanner: Optional[ReceiptScannerService] = None):
+        self.db = db
+        self.scanner = scanner or ReceiptScannerService()
+        self._files = 0
+        self._bytes = 0
+
+    async def run(self, user_id: str, uploads: List[UploadFile]) -> Dict:
+        workdir = Path(tempfile.mkdtemp(prefix="receipt_batch_"))
+        try:
+            items = await self._spool(uploads, workdir)
+            await self._fingerprint(items)
+            # Sinxron SQLAlchemy so'rovlari va commit event loop'ni to'xtatmasligi uchun thread'da
+            await asyncio.to_thread(self._match_duplicates, user_id, items)
+            await self._scan(items)
+            transactions = await asyncio.to_thread(self._save, user_id, items)
+            return self._report(items, transactions)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, workdir, True)
+
+    # --- Yuklash ---
+
+    async def _spool(self, uploads: List[UploadFile], workdir: Path) -> List[BatchItem]:
+        items: List[BatchItem] = []
+        max_file = ai_config.receipt_max_file_mb * MB
+        for index, upload in enumerate(uploads):
+            name = Path(upload.filename or f"file_{index}").name
+            suffix = Path(name).suffix.lower()
+            is_zip = suffix == ".zip" or upload.content_type in ZIP_CONTENT_TYPES
+
+            if not is_zip and not self._is_image(suffix, upload.content_type):
+                items.append(BatchItem(name, status="rejected", error="Unsupported file type"))
+                continue
+
+            target = workdir / f"{uuid.uuid4().hex}{suffix}"
+            limit = ai_config.receipt_batch_max_mb * MB if is_zip else max_file
+            size = await self._copy_upload(upload, target, limit)
+            if size is None:
+                items.append(BatchItem(name, status="rejected", error=f"File exceeds {limit // MB} MB"))
+                continue
+
+            if is_zip:
+                items.extend(await asyncio.to_thread(self._expand_zip, target, name, workdir))
+                target.unlink(missing_ok=True)
+            else:
+                self._charge(size)
+                items.append(BatchItem(name, path=target))
+        return items
+
+    @staticmethod
+    def _is_image(suffix: str, content_type: Optional[str]) -> bool:
+        return suffix in IMAGE_EXTENSIONS or bool(content_type and content_type.startswith("image/"))
+
+    @staticmethod
+    async def _copy_upload(upload: UploadFile, target: Path, limit: int) -> Optional[int]:
+        """Faylni bo'laklab diskka yozish; ``limit`` dan oshsa None"""
+        size = 0
+        with open(target, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    break
+                await asyncio.to_thread(out.write, chunk)
+        if size > limit:
+            target.unlink(missing_ok=True)
+            return None
+        return size
+
+    def _charge(self, size: int):
+        self._files += 1
+        self._bytes += size
+        if self._files > ai_config.receipt_batch_max_files:
+            raise BatchLimitError(f"Too many receipts (max {ai_config.receipt_batch_max_files})")
+        if self._bytes > ai_config.receipt_batch_max_mb * MB:
+            raise BatchLimitError(f"Receipts exceed {ai_config.receipt_batch_max_mb} MB in total")
+
+    def _expand_zip(self, zip_path: Path, archive_name: str, workdir: Path) -> List[BatchItem]:
+        """Zip ichidagi rasmlarni ochish; sarlavhadagi hajmga ishonilmaydi"""
+        items: List[BatchItem] = []
+        max_file = ai_config.receipt_max_file_mb * MB
+        try:
+            with zipfile.ZipFile(zip_path) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                        continue
+                    item = BatchItem(f"{archive_name}/{info.filename}")
+                    items.append(item)
+
+                    suffix = Path(info.filename).suffix.lower()
+                    if suffix not in IMAGE_EXTENSIONS:
+                        item.reject("Unsupported file type")
+                        continue
+                    if info.file_size > max_file:
+                        item.reject(f"File exceeds {ai_config.receipt_max_file_mb} MB")
+                        continue
+                    if info.file_size > ai_config.receipt_zip_max_ratio * max(info.compress_size, 1):
+                        item.reject("Suspicious compression ratio")
+                        continue
+
+                    self._charge(info.file_size)
+                    target = workdir / f"{uuid.uuid4().hex}{suffix}"
+                    try:
+                        if self._extract_entry(archive, info, target):
+                            item.path = target
+                        else:
+                            item.reject("Entry is larger than declared")
+                    except (RuntimeError, zipfile.BadZipFile, OSError) as e:
+                        item.reject(f"Cannot extract: {str(e)}")
+        except zipfile.BadZipFile:
+            items.append(BatchItem(archive_name, status="rejected", error="Invalid zip archive"))
+        return items
+
+    @staticmethod
+    def _extract_entry(archive: zipfile.ZipFile, info: zipfile.ZipInfo, target: Path) -> bool:
+        written = 0
+        with archive.open(info) as source, open(target, "wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    return True
+                written += len(chunk)
+                if written > info.file_size:
+                    return False
+                out.write(chunk)
+
+    # --- Qayta ishlash ---
+
+    async def _fingerprint(self, items: List[BatchItem]):
+        semaphore = asyncio.Semaphore(ai_config.receipt_batch_concurrency)
+
+        async def fingerprint(item: BatchItem):
+            async with semaphore:
+                item.fingerprint = await asyncio.to_thread(
+                    lambda: fingerprint_receipt(item.path.read_bytes())
+                )
+
+        await asyncio.gather(*(fingerprint(item) for item in items if item.status == "pending"))
+
+    def _match_duplicates(self, user_id: str, items: List[BatchItem]):
+        """Partiya ichidagi aniq nusxalar va oldin skanlangan cheklar (kesh)"""
+        store = ReceiptScanCacheStore(self.db)
+        seen: Dict[str, BatchItem] = {}
+        for item in items:
+            if item.status != "pending":
+                continue
+            first = seen.get(item.fingerprint.sha256)
+            if first is not None:
+                item.status = "duplicate"
+                item.same_as = first
+                continue
+            seen[item.fingerprint.sha256] = item
+
+            try:
+                cached = store.lookup(user_id, item.fingerprint)
+            except Exception as e:
+                logger.warning(f"Receipt cache lookup failed: {str(e)}")
+                cached = None
+            if cached is None:
+                continue
+
+            item.cached = cached
+            existing = None
+            if cached.transaction_id:
+                existing = transaction_service.get_transaction(self.db, cached.transaction_id, user_id)
+            if existing and cached.match == "exact":
+                item.status = "duplicate"
+                item.duplicate_of = existing.id
+            else:
+                item.extracted = cached.result
+                if existing:
+                    item.duplicate_of = existing.id  # mumkin bo'lgan dublikat
+
+    async def _scan(self, items: List[BatchItem]):
+        semaphore = asyncio.Semaphore(ai_config.receipt_batch_concurrency)
+
+        async def scan(item: BatchItem):
+            async with semaphore:
+                try:
+                    image_data = await asyncio.to_thread(item.path.read_bytes)
+                    item.extracted = await self.scanner.scan_receipt(image_data)
+                except Exception as e:
+                    logger.warning(f"Batch receipt {item.filename} failed: {str(e)}")
+                    item.status = "failed"
+                    item.error = str(e)
+
+        await asyncio.gather(*(
+            scan(item) for item in items if item.status == "pending" and item.extracted is None
+        ))
+
+    def _save(self, user_id: str, items: List[BatchItem]) -> List:
+        ready: List[BatchItem] = []
+        creates = []
+        for item in items:
+            if item.status != "pending":
+                continue
+            try:
+                creates.append(ReceiptScannerService.to_transaction(item.extracted))
+                ready.append(item)
+            except Exception as e:
+                item.status = "failed"
+                item.error = f"Invalid receipt data: {str(e)}"
+
+        transactions = transaction_service.create_transactions_bulk(self.db, creates, user_id)
+        for item, transaction in zip(ready, transactions):
+            item.status = "created"
+            item.transaction_id = transaction.id
+
+        for item in items:
+            if item.same_as is not None:
+                item.duplicate_of = item.same_as.transaction_id or item.same_as.duplicate_of
+
+        try:
+            store = ReceiptScanCacheStore(self.db)
+            for item in ready:
+                store.remember(user_id, item.fingerprint, item.extracted, item.cached, item.transaction_id)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"Receipt cache update failed: {str(e)}")
+        return transactions
+
+    @staticmethod
+    def _report(items: List[BatchItem], transactions: List) -> Dict:
+        counts = {status: 0 for status in ("created", "duplicate", "failed", "rejected")}
+        for item in items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return {
+            "total": len(items),
+            "created": counts["created"],
+            "duplicates": counts["duplicate"],
+            "failed": counts["failed"],
+            "rejected": counts["rejected"],
+            "files": [
+                {
+                    "filename": item.filename,
+                    "status": item.status,
+                    "error": item.error,
+                    "transaction_id": item.transaction_id,
+                    "duplicate_of": item.duplicate_of,
+                    "result": item.extracted,
+                }
+                for item in items
+            ],
+            "transactions": transactions,
+        }
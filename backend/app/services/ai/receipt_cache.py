@@ -0,0 +1,162 @@
+"""
+Chek skanerlash natijalari keshi (content-addressed)
+
+Foydalanuvchi bir xil chekni qayta yuklasa OCR va pullik vision LLM
+chaqiruvi takrorlanmaydi:
+- aniq nusxa: yuklangan baytlarning SHA-256 hash'i
+- o'xshash surat (kichraytirilgan, qayta siqilgan): 256-bit dHash va
+  Hamming masofasi ``ai_config.receipt_phash_max_distance`` gacha
+Yozuvlar ``receipt_scan_cache`` jadvalida ``ai_config.receipt_cache_ttl_days``
+kun saqlanadi va tranzaksiyaga bog'lanadi, shuning uchun takroriy skan
+mumkin bo'lgan dublikat sifatida belgilanadi.
+"""
+import io
+import json
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import numpy as np
+from PIL import Image, ImageOps
+from sqlalchemy.orm import Session
+from app.models import ReceiptScanCache
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReceiptFingerprint:
+    sha256: str
+    phash: Optional[str] = None  # rasm ochilmasa None
+
+
+@dataclass
+class CachedScan:
+    entry_id: str
+    result: Dict
+    transaction_id: Optional[str]
+    match: str  # 'exact' yoki 'similar'
+    distance: int
+
+
+def difference_hash(image: Image.Image, hash_size: int = 16, tolerance: int = 2) -> int:
+    """dHash: kichraytirilgan kulrang rasmda qo'shni piksellar farqi bitlari
+
+    Cheklar bir-biriga juda o'xshash (oq fon, matn qatorlari), 8x8 hash ularni
+    ajrata olmaydi, shuning uchun 16x16 (256 bit). Oq fonda JPEG shovqini
+    bitlarni tasodifan almashtirmasligi uchun ``tolerance`` dan kichik farq 0.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] - pixels[:, :-1] > tolerance).ravel()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hamming_distance(left: str, right: str) -> int:
+    return bin(int(left, 16) ^ int(right, 16)).count("1")
+
+
+def fingerprint_receipt(image_data: bytes) -> ReceiptFingerprint:
+    """SHA-256 + dHash; JPEG to'liq dekodlanmaydi (draft), shuning uchun arzon"""
+    sha256 = hashlib.sha256(image_data).hexdigest()
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        image.draft("L", (64, 64))
+        image = ImageOps.exif_transpose(image)
+        return ReceiptFingerprint(sha256=sha256, phash=f"{difference_hash(image):064x}")
+    except Exception as e:
+        logger.debug(f"Receipt perceptual hash skipped: {str(e)}")
+        return ReceiptFingerprint(sha256=sha256)
+
+
+class ReceiptScanCacheStore:
+    """``receipt_scan_cache`` jadvali ustidagi qidiruv/saqlash (foydalanuvchi bo'yicha)"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def lookup(self, user_id: str, fingerprint: ReceiptFingerprint) -> Optional[CachedScan]:
+        """Avval aniq hash, keyin oxirgi yozuvlar orasidan eng yaqin dHash"""
+        now = datetime.utcnow()
+        active = self.db.query(ReceiptScanCache).filter(
+            ReceiptScanCache.user_id == user_id,
+            ReceiptScanCache.expires_at > now
+        )
+
+        entry = active.filter(ReceiptScanCache.sha256 == fingerprint.sha256).order_by(
+            ReceiptScanCache.created_at.desc()
+        ).first()
+        if entry is not None:
+            return self._hit(entry, "exact", 0)
+
+        if not fingerprint.phash:
+            return None
+
+        candidates = active.filter(ReceiptScanCache.phash.isnot(None)).order_by(
+            ReceiptScanCache.created_at.desc()
+        ).limit(ai_config.receipt_cache_candidates).all()
+
+        best, best_distance = None, ai_config.receipt_phash_max_distance + 1
+        for candidate in candidates:
+            distance = hamming_distance(candidate.phash, fingerprint.phash)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        if best is None:
+            return None
+        return self._hit(best, "similar", best_distance)
+
+    def store(
+        self,
+        user_id: str,
+        fingerprint: ReceiptFingerprint,
+        result: Dict,
+        transaction_id: Optional[str] = None
+    ) -> ReceiptScanCache:
+        """Natijani saqlash (commit chaqiruvchida); muddati o'tganlar shu yerda tozalanadi"""
+        self.purge_expired(user_id)
+        entry = ReceiptScanCache(
+            user_id=user_id,
+            sha256=fingerprint.sha256,
+            phash=fingerprint.phash,
+            result=json.dumps(result, ensure_ascii=False),
+            transaction_id=transaction_id,
+            expires_at=datetime.utcnow() + timedelta(days=ai_config.receipt_cache_ttl_days),
+        )
+        self.db.add(entry)
+        return entry
+
+    def remember(
+        self,
+        user_id: str,
+        fingerprint: ReceiptFingerprint,
+        extracted: Dict,
+        cached: Optional[CachedScan],
+        transaction_id: str
+    ):
+        """Yangi skan (yoki o'xshash surat) keshga yoziladi; aniq nusxada yozuv yangi tranzaksiyaga bog'lanadi"""
+        if cached is None or cached.match == "similar":
+            result = {key: value for key, value in extracted.items() if key != "preprocessing"}
+            self.store(user_id, fingerprint, result, transaction_id)
+        elif cached.transaction_id != transaction_id:
+            # Oldingi tranzaksiya o'chirilgan (masalan saqlash muvaffaqiyatsiz bo'lgan)
+            self.db.query(ReceiptScanCache).filter(ReceiptScanCache.id == cached.entry_id).update(
+                {"transaction_id": transaction_id}, synchronize_session=False
+            )
+
+    def purge_expired(self, user_id: Optional[str] = None) -> int:
+        query = self.db.query(ReceiptScanCache).filter(ReceiptScanCache.expires_at <= datetime.utcnow())
+        if user_id:
+            query = query.filter(ReceiptScanCache.user_id == user_id)
+        return query.delete(synchronize_session=False)
+
+    def _hit(self, entry: ReceiptScanCache, match: str, distance: int) -> CachedScan:
+        entry.hit_count = (entry.hit_count or 0) + 1
+        return CachedScan(
+            entry_id=entry.id,
+            result=json.loads(entry.result),
+            transaction_id=entry.transaction_id,
+            match=match,
+            distance=distance,
+        )
@@ -4,22 +4,67 @@ Scans receipts using OCR and AI to extract transaction information
 """
 import os
 import base64
+import asyncio
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, Optional
 from datetime import date
 from PIL import Image
 import io
+from app.config.ai_config import ai_config
+from app.schemas.transaction import TransactionCreate
+from app.services.ai.vision_clients import VisionClient, get_vision_client
+from app.services.ai.receipt_preprocessor import PreprocessedReceipt, preprocess_receipt
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+_ocr_executor: Optional[ProcessPoolExecutor] = None
+
+
+def ocr_image(image_data: bytes) -> str:
+    """Run tesseract on image bytes (module-level so it can run in a worker process)"""
+    image = Image.open(io.BytesIO(image_data))
+    return pytesseract.image_to_string(image, lang='eng+uzb')
+
+
+def get_ocr_executor() -> ProcessPoolExecutor:
+    """Shared process pool for OCR; tesseract is CPU-bound and must stay off the event loop"""
+    global _ocr_executor
+    if _ocr_executor is None:
+        _ocr_executor = ProcessPoolExecutor(max_workers=ai_config.ocr_workers)
+    return _ocr_executor
+
+
+def shutdown_ocr_executor():
+    global _ocr_executor
+    if _ocr_executor is not None:
+        _ocr_executor.shutdown(wait=False, cancel_futures=True)
+        _ocr_executor = None
+
 
 class ReceiptScannerService:
     """Service for scanning receipts using OCR and AI"""
     
-    def __init__(self):
+    def __init__(self, vision_client: Optional[VisionClient] = None):
         self.use_ocr = os.getenv("USE_OCR", "true").lower() == "true"
         self.use_ai = os.getenv("USE_AI_VISION", "true").lower() == "true"
-        self.ai_provider = os.getenv("AI_PROVIDER", "openai")  # openai or anthropic
+        self.ai_provider = os.getenv("AI_PROVIDER", "openai")  # openai, anthropic or fake
+        self._vision_client = vision_client
+        # Bounds paid LLM calls across the queue and bulk uploads sharing this scanner
+        self._vision_slots = asyncio.Semaphore(ai_config.vision_max_concurrency)
+        
+    @property
+    def vision_client(self) -> Optional[VisionClient]:
+        """Async vision client, created once and reused (keeps its HTTP connection pool)"""
+        if self._vision_client is None and self.use_ai:
+            self._vision_client = get_vision_client(self.ai_provider)
+        return self._vision_client
         
     async def scan_receipt(self, image_data: bytes) -> Dict:
         """
@@ -37,29 +82,38 @@ class ReceiptScannerService:
                 "title": str,
                 "description": str,
                 "items": list[str],
-                "merchant": str
+                "merchant": str,
+                "preprocessing": dict (size/latency stats, if the image was preprocessed)
             }
         """
         try:
+            # Step 0: Shrink and clean up the photo before OCR and upload
+            prepared = await self._preprocess(image_data)
+            upload_data = prepared.upload_data if prepared else image_data
+            ocr_data = prepared.ocr_data if prepared else image_data
+            media_type = prepared.media_type if prepared else "image/jpeg"
+            
             # Convert image to base64 for AI
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+            image_base64 = base64.b64encode(upload_data).decode('utf-8')
             
             # Step 1: OCR extraction (if enabled)
             ocr_text = ""
             if self.use_ocr:
-                ocr_text = await self._extract_text_ocr(image_data)
+                ocr_text = await self._extract_text_ocr(ocr_data)
                 logger.info(f"OCR extracted text: {ocr_text[:200]}...")
             
             # Step 2: AI extraction (if enabled)
             extracted_data = {}
             if self.use_ai:
-                extracted_data = await self._extract_with_ai(image_base64, ocr_text)
+                extracted_data = await self._extract_with_ai(image_base64, ocr_text, media_type)
             else:
                 # Fallback to simple OCR parsing
                 extracted_data = self._parse_ocr_text(ocr_text)
             
             # Step 3: Validate and normalize data
             normalized = self._normalize_data(extracted_data)
+            if prepared:
+                normalized["preprocessing"] = prepared.stats
             
             return normalized
             
@@ -67,176 +121,66 @@ class ReceiptScannerService:
             logger.error(f"Error scanning receipt: {str(e)}", exc_info=True)
             raise Exception(f"Failed to scan receipt: {str(e)}")
     
+    @staticmethod
+    def to_transaction(extracted: Dict) -> TransactionCreate:
+        """Build the expense transaction for a scanned receipt"""
+        return TransactionCreate(
+            title=extracted["title"],
+            description=extracted.get("description", ""),
+            category=extracted["category"],
+            amount=extracted["amount"],
+            transaction_type="expense",
+            transaction_date=date.fromisoformat(extracted["date"]),
+            icon="ShoppingBag",
+            color="bg-slate-100 text-slate-600",
+        )
+    
+    async def _preprocess(self, image_data: bytes) -> Optional[PreprocessedReceipt]:
+        """Run the Pillow preprocessing stage off the event loop; None keeps the raw upload"""
+        if not ai_config.receipt_preprocess:
+            return None
+        
+        try:
+            prepared = await asyncio.to_thread(preprocess_receipt, image_data)
+            logger.info(f"Receipt preprocessed: {prepared.stats}")
+            return prepared
+        except Exception as e:
+            logger.warning(f"Receipt preprocessing failed, using original image: {str(e)}")
+            return None
+    
     async def _extract_text_ocr(self, image_data: bytes) -> str:
-        """Extract text from image using OCR"""
+        """Extract text from image using OCR in the shared process pool"""
+        if not PYTESSERACT_AVAILABLE:
+            logger.warning("pytesseract not available, using fallback")
+            # Fallback: return empty string, AI will handle it
+            return ""
+        
         try:
-            # Try to use pytesseract if available
-            try:
-                import pytesseract
-                from PIL import Image
-                
-                image = Image.open(io.BytesIO(image_data))
-                text = pytesseract.image_to_string(image, lang='eng+uzb')
-                return text
-            except ImportError:
-                logger.warning("pytesseract not available, using fallback")
-                # Fallback: return empty string, AI will handle it
-                return ""
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_ocr_executor(), ocr_image, image_data)
         except Exception as e:
             logger.warning(f"OCR extraction failed: {str(e)}")
             return ""
     
-    async def _extract_with_ai(self, image_base64: str, ocr_text: str) -> Dict:
+    async def _extract_with_ai(self, image_base64: str, ocr_text: str, media_type: str = "image/jpeg") -> Dict:
         """Extract information using AI Vision"""
-        try:
-            if self.ai_provider == "openai":
-                return await self._extract_with_openai(image_base64, ocr_text)
-            elif self.ai_provider == "anthropic":
-                return await self._extract_with_anthropic(image_base64, ocr_text)
-            else:
-                logger.warning(f"Unknown AI provider: {self.ai_provider}, using fallback")
-                return self._parse_ocr_text(ocr_text)
-        except Exception as e:
-            logger.error(f"AI extraction failed: {str(e)}")
-            # Fallback to OCR parsing
+        client = self.vision_client
+        if client is None:
             return self._parse_ocr_text(ocr_text)
-    
-    async def _extract_with_openai(self, image_base64: str, ocr_text: str) -> Dict:
-        """Extract using OpenAI GPT-4 Vision"""
-        try:
-            import openai
-            
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                logger.warning("OPENAI_API_KEY not set, using fallback")
-                return self._parse_ocr_text(ocr_text)
-            
-            client = openai.OpenAI(api_key=api_key)
-            
-            prompt = """Extract transaction information from this receipt image. 
-Return a JSON object with the following structure:
-{
-    "amount": float (total amount),
-    "date": "YYYY-MM-DD" (transaction date, use today if not found),
-    "category": string (one of: Oziq-ovqat, Transport, Boshqa, Maosh, Xizmatlar),
-    "title": string (merchant/store name or main item),
-    "description": string (brief description),
-    "items": array of strings (list of purchased items),
-    "merchant": string (store/merchant name)
-}
-
-If OCR text is provided, use it to help extract information.
-If date is not found, use today's date.
-If category cannot be determined, use "Boshqa".
-"""
-            
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt + (f"\n\nOCR Text:\n{ocr_text}" if ocr_text else "")
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ]
-            
-            response = client.chat.completions.create(
-                model="gpt-4o",  # or gpt-4-vision-preview
-                messages=messages,
-                max_tokens=500,
-                response_format={"type": "json_object"}
-            )
-            
-            import json
-            result = json.loads(response.choices[0].message.content)
-            return result
-            
-        except ImportError:
-            logger.warning("openai library not installed")
-            return self._parse_ocr_text(ocr_text)
-        except Exception as e:
-            logger.error(f"OpenAI extraction error: {str(e)}")
-            return self._parse_ocr_text(ocr_text)
-    
-    async def _extract_with_anthropic(self, image_base64: str, ocr_text: str) -> Dict:
-        """Extract using Anthropic Claude Vision"""
+        
         try:
-            import anthropic
-            
-            api_key = os.getenv("ANTHROPIC_API_KEY")
-            if not api_key:
-                logger.warning("ANTHROPIC_API_KEY not set, using fallback")
-                return self._parse_ocr_text(ocr_text)
-            
-            client = anthropic.Anthropic(api_key=api_key)
-            
-            prompt = """Extract transaction information from this receipt image. 
-Return a JSON object with the following structure:
-{
-    "amount": float (total amount),
-    "date": "YYYY-MM-DD" (transaction date, use today if not found),
-    "category": string (one of: Oziq-ovqat, Transport, Boshqa, Maosh, Xizmatlar),
-    "title": string (merchant/store name or main item),
-    "description": string (brief description),
-    "items": array of strings (list of purchased items),
-    "merchant": string (store/merchant name)
-}
-
-If OCR text is provided, use it to help extract information.
-If date is not found, use today's date.
-If category cannot be determined, use "Boshqa".
-""" + (f"\n\nOCR Text:\n{ocr_text}" if ocr_text else "")
-            
-            message = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=500,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "image/jpeg",
-                                    "data": image_base64
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ]
-            )
-            
-            import json
-            # Extract JSON from response
-            content = message.content[0].text
-            # Try to find JSON in the response
-            import re
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
-            else:
-                result = json.loads(content)
-            
-            return result
-            
-        except ImportError:
-            logger.warning("anthropic library not installed")
+            # Client has its own HTTP timeout; wait_for also bounds retries
+            async with self._vision_slots:
+                return await asyncio.wait_for(
+                    client.extract(image_base64, ocr_text, media_type),
+                    timeout=ai_config.vision_timeout_seconds * 2
+                )
+        except asyncio.TimeoutError:
+            logger.error(f"{client.provider} extraction timed out")
             return self._parse_ocr_text(ocr_text)
         except Exception as e:
-            logger.error(f"Anthropic extraction error: {str(e)}")
+            logger.error(f"AI extraction failed: {str(e)}")
+            # Fallback to OCR parsing
             return self._parse_ocr_text(ocr_text)
     
     def _parse_ocr_text(self, ocr_text: str) -> Dict:
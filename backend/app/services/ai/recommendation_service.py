@@ -1,93 +1,192 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func, case, null
 from typing import List, Dict, Optional
 from datetime import date, timedelta
+import numpy as np
 from app.models import Task, Habit, HabitCompletion
 from app.config.ai_config import ai_config
 
 
+# Vazifa tavsiyalari uchun og'irliklar (score = yig'indi)
+DEFAULT_TASK_WEIGHTS = {
+    "category_success": 30.0,  # kategoriyadagi bajarilish ulushi (0..1) ga ko'paytiriladi
+    "overdue": 50.0,
+    "due_today": 40.0,
+    "due_soon": 20.0,  # 1-2 kun qoldi
+    "priority_high": 30.0,
+    "priority_medium": 15.0,  # noma'lum prioritet ham shunday baholanadi
+    "priority_low": 5.0,
+    "focus": 10.0,
+    "age_per_day": 0.0,  # eski vazifalarni ko'tarish uchun (kun boshiga)
+    "age_max_days": 30.0,
+}
+
+# Yaxshi natija deb hisoblanadigan kategoriya bajarilish ulushi
+GOOD_CATEGORY_SUCCESS = 0.5
+
+
 class RecommendationService:
     """Tavsiyalar servisi"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, weights: Optional[Dict[str, float]] = None):
         self.db = db
+        self.weights = {**DEFAULT_TASK_WEIGHTS, **(weights or {})}
     
     def get_task_recommendations(
         self,
         user_id: str,
         limit: int = 5
     ) -> List[Dict]:
-        """Vazifalar uchun tavsiyalar"""
-        # Foydalanuvchi tarixi
-        completed_tasks = self.db.query(Task).filter(
-            and_(
-                Task.user_id == user_id,
-                Task.status == "done"
-            )
-        ).order_by(Task.completed_at.desc()).limit(50).all()
+        """Vazifalar uchun tavsiyalar
         
-        pending_tasks = self.db.query(Task).filter(
+        Pending vazifalar ORM obyektlari o'rniga ustunlar sifatida o'qiladi va
+        NumPy massivlarida baholanadi; eng yaxshi ``limit`` tasi argpartition bilan tanlanadi.
+        """
+        # Kategoriyalar bo'yicha muvaffaqiyat darajasi (SQL agregat)
+        category_success = self._get_category_success(user_id)
+        
+        if not category_success:
+            # Hech qanday tarix yo'q, oddiy tavsiyalar
+            pending_tasks = self.db.query(Task).filter(
+                and_(
+                    Task.user_id == user_id,
+                    Task.status == "pending"
+                )
+            ).limit(limit).all()
+            return self._get_default_task_recommendations(pending_tasks, limit)
+        
+        rows = self.db.query(
+            Task.id,
+            Task.title,
+            Task.category,
+            Task.priority,
+            Task.is_focus,
+            Task.due_date,
+            Task.created_at if self.weights["age_per_day"] else null()
+        ).filter(
             and_(
                 Task.user_id == user_id,
                 Task.status == "pending"
             )
         ).all()
         
-        if not completed_tasks:
-            # Hech qanday tarix yo'q, oddiy tavsiyalar
-            return self._get_default_task_recommendations(pending_tasks, limit)
+        if not rows:
+            return []
         
-        # Kategoriyalar bo'yicha muvaffaqiyat darajasi
-        category_success = {}
-        for task in completed_tasks:
-            cat = task.category
-            if cat not in category_success:
-                category_success[cat] = {"completed": 0, "total": 0}
-            category_success[cat]["completed"] += 1
+        ids, titles, categories, priorities, focus, due_dates, created_at = zip(*rows)
+        today = date.today()
+        days_until = self._days_between(today, due_dates)
+        scores = self.score_tasks(
+            categories=categories,
+            priorities=priorities,
+            is_focus=focus,
+            days_until_due=days_until,
+            age_days=-self._days_between(today, created_at) if self.weights["age_per_day"] else None,
+            category_success=category_success
+        )
         
-        # Pending tasks uchun score hisoblash
         recommendations = []
-        for task in pending_tasks:
-            score = 0
-            
-            # Kategoriya muvaffaqiyati
-            cat = task.category
-            if cat in category_success:
-                success_rate = category_success[cat]["completed"] / max(category_success[cat]["total"], 1)
-                score += success_rate * 30
-            
-            # Muddat
-            if task.due_date:
-                days_until = (task.due_date.date() - date.today()).days
-                if days_until < 0:
-                    score += 50  # Kechikkan
-                elif days_until < 1:
-                    score += 40
-                elif days_until < 3:
-                    score += 20
-            
-            # Prioritet
-            priority_scores = {"high": 30, "medium": 15, "low": 5}
-            score += priority_scores.get(task.priority, 15)
-            
-            # Focus
-            if task.is_focus == 1:
-                score += 10
-            
+        for i in self._top_k(scores, limit):
+            due_date = due_dates[i]
+            days = None if np.isnan(days_until[i]) else int(days_until[i])
             recommendations.append({
-                "task_id": task.id,
-                "title": task.title,
-                "category": task.category,
-                "priority": task.priority,
-                "due_date": task.due_date.isoformat() if task.due_date else None,
-                "score": round(score, 2),
-                "reason": self._get_recommendation_reason(task, category_success)
+                "task_id": ids[i],
+                "title": titles[i],
+                "category": categories[i],
+                "priority": priorities[i],
+                "due_date": due_date.isoformat() if due_date else None,
+                "score": round(float(scores[i]), 2),
+                "reason": self._get_recommendation_reason(
+                    categories[i], priorities[i], focus[i], days, category_success
+                )
             })
         
-        # Score bo'yicha saralash
-        recommendations.sort(key=lambda x: x["score"], reverse=True)
+        return recommendations
+    
+    def score_tasks(
+        self,
+        categories: List[str],
+        priorities: List[Optional[str]],
+        is_focus: List[Optional[int]],
+        days_until_due: np.ndarray,
+        age_days: Optional[np.ndarray],
+        category_success: Dict[str, float]
+    ) -> np.ndarray:
+        """Vazifalar score'larini vektorlashgan holda hisoblash
         
-        return recommendations[:limit]
+        ``days_until_due``/``age_days``da muddat yoki sana yo'q bo'lsa NaN bo'ladi.
+        """
+        w = self.weights
+        
+        # Kategoriya muvaffaqiyati: har bir noyob kategoriya uchun bir marta lookup
+        unique_categories, category_codes = np.unique(np.asarray(categories, dtype=object), return_inverse=True)
+        success_by_code = np.array([category_success.get(cat, 0.0) for cat in unique_categories], dtype=float)
+        scores = success_by_code[category_codes] * w["category_success"]
+        
+        # Muddat
+        with np.errstate(invalid="ignore"):
+            scores += np.select(
+                [days_until_due < 0, days_until_due < 1, days_until_due < 3],
+                [w["overdue"], w["due_today"], w["due_soon"]],
+                default=0.0
+            )
+        
+        # Prioritet
+        priority_arr = np.asarray(priorities, dtype=object)
+        scores += np.select(
+            [priority_arr == "high", priority_arr == "low"],
+            [w["priority_high"], w["priority_low"]],
+            default=w["priority_medium"]
+        )
+        
+        # Focus
+        scores += (np.asarray(is_focus, dtype=object) == 1) * w["focus"]
+        
+        # Yosh
+        if w["age_per_day"] and age_days is not None:
+            age = np.clip(np.nan_to_num(age_days, nan=0.0), 0, w["age_max_days"])
+            scores += age * w["age_per_day"]
+        
+        return scores
+    
+    def _get_category_success(self, user_id: str) -> Dict[str, float]:
+        """Kategoriya -> bajarilgan vazifalar ulushi (faqat bajarilgani bor kategoriyalar)"""
+        rows = self.db.query(
+            Task.category,
+            func.count(Task.id),
+            func.sum(case((Task.status == "done", 1), else_=0))
+        ).filter(
+            Task.user_id == user_id
+        ).group_by(Task.category).all()
+        
+        return {
+            category: int(done) / total
+            for category, total, done in rows
+            if done
+        }
+    
+    @staticmethod
+    def _days_between(today: date, values) -> np.ndarray:
+        """Har bir sana uchun (sana - bugun) kunlarda; None -> NaN
+        
+        ``toordinal`` orqali hisoblash datetime obyektlarini datetime64'ga
+        o'girishdan ancha tez.
+        """
+        today_ordinal = today.toordinal()
+        return np.fromiter(
+            (value.toordinal() - today_ordinal if value is not None else np.nan for value in values),
+            dtype=float,
+            count=len(values)
+        )
+    
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Eng katta k ta score indekslari (kamayish tartibida, tenglikda asl tartib)"""
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.lexsort((candidates, -scores[candidates]))]
     
     def get_habit_recommendations(
         self,
@@ -174,28 +273,29 @@ class RecommendationService:
     
     def _get_recommendation_reason(
         self,
-        task: Task,
-        category_success: Dict
+        category: str,
+        priority: Optional[str],
+        is_focus: Optional[int],
+        days_until: Optional[int],
+        category_success: Dict[str, float]
     ) -> str:
         """Tavsiya sababi"""
         reasons = []
         
-        if task.due_date:
-            days_until = (task.due_date.date() - date.today()).days
+        if days_until is not None:
             if days_until < 0:
                 reasons.append("Muddat o'tib ketgan")
             elif days_until < 1:
                 reasons.append("Bugun muddat")
         
-        if task.priority == "high":
+        if priority == "high":
             reasons.append("Yuqori prioritet")
         
-        if task.is_focus == 1:
+        if is_focus == 1:
             reasons.append("Focus vazifa")
         
-        cat = task.category
-        if cat in category_success:
-            reasons.append(f"{cat} kategoriyasida yaxshi natijalar")
+        if category_success.get(category, 0) >= GOOD_CATEGORY_SUCCESS:
+            reasons.append(f"{category} kategoriyasida yaxshi natijalar")
         
         return ", ".join(reasons) if reasons else "Tavsiya etiladi"
     
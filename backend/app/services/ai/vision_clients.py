@@ -0,0 +1,177 @@
+"""
+Vision LLM clients for receipt extraction
+
+All clients are async and bounded by ``ai_config.vision_timeout_seconds``, so a
+slow provider never blocks the event loop. ``FakeVisionClient`` is a local
+stand-in used in tests and development (``AI_PROVIDER=fake``).
+"""
+import os
+import re
+import json
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_PROMPT = """Extract transaction information from this receipt image.
+Return a JSON object with the following structure:
+{
+    "amount": float (total amount),
+    "date": "YYYY-MM-DD" (transaction date, use today if not found),
+    "category": string (one of: Oziq-ovqat, Transport, Boshqa, Maosh, Xizmatlar),
+    "title": string (merchant/store name or main item),
+    "description": string (brief description),
+    "items": array of strings (list of purchased items),
+    "merchant": string (store/merchant name)
+}
+
+If OCR text is provided, use it to help extract information.
+If date is not found, use today's date.
+If category cannot be determined, use "Boshqa".
+"""
+
+
+def _build_prompt(ocr_text: str) -> str:
+    return RECEIPT_PROMPT + (f"\n\nOCR Text:\n{ocr_text}" if ocr_text else "")
+
+
+class VisionClient(ABC):
+    """Base class: extract receipt fields from a base64 image"""
+
+    provider = "base"
+
+    @abstractmethod
+    async def extract(self, image_base64: str, ocr_text: str, media_type: str = "image/jpeg") -> Dict:
+        """Receipt fields (amount, date, category, title, ...) as a dict"""
+
+
+class OpenAIVisionClient(VisionClient):
+    """OpenAI GPT-4o vision via AsyncOpenAI"""
+
+    provider = "openai"
+
+    def __init__(self, api_key: str, model: str = "gpt-4o", timeout: Optional[float] = None):
+        import openai
+
+        self.model = model
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            timeout=timeout or ai_config.vision_timeout_seconds,
+            max_retries=1,
+        )
+
+    async def extract(self, image_base64: str, ocr_text: str, media_type: str = "image/jpeg") -> Dict:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": _build_prompt(ocr_text)},
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": f"data:{media_type};base64,{image_base64}"}
+                        }
+                    ]
+                }
+            ],
+            max_tokens=500,
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+
+
+class AnthropicVisionClient(VisionClient):
+    """Anthropic Claude vision via AsyncAnthropic"""
+
+    provider = "anthropic"
+
+    def __init__(self, api_key: str, model: str = "claude-3-5-sonnet-20241022", timeout: Optional[float] = None):
+        import anthropic
+
+        self.model = model
+        self.client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            timeout=timeout or ai_config.vision_timeout_seconds,
+            max_retries=1,
+        )
+
+    async def extract(self, image_base64: str, ocr_text: str, media_type: str = "image/jpeg") -> Dict:
+        message = await self.client.messages.create(
+            model=self.model,
+            max_tokens=500,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image",
+                            "source": {"type": "base64", "media_type": media_type, "data": image_base64}
+                        },
+                        {"type": "text", "text": _build_prompt(ocr_text)}
+                    ]
+                }
+            ]
+        )
+
+        # Extract JSON from response
+        content = message.content[0].text
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        return json.loads(json_match.group() if json_match else content)
+
+
+class FakeVisionClient(VisionClient):
+    """Local stand-in for a vision LLM: returns a canned response after an optional delay"""
+
+    provider = "fake"
+
+    DEFAULT_RESPONSE = {
+        "amount": 45000.0,
+        "category": "Oziq-ovqat",
+        "title": "Korzinka",
+        "description": "",
+        "items": ["Non", "Sut", "Tuxum"],
+        "merchant": "Korzinka",
+    }
+
+    def __init__(self, response: Optional[Dict] = None, delay: float = 0.0, error: Optional[Exception] = None):
+        self.response = response or self.DEFAULT_RESPONSE
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def extract(self, image_base64: str, ocr_text: str, media_type: str = "image/jpeg") -> Dict:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return dict(self.response)
+
+
+def get_vision_client(provider: str) -> Optional[VisionClient]:
+    """Build a vision client for the provider, or None if it is not configured"""
+    try:
+        if provider == "openai":
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                logger.warning("OPENAI_API_KEY not set, using fallback")
+                return None
+            return OpenAIVisionClient(api_key)
+        if provider == "anthropic":
+            api_key = os.getenv("ANTHROPIC_API_KEY")
+            if not api_key:
+                logger.warning("ANTHROPIC_API_KEY not set, using fallback")
+                return None
+            return AnthropicVisionClient(api_key)
+        if provider == "fake":
+            return FakeVisionClient()
+    except ImportError:
+        logger.warning(f"{provider} library not installed")
+        return None
+
+    logger.warning(f"Unknown AI provider: {provider}, using fallback")
+    return None
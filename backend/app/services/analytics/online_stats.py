@@ -0,0 +1,174 @@
+"""
+Inkremental (online) statistika: Welford, EWMA va t-digest
+
+Barcha tuzilmalar bitta qiymat qo'shish/olib tashlashni O(1) (t-digest uchun
+O(compression)) vaqtda bajaradi va JSON/ustunlarga saqlanadi.
+"""
+import math
+from bisect import bisect_left
+from typing import List, Optional
+
+
+class RunningStats:
+    """Welford algoritmi: o'rtacha va dispersiya, qo'shish va olib tashlash bilan"""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def remove(self, value: float):
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        old_mean = self.mean
+        self.count -= 1
+        self.mean = (old_mean * (self.count + 1) - value) / self.count
+        self.m2 = max(self.m2 - (value - old_mean) * (value - self.mean), 0.0)
+
+    @property
+    def variance(self) -> float:
+        """Populyatsiya dispersiyasi (np.var bilan bir xil)"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def z_score(self, value: float) -> float:
+        std = self.std
+        return (value - self.mean) / std if std > 0 else 0.0
+
+
+class Ewma:
+    """Eksponensial silliqlangan o'rtacha va dispersiya
+
+    Olib tashlash aniq teskari amal emas, shuning uchun EWMA faqat qo'shishda
+    yangilanadi; to'liq aniqlik kerak bo'lsa statistikani qayta qurish kerak.
+    """
+
+    def __init__(self, alpha: float, mean: Optional[float] = None, var: float = 0.0):
+        if not 0 < alpha <= 1:
+            raise ValueError("EWMA alpha must be in (0, 1]")
+        self.alpha = alpha
+        self.mean = mean
+        self.var = var
+
+    def add(self, value: float):
+        if self.mean is None:
+            self.mean, self.var = value, 0.0
+            return
+        delta = value - self.mean
+        self.mean += self.alpha * delta
+        self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+
+class TDigest:
+    """Kvantillar uchun ixcham sketch (merging t-digest)
+
+    Centroidlar ``[mean, weight]`` ro'yxati sifatida saqlanadi. Olib tashlash
+    taxminiy: eng yaqin centroid og'irligi kamaytiriladi.
+    """
+
+    def __init__(self, compression: int = 100, centroids: Optional[List[List[float]]] = None):
+        self.compression = compression
+        self.centroids: List[List[float]] = sorted(centroids or [], key=lambda c: c[0])
+
+    @property
+    def total_weight(self) -> float:
+        return sum(weight for _, weight in self.centroids)
+
+    def add(self, value: float, weight: float = 1.0):
+        means = [c[0] for c in self.centroids]
+        self.centroids.insert(bisect_left(means, value), [value, weight])
+        if len(self.centroids) > 2 * self.compression:
+            self.compress()
+
+    def remove(self, value: float, weight: float = 1.0):
+        if not self.centroids:
+            return
+        means = [c[0] for c in self.centroids]
+        idx = bisect_left(means, value)
+        candidates = [i for i in (idx - 1, idx) if 0 <= i < len(self.centroids)]
+        nearest = min(candidates, key=lambda i: abs(self.centroids[i][0] - value))
+        self.centroids[nearest][1] -= weight
+        if self.centroids[nearest][1] <= 1e-9:
+            del self.centroids[nearest]
+
+    def compress(self):
+        """Qo'shni centroidlarni birlashtirish: har bir centroid k-shkalada 1 birlikdan oshmaydi
+
+        k(q) = δ/(2π)·asin(2q-1) - dumlarda centroidlar kichik, o'rtada katta bo'ladi,
+        centroidlar soni esa taxminan δ bilan chegaralanadi.
+        """
+        total = self.total_weight
+        if total <= 0 or len(self.centroids) < 2:
+            return
+
+        merged = [list(self.centroids[0])]
+        cumulative = 0.0
+        for mean, weight in self.centroids[1:]:
+            current = merged[-1]
+            combined = current[1] + weight
+            if self._k((cumulative + combined) / total) - self._k(cumulative / total) <= 1:
+                current[0] += (mean - current[0]) * weight / combined
+                current[1] = combined
+            else:
+                cumulative += current[1]
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+
+        target = min(max(q, 0.0), 1.0) * self.total_weight
+        cumulative = 0.0
+        prev_center, prev_mean = None, None
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target <= center:
+                if prev_center is None:
+                    return mean
+                ratio = (target - prev_center) / (center - prev_center)
+                return prev_mean + ratio * (mean - prev_mean)
+            prev_center, prev_mean = center, mean
+            cumulative += weight
+        return self.centroids[-1][0]
+
+    def cdf(self, value: float) -> float:
+        """``value`` dan kichik qiymatlar ulushi (taxminiy)"""
+        total = self.total_weight
+        if total <= 0:
+            return 0.0
+
+        cumulative = 0.0
+        prev_center, prev_mean = None, None
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if value <= mean:
+                if prev_center is None:
+                    return 0.0 if value < mean else center / total
+                ratio = (value - prev_mean) / (mean - prev_mean) if mean > prev_mean else 1.0
+                return (prev_center + ratio * (center - prev_center)) / total
+            prev_center, prev_mean = center, mean
+            cumulative += weight
+        return 1.0
+
+    def to_list(self) -> List[List[float]]:
+        return [[round(mean, 6), weight] for mean, weight in self.centroids]
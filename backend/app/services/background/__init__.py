@@ -1,4 +1,5 @@
 from .ai_tasks import AITasks
+from .job_runner import BackgroundJobRunner
+from .scheduler import CronSchedule, JobScheduler, create_ai_scheduler
 
-__all__ = ["AITasks"]
-
+__all__ = ["AITasks", "BackgroundJobRunner", "CronSchedule", "JobScheduler", "create_ai_scheduler"]
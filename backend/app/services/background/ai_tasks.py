@@ -1,9 +1,10 @@
-from sqlalchemy.orm import Session
-from typing import Optional
-from datetime import date, timedelta
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Optional, Dict
 from app.services.ai.insights_service import InsightsService
+from app.services.ai.insights_store import InsightsStore
 from app.services.ai.task_priority_service import TaskPriorityService
 from app.services.ai.anomaly_detection_service import AnomalyDetectionService
+from app.services.background.job_runner import BackgroundJobRunner, check_deadline, iter_user_id_chunks
 from app.config.ai_config import ai_config
 
 
@@ -16,53 +17,86 @@ class AITasks:
         self.anomaly_detection = AnomalyDetectionService(db)
         self.task_priority = TaskPriorityService(db)
     
+    @staticmethod
+    def daily_insights_for_user(db: Session, user_id: str) -> Dict:
+        """Bitta foydalanuvchi uchun xulosalarni hisoblash va insights jadvaliga saqlash"""
+        snapshots = InsightsStore(db).refresh(user_id)
+        return {"user_id": user_id, "success": True, "insights": snapshots["daily"]}
+    
+    @staticmethod
+    def anomalies_for_user(db: Session, user_id: str) -> Dict:
+        """Bitta foydalanuvchi uchun anomaliyalarni tekshirish"""
+        service = AnomalyDetectionService(db)
+        expense_anomalies = service.detect_expense_anomalies(user_id)
+        check_deadline(db)
+        habit_anomalies = service.detect_habit_anomalies(user_id)
+        return {
+            "user_id": user_id,
+            "expense_anomalies": len(expense_anomalies),
+            "habit_anomalies": len(habit_anomalies),
+            "total": len(expense_anomalies) + len(habit_anomalies)
+        }
+    
+    @staticmethod
+    def anomaly_model_for_user(db: Session, user_id: str) -> Dict:
+        """Bitta foydalanuvchi uchun anomaliya detectorini qayta fit qilish"""
+        detector = AnomalyDetectionService(db).get_detector(user_id, refresh=True)
+        return {
+            "user_id": user_id,
+            "fitted": detector is not None,
+            "n_samples": detector["n_samples"] if detector else 0
+        }
+    
+    @staticmethod
+    def run_daily_insights_job(session_factory: sessionmaker) -> Dict:
+        """Kunlik xulosalarni worker pool orqali barcha foydalanuvchilar uchun generatsiya qilish"""
+        runner = BackgroundJobRunner(session_factory)
+        return runner.run("daily_insights", AITasks.daily_insights_for_user)
+    
+    @staticmethod
+    def run_anomaly_check_job(session_factory: sessionmaker) -> Dict:
+        """Anomaliyalarni worker pool orqali barcha foydalanuvchilar uchun tekshirish"""
+        runner = BackgroundJobRunner(session_factory)
+        return runner.run("anomaly_check", AITasks.anomalies_for_user)
+    
+    @staticmethod
+    def run_anomaly_model_refresh_job(session_factory: sessionmaker) -> Dict:
+        """Anomaliya detectorlarini worker pool orqali qayta fit qilish"""
+        runner = BackgroundJobRunner(session_factory)
+        return runner.run("anomaly_models", AITasks.anomaly_model_for_user)
+    
     def generate_daily_insights_for_all_users(self):
         """Barcha foydalanuvchilar uchun kunlik xulosa generatsiya qilish"""
-        from app.models import User
-        
-        users = self.db.query(User).all()
         results = []
         
-        for user in users:
-            try:
-                insights = self.insights_service.generate_daily_insights(user.id)
-                results.append({
-                    "user_id": user.id,
-                    "success": True,
-                    "insights": insights
-                })
-            except Exception as e:
-                results.append({
-                    "user_id": user.id,
-                    "success": False,
-                    "error": str(e)
-                })
+        for user_ids in iter_user_id_chunks(self.db, ai_config.job_chunk_size):
+            for user_id in user_ids:
+                try:
+                    results.append(self.daily_insights_for_user(self.db, user_id))
+                except Exception as e:
+                    self.db.rollback()
+                    results.append({
+                        "user_id": user_id,
+                        "success": False,
+                        "error": str(e)
+                    })
         
         return results
     
     def check_anomalies_for_all_users(self):
         """Barcha foydalanuvchilar uchun anomaliyalarni tekshirish"""
-        from app.models import User
-        
-        users = self.db.query(User).all()
         results = []
         
-        for user in users:
-            try:
-                expense_anomalies = self.anomaly_detection.detect_expense_anomalies(user.id)
-                habit_anomalies = self.anomaly_detection.detect_habit_anomalies(user.id)
-                
-                results.append({
-                    "user_id": user.id,
-                    "expense_anomalies": len(expense_anomalies),
-                    "habit_anomalies": len(habit_anomalies),
-                    "total": len(expense_anomalies) + len(habit_anomalies)
-                })
-            except Exception as e:
-                results.append({
-                    "user_id": user.id,
-                    "error": str(e)
-                })
+        for user_ids in iter_user_id_chunks(self.db, ai_config.job_chunk_size):
+            for user_id in user_ids:
+                try:
+                    results.append(self.anomalies_for_user(self.db, user_id))
+                except Exception as e:
+                    self.db.rollback()
+                    results.append({
+                        "user_id": user_id,
+                        "error": str(e)
+                    })
         
         return results
     
@@ -0,0 +1,302 @@
+"""
+Background job runner - barcha foydalanuvchilar bo'yicha ishlarni parallel bajarish
+"""
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+from app.models import User, JobRun, Metric
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+# handler(db, user_id) -> natija (dict)
+UserHandler = Callable[[Session, str], Dict]
+
+MAX_STORED_ERRORS = 100
+
+
+class JobDeadlineExceeded(Exception):
+    """Handler foydalanuvchiga ajratilgan ``user_timeout`` dan oshib ketdi"""
+
+
+def check_deadline(db: Session):
+    """Uzoq handler'lar bosqichlar orasida chaqiradi - muddat o'tgan bo'lsa ishni to'xtatadi
+
+    Thread'ni tashqaridan to'xtatib bo'lmaydi, shuning uchun timeout handler
+    ichida (bu tekshiruv va PostgreSQL ``statement_timeout``) ta'minlanadi.
+    """
+    deadline = db.info.get("job_deadline")
+    if deadline is not None and time.monotonic() > deadline:
+        raise JobDeadlineExceeded("User deadline exceeded")
+
+
+def iter_user_id_chunks(db: Session, chunk_size: int) -> Iterator[List[str]]:
+    """Foydalanuvchi ID larini keyset pagination bilan bo'laklab o'qish
+
+    OFFSET ishlatilmaydi: har bir bo'lak oldingi bo'lakning oxirgi ID sidan
+    boshlanadi, shuning uchun 100k+ foydalanuvchida ham so'rov narxi o'zgarmaydi.
+    """
+    last_id = None
+    while True:
+        query = db.query(User.id).order_by(User.id)
+        if last_id is not None:
+            query = query.filter(User.id > last_id)
+
+        ids = [row[0] for row in query.limit(chunk_size).all()]
+        if not ids:
+            return
+
+        yield ids
+
+        if len(ids) < chunk_size:
+            return
+        last_id = ids[-1]
+
+
+class BackgroundJobRunner:
+    """Foydalanuvchilar bo'yicha vazifalarni cheklangan worker pool orqali bajarish
+
+    - foydalanuvchilar keyset pagination bilan oqim sifatida o'qiladi
+    - har bir foydalanuvchi alohida session'da ishlanadi (xato faqat o'sha
+      foydalanuvchining tranzaksiyasini bekor qiladi)
+    - bir vaqtda ishlanayotgan vazifalar soni ``max_workers * 2`` dan oshmaydi
+    - ``user_timeout`` dan uzoq ishlagan foydalanuvchi "timed_out" deb belgilanadi;
+      handler ham shu muddat bilan cheklanadi (``check_deadline``, ``statement_timeout``)
+    - timeout bo'lib hali ham ishlayotgan thread'lar ``max_workers`` ga yetsa yangi
+      foydalanuvchilar yuborilmaydi va ish "degraded" deb yakunlanadi
+    - yakuniy statistika ``job_runs`` jadvaliga va ``metrics`` ga yoziladi
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        max_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        user_timeout: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.max_workers = max_workers or ai_config.job_max_workers
+        self.chunk_size = chunk_size or ai_config.job_chunk_size
+        self.user_timeout = user_timeout or ai_config.job_user_timeout_seconds
+        self._poll_interval = min(1.0, self.user_timeout / 2)
+
+    def run(
+        self,
+        job_name: str,
+        handler: UserHandler,
+        on_result: Optional[Callable[[str, Dict], None]] = None,
+    ) -> Dict:
+        """Vazifani barcha foydalanuvchilar uchun bajarish va statistikani qaytarish"""
+        job_run_id = self._start_job_run(job_name)
+        start = time.monotonic()
+
+        stats = {"processed": 0, "succeeded": 0, "failed": 0, "timed_out": 0, "skipped": 0}
+        errors: List[Dict] = []
+        latencies: List[float] = []
+        status = "completed"
+
+        in_flight: Dict[Future, Tuple[str, List[float]]] = {}
+        # Timeout deb belgilangan, lekin thread'i hali band bo'lgan vazifalar (boshlangan vaqti)
+        stuck: Dict[Future, float] = {}
+        max_in_flight = self.max_workers * 2
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"job-{job_name}",
+        )
+        reader = self.session_factory()
+        try:
+            for chunk in iter_user_id_chunks(reader, self.chunk_size):
+                for user_id in chunk:
+                    while len(in_flight) >= max_in_flight and not self._wedged(stuck):
+                        self._drain(in_flight, stuck, stats, errors, latencies, on_result)
+                    if self._wedged(stuck):
+                        break
+
+                    started: List[float] = []
+                    future = executor.submit(self._run_for_user, handler, user_id, started)
+                    in_flight[future] = (user_id, started)
+                if self._wedged(stuck):
+                    break
+
+            while in_flight and not self._wedged(stuck):
+                self._drain(in_flight, stuck, stats, errors, latencies, on_result)
+
+            if self._wedged(stuck):
+                # Barcha worker'lar band - navbatdagilar hech qachon boshlanmaydi
+                status = "degraded"
+                self._skip_queued(in_flight, stats)
+                # Tekshiruvdan keyin boshlanib ulgurganlari ham kutilmaydi
+                stats["skipped"] += len(in_flight)
+                in_flight.clear()
+                logger.error(
+                    f"Background job {job_name} degraded: {len(stuck)} worker threads stuck past "
+                    f"{self.user_timeout}s, remaining users skipped"
+                )
+                errors.append({"user_id": None, "error": f"{len(stuck)} workers stuck, stopped submitting"})
+        except Exception as e:
+            status = "failed"
+            logger.error(f"Background job {job_name} failed: {str(e)}", exc_info=True)
+            errors.append({"user_id": None, "error": str(e)})
+        finally:
+            reader.close()
+            # Timeout bo'lgan thread'lar kutilmaydi, ularning natijasi e'tiborsiz qoladi
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        duration = time.monotonic() - start
+        summary = {
+            "job_id": job_run_id,
+            "job": job_name,
+            "status": status,
+            **stats,
+            "duration_seconds": round(duration, 3),
+            "throughput_per_second": round(stats["processed"] / duration, 2) if duration > 0 else 0.0,
+            "p95_latency_ms": self._percentile(latencies, 95),
+            "errors": errors[:MAX_STORED_ERRORS],
+        }
+
+        self._finish_job_run(job_run_id, summary)
+        logger.info(
+            f"Background job {job_name} {status}: {stats['processed']} users, "
+            f"{stats['failed']} failed, {stats['timed_out']} timed out, {stats['skipped']} skipped, "
+            f"{summary['throughput_per_second']} users/s"
+        )
+        return summary
+
+    def _run_for_user(self, handler: UserHandler, user_id: str, started: List[float]) -> Dict:
+        """Bitta foydalanuvchi uchun handler'ni alohida session'da bajarish"""
+        started.append(time.monotonic())
+        db = self.session_factory()
+        db.info["job_deadline"] = started[0] + self.user_timeout
+        postgres = db.get_bind().dialect.name == "postgresql"
+        try:
+            if postgres:
+                # SET (LOCAL emas): handler o'rtada commit qilsa ham amal qiladi
+                db.execute(text(f"SET statement_timeout = {int(self.user_timeout * 1000)}"))
+            result = handler(db, user_id)
+            db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            if postgres:
+                # Ulanish pool'ga timeout'siz qaytishi kerak
+                try:
+                    db.execute(text("RESET statement_timeout"))
+                    db.commit()
+                except Exception:
+                    db.rollback()
+            db.close()
+
+    def _wedged(self, stuck: Dict[Future, float]) -> bool:
+        """Timeout bo'lgan thread'lar butun pool'ni egallab olganmi
+
+        Handler o'z muddatini tekshirib biroz kechikib chiqishi mumkin, shuning
+        uchun ``2 * user_timeout`` dan keyin ham ishlayotgan thread osilgan hisoblanadi.
+        """
+        for future in [future for future in stuck if future.done()]:
+            del stuck[future]
+        now = time.monotonic()
+        hung = sum(1 for started in stuck.values() if now - started > 2 * self.user_timeout)
+        return hung >= self.max_workers
+
+    @staticmethod
+    def _skip_queued(in_flight: Dict[Future, Tuple[str, List[float]]], stats: Dict):
+        """Hali boshlanmagan vazifalarni bekor qilish"""
+        for future in list(in_flight):
+            if future.cancel():
+                in_flight.pop(future)
+                stats["skipped"] += 1
+
+    def _drain(
+        self,
+        in_flight: Dict[Future, Tuple[str, List[float]]],
+        stuck: Dict[Future, float],
+        stats: Dict,
+        errors: List[Dict],
+        latencies: List[float],
+        on_result: Optional[Callable[[str, Dict], None]],
+    ):
+        """Tugagan vazifalarni yig'ish va muddati o'tganlarini timeout deb belgilash"""
+        done, _ = wait(list(in_flight), timeout=self._poll_interval, return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+
+        for future in done:
+            user_id, started = in_flight.pop(future)
+            stats["processed"] += 1
+            if started:
+                latencies.append(now - started[0])
+            try:
+                result = future.result()
+                stats["succeeded"] += 1
+                if on_result:
+                    on_result(user_id, result)
+            except Exception as e:
+                stats["failed"] += 1
+                if len(errors) < MAX_STORED_ERRORS:
+                    errors.append({"user_id": user_id, "error": str(e)})
+
+        for future, (user_id, started) in list(in_flight.items()):
+            if started and now - started[0] > self.user_timeout:
+                in_flight.pop(future)
+                if not future.cancel():
+                    stuck[future] = started[0]
+                stats["processed"] += 1
+                stats["timed_out"] += 1
+                latencies.append(now - started[0])
+                if len(errors) < MAX_STORED_ERRORS:
+                    errors.append({"user_id": user_id, "error": f"Timed out after {self.user_timeout}s"})
+
+    def _start_job_run(self, job_name: str) -> Optional[str]:
+        db = self.session_factory()
+        try:
+            job_run = JobRun(job_name=job_name, status="running")
+            db.add(job_run)
+            db.commit()
+            return job_run.id
+        except Exception as e:
+            logger.error(f"Error creating job run record: {str(e)}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def _finish_job_run(self, job_run_id: Optional[str], summary: Dict):
+        db = self.session_factory()
+        try:
+            job_run = db.query(JobRun).filter(JobRun.id == job_run_id).first() if job_run_id else None
+            if job_run:
+                job_run.status = summary["status"]
+                job_run.finished_at = datetime.utcnow()
+                job_run.processed = summary["processed"]
+                job_run.succeeded = summary["succeeded"]
+                job_run.failed = summary["failed"]
+                job_run.timed_out = summary["timed_out"]
+                job_run.duration_seconds = summary["duration_seconds"]
+                job_run.throughput = summary["throughput_per_second"]
+                job_run.errors = json.dumps(summary["errors"]) if summary["errors"] else None
+
+            tags = json.dumps({"job": summary["job"]})
+            db.add(Metric(metric_name="job_throughput", metric_value=summary["throughput_per_second"], tags=tags))
+            db.add(Metric(metric_name="job_duration_seconds", metric_value=summary["duration_seconds"], tags=tags))
+            db.add(Metric(metric_name="job_failures", metric_value=summary["failed"] + summary["timed_out"], tags=tags))
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error saving job run summary: {str(e)}")
+            db.rollback()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _percentile(values: List[float], percentile: int) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return round(ordered[index] * 1000, 2)
@@ -0,0 +1,354 @@
+"""
+Outbox - Telegram, email va push xabarlarini fon rejimida yetkazish
+
+Xabar ``outbox_messages`` jadvaliga chaqiruvchining tranzaksiyasi ichida yoziladi
+(masalan, tasdiqlash kodi bilan birga), endpoint esa darhol javob qaytaradi.
+Worker muddati kelgan xabarlarni partiyalab oladi, kanal bo'yicha parallel
+yuboradi va vaqtinchalik xatolarda eksponensial backoff bilan qayta urinadi.
+
+Muddatli xabarlar (``expires_at``, masalan tasdiqlash kodi) muddati o'tgach
+yuborilmaydi. Yuborilgan xabarning payload'i tozalanadi, yakunlangan qatorlar
+``outbox_retention_hours`` dan keyin o'chiriladi - kodlar bazada qolmaydi.
+"""
+import json
+import random
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("telegram", "email", "push")
+PURGE_INTERVAL_SECONDS = 3600
+EXPIRED_ERROR = "Expired before delivery"
+# Yakunlangan xabarning payload'i o'rniga (maxfiy matn saqlanmaydi)
+CLEARED_PAYLOAD = "{}"
+
+
+class PermanentDeliveryError(Exception):
+    """Qayta urinish foyda bermaydigan xato (bloklangan bot, noto'g'ri manzil, o'chirilgan kanal)"""
+
+
+@dataclass
+class OutboxItem:
+    """Sessiyadan ajratilgan xabar - sender'lar DB bilan ishlamaydi"""
+    id: str
+    channel: str
+    recipient: str
+    payload: Dict[str, Any]
+    attempts: int
+    created_at: Optional[datetime]
+    expires_at: Optional[datetime] = None
+
+
+Sender = Callable[[OutboxItem], Awaitable[None]]
+
+
+def enqueue_message(
+    db: Session,
+    channel: str,
+    recipient: str,
+    payload: Dict[str, Any],
+    user_id: Optional[str] = None,
+    expires_at: Optional[datetime] = None,
+) -> OutboxMessage:
+    """Xabarni navbatga qo'shish; commit chaqiruvchida (o'z yozuvlari bilan birga)
+
+    ``expires_at`` (UTC) o'tgach xabar yuborilmaydi va ``failed`` bo'ladi.
+    """
+    if channel not in CHANNELS:
+        raise ValueError(f"Unknown outbox channel: {channel}")
+    message = OutboxMessage(
+        user_id=user_id,
+        channel=channel,
+        recipient=str(recipient),
+        payload=json.dumps(payload, ensure_ascii=False),
+        status="pending",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+        expires_at=expires_at,
+    )
+    db.add(message)
+    return message
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+async def send_telegram(item: OutboxItem) -> None:
+    from app.services.telegram_client import TelegramAPIError, get_telegram_client
+
+    client = get_telegram_client()
+    if client is None:
+        raise PermanentDeliveryError("TELEGRAM_BOT_TOKEN not set")
+    try:
+        await client.send_message(item.recipient, item.payload["text"], parse_mode=item.payload.get("parse_mode"))
+    except TelegramAPIError as e:
+        # 429 va 5xx client ichida qayta urinilgan; 400/403 (bloklangan, chat yo'q) takrorlanmaydi
+        if e.status_code is not None and 400 <= e.status_code < 500 and e.status_code != 429:
+            raise PermanentDeliveryError(str(e))
+        raise
+
+
+async def send_email(item: OutboxItem) -> None:
+    from app.services.email_service import EmailService
+
+    service = EmailService()
+    if not service.enabled:
+        raise PermanentDeliveryError("Email not enabled")
+    if not await service.send_email(item.recipient, item.payload["subject"], item.payload["body"], item.payload.get("html")):
+        raise RuntimeError("SMTP delivery failed")
+
+
+async def send_push(item: OutboxItem) -> None:
+    from app.database import SessionLocal
+    from app.services.fcm_client import PushMessage, get_fcm_client
+    from app.services.notification_service import NotificationService, prune_device_tokens
+
+    client = get_fcm_client()
+    if not NotificationService.fcm_configured() or client is None:
+        raise PermanentDeliveryError("FCM not enabled")
+    result = await client.send(PushMessage(
+        item.recipient, item.payload.get("title", ""), item.payload.get("body", ""), item.payload.get("data") or {}
+    ))
+    if result.invalid_token:
+        db = SessionLocal()
+        try:
+            await asyncio.to_thread(prune_device_tokens, db, [item.recipient])
+        finally:
+            db.close()
+        raise PermanentDeliveryError(result.error)
+    if not result.success:
+        raise RuntimeError(result.error)
+
+
+def default_senders() -> Dict[str, Sender]:
+    return {"telegram": send_telegram, "email": send_email, "push": send_push}
+
+
+class OutboxWorker:
+    """Bitta asyncio task: partiyani olish -> parallel yuborish -> natijani bitta commit bilan yozish"""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        senders: Optional[Dict[str, Sender]] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+        lease_seconds: Optional[int] = None,
+        retention_hours: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.senders = senders if senders is not None else default_senders()
+        self.batch_size = batch_size or settings.outbox_batch_size
+        self.concurrency = concurrency or settings.outbox_concurrency
+        self.poll_interval = poll_interval if poll_interval is not None else settings.outbox_poll_seconds
+        self.max_attempts = max_attempts or settings.outbox_max_attempts
+        self.backoff_base = backoff_base if backoff_base is not None else settings.outbox_backoff_base_seconds
+        self.backoff_max = backoff_max if backoff_max is not None else settings.outbox_backoff_max_seconds
+        self.lease_seconds = lease_seconds or settings.outbox_lease_seconds
+        self.retention_hours = retention_hours or settings.outbox_retention_hours
+        self._last_purge: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run_forever())
+        logger.info(f"Outbox worker started (batch={self.batch_size}, concurrency={self.concurrency})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        """Yangi xabar qo'shilgani haqida signal - poll intervalini kutmasdan yuborish"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run_forever(self):
+        while True:
+            self._wake.clear()
+            try:
+                processed = await self.run_once()
+                await self._maybe_purge()
+            except Exception as e:
+                logger.error(f"Outbox batch failed: {str(e)}", exc_info=True)
+                processed = 0
+            # To'liq partiya - navbatda yana xabar bo'lishi mumkin
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self) -> int:
+        """Bitta partiyani yetkazish; qayta ishlangan xabarlar soni"""
+        items = await asyncio.to_thread(self._claim)
+        if not items:
+            return 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(item: OutboxItem) -> Tuple[OutboxItem, Optional[str], bool]:
+            sender = self.senders.get(item.channel)
+            if sender is None:
+                return item, f"No sender for channel {item.channel}", True
+            async with semaphore:
+                try:
+                    await sender(item)
+                    return item, None, False
+                except PermanentDeliveryError as e:
+                    return item, str(e), True
+                except Exception as e:
+                    return item, str(e) or type(e).__name__, False
+
+        results = await asyncio.gather(*(deliver(item) for item in items))
+        await asyncio.to_thread(self._record, results)
+        return len(items)
+
+    def _claim(self) -> List[OutboxItem]:
+        """Muddati kelgan (yoki lease'i tugagan) xabarlarni ``sending`` holatiga o'tkazish"""
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(OutboxMessage)
+                .filter(or_(
+                    and_(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now),
+                    # Worker yuborish paytida to'xtagan bo'lsa
+                    and_(OutboxMessage.status == "sending",
+                         OutboxMessage.locked_at <= now - timedelta(seconds=self.lease_seconds)),
+                ))
+                .order_by(OutboxMessage.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            items = []
+            for row in rows:
+                expires_at = _naive_utc(row.expires_at)
+                if expires_at is not None and expires_at <= now:
+                    row.status = "failed"
+                    row.last_error = EXPIRED_ERROR
+                    row.locked_at = None
+                    row.payload = CLEARED_PAYLOAD
+                    continue
+                row.status = "sending"
+                row.locked_at = now
+                row.attempts = (row.attempts or 0) + 1
+                items.append(OutboxItem(
+                    id=row.id,
+                    channel=row.channel,
+                    recipient=row.recipient,
+                    payload=json.loads(row.payload),
+                    attempts=row.attempts,
+                    created_at=_naive_utc(row.created_at),
+                    expires_at=expires_at,
+                ))
+            db.commit()
+            return items
+        finally:
+            db.close()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _record(self, results: List[Tuple[OutboxItem, Optional[str], bool]]):
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            for item, error, permanent in results:
+                next_attempt_at = now + timedelta(seconds=self._backoff(item.attempts))
+                if error is None:
+                    values = {
+                        "status": "sent", "sent_at": now, "last_error": None, "locked_at": None,
+                        "payload": CLEARED_PAYLOAD,
+                    }
+                    if item.created_at is not None:
+                        values["delivery_ms"] = max(0.0, (now - item.created_at).total_seconds() * 1000)
+                elif permanent or item.attempts >= self.max_attempts:
+                    logger.warning(f"Outbox {item.channel} message {item.id} failed after {item.attempts} attempts: {error}")
+                    values = {"status": "failed", "last_error": error[:1000], "locked_at": None}
+                elif item.expires_at is not None and next_attempt_at >= item.expires_at:
+                    # Keyingi urinish muddatdan keyin bo'lardi
+                    values = {
+                        "status": "failed", "last_error": f"{EXPIRED_ERROR}: {error}"[:1000], "locked_at": None,
+                        "payload": CLEARED_PAYLOAD,
+                    }
+                else:
+                    values = {
+                        "status": "pending",
+                        "last_error": error[:1000],
+                        "locked_at": None,
+                        "next_attempt_at": next_attempt_at,
+                    }
+                db.query(OutboxMessage).filter(OutboxMessage.id == item.id).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _maybe_purge(self):
+        now = datetime.utcnow()
+        if self._last_purge and (now - self._last_purge).total_seconds() < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        removed = await asyncio.to_thread(self.purge, now - timedelta(hours=self.retention_hours))
+        if removed:
+            logger.info(f"Purged {removed} delivered or failed outbox messages")
+
+    def purge(self, before: datetime) -> int:
+        """``before`` dan oldin yakunlangan (yuborilgan yoki muvaffaqiyatsiz) xabarlarni o'chirish"""
+        db = self.session_factory()
+        try:
+            removed = db.query(OutboxMessage).filter(or_(
+                and_(OutboxMessage.status == "sent", OutboxMessage.sent_at < before),
+                # failed xabarda oxirgi urinish vaqti next_attempt_at'da
+                and_(OutboxMessage.status == "failed", OutboxMessage.next_attempt_at < before),
+            )).delete(synchronize_session=False)
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+
+_outbox_worker: Optional[OutboxWorker] = None
+
+
+def start_outbox_worker(session_factory: sessionmaker) -> OutboxWorker:
+    global _outbox_worker
+    if _outbox_worker is None:
+        _outbox_worker = OutboxWorker(session_factory)
+    if not _outbox_worker.running:
+        _outbox_worker.start()
+    return _outbox_worker
+
+
+def wake_outbox_worker():
+    """Endpoint'lar xabar qo'shgandan keyin chaqiradi; worker ishlamasa hech narsa qilmaydi"""
+    if _outbox_worker is not None:
+        _outbox_worker.wake()
+
+
+async def stop_outbox_worker():
+    if _outbox_worker is not None and _outbox_worker.running:
+        await _outbox_worker.stop()
@@ -0,0 +1,255 @@
+"""
+Chek skanerlash navbati - yuklangan cheklar fon rejimida qayta ishlanadi
+
+Endpoint faqat job yaratadi va darhol javob qaytaradi; OCR process pool'da,
+vision LLM esa async client orqali ishlaydi. Natija ``receipt_scan_jobs``
+jadvalida saqlanadi va mijoz uni so'rab (long-polling) oladi. Avval skan
+qilingan (yoki juda o'xshash) chek keshdan qaytariladi va dublikat deb belgilanadi.
+"""
+import json
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import sessionmaker
+from app.models import ReceiptScanJob
+from app.services import transaction_service
+from app.services.ai.receipt_scanner_service import ReceiptScannerService
+from app.services.ai.receipt_cache import (
+    CachedScan, ReceiptFingerprint, ReceiptScanCacheStore, fingerprint_receipt
+)
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ("queued", "processing")
+
+
+class ReceiptScanQueue:
+    """asyncio.Queue + cheklangan worker'lar; har bir job alohida session'da yakunlanadi"""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        scanner: Optional[ReceiptScannerService] = None,
+        workers: Optional[int] = None,
+        maxsize: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.scanner = scanner or ReceiptScannerService()
+        self.workers = workers or ai_config.receipt_scan_workers
+        self.maxsize = maxsize or ai_config.receipt_scan_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._done_events: Dict[str, asyncio.Event] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Receipt scan queue started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(
+        self,
+        user_id: str,
+        image_data: bytes,
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None
+    ) -> str:
+        """Job yaratish va navbatga qo'yish; navbat to'la bo'lsa asyncio.QueueFull"""
+        if self._queue is None:
+            raise RuntimeError("Receipt scan queue is not started")
+        if self._queue.full():
+            raise asyncio.QueueFull()
+
+        job_id = await asyncio.to_thread(self._create_job, user_id, filename, content_type)
+        self._done_events[job_id] = asyncio.Event()
+        try:
+            self._queue.put_nowait((job_id, user_id, image_data))
+        except asyncio.QueueFull:
+            # Job yaratilayotganda navbat to'lib qoldi - "queued" qator yetim qolmasin
+            self._done_events.pop(job_id, None)
+            await asyncio.to_thread(self._delete_job, job_id)
+            raise
+        return job_id
+
+    async def wait(self, job_id: str, timeout: float):
+        """Job tugashini ko'pi bilan ``timeout`` soniya kutish"""
+        event = self._done_events.get(job_id)
+        if event is None:
+            return
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def join(self):
+        """Navbatdagi barcha joblar tugashini kutish"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _worker(self):
+        while True:
+            job_id, user_id, image_data = await self._queue.get()
+            try:
+                await self._process(job_id, user_id, image_data)
+            except Exception as e:
+                logger.error(f"Receipt scan job {job_id} crashed: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+                event = self._done_events.pop(job_id, None)
+                if event:
+                    event.set()
+
+    async def _process(self, job_id: str, user_id: str, image_data: bytes):
+        await asyncio.to_thread(self._mark_processing, job_id)
+        try:
+            fingerprint = await asyncio.to_thread(fingerprint_receipt, image_data)
+            cached = await asyncio.to_thread(self._lookup_cache, user_id, fingerprint)
+            if cached:
+                logger.info(f"Receipt scan job {job_id} served from cache ({cached.match}, distance={cached.distance})")
+                extracted = cached.result
+            else:
+                extracted = await self.scanner.scan_receipt(image_data)
+            await asyncio.to_thread(self._complete_job, job_id, user_id, extracted, fingerprint, cached)
+        except Exception as e:
+            logger.warning(f"Receipt scan job {job_id} failed: {str(e)}")
+            await asyncio.to_thread(self._fail_job, job_id, str(e))
+
+    def _create_job(self, user_id: str, filename: Optional[str], content_type: Optional[str]) -> str:
+        db = self.session_factory()
+        try:
+            job = ReceiptScanJob(user_id=user_id, filename=filename, content_type=content_type, status="queued")
+            db.add(job)
+            db.commit()
+            return job.id
+        finally:
+            db.close()
+
+    def _delete_job(self, job_id: str):
+        db = self.session_factory()
+        try:
+            db.query(ReceiptScanJob).filter(ReceiptScanJob.id == job_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _mark_processing(self, job_id: str):
+        db = self.session_factory()
+        try:
+            db.query(ReceiptScanJob).filter(ReceiptScanJob.id == job_id).update(
+                {"status": "processing", "started_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _lookup_cache(self, user_id: str, fingerprint: ReceiptFingerprint) -> Optional[CachedScan]:
+        db = self.session_factory()
+        try:
+            cached = ReceiptScanCacheStore(db).lookup(user_id, fingerprint)
+            db.commit()  # hit_count
+            return cached
+        except Exception as e:
+            logger.warning(f"Receipt cache lookup failed: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    def _complete_job(
+        self,
+        job_id: str,
+        user_id: str,
+        extracted: Dict,
+        fingerprint: Optional[ReceiptFingerprint] = None,
+        cached: Optional[CachedScan] = None
+    ):
+        """Tranzaksiya yaratish (yoki aniq dublikatda mavjudini qaytarish) va jobni yakunlash"""
+        db = self.session_factory()
+        try:
+            result = dict(extracted)
+            transaction = None
+            if cached:
+                result["cache"] = {"match": cached.match, "distance": cached.distance}
+                existing = None
+                if cached.transaction_id:
+                    existing = transaction_service.get_transaction(db, cached.transaction_id, user_id)
+                if existing and cached.match == "exact":
+                    transaction = existing
+                    result["duplicate_of"] = existing.id
+                elif existing:
+                    result["possible_duplicate_of"] = existing.id
+
+            if transaction is None:
+                transaction = transaction_service.create_transaction(
+                    db, ReceiptScannerService.to_transaction(extracted), user_id
+                )
+
+            if fingerprint is not None:
+                try:
+                    ReceiptScanCacheStore(db).remember(user_id, fingerprint, extracted, cached, transaction.id)
+                except Exception as e:
+                    logger.warning(f"Receipt cache update failed: {str(e)}")
+
+            job = db.query(ReceiptScanJob).filter(ReceiptScanJob.id == job_id).first()
+            job.status = "completed"
+            job.result = json.dumps(result, ensure_ascii=False)
+            job.transaction_id = transaction.id
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+    def _fail_job(self, job_id: str, error: str):
+        db = self.session_factory()
+        try:
+            db.query(ReceiptScanJob).filter(ReceiptScanJob.id == job_id).update(
+                {"status": "failed", "error": error[:1000], "finished_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+def fail_interrupted_scan_jobs(session_factory: sessionmaker) -> int:
+    """Qayta ishga tushganda xotirada yo'qolgan (tugallanmagan) joblarni failed deb belgilash"""
+    db = session_factory()
+    try:
+        count = db.query(ReceiptScanJob).filter(ReceiptScanJob.status.in_(PENDING_STATUSES)).update(
+            {"status": "failed", "error": "Interrupted by server restart", "finished_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+        return count
+    finally:
+        db.close()
+
+
+_receipt_queue: Optional[ReceiptScanQueue] = None
+
+
+async def get_receipt_queue() -> ReceiptScanQueue:
+    """Jarayon bo'yicha yagona navbat (FastAPI dependency); birinchi chaqiruvda ishga tushadi"""
+    global _receipt_queue
+    if _receipt_queue is None:
+        from app.database import SessionLocal
+        _receipt_queue = ReceiptScanQueue(SessionLocal)
+    if not _receipt_queue.running:
+        _receipt_queue.start()
+    return _receipt_queue
+
+
+async def stop_receipt_queue():
+    if _receipt_queue is not None and _receipt_queue.running:
+        await _receipt_queue.stop()
@@ -0,0 +1,321 @@
+"""
+Reminder scheduler - vazifa va odat eslatmalarini vaqti kelganda yuborish
+
+Har bir foydalanuvchini so'rab chiqish o'rniga barcha foydalanuvchilar uchun
+yagona vaqt bo'yicha tartiblangan navbat ishlatiladi: ``(due_date, status)``
+indeksi orqali faqat yaqin ``lead + horizon`` oynasidagi vazifalar o'qiladi va
+xotiradagi heap'ga qo'yiladi (har bir eslatma O(log n)). Scheduler keyingi
+eslatma vaqti (yoki keyingi yangilanish) kelguncha uxlaydi, vaqti kelgan
+eslatmalarni partiyalab tekshiradi va ``send_push_batch`` orqali yuboradi.
+"""
+import heapq
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy import and_, exists
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.models import Habit, HabitCompletion, Task
+from app.services.notification_service import NotificationService, PushNotification
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("pending", "in_progress")
+
+Dispatcher = Callable[[List[PushNotification]], Awaitable[Dict[str, int]]]
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _parse_time(value: Optional[str]) -> Optional[time]:
+    if not value:
+        return None
+    hour, minute = value.split(":")
+    return time(int(hour), int(minute))
+
+
+@dataclass
+class Reminder:
+    """Navbatdagi eslatma: vazifa (``task``) yoki kunlik odatlar (``habits``)"""
+    kind: str
+    fire_at: datetime
+    ref: str  # task_id yoki sana (ISO)
+    due_date: Optional[datetime] = None
+
+    @property
+    def key(self) -> Tuple[str, str, Optional[datetime]]:
+        return self.kind, self.ref, self.due_date
+
+
+class ReminderScheduler:
+    """Bitta asyncio task: indeks bo'yicha oynani o'qish -> heap -> vaqti kelganda partiyalab yuborish"""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        dispatcher: Optional[Dispatcher] = None,
+        lead_minutes: Optional[int] = None,
+        horizon_minutes: Optional[int] = None,
+        refresh_seconds: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        habit_time: Optional[str] = None,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        self.session_factory = session_factory
+        self.dispatcher = dispatcher or self._send
+        self.lead = timedelta(minutes=lead_minutes if lead_minutes is not None else settings.reminder_lead_minutes)
+        self.horizon = timedelta(minutes=horizon_minutes or settings.reminder_horizon_minutes)
+        self.refresh_interval = timedelta(seconds=refresh_seconds or settings.reminder_refresh_seconds)
+        self.batch_size = batch_size or settings.reminder_batch_size
+        self.habit_time = _parse_time(habit_time if habit_time is not None else settings.habit_reminder_time_utc)
+        self.clock = clock
+        self.heap: List[Tuple[datetime, int, Reminder]] = []
+        self._seq = 0
+        self._scheduled: Set[Tuple] = set()
+        # Yuborilgan vazifa eslatmalari (due_date o'tguncha) - qayta skanerda takrorlanmasligi uchun
+        self._sent: Dict[Tuple, datetime] = {}
+        self._started_at: Optional[datetime] = None
+        self._next_refresh: Optional[datetime] = None
+        self._refresh_requested = False
+        self._habits_scheduled = False
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run_forever())
+        logger.info(f"Reminder scheduler started (lead={self.lead}, horizon={self.horizon}, batch={self.batch_size})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        """Vazifa yaratildi yoki muddati o'zgardi - oynani darhol qayta o'qish"""
+        self._refresh_requested = True
+        if self._wake is not None:
+            self._wake.set()
+
+    def schedule(self, reminder: Reminder) -> bool:
+        """Eslatmani heap'ga qo'shish (O(log n)); navbatda yoki yuborilgan bo'lsa False"""
+        if reminder.key in self._scheduled or reminder.key in self._sent:
+            return False
+        self._seq += 1
+        heapq.heappush(self.heap, (reminder.fire_at, self._seq, reminder))
+        self._scheduled.add(reminder.key)
+        return True
+
+    def next_fire_at(self) -> Optional[datetime]:
+        return self.heap[0][0] if self.heap else None
+
+    async def _run_forever(self):
+        while True:
+            self._wake.clear()
+            try:
+                wake_at = await self.tick()
+            except Exception as e:
+                logger.error(f"Reminder scheduler tick failed: {str(e)}", exc_info=True)
+                wake_at = None
+            # Keyingi eslatma yoki yangilanish vaqtigacha uxlash
+            delay = (wake_at - self.clock()).total_seconds() if wake_at else self.refresh_interval.total_seconds()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, delay))
+            except asyncio.TimeoutError:
+                pass
+
+    async def tick(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Kerak bo'lsa oynani yangilash va vaqti kelganlarini yuborish; keyingi uyg'onish vaqti"""
+        now = now or self.clock()
+        if self._started_at is None:
+            self._started_at = now
+        if self._refresh_requested or self._next_refresh is None or now >= self._next_refresh:
+            self._refresh_requested = False
+            reminders = await asyncio.to_thread(self._load_window, now)
+            scheduled = sum(self.schedule(reminder) for reminder in reminders)
+            if scheduled:
+                logger.debug(f"Scheduled {scheduled} task reminders")
+            self._next_refresh = now + self.refresh_interval
+        if self.habit_time is not None and not self._habits_scheduled:
+            self._schedule_habits(now)
+
+        while self.heap and self.heap[0][0] <= now:
+            await self._dispatch(self._pop_due(now), now)
+
+        next_fire = self.next_fire_at()
+        return min(next_fire, self._next_refresh) if next_fire else self._next_refresh
+
+    def _pop_due(self, now: datetime) -> List[Reminder]:
+        batch = []
+        while self.heap and self.heap[0][0] <= now and len(batch) < self.batch_size:
+            _, _, reminder = heapq.heappop(self.heap)
+            self._scheduled.discard(reminder.key)
+            batch.append(reminder)
+        return batch
+
+    def _schedule_habits(self, now: datetime):
+        fire_at = datetime.combine(now.date(), self.habit_time)
+        if fire_at <= now:
+            fire_at += timedelta(days=1)
+        self.schedule(Reminder("habits", fire_at, fire_at.date().isoformat()))
+        self._habits_scheduled = True
+
+    def _load_window(self, now: datetime) -> List[Reminder]:
+        """``[now, now + lead + horizon)`` oralig'ida muddati bor faol vazifalar (indeks bo'yicha)"""
+        for key, due_date in list(self._sent.items()):
+            if due_date < now:
+                del self._sent[key]
+        # Scheduler ishga tushishidan oldin o'tib ketgan va o'shandan beri o'zgarmagan eslatmalar
+        # oldingi jarayon tomonidan yuborilgan deb hisoblanadi
+        catch_up_from = self._started_at - self.refresh_interval
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(Task.id, Task.due_date, Task.updated_at)
+                .filter(
+                    Task.due_date >= now,
+                    Task.due_date < now + self.lead + self.horizon,
+                    Task.status.in_(ACTIVE_STATUSES),
+                )
+                .all()
+            )
+        finally:
+            db.close()
+        reminders = []
+        for task_id, due_date, updated_at in rows:
+            due_date = _naive_utc(due_date)
+            fire_at = due_date - self.lead
+            updated_at = _naive_utc(updated_at)
+            if fire_at < catch_up_from and (updated_at is None or updated_at < catch_up_from):
+                continue
+            # Eslatma vaqti o'tgan yangi vazifa - darhol eslatish
+            reminders.append(Reminder("task", max(fire_at, now), task_id, due_date))
+        return reminders
+
+    async def _dispatch(self, batch: List[Reminder], now: datetime):
+        tasks = [reminder for reminder in batch if reminder.kind == "task"]
+        if tasks:
+            notifications = await asyncio.to_thread(self._task_notifications, tasks)
+            await self._deliver(notifications)
+        for reminder in batch:
+            if reminder.kind == "habits":
+                await self._dispatch_habits(date.fromisoformat(reminder.ref))
+                self._habits_scheduled = False
+                self._schedule_habits(now)
+
+    def _task_notifications(self, reminders: List[Reminder]) -> List[PushNotification]:
+        """Partiyani bitta so'rov bilan qayta tekshirish: bajarilgan yoki muddati o'zgargan vazifalar tashlanadi"""
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(Task.id, Task.user_id, Task.title, Task.status, Task.due_date)
+                .filter(Task.id.in_([reminder.ref for reminder in reminders]))
+                .all()
+            )
+        finally:
+            db.close()
+        current = {row.id: row for row in rows}
+        notifications = []
+        for reminder in reminders:
+            task = current.get(reminder.ref)
+            if task is None or task.status not in ACTIVE_STATUSES or _naive_utc(task.due_date) != reminder.due_date:
+                continue
+            self._sent[reminder.key] = reminder.due_date
+            notifications.append(PushNotification(
+                user_id=task.user_id,
+                title="Vazifa eslatmasi",
+                body=task.title,
+                data={"type": "task_reminder", "task_id": task.id, "due_date": reminder.due_date.isoformat()},
+            ))
+        return notifications
+
+    async def _dispatch_habits(self, day: date):
+        """Bugun bajarilmagan faol odatlar - id bo'yicha sahifalab, har sahifa bitta partiya"""
+        after = ""
+        while True:
+            habits = await asyncio.to_thread(self._habits_page, day, after)
+            if not habits:
+                return
+            await self._deliver([
+                PushNotification(
+                    user_id=user_id,
+                    title="Odat eslatmasi",
+                    body=title,
+                    data={"type": "habit_reminder", "habit_id": habit_id},
+                )
+                for habit_id, user_id, title in habits
+            ])
+            if len(habits) < self.batch_size:
+                return
+            after = habits[-1][0]
+
+    def _habits_page(self, day: date, after: str) -> List[Tuple[str, str, str]]:
+        db = self.session_factory()
+        try:
+            completed = exists().where(and_(
+                HabitCompletion.habit_id == Habit.id,
+                HabitCompletion.completion_date == day,
+            ))
+            rows = (
+                db.query(Habit.id, Habit.user_id, Habit.title)
+                .filter(Habit.is_active == 1, Habit.id > after, ~completed)
+                .order_by(Habit.id)
+                .limit(self.batch_size)
+                .all()
+            )
+            return [tuple(row) for row in rows]
+        finally:
+            db.close()
+
+    async def _deliver(self, notifications: List[PushNotification]):
+        if not notifications:
+            return
+        try:
+            summary = await self.dispatcher(notifications)
+            logger.info(f"Sent {len(notifications)} reminders: {summary}")
+        except Exception as e:
+            logger.error(f"Reminder batch failed: {str(e)}", exc_info=True)
+
+    async def _send(self, notifications: List[PushNotification]) -> Dict[str, int]:
+        db = self.session_factory()
+        try:
+            return await NotificationService(db).send_push_batch(notifications)
+        finally:
+            db.close()
+
+
+_reminder_scheduler: Optional[ReminderScheduler] = None
+
+
+def start_reminder_scheduler(session_factory: sessionmaker) -> ReminderScheduler:
+    global _reminder_scheduler
+    if _reminder_scheduler is None:
+        _reminder_scheduler = ReminderScheduler(session_factory)
+    if not _reminder_scheduler.running:
+        _reminder_scheduler.start()
+    return _reminder_scheduler
+
+
+def wake_reminder_scheduler():
+    """Vazifa yaratilganda/o'zgarganda chaqiriladi; scheduler ishlamasa hech narsa qilmaydi"""
+    if _reminder_scheduler is not None:
+        _reminder_scheduler.wake()
+
+
+async def stop_reminder_scheduler():
+    if _reminder_scheduler is not None and _reminder_scheduler.running:
+        await _reminder_scheduler.stop()
@@ -0,0 +1,156 @@
+"""
+Cron uslubidagi scheduler - background vazifalarni jadval bo'yicha ishga tushirish
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Set
+from sqlalchemy.orm import sessionmaker
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_cron_field(field: str, minimum: int, maximum: int) -> Set[int]:
+    """Bitta cron maydonini qiymatlar to'plamiga aylantirish (*, */n, a-b, a-b/n, a,b)"""
+    values: Set[int] = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+            if step < 1:
+                raise ValueError(f"Invalid cron step: {field}")
+
+        if part == "*":
+            start, end = minimum, maximum
+        elif "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = int(part)
+            end = maximum if step > 1 else start
+
+        if start < minimum or end > maximum or start > end:
+            raise ValueError(f"Cron field out of range: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Standart 5 maydonli cron ifodasi: daqiqa soat kun oy hafta_kuni
+
+    Hafta kuni: 0 yoki 7 = yakshanba. Agar kun va hafta kuni ikkalasi ham
+    cheklangan bo'lsa, cron'dagi kabi ulardan biri mos kelishi yetarli.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        self.weekdays = {d % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+        self._day_restricted = fields[2] != "*"
+        self._weekday_restricted = fields[4] != "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_ok = dt.day in self.days
+        weekday_ok = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._day_restricted and self._weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, dt: datetime) -> datetime:
+        """``dt`` dan keyingi birinchi mos keladigan vaqt"""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+
+        while candidate <= limit:
+            if candidate.month not in self.months:
+                year = candidate.year + (candidate.month // 12)
+                month = candidate.month % 12 + 1
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    schedule: CronSchedule
+    func: Callable[[], object]
+
+
+class JobScheduler:
+    """Asyncio asosidagi scheduler: har bir vazifa o'z jadvali bo'yicha alohida thread'da ishlaydi"""
+
+    def __init__(self):
+        self.jobs: List[ScheduledJob] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, cron: str, func: Callable[[], object]):
+        self.jobs.append(ScheduledJob(name=name, schedule=CronSchedule(cron), func=func))
+
+    def start(self):
+        for job in self.jobs:
+            self._tasks.append(asyncio.create_task(self._run_forever(job)))
+            logger.info(f"Scheduled job {job.name} ({job.schedule.expression})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run_forever(self, job: ScheduledJob):
+        while True:
+            now = datetime.now()
+            next_run = job.schedule.next_after(now)
+            await asyncio.sleep((next_run - now).total_seconds())
+
+            logger.info(f"Running scheduled job: {job.name}")
+            try:
+                # Vazifalar sinxron (SQLAlchemy), event loop'ni bloklamaslik uchun thread'da
+                await asyncio.to_thread(job.func)
+            except Exception as e:
+                logger.error(f"Scheduled job {job.name} failed: {str(e)}", exc_info=True)
+
+
+def create_ai_scheduler(session_factory: sessionmaker, scheduler: Optional[JobScheduler] = None) -> JobScheduler:
+    """AITasks vazifalarini ai_config'dagi jadval bilan ro'yxatdan o'tkazish"""
+    from app.services.background.ai_tasks import AITasks
+
+    scheduler = scheduler or JobScheduler()
+    scheduler.add_job(
+        "daily_insights",
+        ai_config.insights_job_cron,
+        lambda: AITasks.run_daily_insights_job(session_factory),
+    )
+    scheduler.add_job(
+        "anomaly_check",
+        ai_config.anomalies_job_cron,
+        lambda: AITasks.run_anomaly_check_job(session_factory),
+    )
+    scheduler.add_job(
+        "anomaly_models",
+        ai_config.anomaly_models_job_cron,
+        lambda: AITasks.run_anomaly_model_refresh_job(session_factory),
+    )
+    return scheduler
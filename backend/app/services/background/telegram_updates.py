@@ -0,0 +1,255 @@
+"""
+Telegram update'lari navbati - webhook faqat update'ni saqlaydi, bu consumer qayta ishlaydi
+
+``update_id`` primary key bo'lgani uchun Telegram qayta yuborgan update ikki marta
+yozilmaydi. Bitta chat update'lari ``update_id`` tartibida ketma-ket, turli chatlar
+esa parallel qayta ishlanadi. Handler o'zgarishlari va javob xabarlari (outbox)
+update holati bilan bitta tranzaksiyada commit qilinadi.
+"""
+import json
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import settings
+from app.models import TelegramUpdate
+from app.services.telegram_service import handle_update, update_chat_id
+from app.services.background.outbox import wake_outbox_worker
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300
+PURGE_INTERVAL_SECONDS = 3600
+
+Handler = Callable[[Session, dict], None]
+
+
+def store_update(db: Session, update: dict) -> bool:
+    """Update'ni navbatga yozish; dublikat ``update_id`` bo'lsa False"""
+    db.add(TelegramUpdate(
+        update_id=int(update["update_id"]),
+        chat_id=update_chat_id(update),
+        payload=json.dumps(update, ensure_ascii=False),
+        status="pending",
+        attempts=0,
+    ))
+    try:
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+class TelegramUpdateConsumer:
+    """Partiya -> chat bo'yicha guruhlash -> har bir chat ketma-ket, chatlar parallel"""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        handler: Handler = handle_update,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retention_hours: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.handler = handler
+        self.batch_size = batch_size or settings.telegram_update_batch_size
+        self.concurrency = concurrency or settings.telegram_update_concurrency
+        self.poll_interval = poll_interval if poll_interval is not None else settings.telegram_update_poll_seconds
+        self.max_attempts = max_attempts or settings.telegram_update_max_attempts
+        self.retention_hours = retention_hours or settings.telegram_update_retention_hours
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._last_purge: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run_forever())
+        logger.info(f"Telegram update consumer started (batch={self.batch_size}, concurrency={self.concurrency})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run_forever(self):
+        while True:
+            self._wake.clear()
+            try:
+                processed = await self.run_once()
+                await self._maybe_purge()
+            except Exception as e:
+                logger.error(f"Telegram update batch failed: {str(e)}", exc_info=True)
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def run_once(self) -> int:
+        """Bitta partiyani qayta ishlash; olingan update'lar soni"""
+        claimed = await asyncio.to_thread(self._claim)
+        if not claimed:
+            return 0
+
+        chats: "OrderedDict[str, List[Tuple[int, dict]]]" = OrderedDict()
+        for update_id, chat_id, update in claimed:
+            # Chatga tegishli bo'lmagan update'lar bir-birini kutmaydi
+            chats.setdefault(chat_id or f"update:{update_id}", []).append((update_id, update))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def process_chat(updates: List[Tuple[int, dict]]):
+            async with semaphore:
+                for index, (update_id, update) in enumerate(updates):
+                    if not await asyncio.to_thread(self._process, update_id, update):
+                        # Tartib buzilmasligi uchun chatning qolgan update'lari keyingi partiyaga qoladi
+                        await asyncio.to_thread(self._release, [u for u, _ in updates[index + 1:]])
+                        return
+
+        await asyncio.gather(*(process_chat(updates) for updates in chats.values()))
+        wake_outbox_worker()
+        return len(claimed)
+
+    def _claim(self) -> List[Tuple[int, Optional[str], dict]]:
+        """Kutilayotgan update'larni olish; boshqa jarayonda ishlanayotgan chatlar o'tkazib yuboriladi"""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=LEASE_SECONDS)
+        db = self.session_factory()
+        try:
+            busy_chats = (
+                db.query(TelegramUpdate.chat_id)
+                .filter(
+                    TelegramUpdate.status == "processing",
+                    TelegramUpdate.locked_at > stale,
+                    TelegramUpdate.chat_id.isnot(None),
+                )
+            )
+            rows = (
+                db.query(TelegramUpdate)
+                .filter(or_(
+                    TelegramUpdate.status == "pending",
+                    and_(TelegramUpdate.status == "processing", TelegramUpdate.locked_at <= stale),
+                ))
+                .filter(or_(TelegramUpdate.chat_id.is_(None), TelegramUpdate.chat_id.notin_(busy_chats)))
+                .order_by(TelegramUpdate.update_id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            claimed = []
+            for row in rows:
+                row.status = "processing"
+                row.locked_at = now
+                claimed.append((row.update_id, row.chat_id, json.loads(row.payload)))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _process(self, update_id: int, update: dict) -> bool:
+        """Handler va ``done`` holati bitta commit'da; xato bo'lsa qayta urinish yoki ``failed``
+
+        True - chatning keyingi update'iga o'tish mumkin
+        """
+        db = self.session_factory()
+        try:
+            try:
+                self.handler(db, update)
+                db.query(TelegramUpdate).filter(TelegramUpdate.update_id == update_id).update(
+                    {"status": "done", "error": None, "locked_at": None, "processed_at": datetime.utcnow(),
+                     "attempts": TelegramUpdate.attempts + 1},
+                    synchronize_session=False
+                )
+                db.commit()
+                return True
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Telegram update {update_id} failed: {str(e)}")
+                row = db.query(TelegramUpdate).filter(TelegramUpdate.update_id == update_id).first()
+                row.attempts = (row.attempts or 0) + 1
+                row.error = str(e)[:1000]
+                row.locked_at = None
+                if row.attempts >= self.max_attempts:
+                    row.status = "failed"
+                    row.processed_at = datetime.utcnow()
+                else:
+                    row.status = "pending"
+                db.commit()
+                # Yakuniy xato chatni bloklamaydi
+                return row.status == "failed"
+        finally:
+            db.close()
+
+    def _release(self, update_ids: List[int]):
+        if not update_ids:
+            return
+        db = self.session_factory()
+        try:
+            db.query(TelegramUpdate).filter(TelegramUpdate.update_id.in_(update_ids)).update(
+                {"status": "pending", "locked_at": None}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _maybe_purge(self):
+        now = datetime.utcnow()
+        if self._last_purge and (now - self._last_purge).total_seconds() < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        removed = await asyncio.to_thread(self.purge, now - timedelta(hours=self.retention_hours))
+        if removed:
+            logger.info(f"Purged {removed} processed Telegram updates")
+
+    def purge(self, before: datetime) -> int:
+        """Telegram qayta yubormaydigan darajada eski, qayta ishlangan update'larni o'chirish"""
+        db = self.session_factory()
+        try:
+            removed = db.query(TelegramUpdate).filter(
+                TelegramUpdate.status.in_(("done", "failed")),
+                TelegramUpdate.processed_at < before,
+            ).delete(synchronize_session=False)
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+
+_update_consumer: Optional[TelegramUpdateConsumer] = None
+
+
+def start_update_consumer(session_factory: sessionmaker) -> TelegramUpdateConsumer:
+    global _update_consumer
+    if _update_consumer is None:
+        _update_consumer = TelegramUpdateConsumer(session_factory)
+    if not _update_consumer.running:
+        _update_consumer.start()
+    return _update_consumer
+
+
+def wake_update_consumer():
+    if _update_consumer is not None:
+        _update_consumer.wake()
+
+
+async def stop_update_consumer():
+    if _update_consumer is not None and _update_consumer.running:
+        await _update_consumer.stop()
@@ -95,8 +95,8 @@ def get_budget_status(
     start_date = budget.start_date
     end_date = budget.end_date or today
     
-    # Get transactions for this category in the date range
-    transactions = db.query(Transaction).filter(
+    # Calculate spent amount for this category in the date range
+    spent_amount = float(db.query(func.sum(func.abs(Transaction.amount))).filter(
         and_(
             Transaction.user_id == user_id,
             Transaction.category == budget.category,
@@ -104,10 +104,7 @@ def get_budget_status(
             Transaction.transaction_date >= start_date,
             Transaction.transaction_date <= end_date,
         )
-    ).all()
-    
-    # Calculate spent amount
-    spent_amount = sum(abs(t.amount) for t in transactions)
+    ).scalar() or 0)
     
     # Calculate percentage and remaining
     percentage_used = (spent_amount / budget.amount * 100) if budget.amount > 0 else 0
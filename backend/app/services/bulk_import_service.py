@@ -0,0 +1,382 @@
+"""
+Bulk import engine
+
+Incoming records are validated against an ``ImportSpec``, processed in chunks and
+written with one ``INSERT ... ON CONFLICT DO UPDATE`` executemany per chunk
+(PostgreSQL and SQLite). Existing keys are prefetched once per chunk to count
+created vs updated rows and to keep ids owned by other accounts from being
+touched. A chunk that fails in the database is retried row by row inside
+savepoints, so one bad row is reported instead of aborting the import.
+
+Raw upserts bypass ``transaction_service``, so derived transaction state is
+refreshed here: ``anomaly_score`` is cleared on every written row (rescored
+lazily by anomaly detection) and the user's expense statistics are rebuilt
+once when the import finishes.
+"""
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from app.models import Task, Habit, Transaction, Budget, ProductivityLog
+from app.services.ai.expense_stats_service import ExpenseStatsService
+from app.services.ai.insights_store import invalidate_insights
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def _integer(value) -> int:
+    if isinstance(value, str):
+        value = value.strip()
+    return int(float(value)) if isinstance(value, str) and "." in value else int(value)
+
+
+def _number(value) -> float:
+    if isinstance(value, str):
+        value = value.replace(" ", "").replace(",", ".")
+    return float(value)
+
+
+def _flag(value) -> int:
+    if isinstance(value, str):
+        return 1 if value.strip().lower() in ("1", "true", "yes", "ha") else 0
+    return 1 if value else 0
+
+
+def _date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip()[:10])
+
+
+def _datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    return datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    """How records of one section map onto a model"""
+    model: Any
+    fields: Dict[str, Callable]
+    required: Tuple[str, ...] = ()
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    choices: Dict[str, frozenset] = field(default_factory=dict)
+    # Columns of the unique key used for ON CONFLICT; anything but ("id",) gets fresh ids
+    conflict: Tuple[str, ...] = ("id",)
+    # Derived columns set to NULL on every written row so they get recomputed
+    reset: Tuple[str, ...] = ()
+
+
+IMPORT_SPECS: Dict[str, ImportSpec] = {
+    "tasks": ImportSpec(
+        model=Task,
+        fields={
+            "title": _text, "description": _text, "category": _text, "priority": _text, "status": _text,
+            "is_focus": _flag, "due_date": _datetime, "start_time": _text, "end_time": _text,
+            "color": _text, "completed_at": _datetime, "created_at": _datetime,
+        },
+        required=("title",),
+        defaults={"category": "Ish", "priority": "medium", "status": "pending", "is_focus": 0, "color": "indigo"},
+        choices={
+            "priority": frozenset({"low", "medium", "high"}),
+            "status": frozenset({"pending", "in_progress", "done", "cancelled"}),
+        },
+    ),
+    "habits": ImportSpec(
+        model=Habit,
+        fields={
+            "title": _text, "description": _text, "goal": _text, "category": _text, "icon": _text,
+            "color": _text, "bg_color": _text, "current_streak": _integer, "longest_streak": _integer,
+            "total_completions": _integer, "is_active": _flag, "created_at": _datetime,
+        },
+        required=("title",),
+        defaults={
+            "goal": "Har kuni", "icon": "Zap", "color": "text-purple-500", "bg_color": "bg-purple-100",
+            "current_streak": 0, "longest_streak": 0, "total_completions": 0, "is_active": 1,
+        },
+    ),
+    "transactions": ImportSpec(
+        model=Transaction,
+        fields={
+            "title": _text, "description": _text, "category": _text, "amount": _number,
+            "transaction_type": _text, "transaction_date": _date, "icon": _text, "color": _text,
+            "receipt_url": _text, "created_at": _datetime,
+        },
+        required=("title", "category", "amount", "transaction_type", "transaction_date"),
+        defaults={"icon": "CreditCard", "color": "bg-slate-100 text-slate-600"},
+        choices={"transaction_type": frozenset({"income", "expense"})},
+        reset=("anomaly_score",),
+    ),
+    "budgets": ImportSpec(
+        model=Budget,
+        fields={
+            "category": _text, "amount": _number, "period": _text, "start_date": _date,
+            "end_date": _date, "is_active": _flag, "created_at": _datetime,
+        },
+        required=("category", "amount", "period", "start_date"),
+        defaults={"is_active": 1},
+        choices={"period": frozenset({"daily", "weekly", "monthly", "yearly"})},
+    ),
+    "productivity_logs": ImportSpec(
+        model=ProductivityLog,
+        fields={
+            "log_date": _date, "tasks_completed": _integer, "tasks_total": _integer,
+            "habits_completed": _integer, "habits_total": _integer, "focus_time_minutes": _integer,
+            "energy_level": _integer, "mood": _text, "notes": _text,
+        },
+        required=("log_date",),
+        defaults={
+            "tasks_completed": 0, "tasks_total": 0, "habits_completed": 0, "habits_total": 0,
+            "focus_time_minutes": 0, "energy_level": 5,
+        },
+        choices={"mood": frozenset({"great", "good", "ok", "bad", "terrible"})},
+        conflict=("user_id", "log_date"),
+    ),
+}
+
+
+class RowError(ValueError):
+    """A record that cannot be imported"""
+
+
+def chunked(records: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class BulkImportService:
+    """Validate and upsert records in chunks"""
+
+    def __init__(self, db: Session, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        # Users whose transactions were written since the last stats rebuild
+        self._stale_stats = set()
+        # Users with any imported rows; their insight snapshots cover the old history
+        self._stale_insights = set()
+
+    def upsert(self, section: str, user_id: str, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Import all records of a section; rows are committed chunk by chunk"""
+        report = self.new_report()
+        offset = 0
+        try:
+            for chunk in chunked(records, self.chunk_size):
+                self.upsert_chunk(section, user_id, chunk, report, offset)
+                offset += len(chunk)
+        finally:
+            self.refresh_stats()
+        return report
+
+    def upsert_stream(self, user_id: str, items: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Import interleaved ``(section, record)`` pairs, buffering at most one chunk per section
+
+        Chunks are committed as they fill up, so an exception raised by ``items``
+        (e.g. a parse error halfway through an upload) leaves earlier chunks imported.
+        """
+        reports: Dict[str, Dict[str, Any]] = {}
+        buffers: Dict[str, List[Dict[str, Any]]] = {}
+        offsets: Dict[str, int] = {}
+        try:
+            for section, record in items:
+                if section not in reports:
+                    reports[section] = self.new_report()
+                    buffers[section] = []
+                    offsets[section] = 0
+                buffer = buffers[section]
+                buffer.append(record)
+                if len(buffer) >= self.chunk_size:
+                    self.upsert_chunk(section, user_id, buffer, reports[section], offsets[section])
+                    offsets[section] += len(buffer)
+                    buffers[section] = []
+            for section, buffer in buffers.items():
+                if buffer:
+                    self.upsert_chunk(section, user_id, buffer, reports[section], offsets[section])
+        finally:
+            # Committed chunks count even if the upload fails halfway
+            self.refresh_stats()
+        return reports
+
+    def refresh_stats(self) -> None:
+        """Rebuild expense statistics and drop insight snapshots of users whose data was imported"""
+        while self._stale_insights:
+            user_id = self._stale_insights.pop()
+            try:
+                invalidate_insights(self.db, user_id)
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Insights invalidation after import failed for {user_id}: {str(e)}")
+        while self._stale_stats:
+            user_id = self._stale_stats.pop()
+            try:
+                ExpenseStatsService(self.db).rebuild(user_id)
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Expense stats rebuild after import failed for {user_id}: {str(e)}")
+
+    @staticmethod
+    def new_report() -> Dict[str, Any]:
+        return {"imported": 0, "created": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def upsert_chunk(
+        self,
+        section: str,
+        user_id: str,
+        records: List[Dict[str, Any]],
+        report: Dict[str, Any],
+        offset: int = 0,
+    ) -> None:
+        """Validate, prefetch, upsert and commit one chunk, accumulating into ``report``"""
+        spec = IMPORT_SPECS[section]
+        groups: Dict[frozenset, Dict[Any, Tuple[int, Dict[str, Any]]]] = {}
+        for index, record in enumerate(records, start=offset + 1):
+            try:
+                row = self._validate(spec, user_id, record)
+            except (RowError, ValueError, TypeError) as e:
+                self._fail(report, index, record, e)
+                continue
+            # Rows with the same set of columns share one statement; a repeated key keeps the last row
+            key = tuple(row[column] for column in spec.conflict)
+            if key == (None,):
+                key = ("new", index)
+            present = (frozenset(record) & set(spec.fields)) | frozenset(spec.reset)
+            groups.setdefault(present, {})[key] = (index, row)
+
+        for present, rows in groups.items():
+            self._assign_ids(spec, user_id, rows)
+            try:
+                with self.db.begin_nested():
+                    self._execute(spec, present, [row for _, row in rows.values()])
+                self._count(report, rows.values())
+            except Exception as e:
+                logger.warning(f"Bulk {section} upsert failed, retrying row by row: {str(e)}")
+                self._execute_rows(spec, present, list(rows.values()), report)
+        self.db.commit()
+        if report["imported"]:
+            self._stale_insights.add(user_id)
+            if spec.model is Transaction:
+                self._stale_stats.add(user_id)
+
+    def _validate(self, spec: ImportSpec, user_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(record, dict):
+            raise RowError("record must be an object")
+        row = dict(spec.defaults)
+        for column, convert in spec.fields.items():
+            if column not in record:
+                continue
+            value = record[column]
+            row[column] = spec.defaults.get(column) if value is None or value == "" else convert(value)
+        for column in spec.required:
+            if row.get(column) is None:
+                raise RowError(f"'{column}' is required")
+        for column, allowed in spec.choices.items():
+            if row.get(column) is not None and row[column] not in allowed:
+                raise RowError(f"'{column}' must be one of {', '.join(sorted(allowed))}")
+        for column in spec.reset:
+            row[column] = None
+        row["user_id"] = user_id
+        row["id"] = _text(record.get("id")) if spec.conflict == ("id",) else None
+        return row
+
+    def _assign_ids(self, spec: ImportSpec, user_id: str, rows: Dict[Any, Tuple[int, Dict[str, Any]]]) -> None:
+        """Prefetch existing keys; new rows and ids owned by another account get fresh UUIDs"""
+        model = spec.model
+        if spec.conflict == ("id",):
+            ids = [row["id"] for _, row in rows.values() if row["id"]]
+            owners = dict(
+                self.db.query(model.id, model.user_id).filter(model.id.in_(ids)).all()
+            ) if ids else {}
+            for _, row in rows.values():
+                owner = owners.get(row["id"]) if row["id"] else None
+                row["_exists"] = owner == user_id
+                if not row["id"] or (owner is not None and owner != user_id):
+                    row["id"] = str(uuid.uuid4())
+            return
+
+        key_columns = [getattr(model, column) for column in spec.conflict]
+        keys = list(rows)
+        existing = set(
+            tuple(found) for found in self.db.query(*key_columns).filter(tuple_(*key_columns).in_(keys)).all()
+        ) if keys else set()
+        for key, (_, row) in rows.items():
+            row["_exists"] = key in existing
+            row["id"] = str(uuid.uuid4())
+
+    def _statement(self, spec: ImportSpec, present: frozenset):
+        table = spec.model.__table__
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+
+        statement = insert(table)
+        # Only columns the file actually provided are overwritten on conflict
+        updates = {column: statement.excluded[column] for column in present if column not in spec.conflict}
+        updates["updated_at"] = func.now()
+        return statement.on_conflict_do_update(
+            index_elements=list(spec.conflict),
+            set_=updates,
+            where=(table.c.user_id == statement.excluded.user_id),
+        )
+
+    def _execute(self, spec: ImportSpec, present: frozenset, rows: List[Dict[str, Any]]) -> None:
+        values = [{k: v for k, v in row.items() if not k.startswith("_")} for row in rows]
+        statement = self._statement(spec, present)
+        if statement is not None:
+            self.db.execute(statement, values)
+            return
+        # Other dialects: split on the prefetched existence flag
+        inserts = [value for value, row in zip(values, rows) if not row["_exists"]]
+        updates = [value for value, row in zip(values, rows) if row["_exists"]]
+        if inserts:
+            self.db.bulk_insert_mappings(spec.model, inserts)
+        if updates:
+            self.db.bulk_update_mappings(spec.model, updates)
+
+    def _execute_rows(self, spec: ImportSpec, present: frozenset, rows, report: Dict[str, Any]) -> None:
+        for index, row in rows:
+            try:
+                with self.db.begin_nested():
+                    self._execute(spec, present, [row])
+                self._count(report, [(index, row)])
+            except Exception as e:
+                self._fail(report, index, row, e)
+
+    @staticmethod
+    def _count(report: Dict[str, Any], rows) -> None:
+        for _, row in rows:
+            report["updated" if row["_exists"] else "created"] += 1
+            report["imported"] += 1
+
+    @staticmethod
+    def _fail(report: Dict[str, Any], index: int, record, error: Exception) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            label = record.get("title") or record.get("id") if isinstance(record, dict) else None
+            report["errors"].append(f"Row {index}{f' ({label})' if label else ''}: {str(error).splitlines()[0]}")
@@ -0,0 +1,230 @@
+"""
+Verification code storage and OTP rate limiting
+
+``MemoryCodeStore`` (default) keeps codes in a process-local TTL map so OTP
+traffic never touches the main database; ``DatabaseCodeStore`` persists them in
+``telegram_codes`` when codes must survive restarts or be shared between
+workers. Both check and count attempts atomically and make a code single-use.
+``SlidingWindowLimiter`` enforces per-phone and per-IP send/verify limits.
+"""
+import hmac
+import heapq
+import time
+import threading
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.models.telegram_code import TelegramCode
+
+logger = logging.getLogger(__name__)
+
+Clock = Callable[[], float]
+
+
+class VerifyResult(str, Enum):
+    VALID = "valid"
+    INVALID = "invalid"
+    MISSING = "missing"  # never issued, already used or expired
+    EXHAUSTED = "exhausted"  # too many attempts; the code is discarded
+
+
+class TTLMap:
+    """Dict whose entries expire; a heap of expiry times evicts them in order"""
+
+    def __init__(self):
+        self.items: Dict[str, Tuple[float, Any]] = {}
+        self.heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, key: str, now: float) -> Any:
+        item = self.items.get(key)
+        if item is None or item[0] <= now:
+            return None
+        return item[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        self.items[key] = (expires_at, value)
+        heapq.heappush(self.heap, (expires_at, key))
+
+    def pop(self, key: str) -> Any:
+        item = self.items.pop(key, None)
+        return item[1] if item else None
+
+    def evict(self, now: float) -> int:
+        removed = 0
+        while self.heap and self.heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self.heap)
+            item = self.items.get(key)
+            # Heap entries of re-set or popped keys are stale
+            if item is not None and item[0] == expires_at:
+                del self.items[key]
+                removed += 1
+        # Re-set keys leave stale heap entries behind; rebuild before they dominate
+        if len(self.heap) > 2 * len(self.items) + 64:
+            self.heap = [(expires_at, key) for key, (expires_at, _) in self.items.items()]
+            heapq.heapify(self.heap)
+        return removed
+
+
+class SlidingWindowLimiter:
+    """Sliding-window log per key; a hit is recorded only when every rule allows it"""
+
+    def __init__(self, clock: Clock = time.monotonic):
+        self.clock = clock
+        self.windows = TTLMap()
+        self.lock = threading.Lock()
+
+    def hit(self, *rules: Tuple[str, int, float]) -> bool:
+        """``rules`` are ``(key, limit, window_seconds)``; False if any key is over its limit"""
+        with self.lock:
+            now = self.clock()
+            self.windows.evict(now)
+            logs = []
+            for key, limit, window in rules:
+                log = self.windows.get(key, now) or deque()
+                while log and log[0] <= now - window:
+                    log.popleft()
+                if len(log) >= limit:
+                    return False
+                logs.append((key, log, window))
+            for key, log, window in logs:
+                log.append(now)
+                self.windows.set(key, log, now + window)
+            return True
+
+
+class CodeStore:
+    """Interface of verification code backends"""
+
+    def issue(self, phone_number: str, code: str, ttl_seconds: float) -> None:
+        """Store a new code for the phone number, replacing any previous one"""
+        raise NotImplementedError
+
+    def verify(self, phone_number: str, code: str, max_attempts: int) -> VerifyResult:
+        """Count an attempt and consume the code if it matches"""
+        raise NotImplementedError
+
+
+@dataclass
+class _Entry:
+    code: str
+    attempts: int = 0
+
+
+class MemoryCodeStore(CodeStore):
+    """Process-local codes; all operations run under one lock"""
+
+    def __init__(self, clock: Clock = time.monotonic):
+        self.clock = clock
+        self.codes = TTLMap()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def issue(self, phone_number: str, code: str, ttl_seconds: float) -> None:
+        with self.lock:
+            now = self.clock()
+            self.codes.evict(now)
+            self.codes.set(phone_number, _Entry(code), now + ttl_seconds)
+
+    def verify(self, phone_number: str, code: str, max_attempts: int) -> VerifyResult:
+        with self.lock:
+            now = self.clock()
+            self.codes.evict(now)
+            entry = self.codes.get(phone_number, now)
+            if entry is None:
+                return VerifyResult.MISSING
+            entry.attempts += 1
+            if hmac.compare_digest(entry.code.encode(), code.encode()):
+                self.codes.pop(phone_number)
+                return VerifyResult.VALID
+            if entry.attempts >= max_attempts:
+                self.codes.pop(phone_number)
+                return VerifyResult.EXHAUSTED
+            return VerifyResult.INVALID
+
+
+class DatabaseCodeStore(CodeStore):
+    """Codes in ``telegram_codes``; conditional UPDATE/DELETE keep attempts and use atomic"""
+
+    def __init__(self, session_factory: sessionmaker):
+        self.session_factory = session_factory
+
+    def issue(self, phone_number: str, code: str, ttl_seconds: float) -> None:
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            db.query(TelegramCode).filter(TelegramCode.expires_at <= now).delete(synchronize_session=False)
+            db.merge(TelegramCode(
+                phone_number=phone_number,
+                code=code,
+                expires_at=now + timedelta(seconds=ttl_seconds),
+                attempts=0,
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def verify(self, phone_number: str, code: str, max_attempts: int) -> VerifyResult:
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            by_phone = db.query(TelegramCode).filter(TelegramCode.phone_number == phone_number)
+            # Only one of concurrent requests can take the last attempt
+            counted = by_phone.filter(
+                TelegramCode.attempts < max_attempts,
+                TelegramCode.expires_at > now,
+            ).update({"attempts": TelegramCode.attempts + 1}, synchronize_session=False)
+            if not counted:
+                # Expired or out of attempts
+                stored = by_phone.first()
+                exhausted = stored is not None and stored.attempts >= max_attempts
+                by_phone.delete(synchronize_session=False)
+                db.commit()
+                return VerifyResult.EXHAUSTED if exhausted else VerifyResult.MISSING
+
+            stored = by_phone.first()
+            if stored is not None and hmac.compare_digest(stored.code.encode(), code.encode()):
+                # Only one of concurrent requests with the right code consumes it
+                consumed = by_phone.filter(TelegramCode.code == code).delete(synchronize_session=False)
+                db.commit()
+                return VerifyResult.VALID if consumed else VerifyResult.MISSING
+            if stored is not None and stored.attempts >= max_attempts:
+                by_phone.delete(synchronize_session=False)
+                db.commit()
+                return VerifyResult.EXHAUSTED
+            db.commit()
+            return VerifyResult.INVALID
+        finally:
+            db.close()
+
+
+_code_store: Optional[CodeStore] = None
+_limiter: Optional[SlidingWindowLimiter] = None
+
+
+def get_code_store() -> CodeStore:
+    """Process-wide store selected by TELEGRAM_CODE_STORE (memory | database)"""
+    global _code_store
+    if _code_store is None:
+        if settings.telegram_code_store == "database":
+            from app.database import SessionLocal
+            _code_store = DatabaseCodeStore(SessionLocal)
+        else:
+            _code_store = MemoryCodeStore()
+    return _code_store
+
+
+def get_rate_limiter() -> SlidingWindowLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = SlidingWindowLimiter()
+    return _limiter
@@ -1,13 +1,182 @@
 """
 Export/Import Service
+
+Exports select plain column tuples through ``yield_per`` (a server-side cursor on
+PostgreSQL), so rows are never loaded as ORM objects or held all at once, and the
+JSON document is written incrementally for ``StreamingResponse``.
 """
 import json
 import csv
 import io
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import zlib
+import tempfile
+import zipfile
+from typing import Dict, List, Any, BinaryIO, Iterable, Iterator, Optional, Tuple
+from datetime import date, datetime
 from sqlalchemy.orm import Session
 from app.models import Task, Habit, Transaction, Budget
+from app.services.bulk_import_service import BulkImportService, chunked
+from app.services.json_stream import open_upload, iter_sections, iter_ndjson
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+EXPORT_CHUNK_SIZE = 1000
+STREAM_BUFFER_BYTES = 64 * 1024
+
+# Exported columns per section, in output order
+EXPORT_SPECS: Dict[str, Tuple[Any, List[str]]] = {
+    "tasks": (Task, [
+        "id", "title", "description", "category", "priority", "status", "is_focus", "due_date",
+        "start_time", "end_time", "color", "completed_at", "created_at", "updated_at",
+    ]),
+    "habits": (Habit, [
+        "id", "title", "description", "goal", "category", "icon", "color", "bg_color",
+        "current_streak", "longest_streak", "total_completions", "is_active", "created_at", "updated_at",
+    ]),
+    "transactions": (Transaction, [
+        "id", "title", "description", "category", "amount", "transaction_type", "transaction_date",
+        "icon", "color", "receipt_url", "created_at", "updated_at",
+    ]),
+    "budgets": (Budget, [
+        "id", "category", "amount", "period", "start_date", "end_date", "is_active", "created_at", "updated_at",
+    ]),
+}
+
+# Integer 0/1 flags exported as JSON booleans
+BOOLEAN_COLUMNS = {"is_focus", "is_active"}
+
+# Leading characters spreadsheet apps evaluate as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@")
+
+# Document layouts: key -> section name or nested layout
+EXPORT_LAYOUTS: Dict[str, Dict[str, Any]] = {
+    "tasks": {"tasks": "tasks"},
+    "habits": {"habits": "habits"},
+    "finance": {"transactions": "transactions", "budgets": "budgets"},
+    "all": {
+        "tasks": "tasks",
+        "habits": "habits",
+        "finance": {"transactions": "transactions", "budgets": "budgets"},
+    },
+}
+
+
+# format -> (media type, file extension); single-table formats are zipped for multi-section layouts
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "json": ("application/json", "json"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+TABLE_FORMATS = {"csv", "parquet"}
+
+
+def export_file_type(layout: str, format: str) -> Tuple[str, str]:
+    """Media type and file extension of an export"""
+    if format in TABLE_FORMATS and len(layout_sections(layout)) > 1:
+        return "application/zip", "zip"
+    return EXPORT_FORMATS[format]
+
+
+def layout_sections(layout: str) -> List[str]:
+    """Section names contained in a document layout"""
+    sections = []
+    for value in EXPORT_LAYOUTS[layout].values():
+        sections.extend(value.values() if isinstance(value, dict) else [value])
+    return sections
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def escape_cell(value):
+    """Quote text a spreadsheet would run as a formula (CSV/XLSX injection)"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def unescape_cell(value):
+    """Reverse ``escape_cell`` for values read back from our own exports"""
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def gzip_stream(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream on the fly (gzip container, one compressor for the whole stream)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only, non-seekable sink whose contents are drained between writes"""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _zip_stream(entries: Iterable[Tuple[str, Iterable[bytes]]]) -> Iterator[bytes]:
+    """Stream a ZIP archive whose members are produced by byte iterators"""
+    sink = _ByteSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in entries:
+            with archive.open(name, "w", force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    data = sink.take()
+                    if data:
+                        yield data
+    yield sink.take()
+
+
+def _file_chunks(file) -> Iterator[bytes]:
+    file.seek(0)
+    while True:
+        data = file.read(STREAM_BUFFER_BYTES)
+        if not data:
+            return
+        yield data
+
+
+if PYARROW_AVAILABLE:
+    _ARROW_TYPES = {
+        str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_(),
+        date: pa.date32(), datetime: pa.timestamp("us", tz="UTC"),
+    }
 
 
 class ExportImportService:
@@ -16,84 +185,53 @@ class ExportImportService:
     def __init__(self, db: Session):
         self.db = db
     
+    def iter_rows(self, section: str, user_id: str) -> Iterator[tuple]:
+        """Stream a section's rows as plain tuples in ``EXPORT_SPECS`` column order"""
+        model, columns = EXPORT_SPECS[section]
+        query = self.db.query(*[getattr(model, column) for column in columns]).filter(
+            model.user_id == user_id
+        ).order_by(model.id)
+        return iter(query.yield_per(EXPORT_CHUNK_SIZE))
+    
+    def iter_records(self, section: str, user_id: str) -> Iterator[Dict[str, Any]]:
+        """Stream a section's rows as JSON-ready dicts"""
+        columns = EXPORT_SPECS[section][1]
+        flags = [index for index, column in enumerate(columns) if column in BOOLEAN_COLUMNS]
+        for row in self.iter_rows(section, user_id):
+            record = dict(zip(columns, row))
+            for index in flags:
+                record[columns[index]] = bool(row[index])
+            yield record
+    
+    def iter_chunks(self, section: str, user_id: str) -> Iterator[List[tuple]]:
+        """Stream a section as lists of tuples (one per fetched batch), flags as booleans"""
+        columns = EXPORT_SPECS[section][1]
+        flags = {index for index, column in enumerate(columns) if column in BOOLEAN_COLUMNS}
+        for rows in chunked(self.iter_rows(section, user_id), EXPORT_CHUNK_SIZE):
+            if flags:
+                rows = [
+                    tuple(bool(value) if index in flags else value for index, value in enumerate(row))
+                    for row in rows
+                ]
+            yield rows
+    
     def export_tasks(self, user_id: str) -> List[Dict[str, Any]]:
         """Export all tasks for a user"""
-        tasks = self.db.query(Task).filter(Task.user_id == user_id).all()
-        
-        return [
-            {
-                "id": task.id,
-                "title": task.title,
-                "description": task.description,
-                "category": task.category,
-                "priority": task.priority,
-                "status": task.status,
-                "is_focus": bool(task.is_focus),
-                "due_date": task.due_date.isoformat() if task.due_date else None,
-                "start_time": task.start_time,
-                "end_time": task.end_time,
-                "color": task.color,
-                "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-                "created_at": task.created_at.isoformat() if task.created_at else None,
-                "updated_at": task.updated_at.isoformat() if task.updated_at else None,
-            }
-            for task in tasks
-        ]
+        return self._materialize("tasks", user_id)
     
     def export_habits(self, user_id: str) -> List[Dict[str, Any]]:
         """Export all habits for a user"""
-        habits = self.db.query(Habit).filter(Habit.user_id == user_id).all()
-        
-        return [
-            {
-                "id": habit.id,
-                "title": habit.title,
-                "description": habit.description,
-                "frequency": habit.frequency,
-                "target_days": habit.target_days,
-                "current_streak": habit.current_streak,
-                "longest_streak": habit.longest_streak,
-                "is_active": bool(habit.is_active),
-                "created_at": habit.created_at.isoformat() if habit.created_at else None,
-                "updated_at": habit.updated_at.isoformat() if habit.updated_at else None,
-            }
-            for habit in habits
-        ]
+        return self._materialize("habits", user_id)
     
     def export_finance(self, user_id: str) -> Dict[str, List[Dict[str, Any]]]:
         """Export all finance data for a user"""
-        transactions = self.db.query(Transaction).filter(Transaction.user_id == user_id).all()
-        budgets = self.db.query(Budget).filter(Budget.user_id == user_id).all()
-        
         return {
-            "transactions": [
-                {
-                    "id": t.id,
-                    "amount": float(t.amount),
-                    "type": t.type,
-                    "category": t.category,
-                    "description": t.description,
-                    "date": t.date.isoformat() if t.date else None,
-                    "created_at": t.created_at.isoformat() if t.created_at else None,
-                }
-                for t in transactions
-            ],
-            "budgets": [
-                {
-                    "id": b.id,
-                    "category": b.category,
-                    "amount": float(b.amount),
-                    "period": b.period,
-                    "start_date": b.start_date.isoformat() if b.start_date else None,
-                    "end_date": b.end_date.isoformat() if b.end_date else None,
-                    "created_at": b.created_at.isoformat() if b.created_at else None,
-                }
-                for b in budgets
-            ],
+            "transactions": self._materialize("transactions", user_id),
+            "budgets": self._materialize("budgets", user_id),
         }
     
     def export_all(self, user_id: str) -> Dict[str, Any]:
-        """Export all data for a user"""
+        """Export all data for a user (in memory; prefer ``stream_json`` for downloads)"""
         return {
             "tasks": self.export_tasks(user_id),
             "habits": self.export_habits(user_id),
@@ -101,99 +239,168 @@ class ExportImportService:
             "exported_at": datetime.now().isoformat(),
         }
     
-    def import_tasks(self, user_id: str, tasks_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Import tasks for a user"""
-        imported = 0
-        errors = []
-        
-        for task_data in tasks_data:
-            try:
-                # Check if task already exists
-                existing = self.db.query(Task).filter(
-                    Task.id == task_data.get("id"),
-                    Task.user_id == user_id
-                ).first()
-                
-                if existing:
-                    # Update existing task
-                    for key, value in task_data.items():
-                        if key not in ["id", "user_id"] and hasattr(existing, key):
-                            setattr(existing, key, value)
-                    imported += 1
-                else:
-                    # Create new task
-                    task = Task(
-                        id=task_data.get("id") or f"imported-{datetime.now().timestamp()}",
-                        user_id=user_id,
-                        title=task_data.get("title", ""),
-                        description=task_data.get("description"),
-                        category=task_data.get("category", "Ish"),
-                        priority=task_data.get("priority", "medium"),
-                        status=task_data.get("status", "pending"),
-                        is_focus=1 if task_data.get("is_focus") else 0,
-                        color=task_data.get("color", "indigo"),
-                    )
-                    self.db.add(task)
-                    imported += 1
-            except Exception as e:
-                errors.append(f"Task {task_data.get('title', 'Unknown')}: {str(e)}")
+    def stream_json(self, user_id: str, layout: str = "all") -> Iterator[bytes]:
+        """Write an export document incrementally; memory stays bounded by the buffer size
         
-        self.db.commit()
+        The session is closed once the stream is exhausted, because the response body is
+        produced after the request's dependencies have already been torn down.
+        """
+        buffer = io.StringIO()
+        try:
+            for piece in self._json_document(user_id, EXPORT_LAYOUTS[layout], top_level=(layout == "all")):
+                buffer.write(piece)
+                if buffer.tell() >= STREAM_BUFFER_BYTES:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode("utf-8")
+        finally:
+            self.db.close()
+    
+    def stream_export(self, user_id: str, layout: str = "all", format: str = "json") -> Iterator[bytes]:
+        """Stream an export in the requested format (see ``EXPORT_FORMATS``)"""
+        if format == "json":
+            return self.stream_json(user_id, layout)
+        return self._closing({
+            "csv": self._csv_export,
+            "xlsx": self._xlsx_export,
+            "parquet": self._parquet_export,
+        }[format](user_id, layout_sections(layout)))
+    
+    def _closing(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        try:
+            yield from chunks
+        finally:
+            self.db.close()
+    
+    def _csv_export(self, user_id: str, sections: List[str]) -> Iterator[bytes]:
+        if len(sections) == 1:
+            return self._csv_section(sections[0], user_id)
+        return _zip_stream((f"{section}.csv", self._csv_section(section, user_id)) for section in sections)
+    
+    def _csv_section(self, section: str, user_id: str) -> Iterator[bytes]:
+        """CSV with a header row; UTF-8 with BOM so spreadsheet apps detect the encoding"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")
+        writer.writerow(EXPORT_SPECS[section][1])
+        for rows in self.iter_chunks(section, user_id):
+            writer.writerows([escape_cell(value) for value in row] for row in rows)
+            if buffer.tell() >= STREAM_BUFFER_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+    
+    def _xlsx_export(self, user_id: str, sections: List[str]) -> Iterator[bytes]:
+        """One sheet per section; write-only worksheets spool rows to disk as they are appended"""
+        from openpyxl import Workbook
         
+        workbook = Workbook(write_only=True)
+        for section in sections:
+            model, columns = EXPORT_SPECS[section]
+            sheet = workbook.create_sheet(section)
+            sheet.append(columns)
+            # Excel cannot store time zones
+            aware = [index for index, column in enumerate(columns) if model.__table__.c[column].type.python_type is datetime]
+            for rows in self.iter_chunks(section, user_id):
+                for row in rows:
+                    row = [escape_cell(value) for value in row]
+                    for index in aware:
+                        if row[index] is not None and row[index].tzinfo:
+                            row[index] = row[index].replace(tzinfo=None)
+                    sheet.append(row)
+        with tempfile.TemporaryFile() as file:
+            workbook.save(file)
+            yield from _file_chunks(file)
+    
+    def _parquet_export(self, user_id: str, sections: List[str]) -> Iterator[bytes]:
+        if len(sections) == 1:
+            return self._parquet_section(sections[0], user_id)
+        return _zip_stream((f"{section}.parquet", self._parquet_section(section, user_id)) for section in sections)
+    
+    def _parquet_section(self, section: str, user_id: str) -> Iterator[bytes]:
+        """One row group per fetched batch, built column by column from the row tuples"""
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("Parquet export requires pyarrow")
+        model, columns = EXPORT_SPECS[section]
+        schema = pa.schema([
+            (column, pa.bool_() if column in BOOLEAN_COLUMNS else _ARROW_TYPES[model.__table__.c[column].type.python_type])
+            for column in columns
+        ])
+        sink = _ByteSink()
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for rows in self.iter_chunks(section, user_id):
+                arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                yield sink.take()
+        yield sink.take()
+    
+    def _json_document(self, user_id: str, layout: Dict[str, Any], top_level: bool = False) -> Iterator[str]:
+        yield "{"
+        for position, (key, value) in enumerate(layout.items()):
+            yield f"{', ' if position else ''}{json.dumps(key)}: "
+            if isinstance(value, dict):
+                yield from self._json_document(user_id, value)
+                continue
+            yield "["
+            for index, record in enumerate(self.iter_records(value, user_id)):
+                yield (", " if index else "") + json.dumps(record, default=_json_default, ensure_ascii=False)
+            yield "]"
+        if top_level:
+            yield f", \"exported_at\": {json.dumps(datetime.now().isoformat())}"
+        yield "}"
+    
+    def _materialize(self, section: str, user_id: str) -> List[Dict[str, Any]]:
+        return [
+            {key: _json_value(value) for key, value in record.items()}
+            for record in self.iter_records(section, user_id)
+        ]
+    
+    def import_tasks(self, user_id: str, tasks_data: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Import tasks for a user (bulk upsert by id)"""
+        return BulkImportService(self.db).upsert("tasks", user_id, tasks_data)
+    
+    def import_habits(self, user_id: str, habits_data: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Import habits for a user (bulk upsert by id)"""
+        return BulkImportService(self.db).upsert("habits", user_id, habits_data)
+    
+    def import_finance(self, user_id: str, finance_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Import transactions and budgets for a user"""
+        engine = BulkImportService(self.db)
         return {
-            "imported": imported,
-            "errors": errors,
+            section: engine.upsert(section, user_id, finance_data.get(section) or [])
+            for section in ("transactions", "budgets")
         }
     
-    def import_habits(self, user_id: str, habits_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Import habits for a user"""
-        imported = 0
-        errors = []
-        
-        for habit_data in habits_data:
-            try:
-                # Check if habit already exists
-                existing = self.db.query(Habit).filter(
-                    Habit.id == habit_data.get("id"),
-                    Habit.user_id == user_id
-                ).first()
-                
-                if existing:
-                    # Update existing habit
-                    for key, value in habit_data.items():
-                        if key not in ["id", "user_id"] and hasattr(existing, key):
-                            setattr(existing, key, value)
-                    imported += 1
-                else:
-                    # Create new habit
-                    habit = Habit(
-                        id=habit_data.get("id") or f"imported-{datetime.now().timestamp()}",
-                        user_id=user_id,
-                        title=habit_data.get("title", ""),
-                        description=habit_data.get("description"),
-                        frequency=habit_data.get("frequency", "daily"),
-                        target_days=habit_data.get("target_days", 7),
-                        current_streak=habit_data.get("current_streak", 0),
-                        longest_streak=habit_data.get("longest_streak", 0),
-                        is_active=1 if habit_data.get("is_active", True) else 0,
-                    )
-                    self.db.add(habit)
-                    imported += 1
-            except Exception as e:
-                errors.append(f"Habit {habit_data.get('title', 'Unknown')}: {str(e)}")
-        
-        self.db.commit()
-        
+    def import_stream(self, user_id: str, fileobj: BinaryIO, layout: str = "all", ndjson: bool = False) -> Dict[str, Any]:
+        """Import an uploaded JSON or NDJSON document (optionally gzipped) without loading it
+
+        Records are parsed one at a time and upserted in chunks; only sections
+        present in the upload appear in the result. Raises ``JSONStreamError`` on
+        malformed input, after the chunks read so far have been committed.
+        """
+        sections = layout_sections(layout)
+        stream = open_upload(fileobj)
+        seen = set()
+        if ndjson:
+            items = iter_ndjson(stream, sections[0] if len(sections) == 1 else None)
+        else:
+            items = iter_sections(stream, sections, seen)
+        results = BulkImportService(self.db).upsert_stream(
+            user_id, ((section, record) for section, record in items if section in sections)
+        )
+        # Sections present in the file but empty still get a (zero) report
         return {
-            "imported": imported,
-            "errors": errors,
+            section: results.get(section) or BulkImportService.new_report()
+            for section in sections if section in results or section in seen
         }
     
     def import_all(self, user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Import all data for a user"""
         results = {
-            "tasks": {"imported": 0, "errors": []},
-            "habits": {"imported": 0, "errors": []},
+            "tasks": BulkImportService.new_report(),
+            "habits": BulkImportService.new_report(),
         }
         
         if "tasks" in data:
@@ -202,5 +409,7 @@ class ExportImportService:
         if "habits" in data:
             results["habits"] = self.import_habits(user_id, data["habits"])
         
+        if isinstance(data.get("finance"), dict):
+            results.update(self.import_finance(user_id, data["finance"]))
+        
         return results
-
@@ -0,0 +1,238 @@
+"""
+Async FCM client (HTTP v1 API)
+
+HTTP v1 takes one registration token per request, so fan-out means many small
+requests: they are sent concurrently over one pooled ``httpx.AsyncClient``
+(multiplexed over HTTP/2 when ``h2`` is installed). Results mark tokens FCM
+reports as unregistered or invalid so callers can prune them.
+"""
+import json
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import httpx
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+FCM_SCOPE = "https://www.googleapis.com/auth/firebase.messaging"
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 10.0
+
+
+@dataclass
+class PushMessage:
+    token: str
+    title: str
+    body: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PushResult:
+    token: str
+    success: bool
+    error: Optional[str] = None
+    invalid_token: bool = False  # unregistered, malformed or from another project: prune it
+
+
+class StaticTokenProvider:
+    """Fixed OAuth access token (local fakes, tokens minted elsewhere)"""
+
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+
+    async def token(self, http: httpx.AsyncClient) -> str:
+        return self.access_token
+
+    def invalidate(self, access_token: str) -> None:
+        pass
+
+
+class ServiceAccountTokenProvider:
+    """OAuth access tokens from a service account key (JWT bearer grant), cached until expiry"""
+
+    def __init__(self, info: Dict[str, Any]):
+        self.info = info
+        self.access_token: Optional[str] = None
+        self.expires_at = 0.0
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    def from_file(cls, path: str) -> "ServiceAccountTokenProvider":
+        with open(path, encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    async def token(self, http: httpx.AsyncClient) -> str:
+        async with self.lock:
+            if self.access_token and time.time() < self.expires_at:
+                return self.access_token
+            from jose import jwt
+
+            token_uri = self.info.get("token_uri", GOOGLE_TOKEN_URI)
+            now = int(time.time())
+            assertion = jwt.encode(
+                {"iss": self.info["client_email"], "scope": FCM_SCOPE, "aud": token_uri, "iat": now, "exp": now + 3600},
+                self.info["private_key"],
+                algorithm="RS256",
+                headers={"kid": self.info.get("private_key_id")},
+            )
+            response = await http.post(token_uri, data={
+                "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
+                "assertion": assertion,
+            })
+            response.raise_for_status()
+            data = response.json()
+            self.access_token = data["access_token"]
+            # Refresh a minute early
+            self.expires_at = time.time() + int(data.get("expires_in", 3600)) - 60
+            return self.access_token
+
+    def invalidate(self, access_token: str) -> None:
+        """Drop a rejected token (unless a concurrent request already replaced it)"""
+        if self.access_token == access_token:
+            self.access_token = None
+
+
+def _error_details(response: httpx.Response) -> Dict[str, str]:
+    try:
+        error = response.json().get("error") or {}
+    except ValueError:
+        return {"status": "", "message": response.text[:200], "code": ""}
+    code = ""
+    for detail in error.get("details") or []:
+        code = detail.get("errorCode") or code
+    return {"status": error.get("status", ""), "message": error.get("message", ""), "code": code}
+
+
+def _is_invalid_token(status_code: int, details: Dict[str, str]) -> bool:
+    # A bare 404 (wrong project id, proxy error page) says nothing about the token
+    if details["code"] in ("UNREGISTERED", "SENDER_ID_MISMATCH"):
+        return True
+    # INVALID_ARGUMENT is also used for bad payloads; only a malformed token is the token's fault
+    return details["code"] == "INVALID_ARGUMENT" and "registration token" in details["message"].lower()
+
+
+class FCMClient:
+    """Concurrent HTTP v1 sends over a pooled (HTTP/2 when available) async client"""
+
+    def __init__(
+        self,
+        project_id: str,
+        token_provider,
+        base_url: str = "https://fcm.googleapis.com",
+        concurrency: int = 100,
+        timeout: float = 10.0,
+        max_retries: int = 2,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.project_id = project_id
+        self.token_provider = token_provider
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.http = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            http2=H2_AVAILABLE and transport is None,
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency, keepalive_expiry=60),
+            transport=transport,
+        )
+
+    @staticmethod
+    def build_payload(message: PushMessage) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "token": message.token,
+            "notification": {"title": message.title, "body": message.body},
+        }
+        if message.data:
+            # FCM data values must be strings
+            payload["data"] = {key: str(value) for key, value in message.data.items() if value is not None}
+        return {"message": payload}
+
+    async def send(self, message: PushMessage) -> PushResult:
+        async with self.semaphore:
+            return await self._send(message)
+
+    async def send_many(self, messages: List[PushMessage]) -> List[PushResult]:
+        """Send all messages concurrently (bounded by ``concurrency``); results keep the input order"""
+        return list(await asyncio.gather(*(self.send(message) for message in messages)))
+
+    async def _send(self, message: PushMessage) -> PushResult:
+        url = f"/v1/projects/{self.project_id}/messages:send"
+        body = self.build_payload(message)
+        refreshed = False
+        attempt = 0
+        while True:
+            try:
+                access_token = await self.token_provider.token(self.http)
+                response = await self.http.post(url, json=body, headers={"Authorization": f"Bearer {access_token}"})
+            except httpx.HTTPError as e:
+                if attempt >= self.max_retries:
+                    return PushResult(message.token, False, f"network error: {e!r}")
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 200:
+                return PushResult(message.token, True)
+            if response.status_code == 401 and not refreshed:
+                # Access token expired or revoked
+                self.token_provider.invalidate(access_token)
+                refreshed = True
+                continue
+
+            details = _error_details(response)
+            error = f"{response.status_code} {details['code'] or details['status']}: {details['message']}"
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else self._backoff(attempt)
+                await asyncio.sleep(min(delay, BACKOFF_MAX_SECONDS))
+                attempt += 1
+                continue
+            return PushResult(message.token, False, error, _is_invalid_token(response.status_code, details))
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+
+_client: Optional[FCMClient] = None
+
+
+def get_fcm_client() -> Optional[FCMClient]:
+    """Shared client, or None unless FCM_PROJECT_ID and FCM_SERVICE_ACCOUNT_FILE are set"""
+    global _client
+    if not settings.fcm_project_id or not settings.fcm_service_account_file:
+        return None
+    if _client is None:
+        _client = FCMClient(
+            settings.fcm_project_id,
+            ServiceAccountTokenProvider.from_file(settings.fcm_service_account_file),
+            base_url=settings.fcm_api_url,
+            concurrency=settings.fcm_concurrency,
+            timeout=settings.fcm_timeout_seconds,
+        )
+    return _client
+
+
+async def close_fcm_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
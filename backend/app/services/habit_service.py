@@ -4,6 +4,7 @@ from typing import Optional, List
 from datetime import date, datetime, timedelta
 from app.models import Habit, HabitCompletion
 from app.schemas.habit import HabitCreate, HabitUpdate, HabitCompletionCreate
+from app.services.ai.insights_store import invalidate_insights
 import uuid
 
 
@@ -107,6 +108,9 @@ def complete_habit(
         )
     ).first()
     
+    # A completion for a past date changes closed days of today's insights
+    invalidate_insights(db, user_id, completion.completion_date)
+    
     if existing:
         # Update existing completion
         existing.progress = completion.progress
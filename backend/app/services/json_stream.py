@@ -0,0 +1,216 @@
+"""
+Incremental JSON readers for large uploads
+
+``iter_sections`` walks an export document (``{"tasks": [...], "finance": {...}}``)
+and yields ``(section, record)`` pairs one array element at a time. Only the
+current element and a fixed-size read buffer are held in memory; each element is
+decoded by the C scanner through ``JSONDecoder.raw_decode``. ``iter_ndjson`` does
+the same for newline-delimited records. Gzip-compressed uploads are detected by
+their magic bytes.
+
+Malformed input fails as soon as the decoder reports an error that more data
+cannot fix, and no single element (or NDJSON line) may grow the buffer past
+``MAX_ELEMENT_CHARS``, so memory stays bounded even for a compressed upload that
+expands to gigabytes.
+"""
+import codecs
+import gzip
+import io
+import json
+import zlib
+from typing import Any, BinaryIO, Collection, Iterator, Optional, Set, Tuple
+
+READ_CHUNK_SIZE = 64 * 1024
+# Largest single record (decoded characters) an upload may contain
+MAX_ELEMENT_CHARS = 1024 * 1024
+# Errors this close to the end of the buffer may just be a token cut by the read boundary
+_TRUNCATION_MARGIN = 8
+GZIP_MAGIC = b"\x1f\x8b"
+_WHITESPACE = " \t\n\r"
+# Truncated/corrupt gzip and invalid UTF-8 surface as parse errors
+_READ_ERRORS = (OSError, EOFError, zlib.error, UnicodeDecodeError)
+
+
+class JSONStreamError(ValueError):
+    """Malformed input; ``position`` is a character offset (JSON) or line number (NDJSON)"""
+
+    def __init__(self, message: str, position: int):
+        super().__init__(f"{message} at position {position}")
+        self.position = position
+
+
+def open_upload(fileobj: BinaryIO) -> BinaryIO:
+    """Return a binary stream over the upload, transparently gunzipping it"""
+    magic = fileobj.read(2)
+    fileobj.seek(0)
+    if magic == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    return fileobj
+
+
+class _Reader:
+    """Sliding character buffer over a byte stream"""
+
+    def __init__(self, stream: BinaryIO, chunk_size: int = READ_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.json = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        try:
+            data = self.stream.read(self.chunk_size)
+            text = self.decoder.decode(data, final=not data)
+        except _READ_ERRORS as e:
+            raise self.error(f"Unreadable upload ({str(e)})")
+        if not data:
+            self.eof = True
+        # Drop consumed text so the buffer never grows past one element + one chunk
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return bool(data) or bool(text)
+
+    def error(self, message: str) -> JSONStreamError:
+        return JSONStreamError(message, self.offset + self.pos)
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Only an error at the end of the buffer (or an open string) can be fixed by reading on
+                truncated = e.pos >= len(self.buffer) - _TRUNCATION_MARGIN or e.msg.startswith("Unterminated string")
+                if not truncated or self.eof:
+                    raise JSONStreamError(e.msg, self.offset + e.pos)
+                # fill() rebases the buffer, so decode again even if nothing was read
+                self.grow()
+                continue
+            # A number near the buffer edge may continue in the next chunk ("12500." + "75", "1e" + "5")
+            if end > len(self.buffer) - _TRUNCATION_MARGIN and not self.eof:
+                self.grow()
+                continue
+            self.pos = end
+            return value
+
+    def grow(self) -> bool:
+        """Read more of the current element, refusing to buffer more than ``MAX_ELEMENT_CHARS``"""
+        if len(self.buffer) - self.pos > MAX_ELEMENT_CHARS:
+            raise self.error(f"Element larger than {MAX_ELEMENT_CHARS} characters")
+        return self.fill()
+
+    def array(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                self.pos -= 1
+                raise self.error("Expecting ',' or ']'")
+
+    def object(self, wanted: Optional[Collection[str]], seen: Set[str]) -> Iterator[Tuple[str, Any]]:
+        """Yield elements of arrays stored under ``wanted`` keys, descending into nested objects"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self.error("Expecting property name")
+            key = self.value()
+            self.expect(":")
+            char = self.peek()
+            if char == "{":
+                yield from self.object(wanted, seen)
+            elif char == "[" and (wanted is None or key in wanted):
+                seen.add(key)
+                for item in self.array():
+                    yield key, item
+            elif char == "[":
+                for _ in self.array():
+                    pass
+            else:
+                self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                self.pos -= 1
+                raise self.error("Expecting ',' or '}'")
+
+
+def iter_sections(
+    stream: BinaryIO,
+    wanted: Optional[Collection[str]] = None,
+    seen: Optional[Set[str]] = None,
+) -> Iterator[Tuple[str, Any]]:
+    """Stream ``(section, record)`` pairs from a JSON document without loading it
+
+    Names of the section arrays encountered (including empty ones) are added to ``seen``.
+    """
+    reader = _Reader(stream)
+    if reader.peek() != "{":
+        raise reader.error("Expecting a JSON object")
+    yield from reader.object(wanted, set() if seen is None else seen)
+    if reader.peek():
+        raise reader.error("Extra data")
+
+
+def iter_ndjson(stream: BinaryIO, default_section: Optional[str] = None) -> Iterator[Tuple[str, Any]]:
+    """Stream ``(section, record)`` pairs from newline-delimited JSON
+
+    Each line is one record; its section comes from a ``"section"`` field or
+    ``default_section`` when the upload targets a single section.
+    """
+    lines = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    line_number = 0
+    while True:
+        try:
+            line = lines.readline(MAX_ELEMENT_CHARS + 1)
+        except _READ_ERRORS as e:
+            raise JSONStreamError(f"Unreadable upload ({str(e)})", line_number + 1)
+        if not line:
+            return
+        line_number += 1
+        if len(line) > MAX_ELEMENT_CHARS:
+            raise JSONStreamError(f"Line longer than {MAX_ELEMENT_CHARS} characters", line_number)
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(e.msg, line_number)
+        if not isinstance(record, dict):
+            raise JSONStreamError("Expecting a JSON object per line", line_number)
+        section = record.pop("section", default_section)
+        if section is None:
+            raise JSONStreamError("Missing 'section'", line_number)
+        yield section, record
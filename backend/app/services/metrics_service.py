@@ -2,7 +2,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
-from app.models import Log, Metric, User
+from app.models import Log, Metric, User, OutboxMessage
 from app.database import SessionLocal
 import json
 import logging
@@ -175,6 +175,68 @@ class MetricsService:
                 "error": str(e),
             }
     
+    @staticmethod
+    def get_outbox_metrics(db: Session, hours: int = 24) -> Dict:
+        """Get outbox delivery latency, failures and backlog for the last N hours"""
+        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        
+        status_counts = (
+            db.query(
+                OutboxMessage.channel,
+                OutboxMessage.status,
+                func.count(OutboxMessage.id).label("count"),
+                func.sum(OutboxMessage.attempts).label("attempts"),
+            )
+            .filter(OutboxMessage.created_at >= cutoff_time)
+            .group_by(OutboxMessage.channel, OutboxMessage.status)
+            .all()
+        )
+        latency = (
+            db.query(
+                OutboxMessage.channel,
+                func.avg(OutboxMessage.delivery_ms).label("avg_ms"),
+                func.max(OutboxMessage.delivery_ms).label("max_ms"),
+            )
+            .filter(
+                and_(
+                    OutboxMessage.created_at >= cutoff_time,
+                    OutboxMessage.status == "sent",
+                )
+            )
+            .group_by(OutboxMessage.channel)
+            .all()
+        )
+        backlog, oldest = (
+            db.query(func.count(OutboxMessage.id), func.min(OutboxMessage.created_at))
+            .filter(OutboxMessage.status.in_(("pending", "sending")))
+            .one()
+        )
+        
+        by_channel: Dict[str, Dict] = {}
+        for r in status_counts:
+            channel = by_channel.setdefault(r.channel, {"sent": 0, "failed": 0, "pending": 0, "attempts": 0})
+            key = "pending" if r.status == "sending" else r.status
+            channel[key] = channel.get(key, 0) + r.count
+            channel["attempts"] += r.attempts or 0
+        for r in latency:
+            channel = by_channel.setdefault(r.channel, {"sent": 0, "failed": 0, "pending": 0, "attempts": 0})
+            channel["avg_delivery_ms"] = round(r.avg_ms, 2) if r.avg_ms is not None else None
+            channel["max_delivery_ms"] = round(r.max_ms, 2) if r.max_ms is not None else None
+        for channel in by_channel.values():
+            finished = channel["sent"] + channel["failed"]
+            channel["failure_rate"] = round(channel["failed"] / finished * 100, 2) if finished else 0
+        
+        if oldest is not None and oldest.tzinfo is not None:
+            oldest = oldest.replace(tzinfo=None) - oldest.utcoffset()
+        
+        return {
+            "by_channel": by_channel,
+            "backlog": backlog,
+            "oldest_pending_seconds": (
+                round(max(0.0, (datetime.utcnow() - oldest).total_seconds()), 1) if oldest is not None else 0
+            ),
+        }
+    
     @staticmethod
     def get_all_metrics(db: Session, hours: int = 24) -> Dict:
         """Get all metrics in one call"""
@@ -185,6 +247,7 @@ class MetricsService:
             "request_volume": MetricsService.get_request_volume(db, hours),
             "database": MetricsService.get_database_status(db),
             "ai_service": MetricsService.get_ai_service_status(),
+            "outbox": MetricsService.get_outbox_metrics(db, hours),
             "timestamp": datetime.utcnow().isoformat(),
         }
     
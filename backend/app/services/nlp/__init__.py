@@ -1,8 +1,16 @@
 from .task_parser import TaskParser
+from .temporal_parser import parse_temporal, TemporalResult
 from .text_classifier import TextClassifier
+from .model_registry import get_nlp, warm_up_nlp
+from .recategorization_service import RecategorizationService
 
 __all__ = [
     "TaskParser",
+    "parse_temporal",
+    "TemporalResult",
     "TextClassifier",
+    "RecategorizationService",
+    "get_nlp",
+    "warm_up_nlp",
 ]
 
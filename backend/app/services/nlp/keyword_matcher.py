@@ -0,0 +1,93 @@
+"""
+Kalit so'zlar uchun kompilyatsiya qilingan matcher
+
+Barcha guruhlarning (kategoriya, prioritet, ...) kalit so'zlari bitta regex
+alternatsiyasiga yig'iladi va matn bir marta o'tishda tekshiriladi.
+- Chap chegara: kalit so'z token boshida bo'lishi kerak ("non" "nonushta" da topiladi,
+  "kanon" da emas). O'ng tomonda qo'shimchalar ruxsat etiladi - o'zbek va rus
+  so'zlari qo'shimcha oladi ("kitobni", "doktorga"); kirill harflari ham so'z harfi hisoblanadi
+- Apostrof variantlari (ʻ ʼ ‘ ’ `) bitta ``'`` ga keltiriladi: "oʻqish" == "o'qish"
+- Bir nechta so'zli kalitlar ("ish haqi") orasida istalgan bo'shliq
+- Uzun kalitlar birinchi: "ish haqi" "ish" dan oldin tekshiriladi
+- Alternatsiya prefiks daraxti (trie) ko'rinishida: regex har pozitsiyada barcha
+  kalitlarni emas, faqat birinchi harfi mosini sinaydi
+"""
+import re
+from typing import Dict, Hashable, Iterable, List, Mapping, Tuple
+
+_APOSTROPHES = re.compile("[ʻʼ‘’`]")
+
+
+def normalize_text(text: str) -> str:
+    return _APOSTROPHES.sub("'", text.lower())
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Kalit so'zlardan prefiks daraxti regex'i; so'z oxiri ``?`` bilan (ochko'z - uzuni birinchi)"""
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Guruhlangan kalit so'zlarni bitta regex bilan qidirish"""
+
+    def __init__(self, groups: Mapping[Hashable, Iterable[str]], whole_word: bool = False):
+        self.groups: List[Hashable] = list(groups)
+        self._lookup: Dict[str, List[Hashable]] = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                key = " ".join(normalize_text(keyword).split())
+                labels = self._lookup.setdefault(key, [])
+                if group not in labels:
+                    labels.append(group)
+
+        # Apostrof so'z ichida (o'zim), lekin tirnoq sifatida ('muhim') chegara
+        tail = r"(?![\w'])" if whole_word else ""
+        self._pattern = re.compile(rf"(?<!\w)(?<!\w')(?:{_trie_pattern(self._lookup)}){tail}")
+
+    def _keywords(self, text: str) -> List[str]:
+        keywords = []
+        for match in self._pattern.findall(normalize_text(text)):
+            keywords.append(match if match in self._lookup else " ".join(match.split()))
+        return keywords
+
+    def find(self, text: str) -> List[Tuple[Hashable, str]]:
+        """Matndagi barcha topilmalar (guruh, kalit so'z) tartib bilan"""
+        return [(group, keyword) for keyword in self._keywords(text) for group in self._lookup[keyword]]
+
+    def scores(self, text: str) -> Dict[Hashable, int]:
+        """Har bir guruh uchun topilgan turli kalit so'zlar soni (guruhlar e'lon tartibida)"""
+        counts: Dict[Hashable, int] = {}
+        for keyword in set(self._keywords(text)):
+            for group in self._lookup[keyword]:
+                counts[group] = counts.get(group, 0) + 1
+        return {group: counts[group] for group in self.groups if group in counts}
+
+    def groups_for(self, word: str) -> List[Hashable]:
+        """Aniq bitta so'z qaysi guruhlarning kalit so'zi"""
+        return self._lookup.get(" ".join(normalize_text(word).split()), [])
+
+
+def best_group(scores: Dict[Hashable, int]):
+    """Eng ko'p topilgan guruh; teng bo'lsa birinchi e'lon qilingani"""
+    if not scores:
+        return None
+    return max(scores.items(), key=lambda item: item[1])[0]
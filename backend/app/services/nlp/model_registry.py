@@ -0,0 +1,62 @@
+"""
+spaCy modellari reestri - jarayon bo'yicha yagona, kechiktirib yuklanadigan nusxa
+
+Import paytida model yuklanmaydi: birinchi ``get_nlp()`` chaqiruvi (yoki
+startup'dan keyingi fon warm-up) yuklaydi. Kerak bo'lmagan komponentlar
+(``ai_config.nlp_disabled_components``, odatda parser va ner) o'chiriladi -
+TaskParser va TextClassifier faqat tokenlar va POS teglaridan foydalanadi.
+"""
+import asyncio
+import logging
+import threading
+import importlib.util
+from typing import Any, Dict, Optional
+from app.config.ai_config import ai_config
+
+logger = logging.getLogger(__name__)
+
+SPACY_AVAILABLE = importlib.util.find_spec("spacy") is not None
+
+_models: Dict[str, Any] = {}
+_failed: set = set()
+_lock = threading.Lock()
+
+
+def get_nlp(name: Optional[str] = None):
+    """Yuklangan spaCy pipeline; spaCy yoki model yo'q bo'lsa None"""
+    name = name or ai_config.nlp_model
+    nlp = _models.get(name)
+    if nlp is not None or not SPACY_AVAILABLE or name in _failed:
+        return nlp
+
+    with _lock:
+        # Boshqa thread kutayotgan vaqtda yuklagan bo'lishi mumkin
+        if name in _models or name in _failed:
+            return _models.get(name)
+        try:
+            import spacy
+            _models[name] = spacy.load(name, disable=list(ai_config.nlp_disabled_components))
+            logger.info(f"spaCy model loaded: {name} (pipes: {_models[name].pipe_names})")
+        except (OSError, ImportError) as e:
+            _failed.add(name)
+            logger.warning(f"spaCy model {name} is not available: {str(e)}")
+        return _models.get(name)
+
+
+def is_loaded(name: Optional[str] = None) -> bool:
+    return (name or ai_config.nlp_model) in _models
+
+
+async def warm_up_nlp(name: Optional[str] = None):
+    """Modelni fon thread'ida yuklash (event loop bloklanmaydi)"""
+    try:
+        await asyncio.to_thread(get_nlp, name)
+    except Exception as e:
+        logger.warning(f"spaCy warm-up failed: {str(e)}")
+
+
+def reset_nlp():
+    """Testlar uchun: yuklangan modellarni unutish"""
+    with _lock:
+        _models.clear()
+        _failed.clear()
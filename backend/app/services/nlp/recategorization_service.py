@@ -0,0 +1,102 @@
+"""
+Foydalanuvchi tranzaksiyalari tarixini qayta kategoriyalash
+
+Tranzaksiyalar oqim bilan (``yield_per``) o'qiladi va ``CategoryModelService.categorize``
+(foydalanuvchi modeli, ishonch past bo'lsa ``TextClassifier``) bilan partiyalab kategoriyalanadi; o'zgarishlar bitta bulk UPDATE bilan yoziladi,
+keyin xarajat statistikasi qayta quriladi.
+"""
+import logging
+from typing import Dict, List
+from sqlalchemy.orm import Session
+from app.models import Transaction
+from app.services.nlp.text_classifier import TextClassifier, DEFAULT_CATEGORY
+from app.services.ai.expense_stats_service import ExpenseStatsService
+
+logger = logging.getLogger(__name__)
+
+INCOME_CATEGORIES = {"Maosh"}
+CHUNK_SIZE = 5000
+MAX_CHANGES_IN_REPORT = 100
+
+
+class RecategorizationService:
+    """Tarixiy tranzaksiyalarni kalit so'z/NLP klassifikatori bilan qayta kategoriyalash"""
+
+    def __init__(self, db: Session, classifier: TextClassifier = None):
+        self.db = db
+        # category_model_service nlp paketini import qiladi - aylanma importdan qochish
+        from app.services.ai.category_model_service import CategoryModelService
+        self.categorizer = CategoryModelService(db, classifier or TextClassifier())
+
+    def recategorize(self, user_id: str, dry_run: bool = True, overwrite: bool = False) -> Dict:
+        """
+        Args:
+            dry_run: faqat hisobot, bazaga yozilmaydi
+            overwrite: foydalanuvchi tanlagan kategoriyalarni ham almashtirish
+                (aks holda faqat "Boshqa"/bo'sh kategoriyalilar)
+        """
+        rows = self.db.query(
+            Transaction.id,
+            Transaction.title,
+            Transaction.description,
+            Transaction.category,
+            Transaction.transaction_type,
+        ).filter(Transaction.user_id == user_id).yield_per(CHUNK_SIZE)
+
+        total = 0
+        updates: List[Dict] = []
+        changes: List[Dict] = []
+        by_category: Dict[str, int] = {}
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_SIZE:
+                total += self._process_chunk(user_id, chunk, overwrite, updates, changes, by_category)
+                chunk = []
+        if chunk:
+            total += self._process_chunk(user_id, chunk, overwrite, updates, changes, by_category)
+
+        if updates and not dry_run:
+            self.db.bulk_update_mappings(Transaction, updates)
+            self.db.commit()
+            try:
+                ExpenseStatsService(self.db).rebuild(user_id)
+            except Exception as e:
+                logger.warning(f"Expense stats rebuild failed for user {user_id}: {str(e)}")
+
+        return {
+            "total": total,
+            "changed": len(updates),
+            "dry_run": dry_run,
+            "by_category": by_category,
+            "changes": changes,
+        }
+
+    def _process_chunk(self, user_id: str, chunk, overwrite: bool, updates, changes, by_category) -> int:
+        results = self.categorizer.categorize(
+            user_id, [(row.title, row.description) for row in chunk]
+        )
+        for row, result in zip(chunk, results):
+            category = result["category"]
+            if not self._should_update(row, category, overwrite):
+                continue
+            updates.append({"id": row.id, "category": category})
+            by_category[category] = by_category.get(category, 0) + 1
+            if len(changes) < MAX_CHANGES_IN_REPORT:
+                changes.append({
+                    "id": row.id,
+                    "title": row.title,
+                    "old_category": row.category,
+                    "new_category": category,
+                })
+        return len(chunk)
+
+    @staticmethod
+    def _should_update(row, category: str, overwrite: bool) -> bool:
+        if category == DEFAULT_CATEGORY or category == row.category:
+            return False
+        # Daromad kategoriyasi faqat daromadlarga, qolganlari faqat xarajatlarga
+        if (category in INCOME_CATEGORIES) != (row.transaction_type == "income"):
+            return False
+        return overwrite or not row.category or row.category == DEFAULT_CATEGORY
@@ -1,42 +1,44 @@
 from typing import Dict, Optional
 import re
-from datetime import datetime, timedelta
-from app.config.ai_config import ai_config
+from datetime import datetime
+from app.services.nlp.model_registry import get_nlp
+from app.services.nlp.temporal_parser import parse_temporal
+from app.services.nlp.keyword_matcher import KeywordMatcher, best_group
 
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-    try:
-        nlp_model = spacy.load(ai_config.nlp_model)
-    except OSError:
-        SPACY_AVAILABLE = False
-        nlp_model = None
-except ImportError:
-    SPACY_AVAILABLE = False
-    nlp_model = None
+
+CATEGORY_KEYWORDS = {
+    "Ish": ["ish", "work", "job", "meeting", "meeting", "loyiha", "project"],
+    "Shaxsiy": ["shaxsiy", "personal", "o'zim", "myself"],
+    "O'qish": ["o'qish", "read", "kitob", "book", "study", "o'quv"],
+    "Salomatlik": ["salomatlik", "health", "sog'liq", "doktor", "doctor"],
+    "Sport": ["sport", "jismoniy", "physical", "mashq", "exercise"]
+}
+
+PRIORITY_KEYWORDS = {
+    "high": ["muhim", "important", "urgent", "shoshilinch", "zarur", "critical"],
+    "medium": ["o'rta", "medium", "normal"],
+    "low": ["past", "low", "kam", "keyinroq", "later"]
+}
+
+# Kategoriya va prioritet bitta o'tishda topiladi
+TASK_MATCHER = KeywordMatcher({
+    **{("category", name): keywords for name, keywords in CATEGORY_KEYWORDS.items()},
+    **{("priority", name): keywords for name, keywords in PRIORITY_KEYWORDS.items()},
+})
 
 
 class TaskParser:
     """Tabiiy til bilan vazifa yaratish parser"""
     
     def __init__(self):
-        self.nlp = nlp_model if SPACY_AVAILABLE else None
-        
-        # Kategoriya kalit so'zlari
-        self.category_keywords = {
-            "Ish": ["ish", "work", "job", "meeting", "meeting", "loyiha", "project"],
-            "Shaxsiy": ["shaxsiy", "personal", "o'zim", "myself"],
-            "O'qish": ["o'qish", "read", "kitob", "book", "study", "o'quv"],
-            "Salomatlik": ["salomatlik", "health", "sog'liq", "doktor", "doctor"],
-            "Sport": ["sport", "jismoniy", "physical", "mashq", "exercise"]
-        }
-        
-        # Prioritet kalit so'zlari
-        self.priority_keywords = {
-            "high": ["muhim", "important", "urgent", "shoshilinch", "zarur", "critical"],
-            "medium": ["o'rta", "medium", "normal"],
-            "low": ["past", "low", "kam", "keyinroq", "later"]
-        }
+        # Kategoriya va prioritet kalit so'zlari (matcher modul yuklanganda quriladi)
+        self.category_keywords = CATEGORY_KEYWORDS
+        self.priority_keywords = PRIORITY_KEYWORDS
+    
+    @property
+    def nlp(self):
+        """Umumiy spaCy pipeline (birinchi murojaatda yuklanadi)"""
+        return get_nlp()
     
     def parse_task_text(
         self,
@@ -48,6 +50,8 @@ class TaskParser:
             "category": "Ish",
             "priority": "medium",
             "due_date": None,
+            "start_time": None,
+            "end_time": None,
             "description": None
         }
         
@@ -58,30 +62,31 @@ class TaskParser:
             if len(sentences) > 1:
                 result["description"] = " ".join(sentences[1:]).strip()
         
-        # Kategoriya aniqlash
-        result["category"] = self._extract_category(text)
-        
-        # Prioritet aniqlash
-        result["priority"] = self._extract_priority(text)
-        
-        # Muddat aniqlash
-        result["due_date"] = self._extract_due_date(text)
+        # Kategoriya va prioritet (bitta o'tish), muddat va vaqt bir marta hisoblanadi
+        scores = TASK_MATCHER.scores(text)
+        temporal = parse_temporal(text)
+        result["due_date"] = temporal.due_date
+        if temporal.start_time:
+            result["start_time"] = temporal.start_time.strftime("%H:%M")
+        if temporal.end_time:
+            result["end_time"] = temporal.end_time.strftime("%H:%M")
+        result["category"] = self._category_from_scores(scores, text)
+        result["priority"] = self._priority_from_scores(scores, result["due_date"])
         
         return result
     
     def _extract_category(self, text: str) -> str:
         """Kategoriyani ajratish"""
-        text_lower = text.lower()
-        
-        # Kategoriya kalit so'zlari bo'yicha tekshirish
-        category_scores = {}
-        for category, keywords in self.category_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            if score > 0:
-                category_scores[category] = score
-        
-        if category_scores:
-            return max(category_scores.items(), key=lambda x: x[1])[0]
+        return self._category_from_scores(TASK_MATCHER.scores(text), text)
+    
+    def _extract_priority(self, text: str) -> str:
+        """Prioritetni ajratish"""
+        return self._priority_from_scores(TASK_MATCHER.scores(text), self._extract_due_date(text))
+    
+    def _category_from_scores(self, scores: Dict, text: str) -> str:
+        category = best_group({key[1]: score for key, score in scores.items() if key[0] == "category"})
+        if category:
+            return category
         
         # NLP bilan (agar mavjud bo'lsa)
         if self.nlp:
@@ -91,25 +96,21 @@ class TaskParser:
                 for token in doc:
                     if token.pos_ == "NOUN":
                         # Kategoriya kalit so'zlari bilan solishtirish
-                        for category, keywords in self.category_keywords.items():
-                            if token.text.lower() in keywords:
-                                return category
+                        for kind, name in TASK_MATCHER.groups_for(token.text):
+                            if kind == "category":
+                                return name
             except Exception:
                 pass
         
         return "Ish"  # Default
     
-    def _extract_priority(self, text: str) -> str:
-        """Prioritetni ajratish"""
-        text_lower = text.lower()
-        
-        # Prioritet kalit so'zlari
-        for priority, keywords in self.priority_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
+    def _priority_from_scores(self, scores: Dict, due_date: Optional[datetime]) -> str:
+        # Prioritet kalit so'zlari (high > medium > low tartibida)
+        for priority in self.priority_keywords:
+            if ("priority", priority) in scores:
                 return priority
         
         # Muddatga asoslangan prioritet
-        due_date = self._extract_due_date(text)
         if due_date:
             days_until = (due_date.date() - datetime.now().date()).days
             if days_until < 1:
@@ -120,47 +121,5 @@ class TaskParser:
         return "medium"  # Default
     
     def _extract_due_date(self, text: str) -> Optional[datetime]:
-        """Muddatni ajratish"""
-        text_lower = text.lower()
-        today = datetime.now()
-        
-        # "Bugun", "ertaga" kabi so'zlar
-        if "bugun" in text_lower or "today" in text_lower:
-            return today
-        
-        if "ertaga" in text_lower or "tomorrow" in text_lower:
-            return today + timedelta(days=1)
-        
-        # "X kun keyin"
-        match = re.search(r'(\d+)\s*(kun|day|days)\s*(keyin|later|after)', text_lower)
-        if match:
-            days = int(match.group(1))
-            return today + timedelta(days=days)
-        
-        # "X hafta keyin"
-        match = re.search(r'(\d+)\s*(hafta|week|weeks)\s*(keyin|later|after)', text_lower)
-        if match:
-            weeks = int(match.group(1))
-            return today + timedelta(weeks=weeks)
-        
-        # Sana formatlari (DD.MM.YYYY, YYYY-MM-DD)
-        date_patterns = [
-            r'(\d{1,2})\.(\d{1,2})\.(\d{4})',  # DD.MM.YYYY
-            r'(\d{4})-(\d{1,2})-(\d{1,2})',  # YYYY-MM-DD
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    if '.' in match.group(0):
-                        day, month, year = map(int, match.groups())
-                        return datetime(year, month, day)
-                    else:
-                        year, month, day = map(int, match.groups())
-                        return datetime(year, month, day)
-                except ValueError:
-                    continue
-        
-        return None
-
+        """Muddatni ajratish (sana + boshlanish vaqti, bo'lmasa kun boshi)"""
+        return parse_temporal(text).due_date
@@ -0,0 +1,412 @@
+"""
+Ko'p tilli sana/vaqt ifodalari parseri (o'zbek lotin/kirill, rus, ingliz)
+
+Lug'at jadvallari va qoidalar modul yuklanganda bitta regex'ga yig'iladi, matn
+bir o'tishda skanerlanadi va har bir topilma o'z handler'iga beriladi.
+- Nisbiy kunlar: bugun/ertaga/indinga, сегодня/завтра/послезавтра, today/tomorrow
+- Hafta kunlari: "dushanba", "жумага", "в пятницу", "next friday" (eng yaqin kelgusi kun)
+- Oy nomlari va raqamli sanalar: "15 mart", "15-марта", "March 15, 2027", "15.03", "2026-03-15"
+  (yilsiz "15.03" ortidan summa/o'lchov so'zi kelsa o'nli son hisoblanadi)
+- Nisbiy ifodalar: "3 kundan keyin", "через неделю", "in 2 hours", "keyingi hafta"
+- Vaqt: "soat 15:00", "в 9", "at 3pm", oraliqlar ("10:00-12:00", "soat 10 dan 12 gacha"),
+  kun qismlari ("ertalab", "вечером", "evening" - soat ko'rsatilmasa standart soat,
+  ko'rsatilsa 12 dan kichik soat kunduzgi/kechki qilinadi)
+
+Sanasiz vaqt bugunga (o'tib ketgan bo'lsa ertaga), yilsiz o'tgan sana keyingi yilga olinadi.
+"""
+import calendar
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app.services.nlp.keyword_matcher import normalize_text, _trie_pattern
+
+RELATIVE_DAYS = {
+    0: ["bugun", "бугун", "сегодня", "today"],
+    1: ["ertaga", "эртага", "завтра", "tomorrow"],
+    2: ["indinga", "индинга", "послезавтра"],
+}
+
+WEEKDAYS = {
+    0: ["dushanba", "душанба", "понедельник", "monday"],
+    1: ["seshanba", "сешанба", "вторник", "tuesday"],
+    2: ["chorshanba", "чоршанба", "среда", "среду", "среды", "wednesday"],
+    3: ["payshanba", "пайшанба", "четверг", "thursday"],
+    4: ["juma", "жума", "пятница", "пятницу", "пятницы", "friday"],
+    5: ["shanba", "шанба", "суббота", "субботу", "субботы", "saturday"],
+    6: ["yakshanba", "якшанба", "воскресенье", "воскресенья", "sunday"],
+}
+
+# Qo'shimcha olishi mumkin bo'lgan o'zaklar ("martda", "марта", "sentyabrgacha")
+MONTH_STEMS = {
+    1: ["yanvar", "январ"],
+    2: ["fevral", "феврал"],
+    3: ["mart", "март"],
+    4: ["aprel", "апрел"],
+    5: ["may", "май", "мая", "мае"],
+    6: ["iyun", "июн"],
+    7: ["iyul", "июл"],
+    8: ["avgust", "август"],
+    9: ["sentabr", "sentyabr", "сентябр"],
+    10: ["oktabr", "oktyabr", "октябр"],
+    11: ["noyabr", "ноябр"],
+    12: ["dekabr", "декабр"],
+}
+
+# Faqat butun so'z sifatida (qisqartmalar "market", "decide" ichida topilmasligi uchun)
+MONTH_WORDS = {
+    1: ["january", "jan"],
+    2: ["february", "feb"],
+    3: ["march", "mar"],
+    4: ["april", "apr"],
+    6: ["june", "jun"],
+    7: ["july", "jul"],
+    8: ["august", "aug"],
+    9: ["september", "sept", "sep"],
+    10: ["october", "oct"],
+    11: ["november", "nov"],
+    12: ["december", "dec"],
+}
+
+UNITS = {
+    "minutes": ["minut", "daqiqa", "дақиқа", "дакика", "минут", "minute", "min"],
+    "hours": ["soat", "соат", "час", "hour"],
+    "days": ["kun", "кун", "день", "дня", "дней", "day"],
+    "weeks": ["hafta", "ҳафта", "хафта", "недел", "week"],
+    "months": ["oy", "ой", "месяц", "month"],
+    "years": ["yil", "йил", "год", "лет", "year"],
+}
+
+NUMBER_WORDS = {
+    "bir": 1, "bitta": 1, "ikki": 2, "uch": 3, "бир": 1, "битта": 1, "икки": 2, "уч": 3,
+    "один": 1, "одну": 1, "два": 2, "две": 2, "три": 3, "one": 1, "two": 2, "three": 3, "a": 1, "an": 1,
+}
+
+NEXT_WORDS = ["keyingi", "kelasi", "кейинги", "келаси", "следующ", "будущ", "next"]
+AFTER_WORDS = ["keyin", "кейин", "so'ng", "сўнг", "later", "спустя"]
+BEFORE_WORDS = ["через", "after", "in"]
+CLOCK_PREFIXES = ["soat", "соат", "в", "во", "at"]
+RANGE_PREFIXES = ["soat", "соат", "с", "from", "between"]
+RANGE_SEPARATORS = ["-", "–", "—", "dan", "дан", "до", "to", "and", "gacha"]
+
+# Yilsiz "d.mm" dan keyin kelsa bu o'nli son (summa, miqdor), sana emas: "1.05 million so'm"
+QUANTITY_WORDS = [
+    "million", "mln", "milliard", "mlrd", "billion", "thousand", "ming", "минг", "млн", "млрд", "тыс",
+    "so'm", "som", "sum", "сўм", "сум", "руб", "usd", "dollar", "доллар", "$", "%",
+    "kg", "кг", "gramm", "грамм", "litr", "литр", "metr", "метр", "km", "км",
+]
+
+# Kun qismi -> (standart soat, 12 dan kichik soatga +12 qo'shiladimi)
+DAY_PARTS = {
+    (9, False): ["ertalab", "эрталаб", "утром", "утра", "morning"],
+    (12, False): ["tushda", "тушда", "tushlikda", "в обед", "noon", "midday"],
+    (15, True): ["tushdan keyin", "тушдан кейин", "после обеда", "kunduzi", "кундузи", "днём", "днем", "дня", "afternoon"],
+    (19, True): ["kechqurun", "кечқурун", "кечкурун", "вечером", "вечера", "evening", "tonight"],
+    (22, True): ["kechasi", "кечаси", "ночью", "ночи", "night"],
+}
+
+
+def _alternation(words: Iterable[str]) -> str:
+    """Prefiks daraxti: uzunlari birinchi (``mar`` dan oldin ``march``), bo'shliq istalgan uzunlikda"""
+    return _trie_pattern(words)
+
+
+def _lookup(table: Dict) -> Dict[str, object]:
+    return {word: value for value, words in table.items() for word in words}
+
+
+_RELATIVE_DAY = _lookup(RELATIVE_DAYS)
+_WEEKDAY = _lookup(WEEKDAYS)
+_MONTH_STEM = _lookup(MONTH_STEMS)
+_MONTH_WORD = _lookup(MONTH_WORDS)
+_UNIT = _lookup(UNITS)
+_DAY_PART = _lookup(DAY_PARTS)
+
+_NUM = rf"(?:\d+|{_alternation(NUMBER_WORDS)})"
+_CLOCK = r"\d{1,2}(?::\d{2})?"
+_AMPM = r"(?:a\.?m\.?|p\.?m\.?)(?!\w)"
+_ORDINAL = r"(?:-?(?:inchi|nchi|chi|го|е)|st|nd|rd|th)?"
+
+
+def _month(prefix: str) -> str:
+    return (
+        rf"(?:(?P<{prefix}_stem>{_alternation(_MONTH_STEM)})(?P<{prefix}_suffix>\w*)"
+        rf"|(?P<{prefix}_word>{_alternation(_MONTH_WORD)})\.?(?!\w))"
+    )
+
+
+# Qoidalar tartibi muhim: bir pozitsiyada birinchi mos kelgani olinadi
+RULES: List[Tuple[str, str]] = [
+    ("iso_date", r"(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})(?!\d)"),
+    ("time_range", rf"(?P<tr_a>\d{{1,2}}:\d{{2}})\s*(?:{_alternation(RANGE_SEPARATORS)})\s*(?P<tr_b>\d{{1,2}}:\d{{2}})"),
+    (
+        "numeric_date",
+        r"(?P<nd_d>\d{1,2})[./](?P<nd_m>\d{1,2})[./](?P<nd_y>\d{4}|\d{2})(?![\d.])"
+        rf"|(?<![$€£])(?P<nd_d2>\d{{1,2}})\.(?P<nd_m2>\d{{2}})(?![\d.])(?!\s*(?:{_alternation(QUANTITY_WORDS)}))"
+    ),
+    (
+        "offset_after",
+        rf"(?P<oa_n>{_NUM})\s*(?P<oa_u>{_alternation(_UNIT)})\w*\s+(?:dan\s+)?(?:{_alternation(AFTER_WORDS)})"
+    ),
+    (
+        "day_month",
+        rf"(?P<dm_d>\d{{1,2}}){_ORDINAL}(?:\s*-\s*|\s+)?(?:of\s+)?{_month('dm')}(?:,?\s+(?P<dm_y>\d{{4}}))?"
+    ),
+    ("clock_ampm", rf"(?P<ca_h>\d{{1,2}})(?:[.:](?P<ca_m>\d{{2}}))?\s*(?P<ca_ap>{_AMPM})"),
+    ("clock", rf"(?P<cl_h>\d{{1,2}}):(?P<cl_m>\d{{2}})(?!\d)(?:\s*(?P<cl_ap>{_AMPM}))?"),
+    (
+        "word_range",
+        rf"(?:{_alternation(RANGE_PREFIXES)})\s+(?P<wr_a>{_CLOCK})\s*(?:{_alternation(RANGE_SEPARATORS)})\s*"
+        rf"(?P<wr_b>{_CLOCK})(?!\d)(?:\s*(?P<wr_ap>{_AMPM}))?"
+    ),
+    (
+        "word_clock",
+        rf"(?:{_alternation(CLOCK_PREFIXES)})\s+(?P<wc_h>\d{{1,2}})(?:[.:](?P<wc_m>\d{{2}}))?(?!\d)"
+        rf"(?:\s*(?P<wc_ap>{_AMPM}))?"
+    ),
+    (
+        "offset_before",
+        rf"(?:{_alternation(BEFORE_WORDS)})\s+(?:(?P<ob_n>{_NUM})\s*)?(?P<ob_u>{_alternation(_UNIT)})\w*"
+    ),
+    ("weekday", rf"(?:(?:{_alternation(NEXT_WORDS)})\w*\s+)?(?P<wd>{_alternation(_WEEKDAY)})\w*"),
+    (
+        "next_period",
+        rf"(?:{_alternation(NEXT_WORDS)})\w*\s+(?P<np_u>{_alternation(w for u in ('weeks', 'months', 'years') for w in UNITS[u])})\w*"
+    ),
+    ("month_day", rf"{_month('md')}\s+(?P<md_d>\d{{1,2}}){_ORDINAL}(?!\d)(?:,?\s+(?P<md_y>\d{{4}}))?"),
+    ("relative_day", rf"(?P<rd>{_alternation(_RELATIVE_DAY)})\w*"),
+    ("day_part", rf"(?P<dp>{_alternation(_DAY_PART)})(?!\w)"),
+]
+
+# Qoidalar boshlanishi mumkin bo'lgan so'zlar: boshqa pozitsiyalarda 15 qoida sinab ko'rilmaydi
+# (o'zaklar qo'shimcha bilan, qolganlari - "a", "в", "in" - faqat butun so'z sifatida)
+_LEADING = (
+    rf"\d|(?:{_alternation([*_WEEKDAY, *_MONTH_STEM, *_RELATIVE_DAY, *NEXT_WORDS])})"
+    rf"|(?:{_alternation([*NUMBER_WORDS, *RANGE_PREFIXES, *CLOCK_PREFIXES, *BEFORE_WORDS, *_MONTH_WORD, *_DAY_PART])})(?!\w)"
+)
+
+PATTERN = re.compile(
+    rf"(?<!\w)(?={_LEADING})(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in RULES) + ")"
+)
+
+
+@dataclass
+class TemporalResult:
+    """Matndan topilgan sana, boshlanish/tugash vaqti va topilmalar (tur, matn)"""
+    date: Optional[date] = None
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    matches: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def due_date(self) -> Optional[datetime]:
+        if self.date is None:
+            return None
+        return datetime.combine(self.date, self.start_time or time.min)
+
+
+def _number(value: str) -> int:
+    return int(value) if value.isdigit() else NUMBER_WORDS[value]
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _shift(now: datetime, amount: int, unit: str):
+    """Sana (kun/hafta/oy/yil) yoki aniq vaqt (daqiqa/soat)"""
+    if unit == "minutes":
+        return now + timedelta(minutes=amount)
+    if unit == "hours":
+        return now + timedelta(hours=amount)
+    if unit == "days":
+        return now.date() + timedelta(days=amount)
+    if unit == "weeks":
+        return now.date() + timedelta(weeks=amount)
+    if unit == "months":
+        return _add_months(now.date(), amount)
+    return _add_months(now.date(), 12 * amount)
+
+
+def _clock(hour: str, minute: Optional[str], ampm: Optional[str]) -> Optional[Tuple[time, bool]]:
+    """(vaqt, am/pm aniq ko'rsatilganmi)"""
+    hour, minute = int(hour), int(minute or 0)
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm.startswith("p") else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute), bool(ampm)
+
+
+def _parse_clock(value: str, ampm: Optional[str] = None):
+    hour, _, minute = value.partition(":")
+    return _clock(hour, minute or None, ampm)
+
+
+def _calendar_date(now: datetime, day: str, month: int, year: Optional[str]) -> date:
+    if year is None:
+        result = date(now.year, month, int(day))
+        # Yilsiz o'tgan sana - keyingi yil
+        return result if result >= now.date() else date(now.year + 1, month, int(day))
+    year = int(year)
+    return date(year + 2000 if year < 100 else year, month, int(day))
+
+
+def _month_of(m: "re.Match", prefix: str) -> Optional[int]:
+    stem = m.group(f"{prefix}_stem")
+    if stem:
+        # "3 marta" - "3 marotaba", mart oyi emas
+        if stem == "mart" and m.group(f"{prefix}_suffix") == "a":
+            return None
+        return _MONTH_STEM[stem]
+    return _MONTH_WORD[m.group(f"{prefix}_word")]
+
+
+def _iso_date(m, now):
+    return {"date": date(int(m.group("iso_y")), int(m.group("iso_m")), int(m.group("iso_d")))}
+
+
+def _numeric_date(m, now):
+    if m.group("nd_d"):
+        return {"date": _calendar_date(now, m.group("nd_d"), int(m.group("nd_m")), m.group("nd_y"))}
+    return {"date": _calendar_date(now, m.group("nd_d2"), int(m.group("nd_m2")), None)}
+
+
+def _day_month(m, now):
+    month = _month_of(m, "dm")
+    return month and {"date": _calendar_date(now, m.group("dm_d"), month, m.group("dm_y"))}
+
+
+def _month_day(m, now):
+    month = _month_of(m, "md")
+    return month and {"date": _calendar_date(now, m.group("md_d"), month, m.group("md_y"))}
+
+
+def _offset(amount: int, unit: str, now: datetime):
+    value = _shift(now, amount, unit)
+    if isinstance(value, datetime):
+        return {"moment": value.replace(second=0, microsecond=0)}
+    return {"date": value}
+
+
+def _offset_after(m, now):
+    return _offset(_number(m.group("oa_n")), _UNIT[m.group("oa_u")], now)
+
+
+def _offset_before(m, now):
+    amount = m.group("ob_n")
+    return _offset(_number(amount) if amount else 1, _UNIT[m.group("ob_u")], now)
+
+
+def _next_period(m, now):
+    return _offset(1, _UNIT[m.group("np_u")], now)
+
+
+def _weekday(m, now):
+    days_ahead = (_WEEKDAY[m.group("wd")] - now.weekday()) % 7 or 7
+    return {"date": now.date() + timedelta(days=days_ahead)}
+
+
+def _relative_day(m, now):
+    return {"date": now.date() + timedelta(days=_RELATIVE_DAY[m.group("rd")])}
+
+
+def _time_range(m, now):
+    start, end = _parse_clock(m.group("tr_a")), _parse_clock(m.group("tr_b"))
+    return start and end and {"range": (start, end)}
+
+
+def _word_range(m, now):
+    ampm = m.group("wr_ap")
+    start, end = _parse_clock(m.group("wr_a"), ampm), _parse_clock(m.group("wr_b"), ampm)
+    return start and end and {"range": (start, end)}
+
+
+def _clock_ampm(m, now):
+    clock = _clock(m.group("ca_h"), m.group("ca_m"), m.group("ca_ap"))
+    return clock and {"time": clock}
+
+
+def _colon_clock(m, now):
+    clock = _clock(m.group("cl_h"), m.group("cl_m"), m.group("cl_ap"))
+    return clock and {"time": clock}
+
+
+def _word_clock(m, now):
+    clock = _clock(m.group("wc_h"), m.group("wc_m"), m.group("wc_ap"))
+    return clock and {"time": clock}
+
+
+def _day_part(m, now):
+    return {"part": _DAY_PART[" ".join(m.group("dp").split())]}
+
+
+HANDLERS: Dict[str, Callable] = {
+    "iso_date": _iso_date,
+    "time_range": _time_range,
+    "numeric_date": _numeric_date,
+    "offset_after": _offset_after,
+    "day_month": _day_month,
+    "clock_ampm": _clock_ampm,
+    "clock": _colon_clock,
+    "word_range": _word_range,
+    "word_clock": _word_clock,
+    "offset_before": _offset_before,
+    "weekday": _weekday,
+    "next_period": _next_period,
+    "month_day": _month_day,
+    "relative_day": _relative_day,
+    "day_part": _day_part,
+}
+
+
+def _afternoon(clock: Tuple[time, bool], part) -> time:
+    """"soat 7 kechqurun" -> 19:00 (am/pm aniq bo'lmasa)"""
+    value, explicit = clock
+    if part and part[1] and not explicit and value.hour < 12:
+        return value.replace(hour=value.hour + 12)
+    return value
+
+
+def parse_temporal(text: str, now: Optional[datetime] = None) -> TemporalResult:
+    """Matndagi birinchi sana, birinchi vaqt/oraliq va kun qismini birlashtirish"""
+    now = now or datetime.now()
+    result = TemporalResult()
+    found: Dict[str, object] = {}
+
+    for m in PATTERN.finditer(normalize_text(text)):
+        try:
+            value = HANDLERS[m.lastgroup](m, now)
+        except (ValueError, OverflowError):
+            value = None
+        if not value:
+            continue
+        result.matches.append((m.lastgroup, m.group(0)))
+        for key, item in value.items():
+            found.setdefault(key, item)
+
+    part = found.get("part")
+    if "range" in found:
+        start, end = found["range"]
+        result.start_time, result.end_time = _afternoon(start, part), _afternoon(end, part)
+    elif "time" in found:
+        result.start_time = _afternoon(found["time"], part)
+    elif part:
+        result.start_time = time(part[0], 0)
+
+    result.date = found.get("date")
+    moment = found.get("moment")
+    if moment is not None and result.date is None:
+        result.date = moment.date()
+        result.start_time = result.start_time or moment.time()
+
+    if result.date is None and result.start_time is not None:
+        # Sanasiz vaqt - bugun, o'tib ketgan bo'lsa ertaga
+        today = now.date()
+        result.date = today if datetime.combine(today, result.start_time) > now else today + timedelta(days=1)
+
+    return result
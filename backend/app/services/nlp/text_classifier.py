@@ -1,36 +1,68 @@
-from typing import Dict, List
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
 from app.config.ai_config import ai_config
+from app.services.nlp.model_registry import get_nlp, is_loaded
+from app.services.nlp.keyword_matcher import KeywordMatcher, best_group
 
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-    try:
-        nlp_model = spacy.load(ai_config.nlp_model)
-    except OSError:
-        SPACY_AVAILABLE = False
-        nlp_model = None
-except ImportError:
-    SPACY_AVAILABLE = False
-    nlp_model = None
+
+TRANSACTION_CATEGORIES = {
+    "Oziq-ovqat": ["oziq", "ovqat", "food", "restaurant", "cafe", "taom", "non", "sut"],
+    "Transport": ["transport", "taxi", "metro", "avtobus", "bus", "yo'l", "yolovchi"],
+    "Maosh": ["maosh", "salary", "ish haqi", "daromad", "income"],
+    "Kiyim": ["kiyim", "clothes", "dress", "shoes", "oyoq kiyim"],
+    "Uy": ["uy", "house", "kvartira", "rent", "ijara", "kommunal"],
+    "Telefon": ["telefon", "phone", "internet", "aloqa", "communication"],
+    "Sog'liq": ["sog'liq", "health", "doktor", "doctor", "shifoxona", "hospital"],
+    "Ta'lim": ["ta'lim", "education", "maktab", "school", "universitet", "university"]
+}
+
+DEFAULT_CATEGORY = "Boshqa"
+
+# Modul yuklanganda bir marta kompilyatsiya qilinadi
+CATEGORY_MATCHER = KeywordMatcher(TRANSACTION_CATEGORIES)
+
+
+class _CategoryMemo:
+    """Matn -> kategoriya LRU keshi (jarayon bo'yicha umumiy, bir xil tavsiflar qayta hisoblanmaydi)"""
+
+    def __init__(self):
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[str]:
+        with self._lock:
+            category = self._items.get(text)
+            if category is not None:
+                self._items.move_to_end(text)
+            return category
+
+    def put(self, text: str, category: str):
+        with self._lock:
+            self._items[text] = category
+            self._items.move_to_end(text)
+            while len(self._items) > ai_config.nlp_memo_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+category_memo = _CategoryMemo()
 
 
 class TextClassifier:
     """Matn klassifikatsiyasi servisi"""
     
     def __init__(self):
-        self.nlp = nlp_model if SPACY_AVAILABLE else None
-        
         # Tranzaksiya kategoriya kalit so'zlari
-        self.transaction_categories = {
-            "Oziq-ovqat": ["oziq", "ovqat", "food", "restaurant", "cafe", "taom", "non", "sut"],
-            "Transport": ["transport", "taxi", "metro", "avtobus", "bus", "yo'l", "yolovchi"],
-            "Maosh": ["maosh", "salary", "ish haqi", "daromad", "income"],
-            "Kiyim": ["kiyim", "clothes", "dress", "shoes", "oyoq kiyim"],
-            "Uy": ["uy", "house", "kvartira", "rent", "ijara", "kommunal"],
-            "Telefon": ["telefon", "phone", "internet", "aloqa", "communication"],
-            "Sog'liq": ["sog'liq", "health", "doktor", "doctor", "shifoxona", "hospital"],
-            "Ta'lim": ["ta'lim", "education", "maktab", "school", "universitet", "university"]
-        }
+        self.transaction_categories = TRANSACTION_CATEGORIES
+    
+    @property
+    def nlp(self):
+        """Umumiy spaCy pipeline (birinchi murojaatda yuklanadi)"""
+        return get_nlp()
     
     def classify_transaction(
         self,
@@ -38,32 +70,70 @@ class TextClassifier:
         title: str = ""
     ) -> str:
         """Tranzaksiya tavsifini kategoriyaga ajratish"""
-        text = f"{title} {description}".lower()
+        return self.classify_transactions([(title, description)])[0]
+    
+    def classify_transactions(
+        self,
+        items: Iterable[Tuple[Optional[str], Optional[str]]]
+    ) -> List[str]:
+        """Ko'p tranzaksiyani kategoriyalash; ``items`` - (title, description) juftliklari
+        
+        Bir xil matnlar bir marta hisoblanadi (memo), kalit so'zlar bilan topilmaganlari
+        ``nlp.pipe`` orqali ``ai_config.batch_size`` lik partiyalarda ishlanadi.
+        """
+        texts = [f"{title or ''} {description or ''}".lower() for title, description in items]
+        
+        results: Dict[str, str] = {}
+        unresolved: List[str] = []
+        for text in dict.fromkeys(texts):
+            category = category_memo.get(text)
+            if category is None:
+                # Kategoriya kalit so'zlari bo'yicha tekshirish (bitta o'tish)
+                category = best_group(CATEGORY_MATCHER.scores(text))
+                if category is None:
+                    unresolved.append(text)
+                    continue
+                category_memo.put(text, category)
+            results[text] = category
         
-        # Kategoriya kalit so'zlari bo'yicha tekshirish
-        category_scores = {}
-        for category, keywords in self.transaction_categories.items():
-            score = sum(1 for keyword in keywords if keyword in text)
-            if score > 0:
-                category_scores[category] = score
+        if unresolved:
+            categories = self._classify_with_nlp(unresolved)
+            # Model hali yuklanmagan bo'lsa default natija keshlanmaydi
+            remember = is_loaded()
+            for text, category in zip(unresolved, categories):
+                results[text] = category
+                if remember:
+                    category_memo.put(text, category)
+        
+        return [results[text] for text in texts]
+    
+    def _classify_with_nlp(self, texts: List[str]) -> List[str]:
+        """NLP bilan (agar mavjud bo'lsa): noun va proper noun so'zlarning lemmasini tekshirish
         
-        if category_scores:
-            return max(category_scores.items(), key=lambda x: x[1])[0]
+        Kalit so'zlar token boshidan (qo'shimchalar bilan) allaqachon qidirilgan, shuning
+        uchun bu yerda faqat matndagi shakldan farq qiladigan lemmalar foyda beradi
+        (masalan, noto'g'ri ko'plik yoki fe'l shakllari).
+        """
+        categories = [DEFAULT_CATEGORY] * len(texts)
+        nlp = self.nlp
+        if not nlp:
+            return categories
         
-        # NLP bilan (agar mavjud bo'lsa)
-        if self.nlp:
-            try:
-                doc = self.nlp(text)
-                # Noun va proper noun so'zlarni tekshirish
+        # Bitta jarayon: request thread ichidan har biri modelni qayta yuklaydigan
+        # jarayonlarni ishga tushirish bu arzon o'tish uchun o'zini oqlamaydi
+        try:
+            docs = nlp.pipe(texts, batch_size=ai_config.batch_size)
+            for index, doc in enumerate(docs):
                 for token in doc:
-                    if token.pos_ in ["NOUN", "PROPN"]:
-                        for category, keywords in self.transaction_categories.items():
-                            if token.text.lower() in keywords:
-                                return category
-            except Exception:
-                pass
+                    if token.pos_ in ["NOUN", "PROPN"] and token.lemma_.lower() != token.lower_:
+                        matches = CATEGORY_MATCHER.groups_for(token.lemma_)
+                        if matches:
+                            categories[index] = matches[0]
+                            break
+        except Exception:
+            pass
         
-        return "Boshqa"  # Default kategoriya
+        return categories
     
     def analyze_sentiment(
         self,
@@ -1,23 +1,53 @@
 """
 Notification Service - FCM Push Notifications
 """
+import asyncio
 import os
 import logging
-from typing import List, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, List, Dict, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from app.models import User, Task, Habit
+from app.models import User, Task, Habit, DeviceToken
+from app.services.fcm_client import PushMessage, get_fcm_client
 
 logger = logging.getLogger(__name__)
 
+# Users per device-token query when fanning out
+TOKEN_QUERY_CHUNK = 500
+
+
+@dataclass
+class PushNotification:
+    """One notification for all devices of a user"""
+    user_id: str
+    title: str
+    body: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+def prune_device_tokens(db: Session, tokens: List[str]) -> int:
+    """Delete tokens FCM reported as unregistered or invalid"""
+    if not tokens:
+        return 0
+    removed = db.query(DeviceToken).filter(DeviceToken.token.in_(tokens)).delete(synchronize_session=False)
+    db.commit()
+    logger.info(f"Pruned {removed} invalid device tokens")
+    return removed
+
 
 class NotificationService:
     """Service for sending push notifications"""
     
     def __init__(self, db: Session):
         self.db = db
-        self.fcm_enabled = os.getenv("FCM_ENABLED", "false").lower() == "true"
+        self.fcm_enabled = self.fcm_configured()
         self.fcm_server_key = os.getenv("FCM_SERVER_KEY", "")
+    
+    @staticmethod
+    def fcm_configured() -> bool:
+        """Whether push delivery is switched on (FCM_ENABLED)"""
+        return os.getenv("FCM_ENABLED", "false").lower() == "true"
         
     async def register_device(self, user_id: str, device_token: str, platform: str = "web") -> bool:
         """
@@ -32,14 +62,73 @@ class NotificationService:
             bool: Success status
         """
         try:
-            # In a real implementation, you would store device tokens in a database
-            # For now, we'll just log it
+            # A token identifies one app install; it moves to whoever signed in last
+            existing = self.db.query(DeviceToken).filter(DeviceToken.token == device_token).first()
+            if existing:
+                existing.user_id = user_id
+                existing.platform = platform
+                existing.last_seen_at = datetime.utcnow()
+            else:
+                self.db.add(DeviceToken(user_id=user_id, token=device_token, platform=platform))
+            self.db.commit()
             logger.info(f"Device registered: user={user_id}, platform={platform}, token={device_token[:20]}...")
             return True
         except Exception as e:
+            self.db.rollback()
             logger.error(f"Error registering device: {str(e)}")
             return False
     
+    async def send_push_batch(self, notifications: List[PushNotification]) -> Dict[str, int]:
+        """
+        Fan notifications out to every registered device of their users
+        
+        Device tokens are loaded in chunks, all messages are sent concurrently
+        through the shared FCM client and tokens FCM rejects are pruned.
+        
+        Returns:
+            Dict: sent, failed and pruned message counts
+        """
+        summary = {"sent": 0, "failed": 0, "pruned": 0}
+        client = get_fcm_client()
+        if not self.fcm_enabled or client is None:
+            logger.warning("FCM not enabled, skipping notification")
+            return summary
+        
+        by_user: Dict[str, List[PushNotification]] = {}
+        for notification in notifications:
+            by_user.setdefault(notification.user_id, []).append(notification)
+        
+        # Token queries and pruning hit the database; keep them off the event loop
+        messages = await asyncio.to_thread(self._load_messages, by_user)
+        results = await client.send_many(messages)
+        invalid = []
+        for result in results:
+            if result.success:
+                summary["sent"] += 1
+            else:
+                summary["failed"] += 1
+                if result.invalid_token:
+                    invalid.append(result.token)
+                else:
+                    logger.warning(f"Push to {result.token[:20]}... failed: {result.error}")
+        summary["pruned"] = await asyncio.to_thread(prune_device_tokens, self.db, sorted(set(invalid)))
+        return summary
+    
+    def _load_messages(self, by_user: Dict[str, List[PushNotification]]) -> List[PushMessage]:
+        """Build one message per device token, querying tokens in chunks of users"""
+        user_ids = list(by_user)
+        messages: List[PushMessage] = []
+        for start in range(0, len(user_ids), TOKEN_QUERY_CHUNK):
+            rows = (
+                self.db.query(DeviceToken.user_id, DeviceToken.token)
+                .filter(DeviceToken.user_id.in_(user_ids[start:start + TOKEN_QUERY_CHUNK]))
+                .all()
+            )
+            for user_id, token in rows:
+                for notification in by_user[user_id]:
+                    messages.append(PushMessage(token, notification.title, notification.body, notification.data))
+        return messages
+    
     async def send_task_reminder(self, user_id: str, task: Task) -> bool:
         """
         Send task reminder notification
@@ -52,13 +141,13 @@ class NotificationService:
             bool: Success status
         """
         try:
-            if not self.fcm_enabled:
-                logger.warning("FCM not enabled, skipping notification")
-                return False
-            
-            # In a real implementation, you would send FCM notification here
-            logger.info(f"Sending task reminder: user={user_id}, task={task.title}")
-            return True
+            summary = await self.send_push_batch([PushNotification(
+                user_id=user_id,
+                title="Vazifa eslatmasi",
+                body=task.title,
+                data={"type": "task_reminder", "task_id": task.id},
+            )])
+            return summary["sent"] > 0
         except Exception as e:
             logger.error(f"Error sending task reminder: {str(e)}")
             return False
@@ -75,13 +164,13 @@ class NotificationService:
             bool: Success status
         """
         try:
-            if not self.fcm_enabled:
-                logger.warning("FCM not enabled, skipping notification")
-                return False
-            
-            # In a real implementation, you would send FCM notification here
-            logger.info(f"Sending habit reminder: user={user_id}, habit={habit.title}")
-            return True
+            summary = await self.send_push_batch([PushNotification(
+                user_id=user_id,
+                title="Odat eslatmasi",
+                body=habit.title,
+                data={"type": "habit_reminder", "habit_id": habit.id},
+            )])
+            return summary["sent"] > 0
         except Exception as e:
             logger.error(f"Error sending habit reminder: {str(e)}")
             return False
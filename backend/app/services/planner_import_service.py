@@ -0,0 +1,357 @@
+"""
+Planner workbook import
+
+Reads the "Ongli Tizim" Google Sheets planners (Vazifalar, Odatlar, Produktivlik
+and Фин план, downloaded as .xlsx) and the XLSX files produced by our own export.
+Workbooks are opened in openpyxl ``read_only`` mode, so sheets are parsed row by
+row from the zip stream, and the extracted records are fed to
+``BulkImportService.upsert_stream`` in chunks.
+
+Planner cells are addressed by the template's fixed layout (see the ``*_TABLES``
+specs below). Records get deterministic ids derived from the sheet position or
+habit title, so importing the same workbook again updates instead of duplicating.
+"""
+import calendar
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string
+from sqlalchemy.orm import Session
+from app.services.bulk_import_service import BulkImportService, IMPORT_SPECS
+from app.services.export_import_service import unescape_cell
+
+Record = Tuple[str, Dict[str, Any]]
+
+UZ_MONTH_SHEETS = ["Yan", "Fev", "Mart", "Apr", "May", "Iyun", "Iyul", "Avg", "Sen", "Okt", "Noy", "Dek"]
+RU_MONTHS = [
+    "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+    "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь",
+]
+
+# Dropdown labels from the planners' "Sozlamalar" sheet (emoji prefix stripped, lowercased)
+PRIORITIES = {"unchalik muhimmas": "low", "o'rtacha muhim": "medium", "muhim": "high", "o'ta muhim": "high"}
+STATUSES = {
+    "bajarildi": "done", "jarayonda": "in_progress", "bekor qilindi": "cancelled",
+    "hali boshlanmadi": "pending", "vaqtidan o'tib ketti": "pending",
+}
+DAY_PARTS = {"утро": time(9), "полдень": time(12), "вечер": time(18)}
+# 1-10 "Kayfiyat" scale -> ProductivityLog.mood
+MOODS = [(9, "great"), (7, "good"), (5, "ok"), (3, "bad"), (1, "terrible")]
+
+_LABEL_PREFIX = re.compile(r"^[\W_]+")
+
+
+@dataclass(frozen=True)
+class TaskTable:
+    """A task list on a planner sheet: header check, first data row and field columns"""
+    sheet: str
+    header_row: int
+    header: Tuple[str, str]  # (column, expected header text)
+    first_row: int
+    columns: Dict[str, str]
+
+
+TASK_TABLES = [
+    # Vazifalar planneri
+    TaskTable("Vazifalar nazorati", 9, ("C", "Vazifa nomi"), 10, {
+        "done": "B", "title": "C", "priority": "D", "status": "E", "category": "F", "description": "G",
+    }),
+    TaskTable("Kalendar", 9, ("B", "Vazifa nomi"), 10, {"done": "B", "title": "C", "due_date": "I"}),
+    TaskTable("Kalendar", 9, ("AW", "Задача"), 10, {"title": "AW", "due_date": "BD"}),
+    # Produktivlik planneri
+    TaskTable("Vazifalar", 5, ("I", "Vazifa"), 7, {
+        "done": "H", "title": "I", "due_date": "Q", "time": "S", "description": "X",
+    }),
+]
+
+# Фин план month sheets: (transaction_type, {field: column}), data from row 45
+FINANCE_FIRST_ROW = 45
+FINANCE_TABLES = [
+    ("expense", {"date": "B", "category": "E", "amount": "Q", "note": "T"}),
+    ("income", {"date": "AF", "category": "AI", "amount": "AU", "note": "AX"}),
+]
+
+
+def _column(letter: str) -> int:
+    return column_index_from_string(letter) - 1
+
+
+def _cell(row: tuple, index: int):
+    return row[index] if index < len(row) else None
+
+
+def _label(value) -> str:
+    """Dropdown text without its emoji prefix"""
+    return _LABEL_PREFIX.sub("", str(value)).strip() if value is not None else ""
+
+
+def _whole(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _clock(value) -> Optional[time]:
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, time):
+        return value
+    text = _label(value).lower()
+    if text in DAY_PARTS:
+        return DAY_PARTS[text]
+    for pattern in ("%I:%M %p", "%H:%M"):
+        try:
+            return datetime.strptime(text.upper(), pattern).time()
+        except ValueError:
+            continue
+    return None
+
+
+def _mood(value) -> Optional[str]:
+    score = _whole(value)
+    if score is None:
+        return None
+    for threshold, mood in MOODS:
+        if score >= threshold:
+            return mood
+    return MOODS[-1][1]
+
+
+def _longest_run(days: List[date]) -> int:
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    return longest
+
+
+class PlannerWorkbookReader:
+    """Extract ``(section, record)`` pairs from one workbook opened in read-only mode"""
+
+    def __init__(self, fileobj: BinaryIO, user_id: str):
+        self.workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        self.user_id = user_id
+        self.sheets: Set[str] = set(self.workbook.sheetnames)
+        # Daily aggregates shared by the habit grid and the productivity plan
+        self.days: Dict[date, Dict[str, Any]] = {}
+
+    def close(self) -> None:
+        self.workbook.close()
+
+    def _id(self, *parts) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, "/".join(str(part) for part in (self.user_id, *parts))))
+
+    def _rows(self, sheet: str, first_row: int = 1, max_col: Optional[int] = None) -> Iterator[Tuple[int, tuple]]:
+        rows = self.workbook[sheet].iter_rows(min_row=first_row, max_col=max_col, values_only=True)
+        return enumerate(rows, start=first_row)
+
+    def records(self) -> Iterator[Record]:
+        yield from self.export_sheets()
+        yield from self.task_tables()
+        yield from self.finance_months()
+        yield from self.habit_months()
+        self.productivity_plan()
+        for day, values in sorted(self.days.items()):
+            yield "productivity_logs", {"log_date": day, **values}
+
+    def export_sheets(self) -> Iterator[Record]:
+        """Sheets of our own XLSX export: a header row of column names, one record per row"""
+        for section in IMPORT_SPECS:
+            if section not in self.sheets:
+                continue
+            header = None
+            for _, row in self._rows(section):
+                if header is None:
+                    header = [str(value) if value is not None else "" for value in row]
+                    continue
+                if any(value is not None for value in row):
+                    yield section, {key: unescape_cell(value) for key, value in zip(header, row) if key}
+
+    def task_tables(self) -> Iterator[Record]:
+        for table in TASK_TABLES:
+            if table.sheet not in self.sheets:
+                continue
+            columns = {field: _column(letter) for field, letter in table.columns.items()}
+            header_column = _column(table.header[0])
+            for number, row in self._rows(table.sheet, table.header_row, max_col=max(columns.values()) + 1):
+                if number == table.header_row:
+                    if _label(_cell(row, header_column)) != table.header[1]:
+                        break  # not this template
+                    continue
+                if number < table.first_row:
+                    continue
+                title = _cell(row, columns["title"])
+                if title is None or not str(title).strip():
+                    continue
+                yield "tasks", self._task(table, number, row, columns)
+
+    def _task(self, table: TaskTable, number: int, row: tuple, columns: Dict[str, int]) -> Dict[str, Any]:
+        def value(field: str):
+            return _cell(row, columns[field]) if field in columns else None
+
+        record = {"id": self._id(table.sheet, table.columns["title"], number), "title": str(value("title")).strip()}
+        if value("description") is not None:
+            record["description"] = str(value("description"))
+        if value("category") is not None:
+            record["category"] = _label(value("category"))
+        priority = PRIORITIES.get(_label(value("priority")).lower())
+        if priority:
+            record["priority"] = priority
+        status = STATUSES.get(_label(value("status")).lower())
+        if value("done") is True:
+            status = "done"
+        if status:
+            record["status"] = status
+        due = value("due_date")
+        if isinstance(due, (date, datetime)):
+            clock = _clock(value("time"))
+            due = due if isinstance(due, datetime) else datetime.combine(due, time())
+            if clock is not None:
+                due = datetime.combine(due.date(), clock)
+                record["start_time"] = clock.strftime("%H:%M")
+            record["due_date"] = due
+        return record
+
+    def finance_months(self) -> Iterator[Record]:
+        tables = [
+            (kind, {field: _column(letter) for field, letter in columns.items()})
+            for kind, columns in FINANCE_TABLES
+        ]
+        max_col = max(index for _, columns in tables for index in columns.values()) + 1
+        year_column = _column("H")
+        for sheet in RU_MONTHS:
+            if sheet not in self.sheets:
+                continue
+            year = None
+            for number, row in self._rows(sheet, 10, max_col=max_col):
+                if number == 10:
+                    year = _whole(_cell(row, year_column))  # "Йилни танланг"
+                    continue
+                if number < FINANCE_FIRST_ROW:
+                    continue
+                for kind, columns in tables:
+                    category = _label(_cell(row, columns["category"]))
+                    amount = _cell(row, columns["amount"])
+                    if not category and amount is None:
+                        continue
+                    note = _cell(row, columns["note"])
+                    yield "transactions", {
+                        "id": self._id(sheet, year, kind, number),
+                        "title": str(note).strip() if note else category,
+                        "description": str(note) if note else None,
+                        "category": category or "Boshqa",
+                        "amount": amount,
+                        "transaction_type": kind,
+                        "transaction_date": _cell(row, columns["date"]),
+                    }
+
+    def habit_months(self) -> Iterator[Record]:
+        """Odatlar planneri: habit names in B10:B21, daily checkboxes under the day numbers in row 9"""
+        if "Dashboard" not in self.sheets or not self.sheets.intersection(UZ_MONTH_SHEETS):
+            return
+        year = None
+        for number, row in self._rows("Dashboard", 3, max_col=_column("Q") + 1):
+            year = _whole(_cell(row, _column("Q")))
+            break
+        if year is None:
+            return
+
+        completions: Dict[str, Set[date]] = {}
+        for month, sheet in enumerate(UZ_MONTH_SHEETS, start=1):
+            if sheet not in self.sheets:
+                continue
+            days: Dict[int, date] = {}
+            habits = 0
+            for number, row in self._rows(sheet, 9, max_col=_column("AG") + 1):
+                if number == 9:
+                    for index in range(_column("C"), len(row)):
+                        day = _whole(row[index])
+                        if day and day <= calendar.monthrange(year, month)[1]:
+                            days[index] = date(year, month, day)
+                elif number <= 21:
+                    title = row[1] if len(row) > 1 else None
+                    if title is None or not str(title).strip():
+                        continue
+                    habits += 1
+                    done = completions.setdefault(str(title).strip(), set())
+                    for index, day in days.items():
+                        if _cell(row, index) is True:
+                            done.add(day)
+                            self._day(day)["habits_completed"] = self._day(day).get("habits_completed", 0) + 1
+                elif number in (37, 38):  # Kayfiyat, Energiya (1-10)
+                    for index, day in days.items():
+                        value = _cell(row, index)
+                        if value is None:
+                            continue
+                        if number == 37:
+                            self._day(day)["mood"] = _mood(value)
+                        else:
+                            self._day(day)["energy_level"] = _whole(value)
+                elif number > 38:
+                    break
+            for day in days.values():
+                if day in self.days and "habits_completed" in self.days[day]:
+                    self.days[day]["habits_total"] = habits
+
+        for title, done in completions.items():
+            yield "habits", {
+                "id": self._id("habit", title),
+                "title": title,
+                "total_completions": len(done),
+                "longest_streak": _longest_run(sorted(done)),
+            }
+
+    def productivity_plan(self) -> None:
+        """Produktivlik planneri "Rejalar": plan items in B11:B22, one month of daily checkboxes"""
+        if "Rejalar" not in self.sheets:
+            return
+        year = month = None
+        days: Dict[int, date] = {}
+        totals: Dict[date, int] = {}
+        items = 0
+        for number, row in self._rows("Rejalar", 2, max_col=_column("AG") + 1):
+            if number == 2:
+                year = _whole(_cell(row, _column("C")))
+            elif number == 8:
+                label = _label(_cell(row, _column("B")))
+                month = RU_MONTHS.index(label) + 1 if label in RU_MONTHS else None
+            elif number == 10 and year and month:
+                for index in range(_column("C"), len(row)):
+                    day = _whole(row[index])
+                    if day and day <= calendar.monthrange(year, month)[1]:
+                        days[index] = date(year, month, day)
+            elif 11 <= number <= 22:
+                title = _cell(row, _column("B"))
+                if title is None or not str(title).strip():
+                    continue
+                items += 1
+                for index, day in days.items():
+                    if _cell(row, index) is True:
+                        totals[day] = totals.get(day, 0) + 1
+            elif number > 22:
+                break
+        for day, completed in totals.items():
+            self._day(day).update(tasks_completed=completed, tasks_total=items)
+
+    def _day(self, day: date) -> Dict[str, Any]:
+        return self.days.setdefault(day, {})
+
+
+class PlannerImportService:
+    """Import planner workbooks through the bulk upsert engine"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def import_workbook(self, user_id: str, fileobj: BinaryIO) -> Dict[str, Dict[str, Any]]:
+        reader = PlannerWorkbookReader(fileobj, user_id)
+        try:
+            return BulkImportService(self.db).upsert_stream(user_id, reader.records())
+        finally:
+            reader.close()
@@ -0,0 +1,215 @@
+"""
+Async Telegram Bot API client
+
+One shared ``httpx.AsyncClient`` keeps connections to the Bot API alive between
+calls. Sends go through token buckets that follow Telegram's broadcast limits
+(global, per private chat and per group), and a 429 response pauses the affected
+bucket for the ``retry_after`` the API asks for before the call is retried.
+"""
+import asyncio
+import logging
+import random
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Union
+import httpx
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ChatId = Union[int, str]
+
+MAX_CHAT_BUCKETS = 10000
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 10.0
+
+
+class TelegramAPIError(Exception):
+    """A Bot API call that failed (after retries, where they apply)"""
+
+    def __init__(self, method: str, description: str, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(f"{method} failed ({status_code}): {description}")
+        self.method = method
+        self.description = description
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Token bucket in GCRA form: ``rate`` tokens per second, bursts of up to ``capacity``
+
+    Callers reserve a slot and sleep until it, so waiting senders are served in
+    arrival order without a lock.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.interval = 1.0 / rate
+        self.tolerance = (capacity - 1) * self.interval
+        self.tat = 0.0  # theoretical arrival time of the next request
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return how long to wait before using it"""
+        tat = max(self.tat, now)
+        self.tat = tat + self.interval
+        return max(0.0, tat - self.tolerance - now)
+
+    def pause(self, now: float, seconds: float) -> None:
+        """No tokens before ``now + seconds``"""
+        self.tat = max(self.tat, now + seconds + self.tolerance)
+
+    def idle(self, now: float) -> bool:
+        return self.tat <= now
+
+
+class TelegramRateLimiter:
+    """Global bucket plus one bucket per chat (groups have negative chat ids)"""
+
+    def __init__(self, global_rate: float, chat_rate: float, group_rate: float):
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chats: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self.chats.get(key)
+        if bucket is None:
+            rate = self.group_rate if key.startswith("-") else self.chat_rate
+            bucket = self.chats[key] = TokenBucket(rate)
+            # Buckets that have refilled carry no state and can be dropped
+            now = self._now()
+            while len(self.chats) > MAX_CHAT_BUCKETS and self.chats[next(iter(self.chats))].idle(now):
+                self.chats.popitem(last=False)
+        else:
+            self.chats.move_to_end(key)
+        return bucket
+
+    async def acquire(self, chat_id: Optional[ChatId] = None) -> None:
+        # The chat slot comes first so a throttled chat doesn't hold global capacity while it waits
+        if chat_id is not None:
+            await self._wait(self.chat_bucket(chat_id))
+        await self._wait(self.global_bucket)
+
+    async def _wait(self, bucket: TokenBucket) -> None:
+        delay = bucket.reserve(self._now())
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, chat_id: Optional[ChatId], seconds: float) -> None:
+        bucket = self.chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+        bucket.pause(self._now(), seconds)
+
+
+class TelegramBotClient:
+    """Bot API methods over a pooled async HTTP client"""
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = "https://api.telegram.org",
+        limiter: Optional[TelegramRateLimiter] = None,
+        max_retries: int = 3,
+        timeout: float = 10.0,
+        pool_size: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.limiter = limiter or TelegramRateLimiter(30, 1, 20 / 60)
+        self.max_retries = max_retries
+        self.http = httpx.AsyncClient(
+            base_url=f"{base_url.rstrip('/')}/bot{token}/",
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=60),
+            transport=transport,
+        )
+
+    async def call(self, method: str, payload: Optional[Dict[str, Any]] = None,
+                   chat_id: Optional[ChatId] = None) -> Any:
+        """Call a Bot API method and return its ``result``
+
+        429 responses wait ``retry_after``; network errors and 5xx back off
+        exponentially. Other errors raise ``TelegramAPIError`` immediately.
+        """
+        for attempt in range(self.max_retries + 1):
+            last = attempt == self.max_retries
+            await self.limiter.acquire(chat_id)
+            try:
+                response = await self.http.post(method, json=payload or {})
+            except httpx.TransportError as e:
+                if last:
+                    raise TelegramAPIError(method, str(e) or type(e).__name__)
+                logger.warning(f"Telegram {method} network error, retrying: {e!r}")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            description = data.get("description") or response.reason_phrase
+
+            if response.status_code == 429:
+                retry_after = float((data.get("parameters") or {}).get("retry_after")
+                                    or response.headers.get("Retry-After") or 1)
+                if last:
+                    raise TelegramAPIError(method, description, 429, retry_after)
+                logger.warning(f"Telegram {method} rate limited for chat {chat_id}, retrying in {retry_after}s")
+                self.limiter.pause(chat_id, retry_after)
+                continue
+            if response.status_code >= 500:
+                if last:
+                    raise TelegramAPIError(method, description, response.status_code)
+                logger.warning(f"Telegram {method} returned {response.status_code}, retrying")
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            if not data.get("ok"):
+                raise TelegramAPIError(method, description, response.status_code)
+            return data.get("result")
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def send_message(self, chat_id: ChatId, text: str, parse_mode: Optional[str] = None,
+                           **params: Any) -> Dict[str, Any]:
+        payload = {"chat_id": chat_id, "text": text, **params}
+        if parse_mode:
+            payload["parse_mode"] = parse_mode
+        return await self.call("sendMessage", payload, chat_id=chat_id)
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+
+_client: Optional[TelegramBotClient] = None
+
+
+def get_telegram_client() -> Optional[TelegramBotClient]:
+    """Shared client for the configured bot, or None without a token"""
+    global _client
+    if not settings.telegram_bot_token:
+        return None
+    if _client is None:
+        _client = TelegramBotClient(
+            settings.telegram_bot_token,
+            base_url=settings.telegram_api_url,
+            limiter=TelegramRateLimiter(
+                settings.telegram_global_rate,
+                settings.telegram_chat_rate,
+                settings.telegram_group_rate_per_minute / 60,
+            ),
+            max_retries=settings.telegram_max_retries,
+            timeout=settings.telegram_timeout_seconds,
+            pool_size=settings.telegram_pool_size,
+        )
+    return _client
+
+
+async def close_telegram_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
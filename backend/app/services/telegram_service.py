@@ -8,9 +8,9 @@ from datetime import datetime, timedelta
 from typing import Optional
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.models.telegram_code import TelegramCode
 from app.models.telegram_user import TelegramUser
-import requests
+from app.services.background.outbox import enqueue_message
+from app.services.code_store import VerifyResult, get_code_store, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -47,58 +47,41 @@ def generate_code() -> str:
     return str(random.randint(100000, 999999)).zfill(6)
 
 
-def send_telegram_message(db: Session, phone_number: str, code: str) -> bool:
+def queue_code_message(db: Session, phone_number: str, code: str) -> None:
     """
-    Send verification code via Telegram Bot API
+    Queue verification code for delivery via the outbox (sent by the outbox worker)
     Gets chat_id from database (phone_number -> chat_id mapping)
+    The message is added to the session; the caller commits it together with the code
     """
     if not settings.telegram_bot_token:
         logger.warning("TELEGRAM_BOT_TOKEN not set, logging code instead")
         logger.info(f"Verification code for {phone_number}: {code}")
-        return True
+        return
     
-    try:
-        normalized_phone = normalize_phone_number(phone_number)
-        
-        # Get chat_id from database
-        telegram_user = db.query(TelegramUser).filter(
-            TelegramUser.phone_number == normalized_phone
-        ).first()
-        
-        if not telegram_user:
-            # User hasn't registered phone number with bot yet
-            logger.warning(f"No chat_id found for phone number: {normalized_phone}. User must send phone number to bot first.")
-            logger.info(f"Verification code for {phone_number}: {code} (logged because chat_id not found)")
-            return True
-        
-        chat_id = telegram_user.chat_id
-        
-        # Send code via Telegram Bot API
-        url = f"https://api.telegram.org/bot{settings.telegram_bot_token}/sendMessage"
-        payload = {
-            "chat_id": chat_id,
-            "text": f"🔐 Sizning tasdiqlash kodingiz: {code}\n\n⏱ Muddati: {settings.telegram_code_expire_minutes} daqiqa"
-        }
-        response = requests.post(url, json=payload, timeout=5)
-        
-        if response.status_code == 200:
-            logger.info(f"Code sent successfully to Telegram chat_id: {chat_id} (phone: {normalized_phone})")
-            return True
-        else:
-            logger.error(f"Failed to send Telegram message. Status: {response.status_code}, Response: {response.text}")
-            return False
-        
-    except Exception as e:
-        logger.error(f"Error sending Telegram message: {e}", exc_info=True)
-        # Fallback: log the code
-        logger.info(f"Verification code for {phone_number}: {code} (logged due to error)")
-        return True
+    normalized_phone = normalize_phone_number(phone_number)
+    
+    # Get chat_id from database
+    telegram_user = db.query(TelegramUser).filter(
+        TelegramUser.phone_number == normalized_phone
+    ).first()
+    
+    if not telegram_user:
+        # User hasn't registered phone number with bot yet
+        logger.warning(f"No chat_id found for phone number: {normalized_phone}. User must send phone number to bot first.")
+        logger.info(f"Verification code for {phone_number}: {code} (logged because chat_id not found)")
+        return
+    
+    text = f"🔐 Sizning tasdiqlash kodingiz: {code}\n\n⏱ Muddati: {settings.telegram_code_expire_minutes} daqiqa"
+    # A code delivered after it expired is useless; the outbox drops it instead of retrying
+    expires_at = datetime.utcnow() + timedelta(minutes=settings.telegram_code_expire_minutes)
+    enqueue_message(db, "telegram", telegram_user.chat_id, {"text": text}, expires_at=expires_at)
+    logger.info(f"Code queued for Telegram chat_id: {telegram_user.chat_id} (phone: {normalized_phone})")
 
 
-def create_code(db: Session, phone_number: str) -> Optional[str]:
+def create_code(db: Session, phone_number: str, client_ip: Optional[str] = None) -> Optional[str]:
     """
     Create and send verification code
-    Returns code if successful, None otherwise
+    Returns code if successful, None otherwise (invalid phone number or rate limited)
     """
     normalized_phone = normalize_phone_number(phone_number)
     
@@ -106,88 +89,128 @@ def create_code(db: Session, phone_number: str) -> Optional[str]:
         logger.warning(f"Invalid phone number format: {phone_number}")
         return None
     
-    # Check rate limiting
-    existing_code = db.query(TelegramCode).filter(
-        TelegramCode.phone_number == normalized_phone
-    ).first()
-    
-    if existing_code:
-        time_since_creation = datetime.utcnow() - existing_code.created_at.replace(tzinfo=None)
-        if time_since_creation.total_seconds() < settings.telegram_code_rate_limit_minutes * 60:
-            logger.warning(f"Rate limit: code already sent to {normalized_phone} recently")
-            return None
+    # Sliding-window rate limits per phone number and per client IP
+    rules = [(
+        f"send:phone:{normalized_phone}",
+        settings.telegram_code_phone_limit,
+        settings.telegram_code_rate_limit_minutes * 60,
+    )]
+    if client_ip:
+        rules.append((
+            f"send:ip:{client_ip}",
+            settings.telegram_code_ip_limit,
+            settings.telegram_code_ip_window_minutes * 60,
+        ))
+    if not get_rate_limiter().hit(*rules):
+        logger.warning(f"Rate limit: code already sent to {normalized_phone} recently (ip: {client_ip})")
+        return None
     
-    # Generate code
+    # Generate code; a new code replaces the previous one
     code = generate_code()
-    expires_at = datetime.utcnow() + timedelta(minutes=settings.telegram_code_expire_minutes)
+    get_code_store().issue(normalized_phone, code, settings.telegram_code_expire_minutes * 60)
     
-    # Delete old code if exists
-    if existing_code:
-        db.delete(existing_code)
-    
-    # Create new code
-    telegram_code = TelegramCode(
-        phone_number=normalized_phone,
-        code=code,
-        expires_at=expires_at,
-        attempts=0
-    )
-    db.add(telegram_code)
+    # Queue the Telegram message
+    queue_code_message(db, normalized_phone, code)
     db.commit()
-    
-    # Send code via Telegram
-    if send_telegram_message(db, normalized_phone, code):
-        logger.info(f"Code sent successfully to {normalized_phone}")
-        return code
-    else:
-        # If sending failed, delete the code
-        db.delete(telegram_code)
-        db.commit()
-        return None
+    return code
 
 
-def verify_code(db: Session, phone_number: str, code: str) -> bool:
+def verify_code(phone_number: str, code: str, client_ip: Optional[str] = None) -> bool:
     """
-    Verify code and increment attempts
+    Verify code and count the attempt
     Returns True if code is valid, False otherwise
     """
     normalized_phone = normalize_phone_number(phone_number)
     
-    telegram_code = db.query(TelegramCode).filter(
-        TelegramCode.phone_number == normalized_phone
-    ).first()
-    
-    if not telegram_code:
-        logger.warning(f"No code found for phone number: {normalized_phone}")
+    if client_ip and not get_rate_limiter().hit((
+        f"verify:ip:{client_ip}",
+        settings.telegram_verify_ip_limit,
+        settings.telegram_code_ip_window_minutes * 60,
+    )):
+        logger.warning(f"Rate limit: too many verification attempts from {client_ip}")
         return False
     
-    # Check if code expired
-    if datetime.utcnow() > telegram_code.expires_at.replace(tzinfo=None):
-        logger.warning(f"Code expired for phone number: {normalized_phone}")
-        db.delete(telegram_code)
-        db.commit()
-        return False
-    
-    # Check attempts limit
-    if telegram_code.attempts >= settings.telegram_code_attempts:
-        logger.warning(f"Too many attempts for phone number: {normalized_phone}")
-        db.delete(telegram_code)
-        db.commit()
-        return False
-    
-    # Increment attempts
-    telegram_code.attempts += 1
-    
-    # Verify code
-    if telegram_code.code == code:
-        # Code is valid, delete it
-        db.delete(telegram_code)
-        db.commit()
+    result = get_code_store().verify(normalized_phone, code, settings.telegram_code_attempts)
+    if result == VerifyResult.VALID:
         logger.info(f"Code verified successfully for {normalized_phone}")
         return True
+    
+    if result == VerifyResult.MISSING:
+        logger.warning(f"No valid code found for phone number: {normalized_phone}")
+    elif result == VerifyResult.EXHAUSTED:
+        logger.warning(f"Too many attempts for phone number: {normalized_phone}")
     else:
-        # Code is invalid, save attempts
-        db.commit()
-        logger.warning(f"Invalid code attempt for {normalized_phone} (attempt {telegram_code.attempts}/{settings.telegram_code_attempts})")
-        return False
+        logger.warning(f"Invalid code attempt for {normalized_phone}")
+    return False
+
+WELCOME_MESSAGE = (
+    "👋 Salom! Tizim AI bot'iga xush kelibsiz!\n\n"
+    "📱 Autentifikatsiya kodini olish uchun telefon raqamingizni yuboring.\n"
+    "📝 Format: +998901234567 yoki 998901234567\n\n"
+    "Masalan: +998901234567"
+)
+
+INVALID_PHONE_MESSAGE = (
+    "❌ Telefon raqam formati noto'g'ri!\n\n"
+    "✅ To'g'ri format: +998901234567\n"
+    "Masalan: +998901234567"
+)
+
+
+def update_chat_id(update: dict) -> Optional[str]:
+    """Chat an update belongs to (updates of one chat are processed in order)"""
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post", "my_chat_member", "chat_member"):
+        chat = (update.get(key) or {}).get("chat")
+        if chat and "id" in chat:
+            return str(chat["id"])
+    callback = update.get("callback_query")
+    if callback:
+        chat = (callback.get("message") or {}).get("chat") or callback.get("from") or {}
+        if "id" in chat:
+            return str(chat["id"])
+    return None
 
+
+def handle_update(db: Session, update: dict) -> None:
+    """
+    Handle one Telegram Bot update
+    Replies are queued in the outbox; the caller commits them together with any
+    phone number -> chat_id mapping changes
+    """
+    if "message" not in update:
+        return
+    
+    message = update["message"]
+    chat_id = str(message["chat"]["id"])
+    text = (message.get("text") or "").strip()
+    
+    # Handle /start command
+    if text == "/start":
+        enqueue_message(db, "telegram", chat_id, {"text": WELCOME_MESSAGE, "parse_mode": "HTML"})
+    
+    # Handle phone number
+    elif text.startswith("+") or text.replace(" ", "").isdigit():
+        phone_text = text.replace(" ", "").replace("-", "")
+        normalized_phone = normalize_phone_number(phone_text)
+        
+        if not validate_phone_number(normalized_phone):
+            enqueue_message(db, "telegram", chat_id, {"text": INVALID_PHONE_MESSAGE, "parse_mode": "HTML"})
+            return
+        
+        # Save or update phone number -> chat_id mapping
+        existing = db.query(TelegramUser).filter(
+            TelegramUser.phone_number == normalized_phone
+        ).first()
+        
+        if existing:
+            # Update chat_id if changed
+            existing.chat_id = chat_id
+        else:
+            db.add(TelegramUser(phone_number=normalized_phone, chat_id=chat_id))
+        
+        success_message = (
+            f"✅ Telefon raqamingiz qabul qilindi: {normalized_phone}\n\n"
+            "🔐 Endi web ilovada telefon raqamingizni kiriting va tasdiqlash kodini oling."
+        )
+        enqueue_message(db, "telegram", chat_id, {"text": success_message, "parse_mode": "HTML"})
+        logger.info(f"Phone number registered: {normalized_phone} -> {chat_id}")
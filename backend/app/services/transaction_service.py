@@ -4,8 +4,53 @@ from typing import Optional, List
 from datetime import date
 from app.models import Transaction
 from app.schemas.transaction import TransactionCreate, TransactionUpdate, TransactionStats
+from app.services.ai.anomaly_detection_service import AnomalyDetectionService
+from app.services.ai.expense_stats_service import ExpenseStatsService
+from app.services.ai.category_model_service import CategoryModelService
+from app.services.ai.insights_store import invalidate_insights
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
+
+
+def _score_anomaly(db: Session, transaction: Transaction) -> None:
+    """Score the transaction with the user's cached anomaly detector; never blocks the write"""
+    try:
+        AnomalyDetectionService(db).score_transaction(transaction)
+    except Exception as e:
+        transaction.anomaly_score = None
+        logger.warning(f"Anomaly scoring failed for transaction {transaction.id}: {str(e)}")
+
+
+def _update_expense_stats(db: Session, user_id: str, removed=None, added=None) -> None:
+    """Apply a transaction change to the running expense statistics; never blocks the write"""
+    try:
+        # A savepoint keeps a failed update (lock timeout, deadlock) from aborting the user's transaction
+        with db.begin_nested():
+            ExpenseStatsService(db).apply(user_id, removed=removed, added=added)
+    except Exception as e:
+        logger.warning(f"Expense stats update failed for user {user_id}: {str(e)}")
+
+
+def _invalidate_insights(db: Session, user_id: str, *days: date) -> None:
+    """Drop today's insight snapshots when a write lands on a closed day; never blocks the write"""
+    try:
+        with db.begin_nested():
+            invalidate_insights(db, user_id, *days)
+    except Exception as e:
+        logger.warning(f"Insights invalidation failed for user {user_id}: {str(e)}")
+
+
+def _learn_category(db: Session, transaction: Transaction) -> None:
+    """Feed a user's category correction to their category model; never blocks the write"""
+    try:
+        CategoryModelService(db).learn(
+            transaction.user_id, transaction.title, transaction.description, transaction.category
+        )
+    except Exception as e:
+        logger.warning(f"Category model update failed for transaction {transaction.id}: {str(e)}")
+
 
 def get_transactions(
     db: Session,
@@ -54,12 +99,47 @@ def create_transaction(db: Session, transaction: TransactionCreate, user_id: str
         user_id=user_id,
         **transaction.model_dump(),
     )
+    _score_anomaly(db, db_transaction)
+    _update_expense_stats(db, user_id, added=ExpenseStatsService.values_of(db_transaction))
+    _invalidate_insights(db, user_id, db_transaction.transaction_date)
     db.add(db_transaction)
     db.commit()
     db.refresh(db_transaction)
     return db_transaction
 
 
+def create_transactions_bulk(
+    db: Session,
+    transactions: List[TransactionCreate],
+    user_id: str
+) -> List[Transaction]:
+    """Create many transactions with a single commit (all or nothing)"""
+    db_transactions = [
+        Transaction(id=str(uuid.uuid4()), user_id=user_id, **transaction.model_dump())
+        for transaction in transactions
+    ]
+    if not db_transactions:
+        return []
+    
+    for db_transaction in db_transactions:
+        _score_anomaly(db, db_transaction)
+    try:
+        with db.begin_nested():
+            ExpenseStatsService(db).apply_many(
+                user_id, [ExpenseStatsService.values_of(t) for t in db_transactions]
+            )
+    except Exception as e:
+        logger.warning(f"Expense stats update failed for user {user_id}: {str(e)}")
+    _invalidate_insights(db, user_id, *(t.transaction_date for t in db_transactions))
+    db.add_all(db_transactions)
+    db.commit()
+    
+    # One query instead of a refresh per row
+    ids = [t.id for t in db_transactions]
+    loaded = {t.id: t for t in db.query(Transaction).filter(Transaction.id.in_(ids)).all()}
+    return [loaded[transaction_id] for transaction_id in ids]
+
+
 def update_transaction(
     db: Session,
     transaction_id: str,
@@ -71,12 +151,22 @@ def update_transaction(
     if not transaction:
         return None
     
+    previous = ExpenseStatsService.values_of(transaction)
+    previous_category = transaction.category
+    previous_date = transaction.transaction_date
     update_data = transaction_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(transaction, field, value)
+    _score_anomaly(db, transaction)
+    current = ExpenseStatsService.values_of(transaction)
+    if current != previous:
+        _update_expense_stats(db, user_id, removed=previous, added=current)
+    _invalidate_insights(db, user_id, previous_date, transaction.transaction_date)
     
     db.commit()
     db.refresh(transaction)
+    if transaction.category != previous_category:
+        _learn_category(db, transaction)
     return transaction
 
 
@@ -85,6 +175,8 @@ def delete_transaction(db: Session, transaction_id: str, user_id: str) -> bool:
     transaction = get_transaction(db, transaction_id, user_id)
     if not transaction:
         return False
+    _update_expense_stats(db, user_id, removed=ExpenseStatsService.values_of(transaction))
+    _invalidate_insights(db, user_id, transaction.transaction_date)
     db.delete(transaction)
     db.commit()
     return True
@@ -0,0 +1,47 @@
+import ipaddress
+from typing import List, Optional, Union
+from fastapi import Request
+from app.config import settings
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def _parse_networks(value: str) -> List[Network]:
+    parts = [part.strip() for part in value.split(",")]
+    return [ipaddress.ip_network(part, strict=False) for part in parts if part and part != "*"]
+
+
+def _in_networks(address: str, networks: List[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def get_client_ip(request: Request, trusted_proxies: Optional[str] = None) -> Optional[str]:
+    """
+    Client address for per-IP rate limits
+
+    Behind a reverse proxy every request arrives from the proxy's address, so when
+    the peer is a trusted proxy the X-Forwarded-For chain is walked from the right,
+    skipping further trusted hops; the first other address is the client.
+    "*" trusts the direct peer only (a single proxy with changing addresses);
+    forwarded hops must match an explicit IP/CIDR. Returns None when
+    TRUSTED_PROXIES is unset, since the peer may then be a shared proxy.
+    """
+    if trusted_proxies is None:
+        trusted_proxies = settings.trusted_proxies
+    if not trusted_proxies.strip() or not request.client:
+        return None
+    networks = _parse_networks(trusted_proxies)
+    peer = request.client.host
+    if "*" not in (part.strip() for part in trusted_proxies.split(",")) and not _in_networks(peer, networks):
+        return peer
+
+    hops = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+    for address in reversed(hops):
+        if not _in_networks(address, networks):
+            return address
+    # Only proxies in the chain; the left-most one is the closest we get to the client
+    return hops[0] if hops else peer
@@ -0,0 +1,19 @@
+-- Migration 006: Add job_runs table for background job history and throughput
+
+CREATE TABLE IF NOT EXISTS job_runs (
+    id TEXT PRIMARY KEY,
+    job_name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running', -- 'running', 'completed', 'failed'
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+    processed INTEGER DEFAULT 0,
+    succeeded INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    timed_out INTEGER DEFAULT 0,
+    duration_seconds REAL,
+    throughput REAL, -- users per second
+    errors TEXT -- JSON list of {"user_id", "error"}
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_runs_job_name ON job_runs(job_name);
+CREATE INDEX IF NOT EXISTS idx_job_runs_started_at ON job_runs(started_at);
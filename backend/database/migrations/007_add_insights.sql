@@ -0,0 +1,19 @@
+-- Migration 007: Add insights table for precomputed AI insight snapshots
+
+CREATE TABLE IF NOT EXISTS insights (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    period TEXT NOT NULL, -- 'daily', 'weekly', 'monthly'
+    period_start DATE NOT NULL,
+    period_end DATE NOT NULL, -- snapshot day
+    base TEXT NOT NULL, -- JSON: closed-day aggregates + trends
+    payload TEXT NOT NULL, -- JSON: last full insights payload
+    base_computed_at TIMESTAMP NOT NULL,
+    computed_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(user_id, period, period_end)
+);
+
+CREATE INDEX IF NOT EXISTS idx_insights_user_id ON insights(user_id);
+CREATE INDEX IF NOT EXISTS idx_insights_period_end ON insights(period_end);
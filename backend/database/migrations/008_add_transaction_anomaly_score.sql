@@ -0,0 +1,5 @@
+-- Migration 008: Store IsolationForest anomaly score on transactions
+
+ALTER TABLE transactions ADD COLUMN anomaly_score REAL;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_anomaly_score ON transactions(user_id, anomaly_score);
@@ -0,0 +1,19 @@
+-- Migration 009: Add expense_stats table for incremental expense statistics
+
+CREATE TABLE IF NOT EXISTS expense_stats (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL, -- '__all__' for all expenses
+    count INTEGER NOT NULL DEFAULT 0,
+    mean REAL NOT NULL DEFAULT 0,
+    m2 REAL NOT NULL DEFAULT 0, -- Welford sum of squared deviations
+    ewma_mean REAL,
+    ewma_var REAL NOT NULL DEFAULT 0,
+    digest TEXT NOT NULL DEFAULT '[]', -- JSON: t-digest centroids
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    UNIQUE(user_id, category)
+);
+
+CREATE INDEX IF NOT EXISTS idx_expense_stats_user_id ON expense_stats(user_id);
@@ -0,0 +1,19 @@
+-- Migration 010: Add receipt_scan_jobs table for the asynchronous receipt scanning queue
+
+CREATE TABLE IF NOT EXISTS receipt_scan_jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued', -- 'queued', 'processing', 'completed', 'failed'
+    filename TEXT,
+    content_type TEXT,
+    result TEXT, -- JSON: extracted receipt data
+    error TEXT,
+    transaction_id TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_receipt_scan_jobs_user_id ON receipt_scan_jobs(user_id);
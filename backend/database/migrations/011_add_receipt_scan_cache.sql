@@ -0,0 +1,19 @@
+-- Migration 011: Add receipt_scan_cache table (content-addressed receipt scan results)
+
+CREATE TABLE IF NOT EXISTS receipt_scan_cache (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL, -- hash of the uploaded bytes
+    phash TEXT, -- 256-bit difference hash (hex) for near-duplicate photos
+    result TEXT NOT NULL, -- JSON: extracted receipt data
+    transaction_id TEXT,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (transaction_id) REFERENCES transactions(id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_receipt_scan_cache_user_id ON receipt_scan_cache(user_id);
+CREATE INDEX IF NOT EXISTS idx_receipt_scan_cache_user_sha ON receipt_scan_cache(user_id, sha256);
+CREATE INDEX IF NOT EXISTS idx_receipt_scan_cache_user_expires ON receipt_scan_cache(user_id, expires_at);
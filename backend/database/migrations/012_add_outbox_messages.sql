@@ -0,0 +1,21 @@
+-- Migration 012: Add outbox_messages table for queued Telegram, email and push delivery
+
+CREATE TABLE IF NOT EXISTS outbox_messages (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    channel TEXT NOT NULL, -- 'telegram', 'email', 'push'
+    recipient TEXT NOT NULL,
+    payload TEXT NOT NULL, -- JSON: channel specific message fields
+    status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'sending', 'sent', 'failed'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP NOT NULL,
+    locked_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP,
+    delivery_ms REAL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_messages_user_id ON outbox_messages(user_id);
+CREATE INDEX IF NOT EXISTS idx_outbox_messages_status_next_attempt ON outbox_messages(status, next_attempt_at);
@@ -0,0 +1,15 @@
+-- Migration 013: Add telegram_updates table - webhook updates are stored and processed in the background
+
+CREATE TABLE IF NOT EXISTS telegram_updates (
+    update_id BIGINT PRIMARY KEY, -- Telegram update_id, deduplicates webhook retries
+    chat_id TEXT,
+    payload TEXT NOT NULL, -- JSON: raw update
+    status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'processing', 'done', 'failed'
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    locked_at TIMESTAMP,
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_telegram_updates_status_chat ON telegram_updates(status, chat_id);
@@ -0,0 +1,3 @@
+-- Migration 015: Composite index for the reminder scheduler's scan of upcoming due dates
+
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date_status ON tasks(due_date, status);
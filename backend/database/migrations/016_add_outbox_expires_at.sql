@@ -0,0 +1,3 @@
+-- Migration 016: Expiry for time-limited outbox messages (verification codes)
+
+ALTER TABLE outbox_messages ADD COLUMN expires_at TIMESTAMP;
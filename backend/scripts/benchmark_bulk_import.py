@@ -0,0 +1,109 @@
+"""
+Bulk import benchmark: the previous per-row import loop (one SELECT per record, ORM
+objects, timestamp ids) against BulkImportService on a fresh SQLite file database,
+for a first import (inserts) and a re-import of the same backup (upserts)
+"""
+import sys
+import time
+import uuid
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Backend papkasini path ga qo'shish
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+import app.models  # noqa: F401
+from app.models import User, Task
+from app.services.bulk_import_service import BulkImportService
+
+
+def make_tasks(count: int):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "title": f"Vazifa {i}",
+            "description": "Import benchmark",
+            "category": ("Ish", "Shaxsiy", "O'qish")[i % 3],
+            "priority": ("low", "medium", "high")[i % 3],
+            "status": "pending",
+            "is_focus": i % 7 == 0,
+            "due_date": "2026-03-01T09:00:00",
+            "color": "indigo",
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_import(db, user_id: str, tasks_data):
+    """Previous ExportImportService.import_tasks"""
+    imported = 0
+    for task_data in tasks_data:
+        existing = db.query(Task).filter(Task.id == task_data.get("id"), Task.user_id == user_id).first()
+        if existing:
+            for key, value in task_data.items():
+                if key not in ["id", "user_id", "due_date"] and hasattr(existing, key):
+                    setattr(existing, key, value)
+        else:
+            db.add(Task(
+                id=task_data.get("id") or f"imported-{datetime.now().timestamp()}",
+                user_id=user_id,
+                title=task_data.get("title", ""),
+                description=task_data.get("description"),
+                category=task_data.get("category", "Ish"),
+                priority=task_data.get("priority", "medium"),
+                status=task_data.get("status", "pending"),
+                is_focus=1 if task_data.get("is_focus") else 0,
+                color=task_data.get("color", "indigo"),
+            ))
+        imported += 1
+    db.commit()
+    return imported
+
+
+def fresh_session(directory: str, name: str):
+    engine = create_engine(f"sqlite:///{directory}/{name}.db")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    db.add(User(id="bench", email=f"{name}@example.com", password_hash="x"))
+    db.commit()
+    return db
+
+
+def timed(label: str, rows: int, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {rows:>8,} rows  {elapsed:>7.2f}s  {rows / elapsed:>10,.0f} rows/s")
+    return result
+
+
+def run_benchmark(rows: int = 100000, legacy_rows: int = 20000):
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_data = make_tasks(legacy_rows)
+        db = fresh_session(directory, "legacy")
+        timed("legacy insert", legacy_rows, lambda: legacy_import(db, "bench", legacy_data))
+        timed("legacy re-import", legacy_rows, lambda: legacy_import(db, "bench", legacy_data))
+
+        data = make_tasks(rows)
+        db = fresh_session(directory, "bulk")
+        engine = BulkImportService(db)
+        report = timed("bulk insert", rows, lambda: engine.upsert("tasks", "bench", data))
+        assert report["created"] == rows, report
+        report = timed("bulk re-import (upsert)", rows, lambda: engine.upsert("tasks", "bench", data))
+        assert report["updated"] == rows, report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark bulk task import")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows for the bulk engine")
+    parser.add_argument("--legacy-rows", type=int, default=20000, help="Rows for the per-row loop")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.legacy_rows)
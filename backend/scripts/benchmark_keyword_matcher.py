@@ -0,0 +1,120 @@
+"""
+Kalit so'z matcher benchmarki: TextClassifier va TaskParser kategoriya/prioritet
+aniqlashining sekundiga matnlar soni (eski substring tsikllari bilan solishtirish)
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+# Backend papkasini path ga qo'shish
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.services.nlp.keyword_matcher import KeywordMatcher, best_group
+from app.services.nlp.text_classifier import TRANSACTION_CATEGORIES, CATEGORY_MATCHER
+from app.services.nlp.task_parser import CATEGORY_KEYWORDS, PRIORITY_KEYWORDS, TASK_MATCHER
+
+WORDS = [
+    "bugun", "ertaga", "uchun", "bilan", "to'lov", "do'kon", "kitobni", "meeting", "taksiga",
+    "ovqat", "sut", "ijara", "loyiha", "hisobot", "muhim", "keyinroq", "internet", "maktab",
+    "doktorga", "mashq", "oylik", "kiyim", "pul", "karta", "транспорт", "обед", "kafe",
+]
+
+
+def make_texts(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14))) for _ in range(count)]
+
+
+def legacy_transaction(text: str):
+    text = text.lower()
+    scores = {}
+    for category, keywords in TRANSACTION_CATEGORIES.items():
+        score = sum(1 for keyword in keywords if keyword in text)
+        if score > 0:
+            scores[category] = score
+    return max(scores.items(), key=lambda x: x[1])[0] if scores else "Boshqa"
+
+
+def legacy_task(text: str):
+    text = text.lower()
+    scores = {}
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        score = sum(1 for keyword in keywords if keyword in text)
+        if score > 0:
+            scores[category] = score
+    category = max(scores.items(), key=lambda x: x[1])[0] if scores else "Ish"
+    priority = next(
+        (name for name, keywords in PRIORITY_KEYWORDS.items() if any(k in text for k in keywords)),
+        "medium"
+    )
+    return category, priority
+
+
+def matcher_transaction(text: str):
+    return best_group(CATEGORY_MATCHER.scores(text)) or "Boshqa"
+
+
+def matcher_task(text: str):
+    scores = TASK_MATCHER.scores(text)
+    category = best_group({key[1]: score for key, score in scores.items() if key[0] == "category"}) or "Ish"
+    priority = next((name for name in PRIORITY_KEYWORDS if ("priority", name) in scores), "medium")
+    return category, priority
+
+
+def throughput(func, texts, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return len(texts) / best
+
+
+def large_vocabulary(groups: int = 40, per_group: int = 10, seed: int = 7):
+    """Kalit so'zlar soni o'sganda: eski tsikl chiziqli sekinlashadi"""
+    rng = random.Random(seed)
+    letters = "abdefghijklmnopqrstuvxyz"
+    vocabulary = {
+        f"group_{g}": ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(per_group)]
+        for g in range(groups)
+    }
+    matcher = KeywordMatcher(vocabulary)
+
+    def legacy(text: str):
+        text = text.lower()
+        scores = {}
+        for group, keywords in vocabulary.items():
+            score = sum(1 for keyword in keywords if keyword in text)
+            if score > 0:
+                scores[group] = score
+        return max(scores.items(), key=lambda x: x[1])[0] if scores else None
+
+    return f"{groups * per_group} keywords", legacy, lambda text: best_group(matcher.scores(text))
+
+
+def run_benchmark(count: int = 20000):
+    texts = make_texts(count)
+    for name, legacy, matcher in (
+        ("transaction category", legacy_transaction, matcher_transaction),
+        ("task category+priority", legacy_task, matcher_task),
+        large_vocabulary(),
+    ):
+        old_rate = throughput(legacy, texts)
+        new_rate = throughput(matcher, texts)
+        print(
+            f"{name:<24} legacy {old_rate:>10,.0f} texts/s   matcher {new_rate:>10,.0f} texts/s   "
+            f"x{new_rate / old_rate:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark NLP keyword matching")
+    parser.add_argument("--texts", type=int, default=20000, help="Number of synthetic texts")
+    args = parser.parse_args()
+
+    run_benchmark(args.texts)
@@ -0,0 +1,128 @@
+"""
+Planner workbook import benchmark: synthetic "Vazifalar planneri" and "Фин план"
+workbooks with many rows, imported through PlannerImportService (openpyxl read-only
+streaming + bulk upsert) on a fresh SQLite file database. Reports rows/s and the
+peak traced memory, next to a regular (non read-only) ``load_workbook`` of the same file
+"""
+import sys
+import time
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+# Backend papkasini path ga qo'shish
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils import column_index_from_string
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+import app.models  # noqa: F401
+from app.models import User
+from app.services.planner_import_service import FINANCE_FIRST_ROW, RU_MONTHS, PlannerImportService
+
+
+def _row(cells: dict) -> list:
+    """Write-only rows are positional: place values at their column letters"""
+    width = max(column_index_from_string(letter) for letter in cells)
+    row = [None] * width
+    for letter, value in cells.items():
+        row[column_index_from_string(letter) - 1] = value
+    return row
+
+
+def make_tasks_workbook(path: str, rows: int) -> int:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Vazifalar nazorati")
+    for _ in range(8):
+        sheet.append([])
+    sheet.append(_row({"C": "Vazifa nomi", "D": "Prioritet", "E": "Status", "F": "Kategoriya", "G": "Izoh / Eslatma"}))
+    for i in range(rows):
+        sheet.append(_row({
+            "B": i % 5 == 0, "C": f"Vazifa {i}", "D": ("💤 Unchalik muhimmas", "🔥 Muhim")[i % 2],
+            "E": "✏️ Jarayonda", "F": "Ish", "G": "Benchmark",
+        }))
+    workbook.save(path)
+    return rows
+
+
+def make_finance_workbook(path: str, rows_per_month: int) -> int:
+    workbook = Workbook(write_only=True)
+    for month, name in enumerate(RU_MONTHS, start=1):
+        sheet = workbook.create_sheet(name)
+        for number in range(1, FINANCE_FIRST_ROW):
+            sheet.append(_row({"H": 2025}) if number == 10 else [])
+        for i in range(rows_per_month):
+            day = date(2025, month, 1) + timedelta(days=i % 28)
+            sheet.append(_row({
+                "B": day, "E": "🍔 Озиқ-овқат ва ичимликлар", "Q": 1000.0 + i, "T": f"Xarid {i}",
+                "AF": day, "AI": "💼 Иш ҳақи (Маош)", "AU": 50000.0, "AX": None,
+            }))
+    workbook.save(path)
+    return rows_per_month * 12 * 2
+
+
+def fresh_session(directory: str, name: str):
+    engine = create_engine(f"sqlite:///{directory}/{name}.db")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    db.add(User(id="bench", email=f"{name}@example.com", password_hash="x"))
+    db.commit()
+    return db
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def peak_memory(func) -> float:
+    """Peak traced allocations in MB (a separate run: tracing slows openpyxl down several times)"""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def run_benchmark(task_rows: int = 50000, finance_rows: int = 2000):
+    with tempfile.TemporaryDirectory() as directory:
+        for name, make, size in (
+            ("tasks", make_tasks_workbook, task_rows),
+            ("finance", make_finance_workbook, finance_rows),
+        ):
+            path = f"{directory}/{name}.xlsx"
+            rows = make(path, size)
+            megabytes = Path(path).stat().st_size / 1e6
+
+            db = fresh_session(directory, name)
+
+            def planner_import():
+                with open(path, "rb") as file:
+                    return PlannerImportService(db).import_workbook("bench", file)
+
+            results, elapsed = timed(planner_import)
+            assert sum(report["created"] for report in results.values()) == rows, results
+            # Re-import of the same file updates the rows in place
+            peak = peak_memory(planner_import)
+            print(f"{name:<8} {megabytes:>5.1f} MB {rows:>8,} rows  read-only import {elapsed:>6.2f}s "
+                  f"{rows / elapsed:>8,.0f} rows/s  peak {peak:>6.1f} MB")
+
+            _, elapsed = timed(lambda: load_workbook(path, data_only=True))
+            peak = peak_memory(lambda: load_workbook(path, data_only=True))
+            print(f"{'':<8} {'':>8} {'':>13}  full load_workbook {elapsed:>6.2f}s {'':>15}  peak {peak:>6.1f} MB")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark planner workbook import")
+    parser.add_argument("--task-rows", type=int, default=50000, help="Rows in the task list")
+    parser.add_argument("--finance-rows", type=int, default=2000, help="Expense/income rows per month sheet")
+    args = parser.parse_args()
+
+    run_benchmark(args.task_rows, args.finance_rows)
@@ -0,0 +1,99 @@
+"""
+Push fan-out benchmark: reminders for many users (several devices each) sent through
+NotificationService.send_push_batch to a local fake FCM endpoint that answers after a
+fixed latency. Reports messages/s for a few client concurrency levels; a share of the
+tokens is unregistered so pruning is part of the measured work
+"""
+import sys
+import os
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Backend papkasini path ga qo'shish
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+import app.models  # noqa: F401
+from app.models import DeviceToken, User
+from app.services import notification_service
+from app.services.fcm_client import FCMClient, StaticTokenProvider
+from app.services.notification_service import NotificationService, PushNotification
+
+
+def fake_fcm(latency: float):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        if b'"stale-' in request.content:
+            return httpx.Response(404, json={"error": {
+                "status": "NOT_FOUND", "message": "Requested entity was not found.",
+                "details": [{"errorCode": "UNREGISTERED"}],
+            }})
+        return httpx.Response(200, json={"name": "projects/bench/messages/1"})
+    return handler
+
+
+def seed(db, users: int, devices: int, stale_every: int):
+    db.add_all([User(id=f"user-{u}", email=f"user-{u}@example.com", password_hash="x") for u in range(users)])
+    db.add_all([
+        DeviceToken(
+            user_id=f"user-{u}",
+            token=f"{'stale' if (u * devices + d) % stale_every == 0 else 'token'}-{u}-{d}",
+            platform="android",
+        )
+        for u in range(users) for d in range(devices)
+    ])
+    db.commit()
+
+
+async def run_once(db, users: int, concurrency: int, latency: float):
+    client = FCMClient(
+        "bench", StaticTokenProvider("bench"), base_url="https://fcm.local",
+        concurrency=concurrency, transport=httpx.MockTransport(fake_fcm(latency)),
+    )
+    notification_service.get_fcm_client = lambda: client
+    reminders = [
+        PushNotification(f"user-{u}", "Vazifa eslatmasi", f"Vazifa {u}", {"type": "task_reminder"})
+        for u in range(users)
+    ]
+    try:
+        started = time.perf_counter()
+        summary = await NotificationService(db).send_push_batch(reminders)
+        return summary, time.perf_counter() - started
+    finally:
+        await client.aclose()
+
+
+def run_benchmark(users: int = 2000, devices: int = 2, latency: float = 0.05, stale_every: int = 50):
+    os.environ["FCM_ENABLED"] = "true"
+    with tempfile.TemporaryDirectory() as directory:
+        for concurrency in (10, 50, 100, 200):
+            engine = create_engine(f"sqlite:///{directory}/push-{concurrency}.db")
+            Base.metadata.create_all(engine)
+            db = sessionmaker(bind=engine, autoflush=False)()
+            seed(db, users, devices, stale_every)
+
+            summary, elapsed = asyncio.run(run_once(db, users, concurrency, latency))
+            messages = summary["sent"] + summary["failed"]
+            print(f"concurrency {concurrency:>4}: {messages:>6,} messages in {elapsed:>6.2f}s "
+                  f"{messages / elapsed:>8,.0f} msg/s ({messages / elapsed * 60:>9,.0f}/min)  "
+                  f"sent {summary['sent']:,} pruned {summary['pruned']:,}")
+            db.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark push notification fan-out")
+    parser.add_argument("--users", type=int, default=2000, help="Users with a reminder")
+    parser.add_argument("--devices", type=int, default=2, help="Registered devices per user")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake FCM response time in seconds")
+    args = parser.parse_args()
+
+    run_benchmark(args.users, args.devices, args.latency)
@@ -0,0 +1,89 @@
+"""
+Vazifa tavsiyalari benchmarki: ko'p pending vazifali foydalanuvchi uchun
+get_task_recommendations tezligini o'lchash
+"""
+import sys
+import time
+import random
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Backend papkasini path ga qo'shish
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import User, Task
+from app.services.ai.recommendation_service import RecommendationService
+
+CATEGORIES = ["Ish", "Shaxsiy", "O'qish", "Sport", "Uy", "Moliya", "Salomatlik", "Sayohat"]
+PRIORITIES = ["low", "medium", "high"]
+
+
+def seed(db, user_id: str, pending: int, done: int):
+    now = datetime.now()
+    rng = random.Random(42)
+    tasks = []
+    for i in range(pending + done):
+        is_done = i < done
+        tasks.append({
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "title": f"Vazifa {i}",
+            "category": rng.choice(CATEGORIES),
+            "priority": rng.choice(PRIORITIES),
+            "status": "done" if is_done else "pending",
+            "is_focus": 1 if rng.random() < 0.1 else 0,
+            "due_date": now + timedelta(days=rng.randint(-10, 30)) if rng.random() < 0.7 else None,
+            "completed_at": now if is_done else None,
+            "created_at": now - timedelta(days=rng.randint(0, 120)),
+        })
+    db.bulk_insert_mappings(Task, tasks)
+    db.commit()
+
+
+def run_benchmark(pending: int = 10000, done: int = 2000, repeat: int = 20, limit: int = 5):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    user_id = "bench_user"
+    db.add(User(id=user_id, email="bench@example.com", password_hash="x"))
+    db.commit()
+
+    print(f"Seeding {pending} pending + {done} done tasks...")
+    seed(db, user_id, pending, done)
+
+    service = RecommendationService(db)
+    service.get_task_recommendations(user_id, limit)  # warm-up
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        recommendations = service.get_task_recommendations(user_id, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(f"get_task_recommendations (limit={limit}, {repeat} runs)")
+    print(f"  median: {timings[len(timings) // 2]:.1f} ms")
+    print(f"  p95:    {timings[int(len(timings) * 0.95) - 1]:.1f} ms")
+    print(f"  top:    {[r['score'] for r in recommendations]}")
+
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark task recommendations")
+    parser.add_argument("--pending", type=int, default=10000, help="Pending tasks per user")
+    parser.add_argument("--done", type=int, default=2000, help="Completed tasks per user")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(args.pending, args.done, args.repeat, args.limit)
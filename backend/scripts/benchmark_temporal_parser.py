@@ -0,0 +1,99 @@
+"""
+Sana/vaqt parseri benchmarki: eski TaskParser._extract_due_date (har chaqiruvda re.search)
+bilan yangi jadvalli parser - sekundiga matnlar soni va test korpusidagi aniqlik
+"""
+import sys
+import re
+import time
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Backend papkasini path ga qo'shish
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.services.nlp.temporal_parser import parse_temporal
+from tests.test_temporal_parser import CORPUS, NOW
+
+
+def legacy_due_date(text: str, today: datetime):
+    """Oldingi TaskParser._extract_due_date (``today`` parametrli)"""
+    text_lower = text.lower()
+    if "bugun" in text_lower or "today" in text_lower:
+        return today
+    if "ertaga" in text_lower or "tomorrow" in text_lower:
+        return today + timedelta(days=1)
+    match = re.search(r'(\d+)\s*(kun|day|days)\s*(keyin|later|after)', text_lower)
+    if match:
+        return today + timedelta(days=int(match.group(1)))
+    match = re.search(r'(\d+)\s*(hafta|week|weeks)\s*(keyin|later|after)', text_lower)
+    if match:
+        return today + timedelta(weeks=int(match.group(1)))
+    for pattern in (r'(\d{1,2})\.(\d{1,2})\.(\d{4})', r'(\d{4})-(\d{1,2})-(\d{1,2})'):
+        match = re.search(pattern, text)
+        if match:
+            try:
+                if '.' in match.group(0):
+                    day, month, year = map(int, match.groups())
+                else:
+                    year, month, day = map(int, match.groups())
+                return datetime(year, month, day)
+            except ValueError:
+                continue
+    return None
+
+
+def make_texts(count: int, seed: int = 42):
+    """Korpus jumlalari + shovqin so'zlar (uzunroq vazifa matnlari)"""
+    rng = random.Random(seed)
+    filler = ["loyiha", "hisobot", "uchrashuv", "do'kon", "kitob", "meeting", "отчет", "созвон", "muhim"]
+    return [
+        f"{rng.choice(filler)} {rng.choice(CORPUS)[0]} {' '.join(rng.choice(filler) for _ in range(rng.randint(2, 8)))}"
+        for _ in range(count)
+    ]
+
+
+def throughput(func, texts, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return len(texts) / best
+
+
+def accuracy():
+    """Sana bo'yicha (eski parser vaqtni umuman ajratmaydi) va to'liq (sana + vaqtlar)"""
+    legacy_dates = new_dates = new_full = 0
+    for text, expected_date, start, end in CORPUS:
+        legacy = legacy_due_date(text, NOW)
+        legacy_dates += (legacy.date() if legacy else None) == expected_date
+        result = parse_temporal(text, now=NOW)
+        new_dates += result.date == expected_date
+        clocks = tuple(value.strftime("%H:%M") if value else None for value in (result.start_time, result.end_time))
+        new_full += result.date == expected_date and clocks == (start, end)
+    return legacy_dates, new_dates, new_full
+
+
+def run_benchmark(count: int = 20000):
+    texts = make_texts(count)
+    old_rate = throughput(lambda text: legacy_due_date(text, NOW), texts)
+    new_rate = throughput(lambda text: parse_temporal(text, now=NOW), texts)
+    print(f"legacy {old_rate:>10,.0f} texts/s   temporal parser {new_rate:>10,.0f} texts/s   x{new_rate / old_rate:.1f}")
+
+    legacy_dates, new_dates, new_full = accuracy()
+    total = len(CORPUS)
+    print(f"corpus ({total} texts): legacy dates {legacy_dates}/{total}   "
+          f"parser dates {new_dates}/{total}   parser date+time {new_full}/{total}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the temporal expression parser")
+    parser.add_argument("--texts", type=int, default=20000, help="Number of synthetic texts")
+    args = parser.parse_args()
+
+    run_benchmark(args.texts)
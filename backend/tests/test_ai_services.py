@@ -3,12 +3,25 @@ from datetime import date, datetime, timedelta
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.database import Base
-from app.models import User, Task, Habit, Transaction
+from app.models import User, Task, Habit, Transaction, Insight
 from app.services.ai.task_priority_service import TaskPriorityService
 from app.services.ai.recommendation_service import RecommendationService
 from app.services.ai.anomaly_detection_service import AnomalyDetectionService
 from app.services.ai.insights_service import InsightsService
+from app.services.ai.insights_store import InsightsStore
+from app.services.ai.model_store import model_store
+from app.services.ai.expense_stats_service import ExpenseStatsService
+from app.services.ai.category_model_service import CategoryModelService, CATEGORY_MODEL_KIND, featurize, predict_proba
+from app.services.analytics.online_stats import RunningStats, TDigest
+from app.services.transaction_service import create_transaction, update_transaction, delete_transaction
+from app.schemas.transaction import TransactionCreate, TransactionUpdate
+import numpy as np
+from app.config.ai_config import ai_config
 from app.services.nlp.task_parser import TaskParser
+from app.services.nlp.text_classifier import TextClassifier, category_memo
+from app.services.nlp.recategorization_service import RecategorizationService
+from app.services.nlp import model_registry
+from app.services.nlp.keyword_matcher import KeywordMatcher
 import uuid
 
 
@@ -73,6 +86,36 @@ def test_recommendation_service(db, test_user):
     assert isinstance(habit_recommendations, list)
 
 
+def test_task_recommendation_scoring(db, test_user):
+    """Kategoriya ulushi to'g'ri hisoblanadi va top-k score bo'yicha tanlanadi"""
+    now = datetime.now()
+    for i in range(4):
+        db.add(Task(id=str(uuid.uuid4()), user_id=test_user.id, title=f"Ish {i}", category="Ish",
+                    status="done", completed_at=now))
+    db.add(Task(id=str(uuid.uuid4()), user_id=test_user.id, title="O'qish", category="O'qish",
+                status="done", completed_at=now))
+    for i in range(3):
+        db.add(Task(id=str(uuid.uuid4()), user_id=test_user.id, title=f"Kitob {i}", category="O'qish",
+                    status="pending", priority="low"))
+    db.add(Task(id="overdue", user_id=test_user.id, title="Hisobot", category="Ish", status="pending",
+                priority="high", is_focus=1, due_date=now - timedelta(days=2)))
+    db.add(Task(id="today", user_id=test_user.id, title="Qo'ng'iroq", category="Ish", status="pending",
+                priority="medium", due_date=now))
+    db.commit()
+
+    service = RecommendationService(db)
+    recommendations = service.get_task_recommendations(test_user.id, limit=3)
+    assert [r["task_id"] for r in recommendations[:2]] == ["overdue", "today"]
+    # Ish: 4/6 bajarilgan, O'qish: 1/4
+    assert recommendations[0]["score"] == pytest.approx(4 / 6 * 30 + 50 + 30 + 10)
+    assert recommendations[2]["score"] == pytest.approx(1 / 4 * 30 + 5)
+    assert "Ish kategoriyasida yaxshi natijalar" in recommendations[0]["reason"]
+
+    # Og'irliklarni sozlash mumkin
+    tuned = RecommendationService(db, weights={"overdue": 0, "priority_high": 0, "focus": 0})
+    assert tuned.get_task_recommendations(test_user.id, limit=1)[0]["task_id"] == "today"
+
+
 def test_anomaly_detection_service(db, test_user):
     """Anomaly detection service test"""
     service = AnomalyDetectionService(db)
@@ -86,6 +129,161 @@ def test_anomaly_detection_service(db, test_user):
     assert isinstance(habit_anomalies, list)
 
 
+def test_expense_anomaly_window_baseline(db, test_user):
+    """Z-score chegarasi faqat ``days`` oynasidagi xarajatlardan hisoblanadi"""
+    today = date.today()
+    # Oynadan tashqaridagi katta xarajatlar chegarani ko'tarmasligi kerak
+    for i in range(20):
+        db.add(Transaction(id=str(uuid.uuid4()), user_id=test_user.id, title=f"Eski {i}", category="Texnika",
+                           amount=-500000, transaction_type="expense", transaction_date=today - timedelta(days=200 + i)))
+    for i in range(6):
+        db.add(Transaction(id=str(uuid.uuid4()), user_id=test_user.id, title=f"Non {i}", category="Oziq-ovqat",
+                           amount=-10000, transaction_type="expense", transaction_date=today - timedelta(days=i)))
+    db.add(Transaction(id="big", user_id=test_user.id, title="Restoran", category="Oziq-ovqat",
+                       amount=-100000, transaction_type="expense", transaction_date=today))
+    db.commit()
+
+    anomalies = AnomalyDetectionService(db).detect_expense_anomalies(test_user.id, days=30)
+    assert [a["transaction_id"] for a in anomalies] == ["big"]
+    # Butun tarix oynasida 100000 odatiy xarajat
+    assert AnomalyDetectionService(db).detect_expense_anomalies(test_user.id, days=365) == []
+
+
+def test_expense_anomaly_scoring(db, test_user, tmp_path, monkeypatch):
+    """Detector cache'lanadi, yangi xarajat insert paytida baholanadi"""
+    monkeypatch.setattr(ai_config, "model_dir", str(tmp_path))
+    model_store.clear()
+
+    today = date.today()
+    for i in range(40):
+        db.add(Transaction(
+            id=str(uuid.uuid4()),
+            user_id=test_user.id,
+            title=f"Non {i}",
+            category="Oziq-ovqat",
+            amount=-(20000 + (i % 5) * 1000),
+            transaction_type="expense",
+            transaction_date=today - timedelta(days=i % 28)
+        ))
+    db.commit()
+
+    service = AnomalyDetectionService(db)
+    detector = service.fit_detector(test_user.id)
+    assert detector is not None
+    assert detector["n_samples"] == 40
+    assert (tmp_path / "expense_anomaly").exists()
+    assert db.query(Transaction).filter(Transaction.anomaly_score.is_(None)).count() == 0
+
+    # Yangi xarajat transaction_service orqali baholanadi
+    big = create_transaction(db, TransactionCreate(
+        title="Televizor",
+        category="Texnika",
+        amount=-5000000,
+        transaction_type="expense",
+        transaction_date=today
+    ), test_user.id)
+    assert big.anomaly_score is not None
+    assert big.anomaly_score > detector["threshold"]
+
+    anomalies = service.detect_expense_anomalies(test_user.id, days=30)
+    assert anomalies[0]["transaction_id"] == big.id
+    # Detector qayta fit qilinmadi
+    assert model_store.get("expense_anomaly", test_user.id)["fitted_at"] == detector["fitted_at"]
+
+    # Daromadlar baholanmaydi
+    income = create_transaction(db, TransactionCreate(
+        title="Maosh",
+        category="Ish haqi",
+        amount=8000000,
+        transaction_type="income",
+        transaction_date=today
+    ), test_user.id)
+    assert income.anomaly_score is None
+
+
+def test_online_stats():
+    """Welford add/remove va t-digest kvantillari"""
+    rng = np.random.default_rng(7)
+    values = rng.lognormal(10, 0.5, size=2000)
+
+    stats = RunningStats()
+    digest = TDigest(compression=100)
+    for value in values:
+        stats.add(value)
+        digest.add(value)
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.std == pytest.approx(values.std())
+    assert len(digest.centroids) <= 200
+    assert digest.quantile(0.5) == pytest.approx(np.quantile(values, 0.5), rel=0.02)
+    assert digest.quantile(0.99) == pytest.approx(np.quantile(values, 0.99), rel=0.05)
+
+    for value in values[:500]:
+        stats.remove(value)
+    assert stats.count == 1500
+    assert stats.mean == pytest.approx(values[500:].mean())
+    assert stats.std == pytest.approx(values[500:].std())
+
+
+def test_expense_stats_incremental(db, test_user):
+    """Create/update/delete statistikani to'liq qayta qurish bilan bir xil yangilaydi"""
+    service = ExpenseStatsService(db)
+    assert service.get_stats(test_user.id).count == 0
+
+    created = []
+    for i in range(12):
+        created.append(create_transaction(db, TransactionCreate(
+            title=f"Xarajat {i}",
+            category="Transport" if i % 3 else "Oziq-ovqat",
+            amount=-(10000 + i * 500),
+            transaction_type="expense",
+            transaction_date=date.today()
+        ), test_user.id))
+
+    update_transaction(db, created[0].id, test_user.id, TransactionUpdate(amount=-90000, category="Transport"))
+    delete_transaction(db, created[1].id, test_user.id)
+
+    overall = service.get_stats(test_user.id)
+    transport = service.get_stats(test_user.id, "Transport")
+    incremental = (overall.count, overall.mean, overall.m2, transport.count, transport.mean)
+
+    service.rebuild(test_user.id)
+    overall = service.get_stats(test_user.id)
+    transport = service.get_stats(test_user.id, "Transport")
+    assert incremental == pytest.approx((overall.count, overall.mean, overall.m2, transport.count, transport.mean))
+    assert overall.count == 11
+
+    check = service.check_transaction(created[0])
+    assert check["is_unusual"] is True
+    assert check["baseline"]["category"] == "Transport"
+    assert check["percentile"] > 90
+
+
+def test_expense_stats_failures_do_not_break_writes(db, test_user, monkeypatch):
+    """Statistika xatosi savepoint'da qoladi; parallel rebuild UNIQUE xatosi bermaydi"""
+    from app.models import ExpenseStat
+
+    service = ExpenseStatsService(db)
+    service.get_stats(test_user.id)
+
+    def failing_apply(self, user_id, removed=None, added=None):
+        self.db.add(ExpenseStat(user_id=user_id, category="Yarim", count=1, mean=1.0, m2=0.0, digest="[]"))
+        self.db.flush()
+        raise RuntimeError("lock timeout")
+
+    monkeypatch.setattr(ExpenseStatsService, "apply", failing_apply)
+    created = create_transaction(db, TransactionCreate(
+        title="Taxi", category="Transport", amount=-20000.0, transaction_type="expense", transaction_date=date.today(),
+    ), test_user.id)
+    assert db.get(Transaction, created.id) is not None
+    assert db.query(ExpenseStat).filter(ExpenseStat.category == "Yarim").count() == 0
+    monkeypatch.undo()
+
+    # Boshqa so'rov qatorlarni bizning DELETE'dan keyin yozgandek
+    monkeypatch.setattr(ExpenseStatsService, "_delete_rows", lambda self, user_id: None)
+    assert service.rebuild(test_user.id) == 0
+    assert service.get_stats(test_user.id).count == 0
+
+
 def test_insights_service(db, test_user):
     """Insights service test"""
     service = InsightsService(db)
@@ -107,6 +305,72 @@ def test_insights_service(db, test_user):
     assert monthly_insights["period"] == "monthly"
 
 
+def test_insights_store(db, test_user):
+    """Insights snapshot saqlanadi va faqat bugungi qism qayta hisoblanadi"""
+    db.add(Task(id=str(uuid.uuid4()), user_id=test_user.id, title="Done", status="done"))
+    db.add(Task(id=str(uuid.uuid4()), user_id=test_user.id, title="Pending", status="pending"))
+    db.commit()
+
+    store = InsightsStore(db)
+    insights, freshness = store.get(test_user.id, "daily")
+    assert insights["summary"]["tasks_total"] == 2
+    assert insights["summary"]["tasks_completion_rate"] == 50.0
+    assert freshness["age_seconds"] == 0
+    assert insights == InsightsService(db).generate_daily_insights(test_user.id)
+
+    # Yangi snapshot qaytariladi (qayta hisoblanmaydi)
+    db.add(Task(id=str(uuid.uuid4()), user_id=test_user.id, title="New", status="done"))
+    db.commit()
+    cached, _ = store.get(test_user.id, "daily")
+    assert cached["summary"]["tasks_total"] == 2
+
+    # Eskirgan snapshot: bugungi qism qayta hisoblanadi
+    snapshot = db.query(Insight).filter(Insight.user_id == test_user.id, Insight.period == "daily").one()
+    snapshot.computed_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+    refreshed, freshness = store.get(test_user.id, "daily")
+    assert refreshed["summary"]["tasks_total"] == 3
+    assert freshness["base_age_seconds"] >= 0
+
+    # Nightly refresh barcha davrlarni saqlaydi
+    snapshots = store.refresh(test_user.id)
+    assert set(snapshots) == {"daily", "weekly", "monthly"}
+    assert db.query(Insight).filter(Insight.user_id == test_user.id).count() == 3
+
+
+def test_insights_invalidated_by_closed_day_writes(db, test_user):
+    """Orqa sanali yozuvlar bugungi snapshotni o'chiradi - base qayta hisoblanadi"""
+    from app.models import HabitCompletion
+    from app.schemas.habit import HabitCompletionCreate
+    from app.services.habit_service import complete_habit
+
+    store = InsightsStore(db)
+    store.get(test_user.id, "weekly")
+    yesterday = date.today() - timedelta(days=1)
+
+    # Bugungi yozuv snapshotga tegmaydi
+    create_transaction(db, TransactionCreate(
+        title="Tushlik", category="Kafe", amount=-30000.0, transaction_type="expense",
+        transaction_date=date.today(),
+    ), test_user.id)
+    assert db.query(Insight).filter(Insight.user_id == test_user.id).count() == 1
+
+    create_transaction(db, TransactionCreate(
+        title="Taxi", category="Transport", amount=-20000.0, transaction_type="expense",
+        transaction_date=yesterday,
+    ), test_user.id)
+    insights, _ = store.get(test_user.id, "weekly")
+    assert insights["summary"]["total_expense"] == 50000.0
+
+    habit = Habit(id=str(uuid.uuid4()), user_id=test_user.id, title="Yugurish", goal="30 min", is_active=1)
+    db.add(habit)
+    db.commit()
+    complete_habit(db, habit.id, test_user.id, HabitCompletionCreate(completion_date=yesterday))
+    assert db.query(HabitCompletion).count() == 1
+    insights, _ = store.get(test_user.id, "weekly")
+    assert insights == InsightsService(db).generate_weekly_insights(test_user.id)
+
+
 def test_task_parser():
     """Task parser test"""
     parser = TaskParser()
@@ -125,3 +389,201 @@ def test_task_parser():
     result = parser.parse_task_text("Muhim vazifa - bugun bajarish kerak")
     assert result["priority"] in ["low", "medium", "high"]
 
+
+def test_nlp_model_registry(monkeypatch):
+    """spaCy modeli bir marta, kerakli komponentlarsiz yuklanadi va servislar orasida umumiy"""
+    import sys
+    import types
+    import threading
+
+    loads = []
+
+    def load(name, disable=()):
+        loads.append((name, list(disable)))
+        return types.SimpleNamespace(pipe_names=["tok2vec", "tagger"])
+
+    monkeypatch.setitem(sys.modules, "spacy", types.SimpleNamespace(load=load))
+    monkeypatch.setattr(model_registry, "SPACY_AVAILABLE", True)
+    model_registry.reset_nlp()
+    try:
+        assert not model_registry.is_loaded()
+        threads = [threading.Thread(target=model_registry.get_nlp) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert loads == [(ai_config.nlp_model, ["parser", "ner"])]
+        assert TaskParser().nlp is TextClassifier().nlp is model_registry.get_nlp()
+    finally:
+        model_registry.reset_nlp()
+
+
+def test_nlp_fallback_matches_lemmas(monkeypatch):
+    """Kalit so'zlar bilan topilmagan matnlarda lemma bo'yicha kategoriya"""
+    import types
+
+    def token(text, lemma, pos="NOUN"):
+        return types.SimpleNamespace(text=text, lower_=text.lower(), lemma_=lemma, pos_=pos)
+
+    docs = {
+        # Modelning lemmasi matndagi shakldan farq qiladi
+        "travelled by subways": [token("travelled", "travel", "VERB"), token("subways", "metro")],
+        "unknown": [token("unknown", "unknown")],
+    }
+    calls = []
+
+    def pipe(texts, batch_size):
+        calls.append(list(texts))
+        return [docs[text] for text in texts]
+
+    monkeypatch.setattr(model_registry, "_models", {ai_config.nlp_model: types.SimpleNamespace(pipe=pipe)})
+    category_memo.clear()
+    try:
+        assert TextClassifier()._classify_with_nlp(list(docs)) == ["Transport", "Boshqa"]
+        assert calls == [list(docs)]
+    finally:
+        category_memo.clear()
+
+
+def test_keyword_matcher():
+    matcher = KeywordMatcher({
+        "Maosh": ["maosh", "ish haqi"],
+        "Ish": ["ish", "meeting"],
+        "Shaxsiy": ["o'zim"],
+        "Transport": ["такси"],
+    })
+
+    # Uzun kalit birinchi, bo'shliqlar farqi yo'q
+    assert matcher.find("Ish   haqi oldim") == [("Maosh", "ish haqi")]
+    # Token boshida qo'shimcha bilan topiladi, so'z o'rtasida emas
+    assert matcher.scores("Ishlash va meetingga borish, tashish") == {"Ish": 2}
+    # Apostrof variantlari va kirill
+    assert matcher.scores("Oʻzim uchun ТАКСИ") == {"Shaxsiy": 1, "Transport": 1}
+    # Tirnoq ichidagi so'z
+    assert matcher.scores("'maosh' keldi") == {"Maosh": 1}
+    assert KeywordMatcher({"Ish": ["ish"]}, whole_word=True).scores("ishlash ish") == {"Ish": 1}
+
+
+def test_transaction_recategorization(db, test_user, tmp_path, monkeypatch):
+    """Batch klassifikatsiya va tarixni qayta kategoriyalash"""
+    monkeypatch.setattr(ai_config, "model_dir", str(tmp_path))
+    model_store.clear()
+    category_memo.clear()
+    categories = TextClassifier().classify_transactions([("Taxi", ""), ("Taxi", None), ("Noma'lum", "x")])
+    assert categories == ["Transport", "Transport", "Boshqa"]
+
+    for i, (title, category, kind) in enumerate([
+        ("Taxi uyga", "Boshqa", "expense"),
+        ("Kvartira ijara", "Boshqa", "expense"),
+        ("Internet", "Xizmatlar", "expense"),  # foydalanuvchi tanlagan - o'zgarmaydi
+        ("Oylik maosh", "Boshqa", "income"),
+        ("Maosh bo'yicha sovg'a", "Boshqa", "expense"),  # daromad kategoriyasi xarajatga emas
+    ]):
+        db.add(Transaction(
+            id=f"recat_{i}", user_id=test_user.id, title=title, category=category,
+            amount=1000.0, transaction_type=kind, transaction_date=date.today(),
+        ))
+    db.commit()
+
+    service = RecategorizationService(db)
+    preview = service.recategorize(test_user.id)
+    assert preview["total"] == 5
+    assert preview["changed"] == 3
+    assert db.query(Transaction).filter(Transaction.id == "recat_0").one().category == "Boshqa"
+
+    result = service.recategorize(test_user.id, dry_run=False)
+    assert result["by_category"] == {"Transport": 1, "Uy": 1, "Maosh": 1}
+    db.expire_all()
+    assert {t.id: t.category for t in db.query(Transaction).all()} == {
+        "recat_0": "Transport",
+        "recat_1": "Uy",
+        "recat_2": "Xizmatlar",
+        "recat_3": "Maosh",
+        "recat_4": "Boshqa",
+    }
+    assert service.recategorize(test_user.id, overwrite=True)["changed"] == 1  # Internet -> Telefon
+
+
+
+def test_category_model(db, test_user, tmp_path, monkeypatch):
+    """Foydalanuvchi tarixidan o'rganish va tuzatishlardan partial_fit"""
+    monkeypatch.setattr(ai_config, "model_dir", str(tmp_path))
+    model_store.clear()
+    category_memo.clear()
+
+    history = {
+        "Kafe": ["Evos", "Oqtepa lavash", "Chayxana"],
+        "Oziq-ovqat": ["Korzinka", "Makro", "Havas"],
+        "Transport": ["Yandex Go", "MyTaxi", "Benzin"],
+    }
+    for category, titles in history.items():
+        for i in range(10):
+            db.add(Transaction(
+                id=str(uuid.uuid4()), user_id=test_user.id, title=f"{titles[i % 3]} {i}",
+                category=category, amount=-30000.0, transaction_type="expense",
+                transaction_date=date.today(),
+            ))
+    db.commit()
+
+    service = CategoryModelService(db)
+    model = service.get_model(test_user.id)
+    assert model["n_samples"] == 30
+    assert (tmp_path / CATEGORY_MODEL_KIND).exists()
+
+    # Tez inference sklearn predict_proba bilan bir xil
+    texts = ["Evos burger", "Korzinka Chilonzor", ""]
+    assert np.allclose(predict_proba(model["model"], texts), model["model"].predict_proba(featurize(texts)))
+
+    results = service.categorize(test_user.id, [("Evos", "kechki ovqat"), ("Yandex Go", None), ("Zzz", "")])
+    assert [r["category"] for r in results[:2]] == ["Kafe", "Transport"]
+    assert results[0]["source"] == "model"
+    assert results[2] == {"category": "Boshqa", "confidence": None, "source": "keywords"}
+
+    # Foydalanuvchi tuzatishi darhol o'rganiladi (qayta fit qilinmasdan)
+    transaction = create_transaction(db, TransactionCreate(
+        title="Artel servis", category="Boshqa", amount=-50000, transaction_type="expense",
+        transaction_date=date.today(),
+    ), test_user.id)
+    update_transaction(db, transaction.id, test_user.id, TransactionUpdate(category="Transport"))
+    updated = model_store.get(CATEGORY_MODEL_KIND, test_user.id)
+    assert updated["corrections"] == 1
+    assert updated["fitted_at"] == model["fitted_at"]
+    assert service.predict_many(test_user.id, [("Artel servis", None)])[0][0] == "Transport"
+
+    # Yangi kategoriya - keyingi murojaatda to'liq qayta o'qitiladi
+    update_transaction(db, transaction.id, test_user.id, TransactionUpdate(category="Texnika"))
+    refitted = service.get_model(test_user.id)
+    assert "Texnika" in refitted["model"].classes_
+    assert refitted["n_samples"] == 31
+    model_store.clear()
+
+
+def test_category_model_negative_cache(db, test_user, tmp_path, monkeypatch):
+    """Ma'lumot yetarli bo'lmasa ham natija keshlanadi - har murojaatda tarix qayta o'qilmaydi"""
+    monkeypatch.setattr(ai_config, "model_dir", str(tmp_path))
+    model_store.clear()
+    for i in range(3):
+        db.add(Transaction(
+            id=str(uuid.uuid4()), user_id=test_user.id, title=f"Evos {i}", category="Kafe",
+            amount=-30000.0, transaction_type="expense", transaction_date=date.today(),
+        ))
+    db.commit()
+
+    service = CategoryModelService(db)
+    fits = []
+    fit_model = service.fit_model
+    monkeypatch.setattr(service, "fit_model", lambda user_id: fits.append(user_id) or fit_model(user_id))
+
+    assert service.get_model(test_user.id) is None
+    assert service.predict_many(test_user.id, [("Evos", None)]) == [None]
+    assert service.get_model(test_user.id) is None
+    assert len(fits) == 1
+    # Salbiy natija diskka yozilmaydi
+    assert not any(tmp_path.rglob("*.joblib"))
+
+    # Foydalanuvchi yorlig'i keshni eskirtiradi
+    assert service.learn(test_user.id, "Korzinka", None, "Oziq-ovqat")
+    assert service.get_model(test_user.id) is None
+    assert len(fits) == 2
+    model_store.clear()
@@ -0,0 +1,135 @@
+import pytest
+import time
+import threading
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import User, JobRun, Metric
+from app.services.background.job_runner import BackgroundJobRunner, check_deadline, iter_user_id_chunks
+from app.services.background.scheduler import CronSchedule
+
+
+@pytest.fixture(scope="function")
+def session_factory(tmp_path):
+    """Worker thread'lar uchun fayl asosidagi SQLite"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'jobs.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = factory()
+    for i in range(25):
+        db.add(User(id=f"user_{i:03d}", email=f"user_{i}@example.com", password_hash="x"))
+    db.commit()
+    db.close()
+
+    try:
+        yield factory
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def test_iter_user_id_chunks(session_factory):
+    """Keyset pagination barcha foydalanuvchilarni bir martadan qaytaradi"""
+    db = session_factory()
+    try:
+        chunks = list(iter_user_id_chunks(db, chunk_size=10))
+    finally:
+        db.close()
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    ids = [user_id for chunk in chunks for user_id in chunk]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 25
+
+
+def test_background_job_runner(session_factory):
+    """Xatolar va timeout'lar boshqa foydalanuvchilarga ta'sir qilmaydi"""
+    def handler(db, user_id):
+        if user_id == "user_003":
+            raise ValueError("boom")
+        if user_id == "user_007":
+            time.sleep(1.0)
+        return {"user_id": user_id}
+
+    collected = []
+    runner = BackgroundJobRunner(session_factory, max_workers=4, chunk_size=10, user_timeout=0.3)
+    summary = runner.run("test_job", handler, on_result=lambda user_id, result: collected.append(user_id))
+
+    assert summary["processed"] == 25
+    assert summary["succeeded"] == 23
+    assert summary["failed"] == 1
+    assert summary["timed_out"] == 1
+    assert len(collected) == 23
+    assert summary["throughput_per_second"] > 0
+
+    db = session_factory()
+    try:
+        job_run = db.query(JobRun).filter(JobRun.id == summary["job_id"]).first()
+        assert job_run.status == "completed"
+        assert job_run.processed == 25
+        assert db.query(Metric).filter(Metric.metric_name == "job_throughput").count() == 1
+    finally:
+        db.close()
+
+
+def test_cron_schedule():
+    """Cron ifodasi bo'yicha keyingi vaqtni hisoblash"""
+    daily = CronSchedule("0 2 * * *")
+    assert daily.next_after(datetime(2024, 1, 1, 1, 30)) == datetime(2024, 1, 1, 2, 0)
+    assert daily.next_after(datetime(2024, 1, 1, 2, 0)) == datetime(2024, 1, 2, 2, 0)
+
+    every_15 = CronSchedule("*/15 * * * *")
+    assert every_15.next_after(datetime(2024, 1, 1, 10, 7)) == datetime(2024, 1, 1, 10, 15)
+
+    # Dushanba kunlari 09:30
+    mondays = CronSchedule("30 9 * * 1")
+    assert mondays.next_after(datetime(2024, 1, 3, 12, 0)) == datetime(2024, 1, 8, 9, 30)
+
+    with pytest.raises(ValueError):
+        CronSchedule("0 25 * * *")
+
+
+def test_job_runner_stops_when_workers_wedge(session_factory):
+    """Barcha worker'lar osilib qolsa ish cheksiz kutmaydi va "degraded" bo'ladi"""
+    release = threading.Event()
+
+    def handler(db, user_id):
+        release.wait(5)
+        return {"user_id": user_id}
+
+    runner = BackgroundJobRunner(session_factory, max_workers=2, chunk_size=10, user_timeout=0.2)
+    started = time.monotonic()
+    try:
+        summary = runner.run("wedged_job", handler)
+    finally:
+        release.set()
+
+    assert time.monotonic() - started < 3
+    assert summary["status"] == "degraded"
+    assert summary["timed_out"] == 2
+    assert summary["skipped"] >= 1
+    assert summary["succeeded"] == 0
+
+    db = session_factory()
+    try:
+        assert db.query(JobRun).filter(JobRun.id == summary["job_id"]).first().status == "degraded"
+    finally:
+        db.close()
+
+
+def test_check_deadline(session_factory):
+    """Handler ichidagi muddat tekshiruvi"""
+    def handler(db, user_id):
+        time.sleep(0.15)
+        check_deadline(db)
+        return {"user_id": user_id}
+
+    runner = BackgroundJobRunner(session_factory, max_workers=4, chunk_size=10, user_timeout=0.1)
+    summary = runner.run("deadline_job", handler)
+    assert summary["succeeded"] == 0
+    assert summary["failed"] + summary["timed_out"] == 25
@@ -0,0 +1,152 @@
+import pytest
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+from app.database import Base
+from app.models import TelegramCode
+from app.services import code_store, telegram_service
+from app.services.code_store import (
+    DatabaseCodeStore, MemoryCodeStore, SlidingWindowLimiter, TTLMap, VerifyResult
+)
+from app.utils.network import get_client_ip
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(scope="function")
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'codes.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    try:
+        yield factory
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def test_ttl_map_evicts_in_expiry_order():
+    ttl = TTLMap()
+    ttl.set("a", 1, 10)
+    ttl.set("b", 2, 20)
+    ttl.set("a", 3, 30)  # re-set leaves a stale heap entry for 10
+    assert ttl.evict(15) == 0
+    assert ttl.get("a", 15) == 3
+    assert ttl.evict(25) == 1
+    assert ttl.get("b", 25) is None
+    assert ttl.evict(30) == 1
+    assert len(ttl) == 0
+
+
+def test_memory_store_attempts_and_expiry():
+    clock = FakeClock()
+    store = MemoryCodeStore(clock)
+
+    store.issue("+998901234567", "123456", ttl_seconds=60)
+    assert store.verify("+998901234567", "000000", max_attempts=3) == VerifyResult.INVALID
+    assert store.verify("+998901234567", "123456", max_attempts=3) == VerifyResult.VALID
+    # Single use
+    assert store.verify("+998901234567", "123456", max_attempts=3) == VerifyResult.MISSING
+
+    store.issue("+998901234567", "654321", ttl_seconds=60)
+    assert store.verify("+998901234567", "1", max_attempts=2) == VerifyResult.INVALID
+    assert store.verify("+998901234567", "2", max_attempts=2) == VerifyResult.EXHAUSTED
+    assert store.verify("+998901234567", "654321", max_attempts=2) == VerifyResult.MISSING
+
+    store.issue("+998901234568", "111111", ttl_seconds=60)
+    clock.now += 61
+    assert store.verify("+998901234568", "111111", max_attempts=3) == VerifyResult.MISSING
+    assert len(store) == 0
+
+
+def test_concurrent_attempts_are_counted_atomically(session_factory):
+    for store in (MemoryCodeStore(), DatabaseCodeStore(session_factory)):
+        store.issue("+998901234567", "123456", ttl_seconds=60)
+        results = []
+
+        def guess(i):
+            results.append(store.verify("+998901234567", f"{i:06d}", max_attempts=3))
+
+        threads = [threading.Thread(target=guess, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Only max_attempts guesses were checked, the rest found no code
+        assert results.count(VerifyResult.INVALID) + results.count(VerifyResult.EXHAUSTED) == 3
+        assert results.count(VerifyResult.MISSING) == 17
+        assert store.verify("+998901234567", "123456", max_attempts=3) == VerifyResult.MISSING
+
+
+def test_database_store(session_factory):
+    store = DatabaseCodeStore(session_factory)
+    store.issue("+998901234567", "123456", ttl_seconds=60)
+    store.issue("+998901234567", "222222", ttl_seconds=60)  # replaces the first code
+    assert store.verify("+998901234567", "123456", max_attempts=3) == VerifyResult.INVALID
+    assert store.verify("+998901234567", "222222", max_attempts=3) == VerifyResult.VALID
+
+    store.issue("+998901234568", "333333", ttl_seconds=-1)
+    assert store.verify("+998901234568", "333333", max_attempts=3) == VerifyResult.MISSING
+    db = session_factory()
+    assert db.query(TelegramCode).count() == 0
+    db.close()
+
+
+def test_sliding_window_limits():
+    clock = FakeClock()
+    limiter = SlidingWindowLimiter(clock)
+    phone = ("send:phone:1", 1, 60)
+    assert limiter.hit(phone, ("send:ip:a", 2, 600))
+    assert not limiter.hit(phone, ("send:ip:a", 2, 600))
+    # A rejected hit is not recorded for the other keys
+    assert limiter.hit(("send:phone:2", 1, 60), ("send:ip:a", 2, 600))
+    assert not limiter.hit(("send:phone:3", 1, 60), ("send:ip:a", 2, 600))
+
+    clock.now += 61
+    assert limiter.hit(phone)
+    clock.now += 540
+    assert limiter.hit(("send:phone:4", 1, 60), ("send:ip:a", 2, 600))
+
+
+def test_create_and_verify_code(session_factory, monkeypatch):
+    monkeypatch.setattr(code_store, "_code_store", MemoryCodeStore())
+    monkeypatch.setattr(code_store, "_limiter", SlidingWindowLimiter())
+    db = session_factory()
+
+    code = telegram_service.create_code(db, "+998901234567", client_ip="10.0.0.1")
+    assert code is not None
+    assert telegram_service.create_code(db, "+998901234567", client_ip="10.0.0.2") is None
+    db.close()
+
+    assert not telegram_service.verify_code("+998901234567", "000000", client_ip="10.0.0.1")
+    assert telegram_service.verify_code("998901234567", code, client_ip="10.0.0.1")
+    assert not telegram_service.verify_code("+998901234567", code, client_ip="10.0.0.1")
+
+
+def make_request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "client": (peer, 12345), "headers": headers})
+
+
+def test_client_ip_from_trusted_proxies():
+    # No proxies configured: the peer may be a shared proxy, so per-IP limits are off
+    assert get_client_ip(make_request("10.0.0.5", "1.2.3.4"), "") is None
+    # Direct connection from an untrusted peer; its header is ignored
+    assert get_client_ip(make_request("5.6.7.8", "1.2.3.4"), "10.0.0.0/8") == "5.6.7.8"
+    # Trusted proxy chain; the spoofed left-most entry is skipped
+    request = make_request("10.0.0.5", "6.6.6.6, 1.2.3.4, 10.0.0.9")
+    assert get_client_ip(request, "10.0.0.0/8") == "1.2.3.4"
+    # "*" trusts the connecting peer only, not the forwarded hops
+    assert get_client_ip(make_request("100.64.3.1", "6.6.6.6, 1.2.3.4"), "*") == "1.2.3.4"
+    assert get_client_ip(make_request("100.64.3.1"), "*") == "100.64.3.1"
@@ -0,0 +1,375 @@
+import csv
+import gzip
+import io
+import json
+import zipfile
+from pathlib import Path
+import uuid
+import pytest
+from datetime import date, datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import User, Task, Habit, Transaction, Budget, ProductivityLog
+from app.services.export_import_service import ExportImportService, EXPORT_SPECS, escape_cell, export_file_type, gzip_stream
+from app.services.bulk_import_service import BulkImportService
+from app.services.planner_import_service import PlannerImportService
+from app.services.json_stream import JSONStreamError, iter_sections, READ_CHUNK_SIZE
+
+
+@pytest.fixture(scope="function")
+def db():
+    """Database session for service tests"""
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def user(db):
+    user = User(id=f"user_{uuid.uuid4().hex[:8]}", email=f"{uuid.uuid4().hex[:8]}@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def account(db, user):
+    """A user with a few rows in every exported table"""
+    for i in range(5):
+        db.add(Task(id=f"task_{i}", user_id=user.id, title=f"Task {i}", is_focus=i % 2, due_date=datetime(2026, 3, 1, 9)))
+        db.add(Transaction(
+            id=f"txn_{i}", user_id=user.id, title=f"Non {i}", category="Oziq-ovqat", amount=1000.0 * i,
+            transaction_type="expense", transaction_date=date(2026, 3, i + 1),
+        ))
+    db.add(Habit(id="habit_0", user_id=user.id, title="Yugurish", goal="30 min"))
+    db.add(Budget(id="budget_0", user_id=user.id, category="Oziq-ovqat", amount=500000.0, period="monthly", start_date=date(2026, 3, 1)))
+    db.commit()
+    return user
+
+
+def test_stream_json_matches_export_all(db, account):
+    """Streamed document has the same layout and values as the in-memory export"""
+    expected = ExportImportService(db).export_all(account.id)
+    streamed = json.loads(b"".join(ExportImportService(db).stream_json(account.id)))
+
+    assert set(streamed) == {"tasks", "habits", "finance", "exported_at"}
+    for key in ("tasks", "habits", "finance"):
+        assert streamed[key] == expected[key]
+    assert streamed["tasks"][1]["is_focus"] is True
+    assert streamed["habits"][0]["goal"] == "30 min"
+    assert streamed["finance"]["transactions"][2]["transaction_date"] == "2026-03-03"
+
+    tasks_only = json.loads(b"".join(ExportImportService(db).stream_json(account.id, "tasks")))
+    assert list(tasks_only) == ["tasks"]
+    assert len(tasks_only["tasks"]) == 5
+
+
+def test_gzip_stream_round_trip(db, account):
+    chunks = list(gzip_stream(ExportImportService(db).stream_json(account.id, "finance")))
+    assert len(json.loads(gzip.decompress(b"".join(chunks)))["transactions"]) == 5
+
+
+def test_table_exports(db, account):
+    """CSV (single table or zipped per table) and XLSX carry the same rows as the JSON export"""
+    expected = ExportImportService(db).export_all(account.id)
+
+    raw = b"".join(ExportImportService(db).stream_export(account.id, "tasks", "csv"))
+    rows = list(csv.DictReader(io.StringIO(raw.decode("utf-8-sig"))))
+    assert [row["id"] for row in rows] == [task["id"] for task in expected["tasks"]]
+    assert (rows[1]["is_focus"], rows[1]["due_date"]) == ("True", "2026-03-01 09:00:00")
+
+    assert export_file_type("finance", "csv") == ("application/zip", "zip")
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(ExportImportService(db).stream_export(account.id, "finance", "csv"))))
+    assert archive.namelist() == ["transactions.csv", "budgets.csv"]
+    transactions = list(csv.DictReader(io.StringIO(archive.read("transactions.csv").decode("utf-8-sig"))))
+    assert [row["amount"] for row in transactions] == ["0.0", "1000.0", "2000.0", "3000.0", "4000.0"]
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(b"".join(ExportImportService(db).stream_export(account.id, "all", "xlsx"))))
+    assert workbook.sheetnames == ["tasks", "habits", "transactions", "budgets"]
+    sheet = list(workbook["tasks"].values)
+    assert list(sheet[0]) == EXPORT_SPECS["tasks"][1]
+    assert (len(sheet), sheet[1][6], sheet[1][7]) == (6, False, datetime(2026, 3, 1, 9))
+    assert list(workbook["budgets"].values)[1][2] == 500000.0
+
+
+def test_parquet_export(db, account):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(b"".join(ExportImportService(db).stream_export(account.id, "tasks", "parquet"))))
+    assert table.column_names == EXPORT_SPECS["tasks"][1]
+    assert table.column("is_focus").to_pylist() == [False, True, False, True, False]
+
+
+def test_bulk_upsert(db, user):
+    """Upsert by id, fresh UUIDs for new/foreign ids, per-row errors do not abort the batch"""
+    db.add(User(id="other_user", email="other@example.com", password_hash="x"))
+    db.add(Task(id="foreign", user_id="other_user", title="Secret"))
+    db.add(Task(id="mine", user_id=user.id, title="Old", priority="low"))
+    db.commit()
+
+    report = BulkImportService(db, chunk_size=2).upsert("tasks", user.id, [
+        {"id": "mine", "title": "Renamed"},
+        {"id": "foreign", "title": "Hijack"},
+        {"title": "Without id"},
+        {"title": ""},
+        {"title": "Bad priority", "priority": "urgent"},
+        {"id": "new", "title": "New", "due_date": "2026-03-01T09:00:00", "is_focus": True},
+    ])
+    assert (report["created"], report["updated"], report["failed"]) == (3, 1, 2)
+    assert report["errors"][0] == "Row 4: 'title' is required"
+
+    mine = db.query(Task).filter(Task.id == "mine").one()
+    assert (mine.title, mine.priority) == ("Renamed", "low")  # only columns present in the file change
+    assert db.query(Task).filter(Task.id == "foreign").one().title == "Secret"
+    hijack = db.query(Task).filter(Task.title == "Hijack").one()
+    assert hijack.user_id == user.id and hijack.id != "foreign"
+    assert db.query(Task).filter(Task.id == "new").one().is_focus == 1
+
+    # Productivity logs upsert on (user_id, log_date)
+    engine = BulkImportService(db)
+    engine.upsert("productivity_logs", user.id, [{"log_date": "2026-03-01", "tasks_completed": 3}])
+    report = engine.upsert("productivity_logs", user.id, [{"log_date": "2026-03-01", "tasks_completed": 5, "mood": "good"}])
+    assert report["updated"] == 1
+    log = db.query(ProductivityLog).one()
+    assert (log.tasks_completed, log.mood) == (5, "good")
+
+
+def test_import_refreshes_expense_stats(db, user):
+    """Imported transactions reach the running stats and insights; updated rows are queued for rescoring"""
+    from app.schemas.transaction import TransactionCreate
+    from app.services.ai.expense_stats_service import ExpenseStatsService
+    from app.services.transaction_service import create_transaction
+
+    first = create_transaction(db, TransactionCreate(
+        title="Non", category="Oziq-ovqat", amount=-1000, transaction_type="expense", transaction_date=date(2026, 3, 1),
+    ), user.id)
+    assert ExpenseStatsService(db).get_stats(user.id).count == 1
+    db.query(Transaction).filter(Transaction.id == first.id).update({"anomaly_score": 0.9})
+    db.commit()
+
+    ExportImportService(db).import_finance(user.id, {"transactions": [
+        {"title": f"Imported {i}", "category": "Kafe", "amount": -2000 * (i + 1),
+         "transaction_type": "expense", "transaction_date": "2026-03-02"}
+        for i in range(5)
+    ] + [{"id": first.id, "title": "Non", "category": "Oziq-ovqat", "amount": -3000,
+          "transaction_type": "expense", "transaction_date": "2026-03-01"}]})
+
+    stats = ExpenseStatsService(db)
+    assert stats.get_stats(user.id).count == 6
+    assert stats.get_stats(user.id).mean == pytest.approx((3000 + 2000 + 4000 + 6000 + 8000 + 10000) / 6)
+    assert stats.get_stats(user.id, "Kafe").count == 5
+    assert db.query(Transaction).filter(Transaction.id == first.id).one().anomaly_score is None
+
+    # Streaming imports go through the same engine
+    body = json.dumps({"finance": {"transactions": [
+        {"title": "Stream", "category": "Kafe", "amount": -500, "transaction_type": "expense",
+         "transaction_date": "2026-03-03"},
+    ]}}).encode()
+    from app.models import Insight
+    from app.services.ai.insights_store import InsightsStore
+
+    InsightsStore(db).get(user.id, "monthly")
+    ExportImportService(db).import_stream(user.id, io.BytesIO(body))
+    assert ExpenseStatsService(db).get_stats(user.id).count == 7
+    # Imported history reaches insights on the next read
+    assert db.query(Insight).filter(Insight.user_id == user.id).count() == 0
+
+
+def test_export_import_round_trip(db, account):
+    """A streamed export re-imports as updates of the same rows"""
+    data = json.loads(b"".join(ExportImportService(db).stream_json(account.id)))
+    results = ExportImportService(db).import_all(account.id, data)
+    assert {section: report["updated"] for section, report in results.items()} == {
+        "tasks": 5, "habits": 1, "transactions": 5, "budgets": 1,
+    }
+    assert all(report["failed"] == 0 for report in results.values())
+    assert db.query(Transaction).count() == 5
+
+
+def test_iter_sections_across_chunk_boundaries():
+    """Elements split between reads decode the same as json.loads"""
+    doc = {
+        "tasks": [{"id": i, "title": "ü" * (i % 40), "amount": 12345678901234567890} for i in range(2000)],
+        "other": {"nested": [1, [2, {"tasks": "not a section"}]]},
+        "finance": {"transactions": [], "budgets": [{"amount": 2.5e5}]},
+    }
+    raw = json.dumps(doc, ensure_ascii=False, indent=1).encode()
+    assert len(raw) > 2 * READ_CHUNK_SIZE
+    seen = set()
+    items = list(iter_sections(io.BytesIO(raw), {"tasks", "transactions", "budgets"}, seen))
+    assert [record for section, record in items if section == "tasks"] == doc["tasks"]
+    assert items[-1] == ("budgets", {"amount": 2.5e5})
+    assert seen == {"tasks", "transactions", "budgets"}
+
+    with pytest.raises(JSONStreamError) as error:
+        list(iter_sections(io.BytesIO(b'{"tasks": [{"title": "a"} {"title": "b"}]}')))
+    assert error.value.position == 26
+
+
+def test_malformed_upload_fails_without_buffering(monkeypatch):
+    """A bad first record raises at once instead of reading the rest of the upload"""
+    import tracemalloc
+    from app.services import json_stream
+
+    records = ",".join(json.dumps({"title": f"Task {i}", "description": "x" * 200}) for i in range(40000))
+    raw = f'{{"tasks": [{{"title": "a",, }}, {records}]}}'.encode()
+    assert len(raw) > 8 * 1024 * 1024
+    upload = io.BytesIO(gzip.compress(raw))
+
+    tracemalloc.start()
+    try:
+        with pytest.raises(JSONStreamError) as error:
+            list(iter_sections(json_stream.open_upload(upload)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert error.value.position == 25
+    assert peak < 1024 * 1024
+
+    # One element may not grow the buffer without bound
+    monkeypatch.setattr(json_stream, "MAX_ELEMENT_CHARS", 200 * 1024)
+    with pytest.raises(JSONStreamError, match="Element larger"):
+        list(iter_sections(io.BytesIO(b'{"tasks": [{"title": "' + b"a" * (1024 * 1024) + b'"}]}')))
+    with pytest.raises(JSONStreamError, match="Line longer"):
+        list(json_stream.iter_ndjson(io.BytesIO(b'{"title": "' + b"a" * (1024 * 1024) + b'"}\n'), "tasks"))
+
+
+def test_numbers_across_read_boundary():
+    """A number cut by the read chunk ("12500." + "75", "1e" + "5") is not decoded early"""
+    for number in ("12500.75", "1e5", "-42", "3.25E-2"):
+        for cut in range(1, len(number)):
+            head = '{"amounts": ["'
+            filler = "x" * (READ_CHUNK_SIZE - len(head) - len('", ') - cut)
+            document = f'{head}{filler}", {number}, 7]}}'
+            assert document.index(number) + cut == READ_CHUNK_SIZE
+            values = [value for _, value in iter_sections(io.BytesIO(document.encode()))]
+            assert values[1:] == [json.loads(number), 7], (number, cut)
+
+
+def test_import_stream(db, account):
+    """Gzipped JSON and NDJSON uploads upsert in chunks; a parse error keeps committed chunks"""
+    data = json.loads(b"".join(ExportImportService(db).stream_json(account.id)))
+    upload = io.BytesIO(gzip.compress(json.dumps(data).encode()))
+    results = ExportImportService(db).import_stream(account.id, upload)
+    assert {section: report["updated"] for section, report in results.items()} == {
+        "tasks": 5, "habits": 1, "transactions": 5, "budgets": 1,
+    }
+
+    ndjson = b'{"title": "Line 1"}\n\n{"section": "habits", "title": "Skipped"}\n{"id": "task_0", "title": "Line 3"}\n'
+    results = ExportImportService(db).import_stream(account.id, io.BytesIO(ndjson), "tasks", ndjson=True)
+    assert list(results) == ["tasks"]
+    assert (results["tasks"]["created"], results["tasks"]["updated"]) == (1, 1)
+    assert db.query(Task).filter(Task.id == "task_0").one().title == "Line 3"
+
+    records = ",".join(json.dumps({"title": f"Bulk {i}"}) for i in range(2500))
+    with pytest.raises(JSONStreamError):
+        ExportImportService(db).import_stream(account.id, io.BytesIO(f'{{"habits": [{records}, {{"title": '.encode()))
+    assert db.query(Habit).filter(Habit.title.like("Bulk %")).count() == 2000
+
+
+DOCS_DIR = Path(__file__).resolve().parents[2] / "docs"
+
+
+def _filled_template(name, cells):
+    """A copy of a shipped planner template with some cells filled in"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(DOCS_DIR / name)
+    for sheet, values in cells.items():
+        for ref, value in values.items():
+            workbook[sheet][ref] = value
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_planner_import_tasks_and_finance(db, user):
+    """Task lists map dropdown labels; re-importing the same workbook updates in place"""
+    upload = _filled_template("Vazifalar planneri _ Ongli Tizim.xlsx", {
+        "Vazifalar nazorati": {"C10": "Hisobot", "D10": "🔥 Muhim", "E10": "✏️ Jarayonda", "G10": "Chorak", "B11": True, "C11": "Sport"},
+        "Kalendar": {"C10": "Uchrashuv", "I10": datetime(2026, 3, 5)},
+    })
+    assert PlannerImportService(db).import_workbook(user.id, upload)["tasks"]["created"] == 3
+    upload.seek(0)
+    assert PlannerImportService(db).import_workbook(user.id, upload)["tasks"]["updated"] == 3
+    tasks = {task.title: task for task in db.query(Task).all()}
+    assert (tasks["Hisobot"].priority, tasks["Hisobot"].status, tasks["Hisobot"].description) == ("high", "in_progress", "Chorak")
+    assert tasks["Sport"].status == "done"
+    assert tasks["Uchrashuv"].due_date == datetime(2026, 3, 5)
+
+    # Фин план month sheet: year in H10, expenses B/E/Q/T and incomes AF/AI/AU/AX from row 45
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Январь"
+    sheet["H10"] = 2025
+    sheet["B45"], sheet["E45"], sheet["Q45"] = datetime(2025, 1, 3), "🍔 Озиқ-овқат ва ичимликлар", 125000
+    sheet["AF45"], sheet["AI45"], sheet["AU45"], sheet["AX45"] = datetime(2025, 1, 5), "💼 Иш ҳақи (Маош)", 5000000, "Maosh"
+    sheet["E46"], sheet["Q46"] = "🚌 Транспорт", "abc"
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    report = PlannerImportService(db).import_workbook(user.id, buffer)["transactions"]
+    assert (report["created"], report["failed"]) == (2, 1)
+    income = db.query(Transaction).filter(Transaction.transaction_type == "income").one()
+    assert (income.title, income.category, income.amount, income.transaction_date) == (
+        "Maosh", "Иш ҳақи (Маош)", 5000000.0, date(2025, 1, 5),
+    )
+
+
+def test_planner_import_habits(db, user):
+    """Habit grid becomes habits with completion stats plus daily productivity logs"""
+    upload = _filled_template("Odatlar planneri _ Ongli Tizim.xlsx", {
+        "Dashboard": {"Q3": 2025},
+        "Yan": {"B10": "Yugurish", "B11": "Kitob", "D11": True, "C37": 8, "C38": 6},
+    })
+    results = PlannerImportService(db).import_workbook(user.id, upload)
+    assert results["habits"]["created"] == 2
+    habits = {habit.title: habit for habit in db.query(Habit).all()}
+    # The template ships with sample ticks in a few months (longest run: Jan 1-6)
+    assert (habits["Yugurish"].total_completions, habits["Yugurish"].longest_streak) == (11, 6)
+    assert habits["Kitob"].total_completions == 2
+
+    first = db.query(ProductivityLog).filter(ProductivityLog.log_date == date(2025, 1, 1)).one()
+    assert (first.habits_completed, first.habits_total, first.mood, first.energy_level) == (1, 2, "good", 6)
+    assert db.query(ProductivityLog).filter(ProductivityLog.log_date == date(2025, 1, 2)).one().habits_completed == 2
+
+
+def test_xlsx_export_round_trip(db, account):
+    upload = io.BytesIO(b"".join(ExportImportService(db).stream_export(account.id, "all", "xlsx")))
+    results = PlannerImportService(db).import_workbook(account.id, upload)
+    assert {section: report["updated"] for section, report in results.items()} == {
+        "tasks": 5, "habits": 1, "transactions": 5, "budgets": 1,
+    }
+
+
+def test_exports_escape_formula_cells(db, account):
+    db.query(Task).filter(Task.user_id == account.id).first().title = '=HYPERLINK("http://x","y")'
+    db.commit()
+
+    raw = b"".join(ExportImportService(db).stream_export(account.id, "tasks", "csv")).decode("utf-8-sig")
+    titles = [row["title"] for row in csv.DictReader(io.StringIO(raw))]
+    assert '\'=HYPERLINK("http://x","y")' in titles
+    # Negative numbers are not text and stay as they are
+    assert (escape_cell(-500.0), escape_cell("-500"), escape_cell("a=b")) == (-500.0, "'-500", "a=b")
+
+    upload = io.BytesIO(b"".join(ExportImportService(db).stream_export(account.id, "tasks", "xlsx")))
+    from openpyxl import load_workbook
+
+    cells = [row[1] for row in load_workbook(upload).worksheets[0].values]
+    assert '\'=HYPERLINK("http://x","y")' in cells
+    # Our own export imports back without the quote
+    upload.seek(0)
+    PlannerImportService(db).import_workbook(account.id, upload)
+    assert db.query(Task).filter(Task.title == '=HYPERLINK("http://x","y")').count() == 1
@@ -0,0 +1,182 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.config import settings
+from app.models import OutboxMessage, TelegramUser
+from app.services import code_store, telegram_service
+from app.services.background.outbox import OutboxWorker, PermanentDeliveryError, enqueue_message
+from app.services.metrics_service import MetricsService
+
+
+@pytest.fixture(scope="function")
+def session_factory(tmp_path):
+    """Worker thread'lar uchun fayl asosidagi SQLite"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'outbox.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    try:
+        yield factory
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+class RecordingSender:
+    """Yuborilgan xabarlarni yozib oladi; ``errors`` navbatdagi urinishlarda ko'tariladi"""
+
+    def __init__(self, errors=()):
+        self.sent = []
+        self.errors = list(errors)
+
+    async def __call__(self, item):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(item)
+
+
+def make_worker(session_factory, **senders):
+    return OutboxWorker(session_factory, senders=senders, batch_size=10, backoff_base=0.0, max_attempts=3)
+
+
+def statuses(session_factory):
+    db = session_factory()
+    try:
+        return {m.recipient: (m.status, m.attempts) for m in db.query(OutboxMessage).all()}
+    finally:
+        db.close()
+
+
+async def test_create_code_queues_message(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "telegram_bot_token", "TEST:TOKEN")
+    monkeypatch.setattr(code_store, "_code_store", code_store.MemoryCodeStore())
+    monkeypatch.setattr(code_store, "_limiter", code_store.SlidingWindowLimiter())
+    db = session_factory()
+    db.add(TelegramUser(phone_number="+998901234567", chat_id="555"))
+    db.commit()
+
+    code = telegram_service.create_code(db, "90 123 45 67")
+    assert code is not None
+    assert len(code_store.get_code_store()) == 1
+    message = db.query(OutboxMessage).one()
+    assert (message.channel, message.recipient, message.status) == ("telegram", "555", "pending")
+    assert message.expires_at is not None
+    db.close()
+
+    telegram = RecordingSender()
+    assert await make_worker(session_factory, telegram=telegram).run_once() == 1
+    assert code in telegram.sent[0].payload["text"]
+
+    db = session_factory()
+    message = db.query(OutboxMessage).one()
+    assert message.status == "sent" and message.attempts == 1
+    assert message.delivery_ms is not None and message.sent_at is not None
+    # Kod bazada ochiq matnda qolmaydi
+    assert code not in message.payload
+    db.close()
+
+
+async def test_retries_and_failures(session_factory):
+    db = session_factory()
+    enqueue_message(db, "telegram", "flaky", {"text": "a"})
+    enqueue_message(db, "telegram", "down", {"text": "b"})
+    enqueue_message(db, "email", "user@example.com", {"subject": "s", "body": "b"})
+    enqueue_message(db, "push", "device-token", {"title": "t", "body": "b"})
+    db.commit()
+    db.close()
+
+    class Telegram(RecordingSender):
+        async def __call__(self, item):
+            if item.recipient == "down":
+                raise RuntimeError("502 Bad Gateway")
+            await super().__call__(item)
+
+    telegram = Telegram(errors=[RuntimeError("timeout")])
+    email = RecordingSender(errors=[PermanentDeliveryError("Email not enabled")])
+    worker = make_worker(session_factory, telegram=telegram, email=email)
+
+    assert await worker.run_once() == 4
+    result = statuses(session_factory)
+    assert result["user@example.com"] == ("failed", 1)
+    assert result["device-token"] == ("failed", 1)  # kanal uchun sender yo'q
+    assert result["flaky"] == ("pending", 1)
+    assert result["down"] == ("pending", 1)
+
+    await worker.run_once()
+    await worker.run_once()
+    result = statuses(session_factory)
+    assert result["flaky"][0] == "sent"
+    assert result["down"] == ("failed", 3)
+    assert await worker.run_once() == 0
+
+    db = session_factory()
+    metrics = MetricsService.get_outbox_metrics(db)
+    db.close()
+    assert metrics["backlog"] == 0
+    assert metrics["by_channel"]["telegram"]["sent"] == 1
+    assert metrics["by_channel"]["telegram"]["failed"] == 1
+    assert metrics["by_channel"]["telegram"]["failure_rate"] == 50.0
+    assert metrics["by_channel"]["email"]["failed"] == 1
+
+
+async def test_worker_wakes_on_enqueue(session_factory):
+    telegram = RecordingSender()
+    worker = OutboxWorker(session_factory, senders={"telegram": telegram}, poll_interval=60)
+    worker.start()
+    try:
+        await asyncio.sleep(0.05)
+        db = session_factory()
+        enqueue_message(db, "telegram", "1", {"text": "Salom"})
+        db.commit()
+        db.close()
+        worker.wake()
+        for _ in range(100):
+            if telegram.sent:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await worker.stop()
+    assert [item.recipient for item in telegram.sent] == ["1"]
+
+
+async def test_expired_messages_are_not_sent(session_factory):
+    now = datetime.utcnow()
+    db = session_factory()
+    enqueue_message(db, "telegram", "late", {"text": "Kod: 111111"}, expires_at=now - timedelta(seconds=1))
+    enqueue_message(db, "telegram", "flaky", {"text": "Kod: 222222"}, expires_at=now + timedelta(seconds=30))
+    db.commit()
+    db.close()
+
+    telegram = RecordingSender(errors=[RuntimeError("timeout")])
+    worker = OutboxWorker(session_factory, senders={"telegram": telegram}, batch_size=10, backoff_base=60.0)
+    assert await worker.run_once() == 1
+    # Keyingi urinish (30-60 s) muddatdan keyin bo'lardi - qayta urinilmaydi
+    assert statuses(session_factory) == {"late": ("failed", 0), "flaky": ("failed", 1)}
+    assert telegram.sent == []
+
+    db = session_factory()
+    assert all(m.payload == "{}" and m.last_error.startswith("Expired") for m in db.query(OutboxMessage).all())
+    db.close()
+
+
+async def test_purge_finished_messages(session_factory):
+    db = session_factory()
+    enqueue_message(db, "telegram", "sent", {"text": "a"})
+    enqueue_message(db, "telegram", "queued", {"text": "b"})
+    db.commit()
+    db.query(OutboxMessage).filter(OutboxMessage.recipient == "queued").update(
+        {"next_attempt_at": datetime.utcnow() + timedelta(hours=1)}
+    )
+    db.commit()
+    db.close()
+    worker = make_worker(session_factory, telegram=RecordingSender())
+    assert await worker.run_once() == 1
+
+    assert worker.purge(datetime.utcnow() - timedelta(hours=1)) == 0
+    assert worker.purge(datetime.utcnow() + timedelta(seconds=1)) == 1
+    assert statuses(session_factory) == {"queued": ("pending", 0)}
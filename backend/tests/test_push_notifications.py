@@ -0,0 +1,215 @@
+import pytest
+import json
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models import DeviceToken, User
+from app.services import notification_service
+from app.services.fcm_client import (
+    FCMClient, PushMessage, ServiceAccountTokenProvider, StaticTokenProvider
+)
+from app.services.notification_service import NotificationService, PushNotification
+
+
+class FakeFCM:
+    """In-process FCM HTTP v1 endpoint (plus the OAuth token endpoint)"""
+
+    def __init__(self, unregistered=(), malformed=(), unavailable=0, expired_tokens=(), not_found=False):
+        self.sent = []
+        self.not_found = not_found
+        self.unregistered = set(unregistered)
+        self.malformed = set(malformed)
+        self.unavailable = unavailable
+        self.expired_tokens = set(expired_tokens)
+        self.assertions = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/token":
+            form = dict(httpx.QueryParams(request.content.decode()))
+            self.assertions.append(form["assertion"])
+            return httpx.Response(200, json={"access_token": f"ya29.{len(self.assertions)}", "expires_in": 3600})
+
+        if request.headers["Authorization"].removeprefix("Bearer ") in self.expired_tokens:
+            return httpx.Response(401, json={"error": {"status": "UNAUTHENTICATED", "message": "expired"}})
+        if self.unavailable:
+            self.unavailable -= 1
+            return httpx.Response(503, headers={"Retry-After": "0"}, json={"error": {"status": "UNAVAILABLE"}})
+
+        if self.not_found:
+            return httpx.Response(404, text="<html>Not Found</html>")
+
+        message = json.loads(request.content)["message"]
+        token = message["token"]
+        if token in self.unregistered:
+            return httpx.Response(404, json={"error": {
+                "status": "NOT_FOUND", "message": "Requested entity was not found.",
+                "details": [{"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": "UNREGISTERED"}],
+            }})
+        if token in self.malformed:
+            return httpx.Response(400, json={"error": {
+                "status": "INVALID_ARGUMENT",
+                "message": "The registration token is not a valid FCM registration token",
+                "details": [{"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": "INVALID_ARGUMENT"}],
+            }})
+        self.sent.append((request.url.path, message))
+        return httpx.Response(200, json={"name": f"projects/test/messages/{len(self.sent)}"})
+
+
+def make_client(fcm, provider=None):
+    return FCMClient(
+        "test-project",
+        provider or StaticTokenProvider("ya29.static"),
+        base_url="https://fcm.test",
+        concurrency=8,
+        transport=httpx.MockTransport(fcm),
+    )
+
+
+@pytest.fixture(scope="function")
+def db():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session.add_all([
+        User(id="u1", email="u1@example.com", password_hash="x"),
+        User(id="u2", email="u2@example.com", password_hash="x"),
+    ])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+async def test_send_many_results():
+    fcm = FakeFCM(unregistered={"gone"}, malformed={"bad"}, unavailable=1)
+    client = make_client(fcm)
+    try:
+        results = await client.send_many([
+            PushMessage("ok-1", "Salom", "Body", {"task_id": 7}),
+            PushMessage("gone", "Salom", "Body"),
+            PushMessage("bad", "Salom", "Body"),
+            PushMessage("ok-2", "Salom", "Body"),
+        ])
+    finally:
+        await client.aclose()
+
+    assert [r.token for r in results] == ["ok-1", "gone", "bad", "ok-2"]
+    assert [r.success for r in results] == [True, False, False, True]
+    assert results[1].invalid_token and results[2].invalid_token
+    sent = {message["token"]: (path, message) for path, message in fcm.sent}
+    path, message = sent["ok-1"]  # retried after the 503
+    assert path == "/v1/projects/test-project/messages:send"
+    assert message["notification"] == {"title": "Salom", "body": "Body"}
+    assert message["data"] == {"task_id": "7"}
+
+
+async def test_service_account_token_refresh():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    provider = ServiceAccountTokenProvider({
+        "client_email": "push@test-project.iam.gserviceaccount.com",
+        "private_key": pem,
+        "private_key_id": "k1",
+        "token_uri": "https://fcm.test/token",
+    })
+    # The first access token is rejected as expired and refreshed once
+    fcm = FakeFCM(expired_tokens={"ya29.1"})
+    client = make_client(fcm, provider)
+    try:
+        results = await client.send_many([PushMessage("t1", "a", "b"), PushMessage("t2", "a", "b")])
+    finally:
+        await client.aclose()
+
+    assert all(r.success for r in results)
+    assert len(fcm.assertions) == 2
+    public = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    claims = jwt.decode(fcm.assertions[0], public, algorithms=["RS256"], audience="https://fcm.test/token")
+    assert claims["iss"] == "push@test-project.iam.gserviceaccount.com"
+    assert claims["scope"] == "https://www.googleapis.com/auth/firebase.messaging"
+
+
+async def test_register_and_fan_out(db, monkeypatch):
+    monkeypatch.setenv("FCM_ENABLED", "true")
+    fcm = FakeFCM(unregistered={"u1-old"})
+    client = make_client(fcm)
+    monkeypatch.setattr(notification_service, "get_fcm_client", lambda: client)
+
+    service = NotificationService(db)
+    assert await service.register_device("u1", "u1-phone", "android")
+    assert await service.register_device("u1", "u1-old", "ios")
+    assert await service.register_device("u2", "u2-web")
+    # Re-registering moves the token instead of duplicating it
+    assert await service.register_device("u2", "u2-web", "web")
+    assert db.query(DeviceToken).count() == 3
+
+    try:
+        summary = await service.send_push_batch([
+            PushNotification("u1", "Vazifa eslatmasi", "Hisobot"),
+            PushNotification("u2", "Odat eslatmasi", "Yugurish", {"habit_id": "h1"}),
+            PushNotification("u3", "No devices", "-"),
+        ])
+    finally:
+        await client.aclose()
+
+    assert summary == {"sent": 2, "failed": 1, "pruned": 1}
+    assert sorted(message["token"] for _, message in fcm.sent) == ["u1-phone", "u2-web"]
+    assert {t.token for t in db.query(DeviceToken).all()} == {"u1-phone", "u2-web"}
+
+
+async def test_bare_404_keeps_tokens(db, monkeypatch):
+    db.add(DeviceToken(user_id="u1", token="t1", platform="android"))
+    db.commit()
+    monkeypatch.setenv("FCM_ENABLED", "true")
+    client = make_client(FakeFCM(not_found=True))
+    monkeypatch.setattr(notification_service, "get_fcm_client", lambda: client)
+    try:
+        summary = await NotificationService(db).send_push_batch([PushNotification("u1", "Salom", "Body")])
+    finally:
+        await client.aclose()
+    assert summary == {"sent": 0, "failed": 1, "pruned": 0}
+    assert db.query(DeviceToken).count() == 1
+
+
+async def test_fan_out_db_work_runs_off_loop(db, monkeypatch):
+    import threading
+    db.add(DeviceToken(user_id="u1", token="gone", platform="android"))
+    db.commit()
+    monkeypatch.setenv("FCM_ENABLED", "true")
+    client = make_client(FakeFCM(unregistered={"gone"}))
+    monkeypatch.setattr(notification_service, "get_fcm_client", lambda: client)
+    threads = []
+    service = NotificationService(db)
+    load, prune = service._load_messages, notification_service.prune_device_tokens
+    monkeypatch.setattr(service, "_load_messages", lambda by_user: threads.append(threading.get_ident()) or load(by_user))
+    monkeypatch.setattr(
+        notification_service, "prune_device_tokens",
+        lambda session, tokens: threads.append(threading.get_ident()) or prune(session, tokens),
+    )
+    try:
+        summary = await service.send_push_batch([PushNotification("u1", "Salom", "Body")])
+    finally:
+        await client.aclose()
+    assert summary == {"sent": 0, "failed": 1, "pruned": 1}
+    assert len(threads) == 2 and threading.get_ident() not in threads
+
+
+async def test_fan_out_disabled(db, monkeypatch):
+    monkeypatch.setenv("FCM_ENABLED", "false")
+    summary = await NotificationService(db).send_push_batch([PushNotification("u1", "a", "b")])
+    assert summary == {"sent": 0, "failed": 0, "pruned": 0}
@@ -0,0 +1,50 @@
+import io
+import pytest
+from PIL import Image, ImageDraw
+from app.services.ai.receipt_preprocessor import preprocess_receipt, estimate_skew
+
+
+def _receipt_image(width=1200, height=1800, angle=0.0) -> Image.Image:
+    """Oq fonda matn qatorlariga o'xshash chiziqlar"""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(100, height - 100, 60):
+        draw.rectangle([100, y, width - 100 - (y % 300), y + 18], fill=(30, 30, 30))
+    if angle:
+        image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor="white")
+    return image
+
+
+def _jpeg(image: Image.Image, **kwargs) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=95, **kwargs)
+    return buf.getvalue()
+
+
+def test_preprocess_shrinks_large_photo():
+    """Katta rasm kichraytiriladi va kulrang JPEG qilib qayta kodlanadi"""
+    original = _jpeg(_receipt_image(3000, 4500))
+    prepared = preprocess_receipt(original)
+
+    assert max(prepared.stats["processed_size"]) <= 1800
+    assert prepared.stats["bytes_saved"] > 0
+    assert prepared.media_type == "image/jpeg"
+    assert Image.open(io.BytesIO(prepared.upload_data)).mode == "L"
+    assert Image.open(io.BytesIO(prepared.ocr_data)).mode == "1"
+
+
+def test_preprocess_applies_exif_orientation():
+    """EXIF orientation=6 (90° burilgan) rasm tik holatga keltiriladi"""
+    landscape = _receipt_image(1200, 1800).rotate(90, expand=True)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    prepared = preprocess_receipt(_jpeg(landscape, exif=exif))
+
+    width, height = prepared.stats["processed_size"]
+    assert height > width
+
+
+@pytest.mark.parametrize("angle", [-3.0, 2.0])
+def test_estimate_skew(angle):
+    image = _receipt_image(angle=angle).convert("L")
+    assert estimate_skew(image) == pytest.approx(-angle, abs=0.5)
@@ -0,0 +1,288 @@
+import pytest
+import asyncio
+import io
+import json
+import threading
+import time
+import zipfile
+from PIL import Image, ImageDraw
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import Headers, UploadFile
+from app.database import Base
+from app.models import User, Transaction, ReceiptScanJob, ReceiptScanCache
+from app.services import transaction_service
+from app.services.ai.receipt_scanner_service import ReceiptScannerService
+from app.services.ai.vision_clients import FakeVisionClient
+from app.services.ai.receipt_batch_service import ReceiptBatchService, BatchLimitError
+from app.services.background.receipt_queue import ReceiptScanQueue, fail_interrupted_scan_jobs
+from app.config.ai_config import ai_config
+
+
+@pytest.fixture(scope="function")
+def session_factory(tmp_path):
+    """Worker thread'lar uchun fayl asosidagi SQLite"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'receipts.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = factory()
+    db.add(User(id="receipt_user", email="receipt@example.com", password_hash="x"))
+    db.commit()
+    db.close()
+
+    try:
+        yield factory
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def scanner(monkeypatch):
+    monkeypatch.setenv("USE_OCR", "false")
+    monkeypatch.setenv("USE_AI_VISION", "true")
+    return ReceiptScannerService(vision_client=FakeVisionClient(delay=0.2))
+
+
+async def test_receipt_queue_processes_jobs(session_factory, scanner):
+    """Joblar parallel ishlanadi va event loop bloklanmaydi"""
+    queue = ReceiptScanQueue(session_factory, scanner=scanner, workers=4)
+    queue.start()
+    try:
+        started = time.perf_counter()
+        job_ids = [
+            await queue.submit("receipt_user", f"fake-image-{i}".encode(), f"r{i}.jpg", "image/jpeg")
+            for i in range(4)
+        ]
+
+        # Loop boshqa ishlarni bajara oladi
+        ticks = 0
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+        await queue.join()
+        assert time.perf_counter() - started < 0.6  # 4 x 0.2s ketma-ket emas
+    finally:
+        await queue.stop()
+
+    db = session_factory()
+    try:
+        jobs = db.query(ReceiptScanJob).filter(ReceiptScanJob.id.in_(job_ids)).all()
+        assert {job.status for job in jobs} == {"completed"}
+        assert all(job.transaction_id for job in jobs)
+        transactions = db.query(Transaction).filter(Transaction.user_id == "receipt_user").all()
+        assert len(transactions) == 4
+        assert transactions[0].amount == 45000.0
+        assert transactions[0].category == "Oziq-ovqat"
+    finally:
+        db.close()
+
+
+async def test_receipt_queue_full_leaves_no_orphan_job(session_factory, scanner):
+    """Navbat job yaratilayotganda to'lsa, "queued" qator qolmaydi"""
+    queue = ReceiptScanQueue(session_factory, scanner=scanner, maxsize=1)
+    queue._queue = asyncio.Queue(maxsize=1)  # worker'siz: navbat bo'shamaydi
+
+    # Ikkala so'rov ham full() tekshiruvidan o'tadi, faqat bittasi navbatga sig'adi
+    results = await asyncio.gather(
+        queue.submit("receipt_user", b"a", "a.jpg", "image/jpeg"),
+        queue.submit("receipt_user", b"b", "b.jpg", "image/jpeg"),
+        return_exceptions=True,
+    )
+    job_ids = [r for r in results if isinstance(r, str)]
+    assert len(job_ids) == 1
+    assert sum(isinstance(r, asyncio.QueueFull) for r in results) == 1
+
+    db = session_factory()
+    try:
+        assert [job.id for job in db.query(ReceiptScanJob).all()] == job_ids
+    finally:
+        db.close()
+
+
+async def test_scan_receipt_rejects_oversized_upload(session_factory, scanner, monkeypatch):
+    """Chegaradan katta rasm navbatga qo'yilmaydi"""
+    from fastapi import HTTPException
+    from app.api.transactions import scan_receipt
+
+    monkeypatch.setattr(ai_config, "receipt_max_file_mb", 1)
+    queue = ReceiptScanQueue(session_factory, scanner=scanner, maxsize=1)
+    queue._queue = asyncio.Queue(maxsize=1)  # worker'siz
+    user = User(id="receipt_user")
+    with pytest.raises(HTTPException) as error:
+        await scan_receipt(_upload("big.jpg", b"\0" * (1024 * 1024 + 1), "image/jpeg"), user, queue)
+    assert error.value.status_code == 413
+    assert queue._queue.qsize() == 0
+
+    response = await scan_receipt(_upload("ok.jpg", b"\0" * 1024, "image/jpeg"), user, queue)
+    assert response.status == "queued"
+    assert queue._queue.qsize() == 1
+
+
+async def test_receipt_queue_vision_timeout(session_factory, scanner, monkeypatch):
+    """Vision LLM timeout bo'lsa OCR parsing fallback ishlatiladi"""
+    monkeypatch.setattr(ai_config, "vision_timeout_seconds", 0.05)
+    scanner._vision_client = FakeVisionClient(delay=1.0)
+
+    queue = ReceiptScanQueue(session_factory, scanner=scanner, workers=1)
+    queue.start()
+    try:
+        job_id = await queue.submit("receipt_user", b"fake-image")
+        await queue.wait(job_id, 2)
+    finally:
+        await queue.stop()
+
+    db = session_factory()
+    try:
+        job = db.query(ReceiptScanJob).filter(ReceiptScanJob.id == job_id).one()
+        assert job.status == "completed"
+        assert '"title": "Yangi xarajat"' in job.result
+    finally:
+        db.close()
+
+
+def _receipt_photo(size=(900, 1400), quality=90, step=70) -> bytes:
+    image = Image.new("RGB", (900, 1400), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(80, 1300, step):
+        draw.rectangle([60, y, 840 - (y % 350), y + 22], fill=(20, 20, 20))
+    image = image.resize(size)
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+async def test_receipt_queue_cache_duplicates(session_factory, scanner):
+    """Qayta yuklangan chek keshdan olinadi: aniq nusxa - o'sha tranzaksiya, o'xshash - dublikat belgisi"""
+    queue = ReceiptScanQueue(session_factory, scanner=scanner, workers=1)
+    queue.start()
+    try:
+        photo = _receipt_photo()
+        first = await queue.submit("receipt_user", photo)
+        await queue.join()
+        exact = await queue.submit("receipt_user", photo)
+        await queue.join()
+        similar = await queue.submit("receipt_user", _receipt_photo(size=(600, 933), quality=60))
+        await queue.join()
+    finally:
+        await queue.stop()
+
+    assert scanner._vision_client.calls == 1
+
+    db = session_factory()
+    try:
+        jobs = {job.id: job for job in db.query(ReceiptScanJob).all()}
+        original_txn = jobs[first].transaction_id
+        exact_result = json.loads(jobs[exact].result)
+        similar_result = json.loads(jobs[similar].result)
+
+        assert jobs[exact].transaction_id == original_txn
+        assert exact_result["duplicate_of"] == original_txn
+        assert exact_result["cache"]["match"] == "exact"
+
+        assert jobs[similar].transaction_id != original_txn
+        assert similar_result["possible_duplicate_of"] == original_txn
+        assert similar_result["cache"]["match"] == "similar"
+
+        assert db.query(Transaction).filter(Transaction.user_id == "receipt_user").count() == 2
+        assert db.query(ReceiptScanCache).count() == 2
+    finally:
+        db.close()
+
+
+def _upload(name: str, data: bytes, content_type: str) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=name, headers=Headers({"content-type": content_type}))
+
+
+def _zip(entries) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+async def test_receipt_batch_upload(session_factory, scanner, monkeypatch):
+    """Rasm + zip: bitta commit, partiyadagi nusxa va keraksiz fayl hisobotda"""
+    threads = []
+    create_bulk = transaction_service.create_transactions_bulk
+    monkeypatch.setattr(
+        transaction_service, "create_transactions_bulk",
+        lambda *args: threads.append(threading.get_ident()) or create_bulk(*args),
+    )
+    first, second, third = (_receipt_photo(step=step) for step in (70, 95, 130))
+    archive = _zip([("march/b.jpg", second), ("march/c.jpg", third), ("march/a_copy.jpg", first), ("notes.txt", b"x")])
+
+    db = session_factory()
+    try:
+        report = await ReceiptBatchService(db, scanner=scanner).run("receipt_user", [
+            _upload("a.jpg", first, "image/jpeg"),
+            _upload("march.zip", archive, "application/zip"),
+        ])
+        statuses = {item["filename"]: item["status"] for item in report["files"]}
+        assert statuses == {
+            "a.jpg": "created",
+            "march.zip/march/b.jpg": "created",
+            "march.zip/march/c.jpg": "created",
+            "march.zip/march/a_copy.jpg": "duplicate",
+            "march.zip/notes.txt": "rejected",
+        }
+        assert (report["created"], report["duplicates"], report["rejected"]) == (3, 1, 1)
+        copy = next(item for item in report["files"] if item["filename"].endswith("a_copy.jpg"))
+        assert copy["duplicate_of"] == report["files"][0]["transaction_id"]
+        assert scanner._vision_client.calls == 3
+        assert db.query(Transaction).filter(Transaction.user_id == "receipt_user").count() == 3
+        # Bazaga yozish event loop thread'ida emas
+        assert threads and threading.get_ident() not in threads
+
+        # Qayta yuklash keshdan: yangi tranzaksiya ham, LLM chaqiruvi ham yo'q
+        again = await ReceiptBatchService(db, scanner=scanner).run(
+            "receipt_user", [_upload("a.jpg", first, "image/jpeg")]
+        )
+        assert again["duplicates"] == 1
+        assert scanner._vision_client.calls == 3
+        assert db.query(Transaction).filter(Transaction.user_id == "receipt_user").count() == 3
+    finally:
+        db.close()
+
+
+async def test_receipt_batch_limits(session_factory, scanner, monkeypatch):
+    bomb = _zip([("bomb.jpg", b"\0" * (5 * 1024 * 1024))])
+    db = session_factory()
+    try:
+        report = await ReceiptBatchService(db, scanner=scanner).run(
+            "receipt_user", [_upload("bomb.zip", bomb, "application/zip")]
+        )
+        assert report["files"][0]["status"] == "rejected"
+        assert report["files"][0]["error"] == "Suspicious compression ratio"
+
+        monkeypatch.setattr(ai_config, "receipt_batch_max_files", 1)
+        with pytest.raises(BatchLimitError):
+            await ReceiptBatchService(db, scanner=scanner).run("receipt_user", [
+                _upload(f"r{i}.jpg", _receipt_photo(step=70 + i), "image/jpeg") for i in range(2)
+            ])
+        assert scanner._vision_client.calls == 0
+    finally:
+        db.close()
+
+
+def test_fail_interrupted_scan_jobs(session_factory):
+    db = session_factory()
+    db.add(ReceiptScanJob(id="queued_job", user_id="receipt_user", status="queued"))
+    db.add(ReceiptScanJob(id="done_job", user_id="receipt_user", status="completed"))
+    db.commit()
+    db.close()
+
+    assert fail_interrupted_scan_jobs(session_factory) == 1
+
+    db = session_factory()
+    try:
+        assert db.query(ReceiptScanJob).filter(ReceiptScanJob.id == "queued_job").one().status == "failed"
+        assert db.query(ReceiptScanJob).filter(ReceiptScanJob.id == "done_job").one().status == "completed"
+    finally:
+        db.close()
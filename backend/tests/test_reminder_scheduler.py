@@ -0,0 +1,160 @@
+import pytest
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models import Habit, HabitCompletion, Task, User
+from app.services.background.reminder_scheduler import Reminder, ReminderScheduler
+
+NOW = datetime(2025, 3, 10, 9, 0)
+
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, notifications):
+        self.batches.append(notifications)
+        return {"sent": len(notifications), "failed": 0, "pruned": 0}
+
+    @property
+    def bodies(self):
+        return [n.body for batch in self.batches for n in batch]
+
+
+@pytest.fixture(scope="function")
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add_all([
+        User(id="u1", email="u1@example.com", password_hash="x"),
+        User(id="u2", email="u2@example.com", password_hash="x"),
+    ])
+    db.commit()
+    db.close()
+    try:
+        yield factory
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def add_task(factory, task_id, due_in_minutes, status="pending", user_id="u1", updated_at=NOW):
+    db = factory()
+    db.add(Task(
+        id=task_id, user_id=user_id, title=task_id, status=status,
+        due_date=NOW + timedelta(minutes=due_in_minutes), updated_at=updated_at,
+    ))
+    db.commit()
+    db.close()
+
+
+def make_scheduler(factory, dispatcher, **kwargs):
+    options = dict(lead_minutes=60, horizon_minutes=15, refresh_seconds=60, batch_size=100, habit_time="")
+    options.update(kwargs)
+    return ReminderScheduler(factory, dispatcher, **options)
+
+
+def test_heap_orders_by_fire_time(session_factory):
+    scheduler = make_scheduler(session_factory, RecordingDispatcher())
+    for minutes in (30, 5, 20):
+        scheduler.schedule(Reminder("task", NOW + timedelta(minutes=minutes), f"t{minutes}", NOW))
+    # The same reminder is queued once
+    assert not scheduler.schedule(Reminder("task", NOW + timedelta(minutes=5), "t5", NOW))
+    assert len(scheduler) == 3
+    assert scheduler.next_fire_at() == NOW + timedelta(minutes=5)
+    assert [r.ref for r in scheduler._pop_due(NOW + timedelta(minutes=25))] == ["t5", "t20"]
+
+
+async def test_window_and_dispatch(session_factory):
+    add_task(session_factory, "soon", 70)  # fires in 10 minutes
+    add_task(session_factory, "new", 30, updated_at=NOW + timedelta(seconds=1))  # created inside the lead time
+    add_task(session_factory, "later", 300)  # outside the horizon
+    add_task(session_factory, "done", 65, status="done")
+    add_task(session_factory, "u2", 74, status="in_progress", user_id="u2")
+    dispatcher = RecordingDispatcher()
+    scheduler = make_scheduler(session_factory, dispatcher)
+
+    wake_at = await scheduler.tick(NOW)
+    assert dispatcher.bodies == ["new"]
+    assert sorted(r.ref for _, _, r in scheduler.heap) == ["soon", "u2"]
+    # Sleeps until the next reminder, not a fixed poll
+    assert wake_at == NOW + timedelta(minutes=1)
+
+    assert await scheduler.tick(NOW + timedelta(minutes=1)) == NOW + timedelta(minutes=2)
+    assert dispatcher.bodies == ["new"]  # re-scan does not send again
+
+    await scheduler.tick(NOW + timedelta(minutes=14))
+    assert dispatcher.bodies == ["new", "soon", "u2"]
+    assert [n.user_id for n in dispatcher.batches[1]] == ["u1", "u2"]
+    assert dispatcher.batches[1][0].data["task_id"] == "soon"
+    assert len(scheduler) == 0
+
+
+async def test_stale_reminders_are_skipped(session_factory):
+    add_task(session_factory, "finished", 61)
+    add_task(session_factory, "moved", 62)
+    dispatcher = RecordingDispatcher()
+    scheduler = make_scheduler(session_factory, dispatcher)
+    await scheduler.tick(NOW)
+
+    db = session_factory()
+    db.get(Task, "finished").status = "done"
+    db.get(Task, "moved").due_date = NOW + timedelta(minutes=70)
+    db.commit()
+    db.close()
+
+    await scheduler.tick(NOW + timedelta(minutes=2))
+    assert dispatcher.bodies == []
+    # The moved task is queued again at its new time
+    assert scheduler.next_fire_at() == NOW + timedelta(minutes=10)
+    await scheduler.tick(NOW + timedelta(minutes=10))
+    assert dispatcher.bodies == ["moved"]
+
+
+async def test_restart_skips_reminders_already_due(session_factory):
+    add_task(session_factory, "old", 20, updated_at=NOW - timedelta(hours=3))
+    dispatcher = RecordingDispatcher()
+    scheduler = make_scheduler(session_factory, dispatcher)
+    await scheduler.tick(NOW)
+    assert dispatcher.bodies == []
+    assert len(scheduler) == 0
+
+
+async def test_batches(session_factory):
+    for i in range(5):
+        add_task(session_factory, f"t{i}", 61)
+    dispatcher = RecordingDispatcher()
+    scheduler = make_scheduler(session_factory, dispatcher, batch_size=2)
+    await scheduler.tick(NOW + timedelta(minutes=1))
+    assert [len(batch) for batch in dispatcher.batches] == [2, 2, 1]
+
+
+async def test_daily_habit_reminder(session_factory):
+    db = session_factory()
+    db.add_all([
+        Habit(id="h1", user_id="u1", title="Yugurish", goal="30 min", is_active=1),
+        Habit(id="h2", user_id="u1", title="Kitob", goal="20 bet", is_active=1),
+        Habit(id="h3", user_id="u2", title="Suv", goal="2 Litr", is_active=1),
+        Habit(id="h4", user_id="u2", title="Eski", goal="-", is_active=0),
+    ])
+    db.add(HabitCompletion(id="c1", habit_id="h2", completion_date=date(2025, 3, 10), progress=100))
+    db.commit()
+    db.close()
+    dispatcher = RecordingDispatcher()
+    scheduler = make_scheduler(session_factory, dispatcher, habit_time="15:00", batch_size=1)
+
+    await scheduler.tick(NOW)
+    assert scheduler.next_fire_at() == datetime(2025, 3, 10, 15, 0)
+    await scheduler.tick(datetime(2025, 3, 10, 15, 0))
+    assert dispatcher.bodies == ["Yugurish", "Suv"]
+    assert dispatcher.batches[0][0].data == {"type": "habit_reminder", "habit_id": "h1"}
+    # Next day's reminder is queued
+    assert scheduler.next_fire_at() == datetime(2025, 3, 11, 15, 0)
@@ -0,0 +1,125 @@
+import pytest
+import asyncio
+import json
+import httpx
+from app.services.telegram_client import TelegramAPIError, TelegramBotClient, TelegramRateLimiter, TokenBucket
+
+
+class FakeBotAPI:
+    """In-process Bot API: records sendMessage calls, answers 429 for queued chats"""
+
+    def __init__(self, rate_limited=None, failures=0):
+        self.calls = []
+        self.rate_limited = dict(rate_limited or {})
+        self.failures = failures
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        payload = json.loads(request.content)
+        self.calls.append((request.url.path, payload, loop.time()))
+        if self.failures:
+            self.failures -= 1
+            return httpx.Response(502, json={"ok": False, "description": "Bad Gateway"})
+        retry_after = self.rate_limited.pop(str(payload.get("chat_id")), None)
+        if retry_after is not None:
+            return httpx.Response(429, json={
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            })
+        if payload.get("chat_id") == "blocked":
+            return httpx.Response(403, json={"ok": False, "description": "Forbidden: bot was blocked by the user"})
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": len(self.calls), "text": payload["text"]}})
+
+
+def make_client(api, global_rate=1000, chat_rate=1000, group_rate=1000, max_retries=3):
+    return TelegramBotClient(
+        "TEST:TOKEN",
+        limiter=TelegramRateLimiter(global_rate, chat_rate, group_rate),
+        max_retries=max_retries,
+        transport=httpx.MockTransport(api),
+    )
+
+
+def test_token_bucket_spacing():
+    bucket = TokenBucket(rate=10, capacity=3)
+    # Burst of 3, then one token every 0.1s
+    waits = [bucket.reserve(0.0) for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.1)
+    assert waits[4] == pytest.approx(0.2)
+
+    bucket.pause(1.0, 2.0)
+    assert bucket.reserve(1.0) == pytest.approx(2.0)
+
+
+async def test_send_message():
+    api = FakeBotAPI()
+    client = make_client(api)
+    try:
+        result = await client.send_message(123, "<b>Salom</b>", parse_mode="HTML")
+    finally:
+        await client.aclose()
+
+    assert result["text"] == "<b>Salom</b>"
+    path, payload, _ = api.calls[0]
+    assert path == "/botTEST:TOKEN/sendMessage"
+    assert payload == {"chat_id": 123, "text": "<b>Salom</b>", "parse_mode": "HTML"}
+
+
+async def test_retry_after_429():
+    api = FakeBotAPI(rate_limited={"42": 0.2})
+    client = make_client(api)
+    try:
+        await client.send_message(42, "hello")
+    finally:
+        await client.aclose()
+
+    assert len(api.calls) == 2
+    assert api.calls[1][2] - api.calls[0][2] >= 0.19
+
+
+async def test_server_errors_are_retried_then_raised():
+    api = FakeBotAPI(failures=1)
+    client = make_client(api)
+    try:
+        await client.send_message(1, "retry")
+        assert len(api.calls) == 2
+
+        with pytest.raises(TelegramAPIError) as error:
+            await client.send_message("blocked", "x")
+        assert error.value.status_code == 403
+        assert len(api.calls) == 3  # client errors are not retried
+    finally:
+        await client.aclose()
+
+    api.rate_limited["7"] = 0.01
+    client = make_client(api, max_retries=0)
+    try:
+        with pytest.raises(TelegramAPIError) as error:
+            await client.send_message(7, "x")
+        assert error.value.retry_after == 0.01
+    finally:
+        await client.aclose()
+
+
+async def test_per_chat_rate_limit():
+    api = FakeBotAPI()
+    client = make_client(api, chat_rate=20, group_rate=10)
+    try:
+        await asyncio.gather(
+            *(client.send_message(5, f"private {i}") for i in range(3)),
+            *(client.send_message(-100, f"group {i}") for i in range(3)),
+            *(client.send_message(chat, "other") for chat in range(100, 110)),
+        )
+    finally:
+        await client.aclose()
+
+    def times(chat_id):
+        return [at for _, payload, at in api.calls if payload["chat_id"] == chat_id]
+
+    private, group = times(5), times(-100)
+    assert all(b - a >= 0.045 for a, b in zip(private, private[1:]))
+    assert all(b - a >= 0.095 for a, b in zip(group, group[1:]))
+    # Other chats are not held back by the throttled ones
+    assert max(times(chat)[0] for chat in range(100, 110)) - api.calls[0][2] < 0.05
@@ -0,0 +1,119 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.config import settings
+from app.models import OutboxMessage, TelegramUpdate, TelegramUser
+from app.api.telegram_webhook import verify_telegram_webhook
+from app.services.background.telegram_updates import TelegramUpdateConsumer, store_update
+
+
+@pytest.fixture(scope="function")
+def session_factory(tmp_path):
+    """Worker thread'lar uchun fayl asosidagi SQLite"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'updates.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    try:
+        yield factory
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def message_update(update_id, chat_id, text):
+    return {"update_id": update_id, "message": {"message_id": update_id, "chat": {"id": chat_id}, "text": text}}
+
+
+def test_verify_webhook_secret(monkeypatch):
+    monkeypatch.setattr(settings, "telegram_bot_token", "TEST:TOKEN")
+    monkeypatch.setattr(settings, "telegram_webhook_secret", "s3cret")
+    assert verify_telegram_webhook("s3cret")
+    assert not verify_telegram_webhook("wrong")
+    assert not verify_telegram_webhook(None)
+
+    monkeypatch.setattr(settings, "telegram_webhook_secret", None)
+    monkeypatch.setattr(settings, "debug", False)
+    assert not verify_telegram_webhook(None)
+
+
+async def test_webhook_stores_update_in_a_worker_thread(session_factory, monkeypatch):
+    import json
+    import threading
+    from starlette.requests import Request
+    from app.api import telegram_webhook
+
+    monkeypatch.setattr(settings, "telegram_bot_token", "TEST:TOKEN")
+    monkeypatch.setattr(settings, "telegram_webhook_secret", "s3cret")
+    threads = []
+    monkeypatch.setattr(
+        telegram_webhook, "store_update",
+        lambda db, update: threads.append(threading.get_ident()) or store_update(db, update),
+    )
+    body = json.dumps(message_update(7, 10, "salom")).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    db = session_factory()
+    try:
+        request = Request({"type": "http", "method": "POST", "headers": []}, receive)
+        assert await telegram_webhook.telegram_webhook(request, "s3cret", db) == {"ok": True}
+        assert db.query(TelegramUpdate).count() == 1
+    finally:
+        db.close()
+    assert threads and threading.get_ident() not in threads
+
+
+async def test_updates_are_deduplicated_and_ordered_per_chat(session_factory):
+    db = session_factory()
+    for update_id, chat_id in ((1, 10), (2, 20), (3, 10), (4, 10), (5, 20)):
+        assert store_update(db, message_update(update_id, chat_id, f"u{update_id}"))
+    # Telegram retry
+    assert not store_update(db, message_update(3, 10, "u3"))
+    db.close()
+
+    handled = []
+    failures = {3: 1}
+
+    def handler(db, update):
+        update_id = update["update_id"]
+        if failures.get(update_id):
+            failures[update_id] -= 1
+            raise RuntimeError("temporary")
+        handled.append(update_id)
+
+    consumer = TelegramUpdateConsumer(session_factory, handler=handler, batch_size=10)
+    assert await consumer.run_once() == 5
+    # Update 3 failed, so 4 (same chat) waits for the next batch
+    assert sorted(handled) == [1, 2, 5]
+
+    assert await consumer.run_once() == 2
+    assert handled[3:] == [3, 4]
+    assert await consumer.run_once() == 0
+
+    db = session_factory()
+    rows = {row.update_id: (row.status, row.attempts) for row in db.query(TelegramUpdate).all()}
+    db.close()
+    assert rows[3] == ("done", 2)
+    assert all(status == "done" for status, _ in rows.values())
+
+
+async def test_bot_replies_are_queued(session_factory):
+    db = session_factory()
+    store_update(db, message_update(100, 555, "/start"))
+    store_update(db, message_update(101, 555, "+998 90 123 45 67"))
+    store_update(db, message_update(102, 777, "12345"))
+    db.close()
+
+    assert await TelegramUpdateConsumer(session_factory).run_once() == 3
+
+    db = session_factory()
+    assert db.query(TelegramUser).one().chat_id == "555"
+    replies = [(m.recipient, m.payload) for m in db.query(OutboxMessage).order_by(OutboxMessage.created_at).all()]
+    db.close()
+    assert [recipient for recipient, _ in replies].count("555") == 2
+    assert any(recipient == "777" and "noto'g'ri" in payload for recipient, payload in replies)
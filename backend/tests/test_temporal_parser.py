@@ -0,0 +1,86 @@
+import pytest
+from datetime import date, datetime
+from app.services.nlp.temporal_parser import parse_temporal
+from app.services.nlp.task_parser import TaskParser
+
+# Chorshanba, 2026-03-11 10:00
+NOW = datetime(2026, 3, 11, 10, 0)
+
+# (matn, sana, boshlanish, tugash) - benchmark ham shu korpusdan aniqlikni hisoblaydi
+CORPUS = [
+    # O'zbek (lotin)
+    ("Bugun loyiha ustida ishlash", date(2026, 3, 11), None, None),
+    ("Ertaga soat 15:00 da uchrashuv", date(2026, 3, 12), "15:00", None),
+    ("ertaga ertalab yugurish", date(2026, 3, 12), "09:00", None),
+    ("Indinga hisobot topshirish", date(2026, 3, 13), None, None),
+    ("3 kundan keyin to'lov", date(2026, 3, 14), None, None),
+    ("bir haftadan keyin doktorga", date(2026, 3, 18), None, None),
+    ("2 soatdan keyin qo'ng'iroq", date(2026, 3, 11), "12:00", None),
+    ("keyingi hafta reja tuzish", date(2026, 3, 18), None, None),
+    ("keyingi oy ijara", date(2026, 4, 11), None, None),
+    ("Dushanbaga taqdimot", date(2026, 3, 16), None, None),
+    ("Juma kuni kechqurun kino", date(2026, 3, 13), "19:00", None),
+    ("15-mart kuni imtihon", date(2026, 3, 15), None, None),
+    ("2 martda tug'ilgan kun", date(2027, 3, 2), None, None),
+    ("soat 10 dan 12 gacha yig'ilish", date(2026, 3, 12), "10:00", "12:00"),
+    ("kechqurun soat 7 da mashg'ulot", date(2026, 3, 11), "19:00", None),
+    ("tushdan keyin kitob o'qish", date(2026, 3, 11), "15:00", None),
+    ("Oʻqish 25.03 gacha", date(2026, 3, 25), None, None),
+    # O'zbek (kirill)
+    ("Эртага эрталаб спорт", date(2026, 3, 12), "09:00", None),
+    ("Жума куни соат 18:30 да учрашув", date(2026, 3, 13), "18:30", None),
+    ("5 апрелда ҳисобот", date(2026, 4, 5), None, None),
+    # Rus
+    ("завтра в 9 утра встреча", date(2026, 3, 12), "09:00", None),
+    ("в пятницу вечером кино", date(2026, 3, 13), "19:00", None),
+    ("через неделю отчет", date(2026, 3, 18), None, None),
+    ("через 3 дня оплатить", date(2026, 3, 14), None, None),
+    ("15 марта 2027 конференция", date(2027, 3, 15), None, None),
+    ("с 14 до 16 созвон", date(2026, 3, 11), "14:00", "16:00"),
+    ("в 7 вечера ужин", date(2026, 3, 11), "19:00", None),
+    ("послезавтра в 10:30", date(2026, 3, 13), "10:30", None),
+    # Ingliz
+    ("Tomorrow meeting at 3pm", date(2026, 3, 12), "15:00", None),
+    ("next friday at 9:30 am standup", date(2026, 3, 13), "09:30", None),
+    ("in 2 hours call mom", date(2026, 3, 11), "12:00", None),
+    ("Conference on March 20, 2027", date(2027, 3, 20), None, None),
+    ("pay rent on the 1st of april", date(2026, 4, 1), None, None),
+    ("10:00-11:30 design review", date(2026, 3, 12), "10:00", "11:30"),
+    ("this evening gym", date(2026, 3, 11), "19:00", None),
+    # Raqamli formatlar
+    ("Deadline 2026-04-01", date(2026, 4, 1), None, None),
+    ("Muddat 15.04.2026", date(2026, 4, 15), None, None),
+    # Sana emas
+    ("3 marta takrorlash", None, None, None),
+    ("1.5 kg olma sotib olish", None, None, None),
+    ("Pay 1.05 million sum", None, None, None),
+    ("Kredit 2.50 mln so'm to'lash", None, None, None),
+    ("Narx $3.10 ga tushdi", None, None, None),
+    ("market research", None, None, None),
+    ("Oddiy vazifa", None, None, None),
+]
+
+
+def _clock(value):
+    return value.strftime("%H:%M") if value else None
+
+
+@pytest.mark.parametrize("text,expected_date,start,end", CORPUS)
+def test_temporal_corpus(text, expected_date, start, end):
+    result = parse_temporal(text, now=NOW)
+    assert (result.date, _clock(result.start_time), _clock(result.end_time)) == (expected_date, start, end)
+
+
+def test_due_date_combines_date_and_time():
+    result = parse_temporal("Ertaga soat 15:00 da uchrashuv", now=NOW)
+    assert result.due_date == datetime(2026, 3, 12, 15, 0)
+    assert [kind for kind, _ in result.matches] == ["relative_day", "word_clock"]
+    assert parse_temporal("3 kundan keyin", now=NOW).due_date == datetime(2026, 3, 14)
+
+
+def test_task_parser_times():
+    result = TaskParser().parse_task_text("Ertaga soat 10:00-11:30 loyiha yig'ilishi")
+    assert result["start_time"] == "10:00"
+    assert result["end_time"] == "11:30"
+    assert result["due_date"].hour == 10
+    assert result["category"] == "Ish"
@@ -1,5 +1,11 @@
 import { apiClient } from './client';
-import type { Transaction, TransactionStats } from './types';
+import type {
+  ApiError,
+  ReceiptBatchResult,
+  ReceiptScanJob,
+  Transaction,
+  TransactionStats,
+} from './types';
 
 export interface TransactionFilters {
   skip?: number;
@@ -62,7 +68,7 @@ export const transactionsApi = {
     const formData = new FormData();
     formData.append('file', imageFile);
 
-    const response = await apiClient.instance.post<Transaction>(
+    const response = await apiClient.instance.post<ReceiptScanJob>(
       '/api/transactions/scan-receipt',
       formData,
       {
@@ -71,7 +77,54 @@ export const transactionsApi = {
         },
       }
     );
+
+    // Scanning runs in the background; long-poll until the job finishes
+    const waitSeconds = 25;
+    let job = response.data;
+    let backoff = 500;
+    while (job.status === 'queued' || job.status === 'processing') {
+      const started = Date.now();
+      job = await transactionsApi.getScanJob(job.job_id, waitSeconds);
+      if (job.status !== 'queued' && job.status !== 'processing') break;
+      // The server answered early without a result - back off instead of spinning
+      if (Date.now() - started < waitSeconds * 1000) {
+        await new Promise(resolve => setTimeout(resolve, backoff));
+        backoff = Math.min(backoff * 2, 5000); // 0.5s, 1s, 2s, 4s, 5s
+      } else {
+        backoff = 500;
+      }
+    }
+
+    if (job.status !== 'completed' || !job.transaction) {
+      const apiError: ApiError = {
+        detail: job.error || 'Chekni skaner qilishda xatolik yuz berdi',
+      };
+      throw apiError;
+    }
+    return job.transaction;
+  },
+
+  async scanReceipts(files: File[]): Promise<ReceiptBatchResult> {
+    // Images and/or .zip archives; the server streams them to disk
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+
+    const response = await apiClient.instance.post<ReceiptBatchResult>(
+      '/api/transactions/scan-receipts',
+      formData,
+      {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+      }
+    );
     return response.data;
   },
-};
 
+  async getScanJob(jobId: string, wait = 0): Promise<ReceiptScanJob> {
+    const response = await apiClient.instance.get<ReceiptScanJob>(
+      `/api/transactions/scan-receipt/${jobId}?wait=${wait}`
+    );
+    return response.data;
+  },
+};
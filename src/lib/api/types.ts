@@ -69,10 +69,40 @@ export interface Transaction {
   icon: string;
   color: string;
   receipt_url?: string;
+  anomaly_score?: number | null;
   created_at: string;
   updated_at: string;
 }
 
+export interface ReceiptScanJob {
+  job_id: string;
+  status: 'queued' | 'processing' | 'completed' | 'failed';
+  error?: string | null;
+  result?: Record<string, unknown> | null;
+  transaction?: Transaction | null;
+  created_at?: string | null;
+  finished_at?: string | null;
+}
+
+export interface ReceiptBatchFile {
+  filename: string;
+  status: 'created' | 'duplicate' | 'failed' | 'rejected';
+  error?: string | null;
+  transaction_id?: string | null;
+  duplicate_of?: string | null;
+  result?: Record<string, unknown> | null;
+}
+
+export interface ReceiptBatchResult {
+  total: number;
+  created: number;
+  duplicates: number;
+  failed: number;
+  rejected: number;
+  files: ReceiptBatchFile[];
+  transactions: Transaction[];
+}
+
 export interface TransactionStats {
   total_income: number;
   total_expense: number;